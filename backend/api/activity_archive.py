@@ -0,0 +1,257 @@
+"""
+Monthly partitions and cold-tier archival for the Activity table.
+
+On PostgreSQL ``api_activity`` is range-partitioned by month on ``published``
+(migration 0026). Rows that fall outside every monthly partition land in
+``api_activity_default`` until a partition for their month is created.
+
+Partitions older than the retention window are exported to gzip-compressed
+NDJSON files (one file per month, newest row first) and detached from the hot
+table, so the hot table and its indexes stay bounded. ``iter_archived_activities``
+streams those files back for the activity stream's archive read path.
+"""
+import gzip
+import json
+import logging
+import os
+import re
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Activity, activity_space_id
+
+logger = logging.getLogger(__name__)
+
+ACTIVITY_TABLE = 'api_activity'
+DEFAULT_PARTITION = 'api_activity_default'
+PARTITION_NAME_RE = re.compile(r'^api_activity_p(\d{4})_(\d{2})$')
+ARCHIVE_FILE_RE = re.compile(r'^activity_(\d{4})_(\d{2})\.ndjson\.gz$')
+
+# Query parameters the archive read path can match, mapped to Activity fields.
+ARCHIVE_FILTER_FIELDS = ('type', 'actor', 'object', 'target')
+
+
+def month_start(value):
+    """Return the first day of the month containing a date or datetime."""
+    if isinstance(value, datetime):
+        value = value.astimezone(dt_timezone.utc).date() if timezone.is_aware(value) else value.date()
+    return value.replace(day=1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + (month.month - 1) + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{ACTIVITY_TABLE}_p{month:%Y_%m}'
+
+
+def archive_path(month, archive_dir=None):
+    archive_dir = archive_dir or settings.ACTIVITY_ARCHIVE_DIR
+    return os.path.join(archive_dir, f'activity_{month:%Y_%m}.ndjson.gz')
+
+
+def _bound(month):
+    return f"'{month.isoformat()} 00:00:00+00'"
+
+
+def is_partitioned():
+    """True when api_activity is a partitioned Postgres table."""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid "
+            "WHERE c.relname = %s AND pg_table_is_visible(c.oid)",
+            [ACTIVITY_TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions():
+    """Return (month, table name) for each monthly partition, oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits i "
+            "JOIN pg_class parent ON parent.oid = i.inhparent "
+            "JOIN pg_class child ON child.oid = i.inhrelid "
+            "WHERE parent.relname = %s AND pg_table_is_visible(parent.oid)",
+            [ACTIVITY_TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    for name in names:
+        match = PARTITION_NAME_RE.match(name)
+        if match:
+            partitions.append((date(int(match.group(1)), int(match.group(2)), 1), name))
+    return sorted(partitions)
+
+
+def create_partition(month):
+    """
+    Create and attach the partition for ``month``.
+
+    Rows for that month already sitting in the default partition are moved
+    into the new table first, otherwise ATTACH would refuse the range. The
+    parent is locked against writes meanwhile, so that no row for the month
+    lands in the default partition between the move and the attach.
+    """
+    name = partition_name(month)
+    lower, upper = _bound(month), _bound(add_months(month, 1))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE "{ACTIVITY_TABLE}" IN SHARE ROW EXCLUSIVE MODE')
+        cursor.execute(f'CREATE TABLE "{name}" (LIKE "{ACTIVITY_TABLE}" INCLUDING DEFAULTS)')
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" '
+            f'WHERE "published" >= {lower} AND "published" < {upper} RETURNING *) '
+            f'INSERT INTO "{name}" SELECT * FROM moved'
+        )
+        cursor.execute(
+            f'ALTER TABLE "{ACTIVITY_TABLE}" ATTACH PARTITION "{name}" '
+            f'FOR VALUES FROM ({lower}) TO ({upper})'
+        )
+    return name
+
+
+def ensure_partitions(months_ahead=None):
+    """
+    Make sure a partition exists for the current month, the ``months_ahead``
+    months after it, and every month that has rows parked in the default
+    partition. Returns the names of the partitions that were created.
+    """
+    if months_ahead is None:
+        months_ahead = settings.ACTIVITY_PARTITION_PREMAKE_MONTHS
+
+    existing = {month for month, _name in list_partitions()}
+    current = month_start(timezone.now())
+    wanted = {add_months(current, offset) for offset in range(months_ahead + 1)}
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT DISTINCT date_trunc(\'month\', "published" AT TIME ZONE \'UTC\') '
+            f'FROM "{DEFAULT_PARTITION}"'
+        )
+        wanted.update(row[0].date() for row in cursor.fetchall())
+
+    return [create_partition(month) for month in sorted(wanted - existing)]
+
+
+def expired_partitions(retention_months=None, now=None):
+    """Monthly partitions whose whole range lies before the retention window."""
+    if retention_months is None:
+        retention_months = settings.ACTIVITY_RETENTION_MONTHS
+    cutoff = add_months(month_start(now or timezone.now()), -retention_months)
+    return [(month, name) for month, name in list_partitions() if month < cutoff]
+
+
+def archive_partition(month, archive_dir=None, drop=True):
+    """
+    Export one monthly partition to NDJSON and detach it from api_activity.
+
+    The partition is locked against writes for the duration of the export so
+    no row can slip in between writing the file and detaching the table.
+    Returns the number of rows written.
+    """
+    name = partition_name(month)
+    path = archive_path(month, archive_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp'
+
+    lower = datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+    next_month = add_months(month, 1)
+    upper = datetime(next_month.year, next_month.month, 1, tzinfo=dt_timezone.utc)
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE "{name}" IN SHARE ROW EXCLUSIVE MODE')
+
+        rows = (
+            Activity.objects
+            .filter(published__gte=lower, published__lt=upper)
+            .order_by('-published', '-id')
+            .values()
+        )
+        written = 0
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as fh:
+            for row in rows.iterator(chunk_size=2000):
+                fh.write(json.dumps(row, cls=DjangoJSONEncoder))
+                fh.write('\n')
+                written += 1
+        os.replace(tmp_path, path)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE "{ACTIVITY_TABLE}" DETACH PARTITION "{name}"')
+            if drop:
+                cursor.execute(f'DROP TABLE "{name}"')
+
+    logger.info("Archived %s activities from %s to %s", written, name, path)
+    return written
+
+
+def archived_months(archive_dir=None):
+    """Months that have an archive file, newest first."""
+    archive_dir = archive_dir or settings.ACTIVITY_ARCHIVE_DIR
+    if not os.path.isdir(archive_dir):
+        return []
+    months = []
+    for filename in os.listdir(archive_dir):
+        match = ARCHIVE_FILE_RE.match(filename)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months, reverse=True)
+
+
+def _row_to_activity(row):
+    row = dict(row)
+    row['published'] = parse_datetime(row['published'])
+    if row.get('space_id') is None:
+        # Archives written before Activity.space_id existed.
+        row['space_id'] = activity_space_id(row.get('target'), row.get('object'), row.get('payload'))
+    known = {field.attname for field in Activity._meta.concrete_fields}
+    return Activity(**{key: value for key, value in row.items() if key in known})
+
+
+def _matches(activity, filters):
+    space_id = filters.get('space_id')
+    if space_id is not None and activity.space_id != space_id:
+        return False
+    for field in ARCHIVE_FILTER_FIELDS:
+        expected = filters.get(field)
+        if expected and (getattr(activity, field) or '').lower() != expected.lower():
+            return False
+    return True
+
+
+def iter_archived_activities(filters=None, since=None, until=None, archive_dir=None):
+    """
+    Stream archived activities newest first as unsaved Activity instances.
+
+    Files outside the [since, until] window are skipped without being opened;
+    ``filters`` maps Activity fields to case-insensitive exact values, plus an
+    optional integer ``space_id``.
+    """
+    filters = filters or {}
+    since_month = month_start(since) if since else None
+    until_month = month_start(until) if until else None
+
+    for month in archived_months(archive_dir):
+        if since_month and month < since_month:
+            break
+        if until_month and month > until_month:
+            continue
+        with gzip.open(archive_path(month, archive_dir), 'rt', encoding='utf-8') as fh:
+            for line in fh:
+                activity = _row_to_activity(json.loads(line))
+                if until and activity.published > until:
+                    continue
+                if since and activity.published < since:
+                    break
+                if _matches(activity, filters):
+                    yield activity
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Profile, Space, Tag, SpaceModerator, Node, Edge, GraphSnapshot, Discussion, DiscussionReaction, Property
+from .models import Profile, Space, Tag, SpaceModerator, Node, Edge, GraphSnapshot, Discussion, DiscussionReaction, Property, RequestProfile
 
 @admin.register(Profile)
 class ProfileAdmin(admin.ModelAdmin):
@@ -19,6 +19,12 @@ class SpaceAdmin(admin.ModelAdmin):
     list_filter = ['created_at']
     search_fields = ['title', 'description', 'creator__username']
 
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ['request_id', 'method', 'route', 'status_code', 'duration_ms', 'sql_count', 'cypher_count', 'user', 'created_at']
+    list_filter = ['route', 'created_at']
+    search_fields = ['request_id', 'path', 'user__username']
+
 admin.site.register(Tag)
 admin.site.register(Node)
 admin.site.register(Edge)
@@ -0,0 +1,115 @@
+"""
+Rollup tables behind the Grafana analytics dashboards (infra/setup_grafana_*.py).
+
+AnalyticsRollup holds how many users, spaces, nodes and edges were created
+per day, week and month. ``update_rollups`` only reads the rows created since
+the metric's watermark (RollupWatermark), adds them to their buckets and
+moves the watermark, all in one transaction, so each run costs as much as
+the rows created since the last one rather than the size of the tables.
+Rows created in the last ROLLUP_LAG are left for the next run, giving
+transactions that started before the watermark time to commit.
+
+Rollups count creations: rows deleted later stay counted until
+``rebuild_rollups`` recounts the metric from scratch.
+
+``manage.py update_analytics_rollups`` runs it once; with --schedule it
+queues the ``update_analytics_rollups`` job, which runs through run_jobs and
+requeues itself every ANALYTICS_ROLLUP_INTERVAL seconds.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .jobs import enqueue, job
+from .models import AnalyticsRollup, Edge, Node, RollupWatermark, Space
+
+logger = logging.getLogger(__name__)
+
+# metric: (model, creation timestamp field)
+METRICS = {
+    'users': (User, 'date_joined'),
+    'spaces': (Space, 'created_at'),
+    'nodes': (Node, 'created_at'),
+    'edges': (Edge, 'created_at'),
+}
+PERIODS = (AnalyticsRollup.PERIOD_DAY, AnalyticsRollup.PERIOD_WEEK, AnalyticsRollup.PERIOD_MONTH)
+ROLLUP_LAG = timedelta(minutes=5)
+
+
+def _bucket_counts(queryset, field, period):
+    return dict(
+        queryset.annotate(bucket=Trunc(field, period)).values('bucket')
+        .annotate(created=Count('pk')).order_by().values_list('bucket', 'created')
+    )
+
+
+def _add_to_rollups(metric, period, counts):
+    existing = {
+        rollup.period_start: rollup
+        for rollup in AnalyticsRollup.objects.filter(metric=metric, period=period, period_start__in=list(counts))
+    }
+    changed, created = [], []
+    for start, count in counts.items():
+        if start in existing:
+            existing[start].count += count
+            changed.append(existing[start])
+        else:
+            created.append(AnalyticsRollup(metric=metric, period=period, period_start=start, count=count))
+    AnalyticsRollup.objects.bulk_update(changed, ['count'])
+    AnalyticsRollup.objects.bulk_create(created)
+
+
+def update_metric(metric, now=None):
+    """Roll up the metric's rows created since its watermark. Returns how many there were."""
+    model, field = METRICS[metric]
+    until = (now or timezone.now()) - ROLLUP_LAG
+    with transaction.atomic():
+        RollupWatermark.objects.get_or_create(metric=metric)
+        # Serializes concurrent runs for the metric
+        watermark = RollupWatermark.objects.select_for_update().get(metric=metric)
+        since = watermark.processed_until
+        if since is not None and since >= until:
+            return 0
+
+        rows = model.objects.filter(**{f'{field}__lt': until})
+        if since is not None:
+            rows = rows.filter(**{f'{field}__gte': since})
+        counts = {period: _bucket_counts(rows, field, period) for period in PERIODS}
+        for period, period_counts in counts.items():
+            _add_to_rollups(metric, period, period_counts)
+
+        watermark.processed_until = until
+        watermark.save(update_fields=['processed_until', 'updated_at'])
+    return sum(counts[AnalyticsRollup.PERIOD_DAY].values())
+
+
+def update_rollups(metrics=None, now=None):
+    """{metric: rows rolled up} for the given metrics (default: all)."""
+    return {metric: update_metric(metric, now) for metric in (metrics or METRICS)}
+
+
+def rebuild_rollups(metrics=None, now=None):
+    """Drop the metrics' rollups and watermarks and count everything again."""
+    metrics = list(metrics or METRICS)
+    with transaction.atomic():
+        AnalyticsRollup.objects.filter(metric__in=metrics).delete()
+        RollupWatermark.objects.filter(metric__in=metrics).delete()
+        return update_rollups(metrics, now)
+
+
+def schedule_rollups(delay=0):
+    return enqueue('update_analytics_rollups', delay=delay, dedupe=True)
+
+
+@job('update_analytics_rollups')
+def update_analytics_rollups(payload):
+    # Queue the next run first, so a failure here doesn't stop the cycle
+    schedule_rollups(delay=getattr(settings, 'ANALYTICS_ROLLUP_INTERVAL', 300))
+    counts = update_rollups()
+    logger.info("Rolled up %s", ", ".join(f"{count} {metric}" for metric, count in counts.items()))
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from . import authentication, authorization  # noqa: F401  (connect signal handlers)
+        from . import analytics, enrichment, geocoding, summaries  # noqa: F401  (register job handlers)
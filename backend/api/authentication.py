@@ -0,0 +1,165 @@
+"""
+JWT authentication that trusts role claims for read-only requests.
+
+Tokens issued by ``issue_access_token`` carry the user's ``user_type``,
+``is_archived`` flag, staff flags and a digest of the spaces they moderate.
+For SAFE methods ``ClaimsJWTAuthentication`` loads the user row together
+with its latest revocation in one query and takes the role from the claims,
+so ``api_profile`` and the moderator assignments are not read. Other
+methods, tokens without the claims and tokens issued before the user's
+latest revocation go through the regular simplejwt database lookup.
+
+Revocations are recorded whenever a claim would change: the role or archived
+flag of a profile, space moderator assignments, or the user's active/staff
+flags. As they are read on every request, a revocation made by any process
+(another worker, run_jobs, the shell) applies to the next request, and
+tokens of deleted or deactivated users are never trusted.
+"""
+import hashlib
+
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework import permissions
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import metrics
+from .models import Profile, SpaceModerator, TokenRevocation
+
+CLAIMS_VERSION = 1
+_NOT_REVOKED = 0
+
+
+def moderated_spaces_digest(space_ids):
+    """Short stable digest of the moderated space ids, '' when there are none."""
+    if not space_ids:
+        return ''
+    joined = ','.join(str(space_id) for space_id in sorted(space_ids))
+    return hashlib.sha1(joined.encode()).hexdigest()[:12]
+
+
+def claims_for_user(user):
+    profile = Profile.objects.filter(user=user).values_list('user_type', 'is_archived').first()
+    user_type, is_archived = profile or (Profile.USER, False)
+    space_ids = list(SpaceModerator.objects.filter(user=user).values_list('space_id', flat=True))
+    return {
+        'ctd': CLAIMS_VERSION,
+        'username': user.username,
+        'user_type': user_type,
+        'is_archived': is_archived,
+        'is_staff': user.is_staff,
+        'is_superuser': user.is_superuser,
+        'mod_spaces': moderated_spaces_digest(space_ids),
+    }
+
+
+def issue_access_token(user):
+    """Access token for ``user`` carrying the role claims."""
+    refresh = RefreshToken.for_user(user)
+    for claim, value in claims_for_user(user).items():
+        refresh[claim] = value
+    return refresh.access_token
+
+
+def revoke_token_claims(user_id, reason=''):
+    """Stop trusting the claims of every token issued to the user until now."""
+    TokenRevocation.objects.update_or_create(
+        user_id=user_id,
+        defaults={'revoked_at': timezone.now(), 'reason': reason},
+    )
+
+
+def claims_user(token):
+    """
+    The token's user, with the role claims attached as ``token_claims``, or
+    None when the claims can't be trusted: an older claims version, a user
+    that is gone or inactive, or a token issued before the latest revocation.
+    """
+    if token.get('ctd') != CLAIMS_VERSION:
+        return None
+    issued_at = token.get('iat')
+    if issued_at is None:
+        return None
+    user = User.objects.select_related('token_revocation').filter(pk=token[api_settings.USER_ID_CLAIM]).first()
+    if user is None or not user.is_active:
+        return None
+    try:
+        revoked_at = user.token_revocation.revoked_at.timestamp()
+    except TokenRevocation.DoesNotExist:
+        revoked_at = _NOT_REVOKED
+    if issued_at <= revoked_at:
+        return None
+    user.token_claims = {
+        'user_type': token['user_type'],
+        'is_archived': token['is_archived'],
+        'mod_spaces': token['mod_spaces'],
+    }
+    return user
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that skips the profile and role queries for reads with trusted claims."""
+
+    def authenticate(self, request):
+        with metrics.phase('auth'):
+            return self._authenticate(request)
+
+    def _authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        if request.method in permissions.SAFE_METHODS:
+            user = claims_user(validated_token)
+            if user is not None:
+                return user, validated_token
+        # A missing or inactive user is rejected here
+        return self.get_user(validated_token), validated_token
+
+
+def _token_flags(instance, fields):
+    # Read through __dict__ so deferred fields are not loaded here.
+    return tuple(instance.__dict__.get(field) for field in fields)
+
+
+PROFILE_CLAIM_FIELDS = ('user_type', 'is_archived')
+USER_CLAIM_FIELDS = ('username', 'is_active', 'is_staff', 'is_superuser')
+
+
+@receiver(post_init, sender=Profile)
+def remember_profile_claims(sender, instance, **kwargs):
+    instance._token_flags = _token_flags(instance, PROFILE_CLAIM_FIELDS)
+
+
+@receiver(post_init, sender=User)
+def remember_user_claims(sender, instance, **kwargs):
+    instance._token_flags = _token_flags(instance, USER_CLAIM_FIELDS)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_save, sender=User)
+def revoke_on_claim_change(sender, instance, created, **kwargs):
+    fields = PROFILE_CLAIM_FIELDS if sender is Profile else USER_CLAIM_FIELDS
+    flags = _token_flags(instance, fields)
+    previous = getattr(instance, '_token_flags', None)
+    instance._token_flags = flags
+    if created:
+        return
+    # Fields that were never loaded (.only()) cannot have changed.
+    if any(old is not None and old != new for old, new in zip(previous or (), flags)):
+        user_id = instance.user_id if sender is Profile else instance.pk
+        revoke_token_claims(user_id, reason=f'{sender.__name__.lower()} changed')
+
+
+@receiver(post_save, sender=SpaceModerator)
+@receiver(post_delete, sender=SpaceModerator)
+def revoke_on_moderator_change(sender, instance, **kwargs):
+    revoke_token_claims(instance.user_id, reason='space moderators changed')
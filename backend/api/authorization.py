@@ -0,0 +1,195 @@
+"""
+Request-scoped authorization context.
+
+Permission classes and views ask the same questions several times per request
+("is this user a collaborator of the space?", "are they archived?"). Use
+``get_authz(request)`` to answer them: every check is a single indexed
+``exists()``-style query and the answer is memoized on the request.
+
+When ``AUTHZ_CACHE_TTL`` is positive, answers are also kept in the shared
+Django cache for that many seconds. Cache keys include a membership version
+that is bumped whenever collaborators, space moderators or profiles change,
+so a change is picked up immediately by every process sharing the cache.
+With the default per-process cache, other workers may serve a stale answer
+for at most the TTL.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import metrics
+from .models import Profile, Space, SpaceModerator
+
+MEMBERSHIP_VERSION_KEY = 'authz:membership_version'
+_REQUEST_ATTR = '_authz_context'
+_MISSING = object()
+
+
+def membership_version():
+    version = cache.get(MEMBERSHIP_VERSION_KEY)
+    if version is None:
+        cache.add(MEMBERSHIP_VERSION_KEY, 1, None)
+        version = cache.get(MEMBERSHIP_VERSION_KEY, 1)
+    return version
+
+
+def bump_membership_version():
+    """Invalidate every cached authorization answer."""
+    try:
+        cache.incr(MEMBERSHIP_VERSION_KEY)
+    except ValueError:
+        cache.add(MEMBERSHIP_VERSION_KEY, 2, None)
+
+
+def _space_id(space):
+    """Space instance or primary key (URL kwargs arrive as strings); None if invalid."""
+    if isinstance(space, Space):
+        return space.pk
+    try:
+        return int(space)
+    except (TypeError, ValueError):
+        return None
+
+
+class AuthorizationContext:
+    """Memoized authorization answers for one user."""
+
+    def __init__(self, user):
+        self.user = user
+        self._memo = {}
+
+    @property
+    def is_authenticated(self):
+        return bool(self.user and self.user.is_authenticated)
+
+    @property
+    def is_staff(self):
+        return self.is_authenticated and (self.user.is_staff or self.user.is_superuser)
+
+    def _check(self, name, compute, *args):
+        if not self.is_authenticated:
+            return None
+        key = (name,) + args
+        if key in self._memo:
+            return self._memo[key]
+
+        with metrics.phase('permissions'):
+            value = self._lookup(name, compute, args)
+        self._memo[key] = value
+        return value
+
+    def _lookup(self, name, compute, args):
+        ttl = getattr(settings, 'AUTHZ_CACHE_TTL', 0)
+        cache_key = None
+        value = _MISSING
+        if ttl > 0:
+            suffix = ':'.join(str(arg) for arg in args)
+            cache_key = f"authz:v{membership_version()}:{self.user.pk}:{name}:{suffix}"
+            value = cache.get(cache_key, _MISSING)
+            metrics.record_cache('authz', hits=value is not _MISSING, misses=value is _MISSING)
+        if value is _MISSING:
+            value = compute(*args)
+            if cache_key:
+                cache.set(cache_key, value, ttl)
+        return value
+
+    def _profile_flags(self):
+        """(user_type, is_archived) of the user's profile, or None without one."""
+        claims = getattr(self.user, 'token_claims', None)
+        if claims:
+            # Trusted JWT claims (see authentication.ClaimsJWTAuthentication)
+            return (claims['user_type'], claims['is_archived'])
+
+        def compute():
+            if User.profile.is_cached(self.user):
+                profile = self.user.profile
+                return (profile.user_type, profile.is_archived)
+            return Profile.objects.filter(user_id=self.user.pk).values_list('user_type', 'is_archived').first()
+        return self._check('profile', compute)
+
+    def is_admin(self):
+        flags = self._profile_flags()
+        return bool(flags) and flags[0] == Profile.ADMIN
+
+    def is_moderator(self):
+        """Global moderator role, regardless of space assignments."""
+        flags = self._profile_flags()
+        return bool(flags) and flags[0] == Profile.MODERATOR
+
+    def is_archived(self):
+        flags = self._profile_flags()
+        return bool(flags) and flags[1]
+
+    def is_collaborator(self, space):
+        if _space_id(space) is None:
+            return False
+        return bool(self._check('collaborator', lambda space_id: Space.collaborators.through.objects.filter(
+            space_id=space_id, user_id=self.user.pk
+        ).exists(), _space_id(space)))
+
+    def is_space_moderator(self, space):
+        if _space_id(space) is None:
+            return False
+        return bool(self._check('space_moderator', lambda space_id: SpaceModerator.objects.filter(
+            space_id=space_id, user_id=self.user.pk
+        ).exists(), _space_id(space)))
+
+    def has_moderator_assignments(self):
+        claims = getattr(self.user, 'token_claims', None)
+        if claims:
+            return bool(claims['mod_spaces'])
+        return bool(self._check('moderator_assignments', lambda: SpaceModerator.objects.filter(
+            user_id=self.user.pk
+        ).exists()))
+
+    def can_moderate(self, space):
+        """Same rule as Profile.can_moderate_space."""
+        if self.is_admin():
+            return True
+        return self.is_moderator() and self.is_space_moderator(space)
+
+
+def get_authz(request):
+    """Return the AuthorizationContext for ``request``, creating it on first use."""
+    # DRF wraps the Django request; keep one context for both.
+    target = getattr(request, '_request', request)
+    context = getattr(target, _REQUEST_ATTR, None)
+    user = request.user
+    if context is None or context.user is not user:
+        context = AuthorizationContext(user)
+        setattr(target, _REQUEST_ATTR, context)
+    return context
+
+
+@receiver(m2m_changed, sender=Space.collaborators.through)
+def collaborators_changed(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_membership_version()
+
+
+@receiver(post_save, sender=SpaceModerator)
+@receiver(post_delete, sender=SpaceModerator)
+@receiver(post_delete, sender=Profile)
+def membership_changed(sender, **kwargs):
+    bump_membership_version()
+
+
+def _profile_authz_flags(profile):
+    # Read through __dict__ so deferred fields are not loaded here.
+    return (profile.__dict__.get('user_type'), profile.__dict__.get('is_archived'))
+
+
+@receiver(post_init, sender=Profile)
+def remember_profile_flags(sender, instance, **kwargs):
+    instance._authz_flags = _profile_authz_flags(instance)
+
+
+@receiver(post_save, sender=Profile)
+def profile_changed(sender, instance, created, **kwargs):
+    # Profiles are re-saved on every User save; only role/archive changes matter.
+    flags = _profile_authz_flags(instance)
+    if created or flags != getattr(instance, '_authz_flags', None):
+        instance._authz_flags = flags
+        bump_membership_version()
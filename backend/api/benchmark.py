@@ -0,0 +1,482 @@
+"""
+Synthetic data and an end-to-end benchmark of the hot API endpoints.
+
+``seed`` (manage.py seed_benchmark_data) adds benchmark spaces shaped like
+real ones: nodes whose degrees follow a power law (a few hubs and a long
+tail of leaves), Wikidata-style properties with a skewed mix of P31 classes,
+discussions with reactions, open reports, and the activities recorded when
+all of these are created. The rows are bulk inserted, so the dashboard
+counters are recounted afterwards. Everything is drawn from one seeded
+Random, so the same arguments give the same data.
+
+``run`` (manage.py run_benchmark) requests each of ENDPOINTS in-process,
+through the whole middleware stack, as a collaborator of the largest
+benchmark space. It reports p50/p95 latency per endpoint and the SQL queries
+and time behind it, read from the Server-Timing header
+(ServerTimingMiddleware). Reports are JSON; ``compare`` lines one up
+against a report from an earlier release.
+"""
+import json
+import logging
+import math
+import random
+import statistics
+import time
+from collections import Counter
+from datetime import timedelta
+from itertools import accumulate
+from uuid import UUID
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, Q
+from django.test import Client
+from django.utils import timezone
+
+from .authentication import issue_access_token
+from .geo import geohash_encode
+from .models import (
+    Activity, DashboardCounters, Discussion, DiscussionReaction, Edge, EdgeProperty, Node, Profile, Property,
+    Report, Space,
+)
+from .neo4j_db import Neo4jConnection
+from .reporting import ALLOWED_REASON_CODES
+
+logger = logging.getLogger(__name__)
+
+# Benchmark spaces and users are recognised by these prefixes
+SPACE_PREFIX = '[benchmark]'
+USERNAME_PREFIX = 'benchmark-user-'
+
+# (qid, label), most common first: P31 values are drawn with the same skew as edge endpoints
+P31_CLASSES = [
+    ('Q5', 'human'), ('Q515', 'city'), ('Q43229', 'organization'), ('Q6256', 'country'),
+    ('Q11424', 'film'), ('Q7725634', 'literary work'), ('Q33506', 'museum'), ('Q3918', 'university'),
+    ('Q4830453', 'business'), ('Q483110', 'stadium'), ('Q8502', 'mountain'), ('Q4022', 'river'),
+    ('Q1248784', 'airport'), ('Q23442', 'island'), ('Q12280', 'bridge'), ('Q16521', 'taxon'),
+]
+# (pid, label, value kind) for the properties besides P31
+NODE_PROPERTIES = [
+    ('P17', 'country', 'item'),
+    ('P131', 'located in the administrative territorial entity', 'item'),
+    ('P27', 'country of citizenship', 'item'),
+    ('P571', 'inception', 'time'),
+    ('P569', 'date of birth', 'time'),
+    ('P1082', 'population', 'quantity'),
+    ('P1448', 'official name', 'string'),
+    ('P856', 'official website', 'url'),
+]
+ITEM_VALUES = [
+    ('Q183', 'Germany'), ('Q142', 'France'), ('Q30', 'United States of America'), ('Q43', 'Turkey'),
+    ('Q145', 'United Kingdom'), ('Q17', 'Japan'), ('Q155', 'Brazil'), ('Q668', 'India'),
+]
+RELATIONS = [
+    ('P361', 'part of'), ('P131', 'located in'), ('P463', 'member of'), ('P108', 'employer'),
+    ('P50', 'author'), ('P161', 'cast member'), ('P279', 'subclass of'), ('P737', 'influenced by'),
+]
+WORDS = [
+    'north', 'river', 'stone', 'harbor', 'golden', 'silent', 'iron', 'oak', 'crimson', 'summit',
+    'meadow', 'lantern', 'atlas', 'cedar', 'falcon', 'granite', 'willow', 'ember', 'coral', 'delta',
+]
+CITIES = [
+    ('Istanbul', 'Turkey', 41.01, 28.98), ('Berlin', 'Germany', 52.52, 13.40), ('Paris', 'France', 48.86, 2.35),
+    ('Tokyo', 'Japan', 35.68, 139.69), ('São Paulo', 'Brazil', -23.55, -46.63), ('Mumbai', 'India', 19.08, 72.88),
+]
+REACTION_UPVOTE_SHARE = 0.8
+# Share of nodes with coordinates, placed within this many degrees of their space
+LOCATED_SHARE = 0.5
+LOCATION_SPREAD = 0.5
+HISTORY = timedelta(days=365)
+BATCH_SIZE = 1000
+
+
+def zipf_weights(count, exponent):
+    """Cumulative weights giving the item of rank r a probability proportional to r ** -exponent."""
+    return list(accumulate(rank ** -exponent for rank in range(1, count + 1)))
+
+
+def benchmark_spaces():
+    return Space.objects.filter(title__startswith=SPACE_PREFIX)
+
+
+def clear():
+    """Delete every benchmark space and user, with everything that hangs off them."""
+    space_ids = list(benchmark_spaces().values_list('id', flat=True))
+    with transaction.atomic():
+        Activity.objects.filter(space_id__in=space_ids).delete()
+        Space.objects.filter(id__in=space_ids).delete()
+        User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+        DashboardCounters.reconcile()
+    return len(space_ids)
+
+
+def _ensure_users(count):
+    existing = list(User.objects.filter(username__startswith=USERNAME_PREFIX).order_by('id'))
+    missing = [
+        User(username=f'{USERNAME_PREFIX}{index}', password=make_password(None))
+        for index in range(len(existing), count)
+    ]
+    if missing:
+        # bulk_create skips the post_save handler that creates the profile
+        created = User.objects.bulk_create(missing)
+        Profile.objects.bulk_create([Profile(user=user) for user in created])
+        existing.extend(created)
+    return existing[:count]
+
+
+def _spread(rng, now):
+    """A creation time within the last HISTORY."""
+    return now - timedelta(seconds=rng.uniform(0, HISTORY.total_seconds()))
+
+
+def _uuid(rng):
+    return str(UUID(int=rng.getrandbits(128), version=4))
+
+
+def _property_value(rng, kind):
+    """(value, value_text, value_id) as add-node stores them."""
+    if kind == 'item':
+        qid, label = rng.choice(ITEM_VALUES)
+        return {'id': qid, 'text': label}, label, qid
+    if kind == 'time':
+        text = f'{rng.randint(1800, 2020)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}'
+    elif kind == 'quantity':
+        text = str(int(10 ** rng.uniform(2, 7)))
+    elif kind == 'url':
+        text = f'https://{rng.choice(WORDS)}.example.org'
+    else:
+        text = f'{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}'
+    return text, text, None
+
+
+def _activity(rng, type, actor, object, space, published, summary, payload):
+    return Activity(
+        as2_id=_uuid(rng), type=type, actor=actor.username, object=object, target=f'Space:{space.id}',
+        summary=summary, published=published, payload={'space_id': space.id, **payload}, space_id=space.id,
+    )
+
+
+def seed(spaces=3, nodes=1000, edges=3000, properties=4, skew=1.0, users=50, collaborators=10,
+         discussions=200, reactions=5, reports=20, rng_seed=0, neo4j=False, now=None):
+    """
+    Add ``spaces`` benchmark spaces and return how many rows of each kind were created.
+
+    Edge endpoints are drawn with Zipf weights of exponent ``skew`` over the
+    space's nodes, so node degrees follow a power law; each node has a P31
+    value and ``properties`` properties in all. ``reactions`` is the most
+    any discussion gets. With ``neo4j`` the nodes and edges are also written
+    to Neo4j, as add-node does, for graph-search.
+    """
+    rng = random.Random(rng_seed)
+    now = now or timezone.now()
+    people = _ensure_users(max(users, collaborators, 1))
+    created = Counter()
+    for _ in range(spaces):
+        with transaction.atomic():
+            created.update(_seed_space(
+                rng, now, people, nodes, edges, properties, skew, collaborators, discussions, reactions, reports,
+                neo4j,
+            ))
+    DashboardCounters.reconcile()
+    return created
+
+
+def _seed_space(rng, now, people, node_count, edge_count, property_count, skew, collaborator_count,
+                discussion_count, reaction_count, report_count, neo4j):
+    members = rng.sample(people, min(collaborator_count, len(people))) or people[:1]
+    city, country, latitude, longitude = rng.choice(CITIES)
+    number = benchmark_spaces().count() + 1
+    space = Space.objects.create(
+        title=f'{SPACE_PREFIX} {rng.choice(WORDS).title()} {city} {number}',
+        description=f'Synthetic benchmark space with {node_count} nodes and {edge_count} edges.',
+        creator=members[0], created_at=now - HISTORY, city=city, country=country,
+        latitude=latitude, longitude=longitude,
+    )
+    space.collaborators.add(*members)
+    activities = []
+    p31_weights = zipf_weights(len(P31_CLASSES), skew)
+
+    node_rows = []
+    for index in range(node_count):
+        p31 = rng.choices(P31_CLASSES, cum_weights=p31_weights)[0]
+        node = Node(
+            label=f'{rng.choice(WORDS).title()} {p31[1]} {index}',
+            wikidata_id=f'Q{rng.randint(10 ** 5, 10 ** 8)}',
+            description=f'Synthetic {p31[1]}',
+            created_by=rng.choice(members), space=space, created_at=_spread(rng, now),
+        )
+        if rng.random() < LOCATED_SHARE:
+            node.latitude = latitude + rng.uniform(-LOCATION_SPREAD, LOCATION_SPREAD)
+            node.longitude = longitude + rng.uniform(-LOCATION_SPREAD, LOCATION_SPREAD)
+            node.city, node.country = city, country
+            # Set by GeohashedModel.save, which bulk_create doesn't call
+            node.geohash = geohash_encode(node.latitude, node.longitude)
+        node._p31 = p31
+        node_rows.append(node)
+    node_rows = Node.objects.bulk_create(node_rows, batch_size=BATCH_SIZE)
+
+    property_rows = []
+    for node in node_rows:
+        qid, label = node._p31
+        property_rows.append(Property(
+            node=node, property_id='P31', statement_id=f'{node.wikidata_id}${_uuid(rng)}',
+            property_label='instance of', value={'id': qid, 'text': label}, value_text=label, value_id=qid,
+        ))
+        for pid, property_label, kind in rng.sample(NODE_PROPERTIES, min(property_count - 1, len(NODE_PROPERTIES))):
+            value, value_text, value_id = _property_value(rng, kind)
+            property_rows.append(Property(
+                node=node, property_id=pid, statement_id=f'{node.wikidata_id}${_uuid(rng)}',
+                property_label=property_label, value=value, value_text=value_text, value_id=value_id,
+            ))
+        activities.append(_activity(
+            rng, 'Create', node.created_by, f'Node:{node.id}', space, node.created_at,
+            f"{node.created_by.username} added node '{node.label}'", {'node_id': node.id},
+        ))
+    Property.objects.bulk_create(property_rows, batch_size=BATCH_SIZE)
+
+    edge_rows = []
+    if len(node_rows) > 1:
+        # Rank order is shuffled so hubs aren't simply the oldest nodes
+        ranked = rng.sample(node_rows, len(node_rows))
+        weights = zipf_weights(len(ranked), skew)
+        for _ in range(edge_count):
+            source, target = rng.choices(ranked, cum_weights=weights, k=2)
+            while target is source:
+                target = rng.choices(ranked, cum_weights=weights)[0]
+            pid, relation = rng.choice(RELATIONS)
+            created_at = min(max(source.created_at, target.created_at) + timedelta(hours=rng.uniform(0, 24)), now)
+            edge_rows.append(Edge(
+                source=source, target=target, relation_property=relation, wikidata_property_id=pid,
+                created_at=created_at,
+            ))
+    edge_rows = Edge.objects.bulk_create(edge_rows, batch_size=BATCH_SIZE)
+    edge_property_rows = []
+    for edge in edge_rows:
+        year = str(rng.randint(1900, 2024))
+        edge_property_rows.append(EdgeProperty(
+            edge=edge, property_id='P580', statement_id=_uuid(rng), property_label='start time',
+            value=year, value_text=year,
+        ))
+        actor = rng.choice(members)
+        activities.append(_activity(
+            rng, 'Add', actor, f'Edge:{edge.id}', space, edge.created_at,
+            f"{actor.username} connected '{edge.source.label}' to '{edge.target.label}' as '{edge.relation_property}'",
+            {'edge_id': edge.id, 'source_id': edge.source_id, 'target_id': edge.target_id},
+        ))
+    EdgeProperty.objects.bulk_create(edge_property_rows, batch_size=BATCH_SIZE)
+
+    discussion_rows = Discussion.objects.bulk_create([
+        Discussion(
+            space=space, user=rng.choice(members), created_at=_spread(rng, now),
+            text=' '.join(rng.choice(WORDS) for _ in range(rng.randint(5, 40))).capitalize() + '.',
+        )
+        for _ in range(discussion_count)
+    ], batch_size=BATCH_SIZE)
+    reaction_rows = []
+    for discussion in discussion_rows:
+        for user in rng.sample(people, min(rng.randint(0, reaction_count), len(people))):
+            value = DiscussionReaction.UPVOTE if rng.random() < REACTION_UPVOTE_SHARE else DiscussionReaction.DOWNVOTE
+            reaction_rows.append(DiscussionReaction(discussion=discussion, user=user, value=value))
+        activities.append(_activity(
+            rng, 'Create', discussion.user, f'Discussion:{discussion.id}', space, discussion.created_at,
+            f"{discussion.user.username} commented in '{space.title}'", {'discussion_id': discussion.id},
+        ))
+    DiscussionReaction.objects.bulk_create(reaction_rows, batch_size=BATCH_SIZE)
+
+    report_rows = []
+    reportable = [(Report.CONTENT_NODE, node) for node in node_rows]
+    reportable += [(Report.CONTENT_DISCUSSION, discussion) for discussion in discussion_rows]
+    for content_type, content in rng.sample(reportable, min(report_count, len(reportable))):
+        reporter = rng.choice(people)
+        report_rows.append(Report(
+            content_type=content_type, content_id=content.id, space=space, reporter=reporter,
+            reason=rng.choice(sorted(ALLOWED_REASON_CODES[content_type])),
+        ))
+    report_rows = Report.objects.bulk_create(report_rows, batch_size=BATCH_SIZE)
+    for report in report_rows:
+        activities.append(_activity(
+            rng, 'Report', report.reporter, f'{report.content_type}:{report.content_id}', space, _spread(rng, now),
+            f'{report.reporter.username} reported {report.content_type} {report.content_id}',
+            {'report_id': report.id, 'status': report.status, 'reason': report.reason},
+        ))
+    # Same counts as _recompute_entity_reports keeps
+    for model, content_type in ((Node, Report.CONTENT_NODE), (Discussion, Report.CONTENT_DISCUSSION)):
+        counts = Counter(report.content_id for report in report_rows if report.content_type == content_type)
+        reported = list(model.objects.filter(id__in=counts))
+        for row in reported:
+            row.report_count = counts[row.id]
+            row.is_reported = True
+        model.objects.bulk_update(reported, ['report_count', 'is_reported'], batch_size=BATCH_SIZE)
+
+    Activity.objects.bulk_create(activities, batch_size=BATCH_SIZE)
+
+    if neo4j:
+        for node in node_rows:
+            Neo4jConnection.create_node(node.id, node.label, space.id, {
+                'wikidata_id': node.wikidata_id, 'description': node.description,
+                'created_by': node.created_by.username, 'created_at': node.created_at.isoformat(),
+            })
+        for edge in edge_rows:
+            Neo4jConnection.create_edge(
+                edge.id, edge.source_id, edge.target_id, edge.relation_property,
+                {'wikidata_property_id': edge.wikidata_property_id},
+            )
+
+    return {
+        'spaces': 1, 'nodes': len(node_rows), 'properties': len(property_rows), 'edges': len(edge_rows),
+        'edge_properties': len(edge_property_rows), 'discussions': len(discussion_rows),
+        'reactions': len(reaction_rows), 'reports': len(report_rows), 'activities': len(activities),
+    }
+
+
+# name: (method, path, body); {space}, {term} and {p31} are filled in from the benchmark space
+ENDPOINTS = {
+    'nodes': ('GET', '/api/spaces/{space}/nodes/', None),
+    'edges': ('GET', '/api/spaces/{space}/edges/', None),
+    'graph-search': ('GET', '/api/spaces/{space}/graph-search/?q={term}', None),
+    'search/query': ('POST', '/api/spaces/{space}/search/query/', {'rules': [{'property_id': 'P31', 'value_id': '{p31}'}]}),
+    'top-scored': ('GET', '/api/spaces/top-scored/', None),
+    'discussions': ('GET', '/api/spaces/{space}/discussions/', None),
+    'activity-stream': ('GET', '/api/activity-stream/?space={space}', None),
+}
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def server_timing(response):
+    """{phase: (ms, calls or None)} from the Server-Timing header."""
+    phases = {}
+    for entry in filter(None, response.get('Server-Timing', '').split(', ')):
+        name, *params = entry.split(';')
+        params = dict(param.split('=', 1) for param in params if '=' in param)
+        calls = params.get('desc', '').rpartition('(')[2].split(' ')[0]
+        phases[name] = (float(params.get('dur', 0)), int(calls) if calls.isdigit() else None)
+    return phases
+
+
+def target_space(space_id=None):
+    """The space to benchmark: the given one, or the benchmark space with the most nodes."""
+    spaces = Space.objects.all() if space_id else benchmark_spaces()
+    if space_id:
+        spaces = spaces.filter(pk=space_id)
+    return spaces.annotate(node_count=Count('node', filter=Q(node__is_archived=False))).order_by('-node_count').first()
+
+
+def _placeholders(space):
+    # The most connected node's first word, and the commonest P31 value
+    degrees = Counter()
+    for source_id, target_id in Edge.objects.filter(source__space=space).values_list('source_id', 'target_id'):
+        degrees.update((source_id, target_id))
+    hub = Node.objects.filter(pk=degrees.most_common(1)[0][0]).first() if degrees else None
+    p31 = Property.objects.filter(node__space=space, property_id='P31').values('value_id').annotate(
+        n=Count('id'),
+    ).order_by('-n').first()
+    return {
+        'space': space.pk,
+        'term': hub.label.split()[0].lower() if hub else 'a',
+        'p31': p31['value_id'] if p31 else 'Q5',
+    }
+
+
+def _fill(value, placeholders):
+    if isinstance(value, str):
+        return value.format(**placeholders)
+    if isinstance(value, dict):
+        return {key: _fill(item, placeholders) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_fill(item, placeholders) for item in value)
+    return value
+
+
+def _client_host():
+    """A host the project accepts, for the in-process client."""
+    for host in settings.ALLOWED_HOSTS:
+        if host not in ('*', '') and not host.startswith('.'):
+            return host
+    return 'localhost'
+
+
+def run(space=None, iterations=20, warmup=2, endpoints=None, label=''):
+    """Request each endpoint ``warmup`` + ``iterations`` times and return the report."""
+    space = target_space(space)
+    if space is None:
+        raise ValueError('No benchmark space found; run seed_benchmark_data first')
+    user = space.collaborators.order_by('id').first() or space.creator
+    # Errors are counted in 'statuses' rather than ending the run
+    client = Client(
+        raise_request_exception=False,
+        HTTP_HOST=_client_host(),
+        HTTP_AUTHORIZATION=f'Bearer {issue_access_token(user)}',
+    )
+    placeholders = _placeholders(space)
+
+    results = {}
+    for name in endpoints or ENDPOINTS:
+        method, path, body = _fill(ENDPOINTS[name], placeholders)
+        timings, queries, db_ms, statuses = [], [], [], Counter()
+        for iteration in range(warmup + iterations):
+            started = time.perf_counter()
+            if method == 'GET':
+                response = client.get(path)
+            else:
+                response = client.post(path, json.dumps(body), content_type='application/json')
+            elapsed = (time.perf_counter() - started) * 1000
+            if iteration < warmup:
+                continue
+            timings.append(elapsed)
+            statuses[response.status_code] += 1
+            db = server_timing(response).get('db')
+            queries.append(db[1] if db else 0)
+            db_ms.append(db[0] if db else 0.0)
+        results[name] = {
+            'method': method,
+            'path': path,
+            'body': body,
+            'statuses': {str(status): count for status, count in sorted(statuses.items())},
+            'p50_ms': round(percentile(timings, 50), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'mean_ms': round(statistics.fmean(timings), 3),
+            'max_ms': round(max(timings), 3),
+            'queries_p50': percentile(queries, 50),
+            'queries_max': max(queries),
+            'db_ms_p50': round(percentile(db_ms, 50), 3),
+        }
+        logger.debug("benchmark %s: %s", name, results[name])
+
+    return {
+        'label': label,
+        'created_at': timezone.now().isoformat(),
+        'iterations': iterations,
+        'warmup': warmup,
+        'space': {
+            'id': space.pk,
+            'title': space.title,
+            'nodes': Node.objects.filter(space=space, is_archived=False).count(),
+            'edges': Edge.objects.filter(source__space=space).count(),
+            'discussions': Discussion.objects.filter(space=space).count(),
+            'activities': Activity.objects.filter(space_id=space.pk).count(),
+        },
+        'endpoints': results,
+    }
+
+
+def compare(report, baseline):
+    """[(endpoint, metric, baseline value, value, change in %)] for the endpoints in both reports."""
+    rows = []
+    for name, result in report['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if not before:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'queries_p50'):
+            old, new = before.get(metric), result[metric]
+            if old is None:
+                continue
+            change = (new - old) / old * 100 if old else None
+            rows.append((name, metric, old, new, change))
+    return rows
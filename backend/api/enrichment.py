@@ -0,0 +1,76 @@
+"""
+Node enrichment off the request path.
+
+``add_node`` only stores the node and the properties the user picked, then
+calls ``schedule_node_enrichment``. The ``enrich_node`` job fills in what
+used to be fetched inline: the entity's P31 (instance of) statements when
+none were picked, and location names for nodes that have coordinates but no
+names (see geocoding.schedule_node_reverse_geocode). Results are written to
+the node's rows, so clients see them on their next fetch of the space.
+"""
+import logging
+
+from .geocoding import schedule_node_reverse_geocode
+from .jobs import enqueue, job
+from .models import Node, Property, bump_content_version
+from .wikidata import get_wikidata_properties_many
+
+logger = logging.getLogger(__name__)
+
+
+def _needs_location(node):
+    return (
+        node.latitude is not None and node.longitude is not None
+        and not any(getattr(node, field) for field in ('country', 'city', 'location_name'))
+    )
+
+
+def schedule_node_enrichment(node, has_p31):
+    """Queue an enrich_node job if the node is missing P31 or location names. Returns the job or None."""
+    fetch_p31 = bool(node.wikidata_id) and not has_p31
+    if not (fetch_p31 or _needs_location(node)):
+        return None
+    return enqueue('enrich_node', {'node_id': node.pk, 'fetch_p31': fetch_p31}, dedupe=True)
+
+
+def add_p31_properties(node):
+    """Store the entity's P31 statements on the node. Returns how many were added."""
+    from .views import _normalize_property_value_for_storage
+
+    fetched = get_wikidata_properties_many([node.wikidata_id], property_filter=['P31'])
+    if node.wikidata_id not in fetched:
+        raise RuntimeError(f"Failed to fetch P31 for {node.wikidata_id}")
+    # Picked up in the meantime (e.g. through update_node_properties)
+    if Property.objects.filter(node=node, property_id='P31').exists():
+        return 0
+
+    rows = []
+    for p31 in fetched[node.wikidata_id]:
+        value_text, value_id = _normalize_property_value_for_storage(p31.get('value'))
+        rows.append(Property(
+            node=node,
+            property_id='P31',
+            statement_id=p31.get('statement_id'),
+            property_label=p31.get('property_label', 'instance of'),
+            value=p31.get('value'),
+            value_text=value_text,
+            value_id=value_id
+        ))
+    Property.objects.bulk_create(rows, ignore_conflicts=True)
+    if rows:
+        # bulk_create skips the signals that invalidate the space's summary
+        bump_content_version(space_ids=[node.space_id])
+    return len(rows)
+
+
+@job('enrich_node')
+def enrich_node(payload):
+    node = Node.objects.filter(pk=payload['node_id']).first()
+    if node is None:
+        return
+    if payload.get('fetch_p31') and node.wikidata_id:
+        added = add_p31_properties(node)
+        if added:
+            logger.info("Added %s P31 properties to node %s", added, node.pk)
+    if _needs_location(node):
+        schedule_node_reverse_geocode(node)
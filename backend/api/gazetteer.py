@@ -0,0 +1,143 @@
+"""
+Offline reverse geocoder backed by a GeoNames cities file.
+
+``GAZETTEER_CITIES_FILE`` points at a GeoNames dump such as ``cities15000.txt``
+(https://download.geonames.org/export/dump/) and ``GAZETTEER_COUNTRIES_FILE``
+at ``countryInfo.txt`` for country names. The cities are loaded once per
+process into a grid of 1-degree cells, so ``nearest_city`` only measures the
+handful of cells around the point: no network, no rate limit, and fast enough
+for bulk backfills (``manage.py backfill_node_locations``).
+
+Without the files configured every lookup returns None and callers fall back
+to Nominatim (see api/geocoding.py).
+"""
+import math
+import threading
+
+from django.conf import settings
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+CELL_DEGREES = 1.0
+
+# Columns of the GeoNames "geoname" table
+NAME, LATITUDE, LONGITUDE, COUNTRY_CODE, POPULATION = 1, 4, 5, 8, 14
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _cell(latitude, longitude):
+    return (
+        int(math.floor(latitude / CELL_DEGREES)),
+        int(math.floor(longitude / CELL_DEGREES)) % int(360 / CELL_DEGREES),
+    )
+
+
+def load_country_names(path):
+    """{ISO code: country name} from a GeoNames countryInfo.txt."""
+    names = {}
+    with open(path, encoding='utf-8') as countries:
+        for line in countries:
+            if line.startswith('#') or not line.strip():
+                continue
+            columns = line.rstrip('\n').split('\t')
+            names[columns[0]] = columns[4]
+    return names
+
+
+class Gazetteer:
+    def __init__(self, cities, country_names=None):
+        """``cities`` is an iterable of (name, latitude, longitude, country_code, population)."""
+        self.country_names = country_names or {}
+        self.grid = {}
+        self.size = 0
+        for city in cities:
+            self.grid.setdefault(_cell(city[1], city[2]), []).append(city)
+            self.size += 1
+
+    @classmethod
+    def from_files(cls, cities_path, countries_path=None):
+        def cities():
+            with open(cities_path, encoding='utf-8') as dump:
+                for line in dump:
+                    columns = line.rstrip('\n').split('\t')
+                    if len(columns) <= POPULATION:
+                        continue
+                    yield (
+                        columns[NAME],
+                        float(columns[LATITUDE]),
+                        float(columns[LONGITUDE]),
+                        columns[COUNTRY_CODE],
+                        int(columns[POPULATION] or 0),
+                    )
+        return cls(cities(), load_country_names(countries_path) if countries_path else None)
+
+    def _candidates(self, latitude, longitude, max_distance_km):
+        lat_span = max_distance_km / KM_PER_DEGREE
+        lat_cells = int(math.ceil(lat_span / CELL_DEGREES))
+        # Cells get narrower towards the poles; widen the longitude range to match
+        widest = min(89.9, abs(latitude) + lat_span)
+        lon_span = min(180.0, lat_span / math.cos(math.radians(widest)))
+        lon_cells = int(math.ceil(lon_span / CELL_DEGREES))
+        columns = int(360 / CELL_DEGREES)
+
+        row, column = _cell(latitude, longitude)
+        seen_columns = {(column + offset) % columns for offset in range(-lon_cells, lon_cells + 1)}
+        for lat_row in range(row - lat_cells, row + lat_cells + 1):
+            for lon_column in seen_columns:
+                yield from self.grid.get((lat_row, lon_column), ())
+
+    def nearest_city(self, latitude, longitude, max_distance_km):
+        """(city tuple, distance in km) of the closest city within range, or None."""
+        best, best_distance = None, max_distance_km
+        for city in self._candidates(latitude, longitude, max_distance_km):
+            distance = haversine_km(latitude, longitude, city[1], city[2])
+            if distance <= best_distance:
+                best, best_distance = city, distance
+        return (best, best_distance) if best else None
+
+    def reverse(self, latitude, longitude, max_distance_km):
+        """Location fields in the shape used by geocoding.reverse_geocode_coordinates, or None."""
+        match = self.nearest_city(latitude, longitude, max_distance_km)
+        if match is None:
+            return None
+        (name, _lat, _lon, country_code, _population), _distance = match
+        country = self.country_names.get(country_code, country_code)
+        return {
+            'country': country,
+            'city': name,
+            'district': None,
+            'street': None,
+            'location_name': f"{name}, {country}" if country else name,
+        }
+
+
+def get_gazetteer():
+    """The configured Gazetteer, loaded on first use, or None when no cities file is set."""
+    global _gazetteer
+    paths = (getattr(settings, 'GAZETTEER_CITIES_FILE', ''), getattr(settings, 'GAZETTEER_COUNTRIES_FILE', '') or None)
+    if not paths[0]:
+        return None
+    current = _gazetteer
+    if current is not None and current[0] == paths:
+        return current[1]
+    with _gazetteer_lock:
+        if _gazetteer is None or _gazetteer[0] != paths:
+            _gazetteer = (paths, Gazetteer.from_files(*paths))
+        return _gazetteer[1]
+
+
+def offline_reverse_geocode(latitude, longitude):
+    """Nearest city and country for the coordinates, or None (no gazetteer or nothing in range)."""
+    gazetteer = get_gazetteer()
+    if gazetteer is None:
+        return None
+    max_distance = getattr(settings, 'GAZETTEER_MAX_DISTANCE_KM', 50)
+    return gazetteer.reverse(latitude, longitude, max_distance)
@@ -0,0 +1,340 @@
+"""
+Geohashes, bounding-box queries and clustering for map views.
+
+Spaces, nodes and profiles store the geohash of their coordinates next to
+latitude/longitude (see GeohashedModel). A bounding box is covered by a
+handful of geohash cells, each of which is a contiguous range of the indexed
+geohash column, so viewport queries are a few B-tree range scans followed by
+an exact latitude/longitude check instead of a scan of every row.
+
+Below MAP_POINTS_MIN_ZOOM the map endpoints return clusters instead of
+points: rows grouped in SQL by a geohash prefix whose length grows with the
+zoom level. Clusters are computed and cached per (zoom, tile), a tile being
+the geohash cell one character shorter than the clusters in it. Tile keys
+include a version kept in the database per scope and region, a geohash
+prefix of TILE_VERSION_PRECISION characters (see MapTileVersion). When a row
+moves, appears or disappears the regions of its old and new geohash are
+bumped (see invalidate_map_tiles), which retires only the tiles over those
+regions, in every worker. The versions of a scope are read from the cache,
+so workers other than the one that made a change, and other processes such
+as a geocode job, see it within MAP_TILE_VERSION_CACHE_SECONDS.
+"""
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, F, Max, Min, Q
+from django.db.models.functions import Substr
+
+from . import metrics
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Stored precision: cells of about 5 x 5 m
+GEOHASH_PRECISION = 9
+# Upper bound on the number of cells (index ranges) used to cover a bounding box
+MAX_COVER_CELLS = 32
+MIN_ZOOM = 0
+MAX_ZOOM = 22
+MAP_PAGE_SIZE = 500
+MAP_MAX_PAGE_SIZE = 2000
+# Most cluster tiles a single request may cover
+MAP_MAX_TILES = 128
+TILE_KEY = 'map_tile:{scope}:{version}:{zoom}:{tile}'
+# Length of the geohash prefixes (regions of about 156 x 156 km) tile versions are kept for
+TILE_VERSION_PRECISION = 3
+TILE_VERSIONS_KEY = 'map_tile_versions:{scope}'
+
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Geohash of a point, or None when either coordinate is missing."""
+    if latitude is None or longitude is None:
+        return None
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        value, span = (longitude, lon_range) if even else (latitude, lat_range)
+        middle = (span[0] + span[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            span[0] = middle
+        else:
+            span[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(height, width) in degrees of a geohash cell of the given length."""
+    lon_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def geohash_bounds(geohash):
+    """(south, west, north, east) of a geohash cell."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = BASE32.index(char)
+        for shift in range(4, -1, -1):
+            span = lon_range if even else lat_range
+            middle = (span[0] + span[1]) / 2
+            if value >> shift & 1:
+                span[0] = middle
+            else:
+                span[1] = middle
+            even = not even
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+def parse_bbox(value):
+    """
+    (west, south, east, north) from a "west,south,east,north" string. West
+    may be greater than east for boxes that cross the antimeridian. Raises
+    ValueError for anything else.
+    """
+    try:
+        west, south, east, north = (float(part) for part in value.split(','))
+    except (AttributeError, ValueError):
+        raise ValueError('bbox must be "west,south,east,north"')
+    if not all(math.isfinite(v) for v in (west, south, east, north)):
+        raise ValueError('bbox must be "west,south,east,north"')
+    if not (-180 <= west <= 180 and -180 <= east <= 180 and -90 <= south <= north <= 90):
+        raise ValueError('bbox is out of range')
+    return west, south, east, north
+
+
+def parse_zoom(value, default=None):
+    """A map zoom level (0-22) from a query parameter, or ``default`` if absent. Raises ValueError."""
+    if value in (None, ''):
+        return default
+    try:
+        zoom = int(value)
+    except ValueError:
+        raise ValueError('zoom must be an integer')
+    if not MIN_ZOOM <= zoom <= MAX_ZOOM:
+        raise ValueError(f'zoom must be between {MIN_ZOOM} and {MAX_ZOOM}')
+    return zoom
+
+
+def _split(bbox):
+    """The bbox as one or two boxes that don't cross the antimeridian."""
+    west, south, east, north = bbox
+    if west <= east:
+        return [bbox]
+    return [(west, south, 180.0, north), (-180.0, south, east, north)]
+
+
+def _cells_along(low, high, size, origin):
+    first = math.floor((low - origin) / size)
+    last = math.floor((min(high, -origin - 1e-12) - origin) / size)
+    return range(first, last + 1)
+
+
+def _grids(bbox, precision):
+    height, width = cell_size(precision)
+    return height, width, [
+        (_cells_along(south, north, height, -90.0), _cells_along(west, east, width, -180.0))
+        for west, south, east, north in _split(bbox)
+    ]
+
+
+def _cell_count(bbox, precision):
+    return sum(len(rows) * len(columns) for rows, columns in _grids(bbox, precision)[2])
+
+
+def cells_in_bbox(bbox, precision):
+    """The geohash cells of the given length that intersect the bbox."""
+    if precision == 0:
+        return ['']
+    height, width, grids = _grids(bbox, precision)
+    return sorted({
+        geohash_encode(-90.0 + (row + 0.5) * height, -180.0 + (column + 0.5) * width, precision)
+        for rows, columns in grids for row in rows for column in columns
+    })
+
+
+def covering_cells(bbox, max_cells=MAX_COVER_CELLS):
+    """
+    Geohash prefixes whose cells together cover the bbox: the longest ones
+    for which no more than ``max_cells`` are needed.
+    """
+    precision = 0
+    while precision < GEOHASH_PRECISION and _cell_count(bbox, precision + 1) <= max_cells:
+        precision += 1
+    return cells_in_bbox(bbox, precision)
+
+
+def _successor(prefix):
+    """The smallest geohash that sorts after every geohash starting with prefix, or None."""
+    stripped = prefix.rstrip(BASE32[-1])
+    if not stripped:
+        return None
+    return stripped[:-1] + BASE32[BASE32.index(stripped[-1]) + 1]
+
+
+def prefix_range(prefix, field='geohash'):
+    """Q for geohashes starting with prefix, as an index range rather than a LIKE."""
+    condition = Q(**{f'{field}__gte': prefix}) if prefix else Q(**{f'{field}__isnull': False})
+    upper = _successor(prefix)
+    if upper is not None:
+        condition &= Q(**{f'{field}__lt': upper})
+    return condition
+
+
+def bbox_filter(bbox, prefix=''):
+    """
+    Q for rows inside the bbox. ``prefix`` is the lookup path to the model
+    with the coordinates (e.g. 'space__').
+    """
+    cells = Q()
+    for cell in covering_cells(bbox):
+        cells |= prefix_range(cell, f'{prefix}geohash')
+    inside = Q()
+    for west, south, east, north in _split(bbox):
+        inside |= Q(**{
+            f'{prefix}latitude__gte': south, f'{prefix}latitude__lte': north,
+            f'{prefix}longitude__gte': west, f'{prefix}longitude__lte': east,
+        })
+    return cells & inside
+
+
+def points_in_bbox(queryset, bbox, fields, page=1, page_size=MAP_PAGE_SIZE):
+    """
+    One page of the rows of ``queryset`` inside the bbox, as dicts of
+    ``fields``, in geohash order: (rows, has_more).
+    """
+    offset = (page - 1) * page_size
+    rows = list(
+        queryset.filter(bbox_filter(bbox)).order_by('geohash', 'id').values(*fields)[offset:offset + page_size + 1]
+    )
+    return rows[:page_size], len(rows) > page_size
+
+
+# Clusters
+
+def points_min_zoom():
+    """Zoom level from which the map shows individual points rather than clusters."""
+    return getattr(settings, 'MAP_POINTS_MIN_ZOOM', 14)
+
+
+def cluster_precision(zoom):
+    """Length of the geohash prefix points are grouped by at a zoom level: about four cells per map tile."""
+    return max(1, min(GEOHASH_PRECISION, round(2 * (zoom + 2) / 5)))
+
+
+def _intersects(west, south, east, north, bbox):
+    return any(
+        west <= box_east and box_west <= east and south <= box_north and box_south <= north
+        for box_west, box_south, box_east, box_north in _split(bbox)
+    )
+
+
+def _aggregate(queryset, tiles, precision):
+    """Clusters of the rows in the given tiles, grouped by tile, from one query."""
+    in_tiles = Q()
+    for tile in tiles:
+        in_tiles |= prefix_range(tile)
+    rows = (
+        queryset.filter(in_tiles)
+        .annotate(cell=Substr('geohash', 1, precision))
+        .values('cell')
+        .annotate(
+            count=Count('id'), first_id=Min('id'),
+            center_latitude=Avg('latitude'), center_longitude=Avg('longitude'),
+            south=Min('latitude'), north=Max('latitude'), west=Min('longitude'), east=Max('longitude'),
+        )
+        .order_by('cell')
+    )
+    by_tile = {}
+    for row in rows:
+        cluster = {
+            'geohash': row['cell'],
+            'count': row['count'],
+            'latitude': row['center_latitude'],
+            'longitude': row['center_longitude'],
+            'bbox': [row['west'], row['south'], row['east'], row['north']],
+        }
+        if row['count'] == 1:
+            cluster['id'] = row['first_id']
+        by_tile.setdefault(row['cell'][:precision - 1], []).append(cluster)
+    return by_tile
+
+
+def clusters_in_bbox(queryset, scope, bbox, zoom):
+    """
+    Clusters of the rows of ``queryset`` inside the bbox at a zoom level.
+    ``scope`` names the queryset in cache keys (e.g. 'spaces'). Raises
+    ValueError when the bbox spans more than MAP_MAX_TILES tiles.
+    """
+    precision = cluster_precision(zoom)
+    if _cell_count(bbox, precision - 1) > MAP_MAX_TILES:
+        raise ValueError('bbox is too large for this zoom level')
+    tiles = cells_in_bbox(bbox, precision - 1)
+    versions = _tile_versions(scope)
+    keys = {
+        tile: TILE_KEY.format(scope=scope, version=_tile_version(versions, tile), zoom=zoom, tile=tile)
+        for tile in tiles
+    }
+    cached = cache.get_many(list(keys.values()))
+    by_tile = {tile: cached[key] for tile, key in keys.items() if key in cached}
+
+    missing = [tile for tile in tiles if tile not in by_tile]
+    metrics.record_cache('map_tiles', hits=len(by_tile), misses=len(missing))
+    if missing:
+        fresh = _aggregate(queryset, missing, precision)
+        fresh = {tile: fresh.get(tile, []) for tile in missing}
+        cache.set_many(
+            {keys[tile]: clusters for tile, clusters in fresh.items()},
+            getattr(settings, 'MAP_TILE_CACHE_SECONDS', 3600),
+        )
+        by_tile.update(fresh)
+
+    return [
+        cluster for tile in tiles for cluster in by_tile[tile]
+        if _intersects(*cluster['bbox'], bbox)
+    ]
+
+
+def _tile_versions(scope):
+    """{region: version} for a scope, cached for MAP_TILE_VERSION_CACHE_SECONDS."""
+    key = TILE_VERSIONS_KEY.format(scope=scope)
+    versions = cache.get(key)
+    if versions is None:
+        from .models import MapTileVersion  # models imports this module
+        versions = dict(MapTileVersion.objects.filter(scope=scope).values_list('region', 'version'))
+        cache.set(key, versions, getattr(settings, 'MAP_TILE_VERSION_CACHE_SECONDS', 10))
+    return versions
+
+
+def _tile_version(versions, tile):
+    """
+    Version of a tile: that of its region, or for a tile larger than a region
+    the sum of those of the regions in it, which grows whenever one of them is
+    bumped.
+    """
+    if len(tile) >= TILE_VERSION_PRECISION:
+        return versions.get(tile[:TILE_VERSION_PRECISION], 0)
+    return sum(version for region, version in versions.items() if region.startswith(tile))
+
+
+def invalidate_map_tiles(scope, geohashes):
+    """Retire the cached cluster tiles of a scope over any of the geohashes that are set."""
+    regions = sorted({geohash[:TILE_VERSION_PRECISION] for geohash in geohashes if geohash})
+    if not regions:
+        return
+    from .models import MapTileVersion  # models imports this module
+    for region in regions:
+        versions = MapTileVersion.objects.filter(scope=scope, region=region)
+        if not versions.update(version=F('version') + 1):
+            _version, created = MapTileVersion.objects.get_or_create(
+                scope=scope, region=region, defaults={'version': 1}
+            )
+            if not created:
+                versions.update(version=F('version') + 1)
+    cache.delete(TILE_VERSIONS_KEY.format(scope=scope))
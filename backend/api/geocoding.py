@@ -0,0 +1,353 @@
+"""
+Nominatim geocoding off the request path.
+
+Endpoints never wait for Nominatim. ``schedule_space_geocode``,
+``schedule_profile_geocode`` and ``schedule_node_reverse_geocode`` apply a
+cached answer immediately when there is one and otherwise queue a background
+job (see api/jobs.py). The job looks the address up and patches the row,
+provided its address has not changed in the meantime. Nodes are first looked
+up in the offline gazetteer (api/gazetteer.py) when one is configured.
+
+Answers are kept in GeocodeCacheEntry, keyed by the normalized address or by
+coordinates rounded to GEOCODE_COORDINATE_PRECISION decimals. "Nothing found"
+is cached too; failed calls are not and the job is retried. Concurrent
+lookups of the same key share one call (api/singleflight.py). Calls are spaced
+by a process-wide token bucket (GEOCODING_RATE_LIMIT requests per second;
+Nominatim's usage policy allows one). The limit is per process, so run a
+single worker for geocode jobs or divide the rate between workers.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+
+from . import http_client
+from .gazetteer import offline_reverse_geocode
+from .geo import geohash_encode, invalidate_map_tiles
+from .jobs import enqueue, job
+from .models import GeocodeCacheEntry, Node, Profile, Space
+from .singleflight import MISS, SharedFlight
+
+NOMINATIM_SEARCH_URL = "https://nominatim.openstreetmap.org/search"
+NOMINATIM_REVERSE_URL = "https://nominatim.openstreetmap.org/reverse"
+NOMINATIM_HEADERS = {'User-Agent': 'ConnectTheDots/1.0'}
+GEOCODE_COORDINATE_PRECISION = 4
+
+_MISS = MISS
+# Identical lookups in flight, in this or another worker, share one Nominatim call.
+_geocode_flight = SharedFlight('geocode')
+
+
+class TokenBucket:
+    """Allows ``rate`` acquisitions per second on average, with bursts of up to ``capacity``."""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, sleeping until one is available."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Reserve the token now; a negative balance is the wait for the next caller too.
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+_bucket = None
+_bucket_lock = threading.Lock()
+
+
+def rate_limiter():
+    global _bucket
+    rate = getattr(settings, 'GEOCODING_RATE_LIMIT', 1.0)
+    with _bucket_lock:
+        if _bucket is None or _bucket.rate != rate:
+            _bucket = TokenBucket(rate)
+        return _bucket
+
+
+def normalize_address(*parts):
+    return ', '.join(' '.join(str(part).split()).casefold() for part in parts if part and str(part).strip())
+
+
+def address_key(*parts):
+    address = normalize_address(*parts)
+    if len(address) > 240:
+        address = hashlib.sha1(address.encode()).hexdigest()
+    return f'addr:{address}'
+
+
+def coordinates_key(latitude, longitude):
+    precision = GEOCODE_COORDINATE_PRECISION
+    return f'rev:{float(latitude):.{precision}f},{float(longitude):.{precision}f}'
+
+
+def _cached(key):
+    entry = GeocodeCacheEntry.objects.filter(key=key).values_list('result', flat=True)
+    return entry[0] if entry else _MISS
+
+
+def _remember(key, result):
+    GeocodeCacheEntry.objects.update_or_create(key=key, defaults={'result': result})
+
+
+def _lookup_once(key, fetch):
+    """Run ``fetch`` and cache its result, unless a concurrent lookup of ``key`` already did."""
+    def fetch_and_remember():
+        result = fetch()
+        _remember(key, result)
+        return result
+
+    result, _shared = _geocode_flight.do(key, fetch_and_remember, lookup=lambda: _cached(key))
+    return result
+
+
+def _nominatim(url, params):
+    """Parsed JSON from Nominatim; raises requests.RequestException on failure."""
+    rate_limiter().acquire()
+    response = http_client.get(url, params=params, headers=NOMINATIM_HEADERS)
+    response.raise_for_status()
+    return response.json()
+
+
+def _parse_reverse(data):
+    if 'address' not in data:
+        return None
+    address = data['address']
+    location_info = {
+        'country': address.get('country') or address.get('country_code', '').upper(),
+        'city': (
+            address.get('city') or
+            address.get('town') or
+            address.get('municipality') or
+            address.get('village') or
+            address.get('hamlet')
+        ),
+        'district': (
+            address.get('suburb') or
+            address.get('district') or
+            address.get('neighbourhood') or
+            address.get('quarter') or
+            address.get('city_district') or
+            address.get('state_district')
+        ),
+        'street': address.get('road') or address.get('pedestrian') or address.get('path'),
+        'location_name': None,
+    }
+    if 'display_name' in data:
+        # Take first few parts of display_name for a concise location
+        parts = data['display_name'].split(',')[:3]
+        location_info['location_name'] = ', '.join(part.strip() for part in parts)
+    return location_info
+
+
+def _parse_search(data):
+    if not data:
+        return None
+    result = data[0]
+    if 'lat' not in result or 'lon' not in result:
+        return None
+    geocoded_info = {
+        'latitude': float(result['lat']),
+        'longitude': float(result['lon']),
+        'location_name': None,
+    }
+    if 'display_name' in result:
+        parts = result['display_name'].split(',')[:4]
+        geocoded_info['location_name'] = ', '.join(part.strip() for part in parts)
+    return geocoded_info
+
+
+def cached_forward_geocode(country=None, city=None, district=None, street=None):
+    """Cached answer for the address: a dict, None (nothing found) or _MISS."""
+    return _cached(address_key(street, district, city, country))
+
+
+def forward_geocode_address(country=None, city=None, district=None, street=None):
+    """
+    {'latitude', 'longitude', 'location_name'} for an address, or None if
+    Nominatim found nothing. Uses the cache; raises on upstream failure.
+    """
+    if not normalize_address(street, district, city, country):
+        return None
+    key = address_key(street, district, city, country)
+    result = _cached(key)
+    if result is _MISS:
+        params = {
+            'q': ', '.join(part for part in (street, district, city, country) if part),
+            'format': 'json',
+            'addressdetails': 1,
+            'limit': 1,
+            'accept-language': 'en'
+        }
+        result = _lookup_once(key, lambda: _parse_search(_nominatim(NOMINATIM_SEARCH_URL, params)))
+    return result
+
+
+def cached_reverse_geocode(latitude, longitude):
+    return _cached(coordinates_key(latitude, longitude))
+
+
+def reverse_geocode_coordinates(latitude, longitude):
+    """
+    {'country', 'city', 'district', 'street', 'location_name'} for coordinates,
+    or None if Nominatim found nothing. Uses the cache; raises on upstream failure.
+    """
+    key = coordinates_key(latitude, longitude)
+    result = _cached(key)
+    if result is _MISS:
+        params = {
+            'lat': latitude,
+            'lon': longitude,
+            'format': 'json',
+            'addressdetails': 1,
+            'zoom': 18,  # High detail level
+            'accept-language': 'en'
+        }
+        result = _lookup_once(key, lambda: _parse_reverse(_nominatim(NOMINATIM_REVERSE_URL, params)))
+    return result
+
+
+# Spaces
+
+SPACE_ADDRESS_FIELDS = ('country', 'city', 'district', 'street')
+
+
+def _apply_space_geocode(space_id, address, result):
+    if not result:
+        return 0
+    # Only if the address is still the one that was geocoded
+    spaces = Space.objects.filter(pk=space_id, **dict(zip(SPACE_ADDRESS_FIELDS, address)))
+    previous = spaces.values_list('geohash', flat=True).first()
+    geohash = geohash_encode(result['latitude'], result['longitude'])
+    updated = spaces.update(latitude=result['latitude'], longitude=result['longitude'], geohash=geohash)
+    if updated:
+        invalidate_map_tiles('spaces', [previous, geohash])
+    return updated
+
+
+def schedule_space_geocode(space):
+    """Fill the space's coordinates from its address, now if cached, otherwise from a job."""
+    address = [getattr(space, field) for field in SPACE_ADDRESS_FIELDS]
+    if not (space.country or space.city):
+        return None
+    cached = cached_forward_geocode(*address)
+    if cached is not _MISS:
+        if _apply_space_geocode(space.pk, address, cached):
+            space.latitude, space.longitude = cached['latitude'], cached['longitude']
+            space.geohash = geohash_encode(space.latitude, space.longitude)
+        return None
+    return enqueue('geocode_space', {'space_id': space.pk, 'address': address}, dedupe=True)
+
+
+@job('geocode_space')
+def geocode_space(payload):
+    _apply_space_geocode(payload['space_id'], payload['address'], forward_geocode_address(*payload['address']))
+
+
+# Profiles
+
+def _profile_location_name(country, city):
+    if country and city:
+        return f"{city}, {country}"
+    return city or country
+
+
+def _apply_profile_geocode(profile_id, country, city, set_location_name, result):
+    if not result:
+        return {}
+    values = {
+        'latitude': result['latitude'], 'longitude': result['longitude'],
+        'geohash': geohash_encode(result['latitude'], result['longitude']),
+    }
+    if set_location_name:
+        values['location_name'] = _profile_location_name(country, city)
+    updated = Profile.objects.filter(pk=profile_id, country=country, city=city).update(**values)
+    return values if updated else {}
+
+
+def schedule_profile_geocode(profile, set_location_name=True):
+    """
+    Fill the profile's coordinates (and, with ``set_location_name``, a
+    "city, country" location name) from its country and city.
+    """
+    if not (profile.country or profile.city):
+        return None
+    cached = cached_forward_geocode(profile.country, profile.city)
+    if cached is not _MISS:
+        values = _apply_profile_geocode(profile.pk, profile.country, profile.city, set_location_name, cached)
+        for field, value in values.items():
+            setattr(profile, field, value)
+        return None
+    return enqueue('geocode_profile', {
+        'profile_id': profile.pk,
+        'country': profile.country,
+        'city': profile.city,
+        'set_location_name': set_location_name,
+    }, dedupe=True)
+
+
+@job('geocode_profile')
+def geocode_profile(payload):
+    country, city = payload['country'], payload['city']
+    _apply_profile_geocode(
+        payload['profile_id'], country, city, payload['set_location_name'],
+        forward_geocode_address(country=country, city=city),
+    )
+
+
+# Nodes
+
+NODE_LOCATION_FIELDS = ('country', 'city', 'district', 'street', 'location_name')
+
+
+def _apply_node_reverse_geocode(node_id, latitude, longitude, result):
+    if not result:
+        return {}
+    node = Node.objects.filter(pk=node_id, latitude=latitude, longitude=longitude).first()
+    if node is None:
+        return {}
+    # Never overwrite what the node already has
+    values = {field: result[field] for field in NODE_LOCATION_FIELDS if result.get(field) and not getattr(node, field)}
+    if values:
+        Node.objects.filter(pk=node_id).update(**values)
+    return values
+
+
+def schedule_node_reverse_geocode(node):
+    """
+    Fill in the location names of a node that has coordinates but none of
+    them: from the offline gazetteer or the cache right away, otherwise from a job.
+    """
+    if node.latitude is None or node.longitude is None:
+        return None
+    if any(getattr(node, field) for field in ('country', 'city', 'location_name')):
+        return None
+    cached = offline_reverse_geocode(node.latitude, node.longitude)
+    if cached is None:
+        cached = cached_reverse_geocode(node.latitude, node.longitude)
+    if cached is not _MISS:
+        for field, value in _apply_node_reverse_geocode(node.pk, node.latitude, node.longitude, cached).items():
+            setattr(node, field, value)
+        return None
+    return enqueue('reverse_geocode_node', {
+        'node_id': node.pk,
+        'latitude': node.latitude,
+        'longitude': node.longitude,
+    }, dedupe=True)
+
+
+@job('reverse_geocode_node')
+def reverse_geocode_node(payload):
+    latitude, longitude = payload['latitude'], payload['longitude']
+    _apply_node_reverse_geocode(payload['node_id'], latitude, longitude, reverse_geocode_coordinates(latitude, longitude))
@@ -0,0 +1,267 @@
+"""
+Shared HTTP client for outbound calls (Wikidata, the SPARQL endpoint, Nominatim).
+
+Every upstream host gets its own pooled ``requests.Session`` so connections
+are kept alive between calls, plus:
+
+- connect/read timeouts, so no call can hang a worker indefinitely;
+- retries with full-jitter exponential backoff for idempotent calls that hit
+  a connection error, a timeout, 429 or a 5xx. Read timeouts are not retried
+  where ``retry_read_timeouts`` is off (the SPARQL endpoint, whose 30 s read
+  timeout would otherwise hold a worker for a minute and a half);
+- a circuit breaker: after ``failure_threshold`` consecutive failed calls the
+  host is skipped for ``reset_timeout`` seconds, then a single probe decides
+  whether it is healthy again;
+- a bulkhead limiting concurrent calls to the host. When it is full, callers
+  fail immediately instead of queueing behind a slow upstream.
+
+Breaker and bulkhead state is per process. ``CircuitOpenError`` and
+``BulkheadFullError`` subclass ``requests.RequestException``, so existing
+``except RequestException`` handlers treat them like any other failure.
+
+Per-host settings can be overridden with ``OUTBOUND_HTTP_UPSTREAMS``, keyed
+by host (``host:port`` for non-default ports).
+"""
+import logging
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = 'ConnectTheDots/1.0 (https://github.com/repo/connectthedots)'
+
+DEFAULT_UPSTREAM = {
+    'connect_timeout': 3.05,
+    'read_timeout': 10,
+    'retries': 2,
+    'retry_read_timeouts': True,
+    'backoff': 0.2,
+    'backoff_max': 2.0,
+    'max_concurrency': 8,
+    'failure_threshold': 5,
+    'reset_timeout': 30,
+}
+
+UPSTREAMS = {
+    'www.wikidata.org': {'read_timeout': 5},
+    # A query that timed out once will most likely time out again
+    'query.wikidata.org': {'read_timeout': 30, 'max_concurrency': 4, 'retry_read_timeouts': False},
+    # Nominatim's usage policy allows a single client connection.
+    'nominatim.openstreetmap.org': {'read_timeout': 10, 'max_concurrency': 1, 'retries': 1},
+}
+
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+class UpstreamUnavailable(requests.exceptions.RequestException):
+    """The call was not attempted because the upstream is known to be unhealthy or saturated."""
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    pass
+
+
+class BulkheadFullError(UpstreamUnavailable):
+    pass
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Whether a call may go through; in half-open state only one probe at a time does."""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def release_probe(self):
+        """Give up a half-open probe slot without judging the upstream."""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning("Circuit opened after %s failures", self.failures)
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class UpstreamClient:
+    """Pooled session, breaker and bulkhead for one upstream host."""
+
+    def __init__(self, host, config):
+        self.host = host
+        self.config = config
+        self.timeout = (config['connect_timeout'], config['read_timeout'])
+        self.breaker = CircuitBreaker(config['failure_threshold'], config['reset_timeout'])
+        self._bulkhead = threading.BoundedSemaphore(config['max_concurrency'])
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config['max_concurrency'])
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['User-Agent'] = USER_AGENT
+
+    def _backoff(self, attempt):
+        cap = min(self.config['backoff_max'], self.config['backoff'] * (2 ** attempt))
+        time.sleep(random.uniform(0, cap))
+
+    def request(self, method, url, idempotent=None, **kwargs):
+        """
+        Send a request and return the response.
+
+        5xx/429 responses are returned once retries are exhausted, so callers
+        keep checking ``status_code``; connection errors and timeouts raise.
+        POSTs are only retried when ``idempotent=True`` (e.g. SPARQL reads).
+        Every call is counted per host and outcome in the metrics, and timed
+        unless it was refused without being attempted.
+        """
+        started = time.perf_counter()
+        outcome = 'error'
+        try:
+            response = self._send(method, url, idempotent, **kwargs)
+            outcome = response.status_code
+            return response
+        except CircuitOpenError:
+            outcome = 'circuit_open'
+            raise
+        except BulkheadFullError:
+            outcome = 'bulkhead_full'
+            raise
+        finally:
+            metrics.OUTBOUND_REQUESTS.inc(host=self.host, outcome=outcome)
+            if outcome not in ('circuit_open', 'bulkhead_full'):
+                elapsed = time.perf_counter() - started
+                metrics.OUTBOUND_LATENCY.observe(elapsed, host=self.host)
+                metrics.record_dependency('http', elapsed)
+
+    def _send(self, method, url, idempotent, **kwargs):
+        method = method.upper()
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        retries = self.config['retries'] if idempotent else 0
+        kwargs.setdefault('timeout', self.timeout)
+
+        if not self._bulkhead.acquire(blocking=False):
+            raise BulkheadFullError(f"Too many concurrent requests to {self.host}")
+        if not self.breaker.allow():
+            self._bulkhead.release()
+            raise CircuitOpenError(f"Circuit open for {self.host}")
+
+        try:
+            for attempt in range(retries + 1):
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as exc:
+                    read_timeout = isinstance(exc, requests.exceptions.ReadTimeout)
+                    if attempt == retries or (read_timeout and not self.config['retry_read_timeouts']):
+                        self.breaker.record_failure()
+                        raise
+                else:
+                    if response.status_code not in RETRY_STATUSES:
+                        self.breaker.record_success()
+                        return response
+                    if attempt == retries:
+                        self.breaker.record_failure()
+                        return response
+                    response.close()
+                self._backoff(attempt)
+        except Exception:
+            # e.g. an invalid URL: says nothing about the upstream's health
+            self.breaker.release_probe()
+            raise
+        finally:
+            self._bulkhead.release()
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+
+def upstream_config(host):
+    config = dict(DEFAULT_UPSTREAM)
+    config.update(UPSTREAMS.get(host, {}))
+    config.update(getattr(settings, 'OUTBOUND_HTTP_UPSTREAMS', {}).get(host, {}))
+    return config
+
+
+def client_for(url):
+    """The UpstreamClient for the host of ``url``, created on first use."""
+    host = urlsplit(url).netloc
+    client = _clients.get(host)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(host)
+            if client is None:
+                client = _clients[host] = UpstreamClient(host, upstream_config(host))
+    return client
+
+
+def reset_clients():
+    """Drop every client (sessions, breakers, bulkheads)."""
+    with _clients_lock:
+        for client in _clients.values():
+            client.session.close()
+        _clients.clear()
+
+
+def request(method, url, **kwargs):
+    return client_for(url).request(method, url, **kwargs)
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def post(url, **kwargs):
+    return request('POST', url, **kwargs)
+
+
+@receiver(setting_changed)
+def reset_on_setting_change(setting, **kwargs):
+    if setting == 'OUTBOUND_HTTP_UPSTREAMS':
+        reset_clients()
@@ -0,0 +1,120 @@
+"""
+Database-backed background jobs.
+
+Handlers register with ``@job('kind')`` and take the job's JSON payload.
+``enqueue()`` stores a pending BackgroundJob row, so jobs queued inside a
+request only become visible to workers once the request's transaction
+commits. ``manage.py run_jobs`` claims due rows with
+``SELECT ... FOR UPDATE SKIP LOCKED``, so several workers can run side by side.
+Failed jobs are retried with exponential backoff until MAX_ATTEMPTS.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 30
+# Running jobs not updated for this long are assumed to belong to a dead worker.
+STALE_AFTER = timedelta(minutes=15)
+
+
+def job(kind):
+    """Register the decorated function as the handler for ``kind``."""
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue(kind, payload=None, delay=0, dedupe=False):
+    """
+    Queue a job. With ``dedupe``, an identical job that is still pending is
+    reused instead of adding another row.
+    """
+    payload = payload or {}
+    if dedupe:
+        existing = BackgroundJob.objects.filter(
+            kind=kind, payload=payload, status=BackgroundJob.STATUS_PENDING
+        ).first()
+        if existing is not None:
+            return existing
+    return BackgroundJob.objects.create(
+        kind=kind,
+        payload=payload,
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def claim_jobs(limit=10, kinds=None):
+    """Mark up to ``limit`` due jobs as running and return them."""
+    with transaction.atomic():
+        queryset = BackgroundJob.objects.select_for_update(skip_locked=True).filter(
+            status=BackgroundJob.STATUS_PENDING, run_after__lte=timezone.now()
+        )
+        if kinds:
+            queryset = queryset.filter(kind__in=kinds)
+        claimed = list(queryset.order_by('run_after', 'id')[:limit])
+        if claimed:
+            BackgroundJob.objects.filter(pk__in=[j.pk for j in claimed]).update(
+                status=BackgroundJob.STATUS_RUNNING, attempts=F('attempts') + 1, updated_at=timezone.now()
+            )
+    for claimed_job in claimed:
+        claimed_job.status = BackgroundJob.STATUS_RUNNING
+        claimed_job.attempts += 1
+    return claimed
+
+
+def run_job(background_job):
+    """Run one claimed job and record the outcome. Returns True on success."""
+    handler = HANDLERS.get(background_job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for {background_job.kind!r}")
+        handler(background_job.payload)
+    except Exception as e:
+        logger.warning("Job %s (%s) failed: %s", background_job.pk, background_job.kind, e)
+        background_job.last_error = str(e)
+        if handler is None or background_job.attempts >= MAX_ATTEMPTS:
+            background_job.status = BackgroundJob.STATUS_FAILED
+        else:
+            background_job.status = BackgroundJob.STATUS_PENDING
+            backoff = RETRY_BASE_SECONDS * 2 ** (background_job.attempts - 1)
+            background_job.run_after = timezone.now() + timedelta(seconds=backoff)
+        background_job.save(update_fields=['status', 'run_after', 'last_error', 'updated_at'])
+        return False
+
+    background_job.status = BackgroundJob.STATUS_DONE
+    background_job.last_error = ''
+    background_job.save(update_fields=['status', 'last_error', 'updated_at'])
+    return True
+
+
+def requeue_stale_jobs():
+    """Put running jobs abandoned by a crashed worker back in the queue."""
+    return BackgroundJob.objects.filter(
+        status=BackgroundJob.STATUS_RUNNING, updated_at__lt=timezone.now() - STALE_AFTER
+    ).update(status=BackgroundJob.STATUS_PENDING, updated_at=timezone.now())
+
+
+def run_pending(limit=None, kinds=None, batch_size=10):
+    """Run due jobs until none are left (or ``limit`` ran). Returns (succeeded, failed)."""
+    succeeded = failed = 0
+    while limit is None or succeeded + failed < limit:
+        batch = batch_size if limit is None else min(batch_size, limit - succeeded - failed)
+        claimed = claim_jobs(batch, kinds=kinds)
+        if not claimed:
+            break
+        for claimed_job in claimed:
+            if run_job(claimed_job):
+                succeeded += 1
+            else:
+                failed += 1
+    return succeeded, failed
@@ -0,0 +1,100 @@
+"""
+Text generation providers for space summaries.
+
+A provider turns a prompt into text, either at once (``generate``) or as a
+stream of chunks (``stream``), and records the model it ended up using in
+``model_used``. ``get_provider()`` builds the one named by the
+``SPACE_SUMMARY_PROVIDER`` setting: a key of PROVIDERS or a dotted path to a
+provider class. Vendor SDKs are imported on first use, so workers that never
+summarize don't pay for them at startup.
+"""
+import os
+from abc import ABC, abstractmethod
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Rough size of a token for English prose; good enough for budgeting prompts
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+class SummaryProvider(ABC):
+    name = ''
+
+    def __init__(self):
+        self.model_used = ''
+
+    @abstractmethod
+    def stream(self, prompt):
+        """Yield the generated text in chunks."""
+
+    def generate(self, prompt):
+        """The whole generated text."""
+        return ''.join(self.stream(prompt))
+
+
+class GeminiProvider(SummaryProvider):
+    """Gemini 2.5 Flash, falling back to Flash-Lite when Flash is out of quota."""
+    name = 'gemini'
+    MODEL = 'gemini-2.5-flash'
+    FALLBACK_MODEL = 'gemini-2.5-flash-lite'
+
+    def _genai(self):
+        import google.generativeai as genai
+
+        api_key = os.getenv('GEMINI_API_KEY')
+        if not api_key:
+            raise RuntimeError('Gemini API key not configured. Please set GEMINI_API_KEY environment variable.')
+        genai.configure(api_key=api_key)
+        return genai
+
+    def _stream_model(self, genai, model_name, prompt):
+        self.model_used = model_name
+        for chunk in genai.GenerativeModel(model_name).generate_content(prompt, stream=True):
+            if chunk.text:
+                yield chunk.text
+
+    def stream(self, prompt):
+        genai = self._genai()
+        started = False
+        try:
+            for chunk in self._stream_model(genai, self.MODEL, prompt):
+                started = True
+                yield chunk
+        except Exception as flash_error:
+            error_str = str(flash_error).lower()
+            # Only switch models before anything was sent; a half answer can't be retried
+            if started or not ('quota' in error_str or 'resource' in error_str or '429' in error_str):
+                raise
+            try:
+                yield from self._stream_model(genai, self.FALLBACK_MODEL, prompt)
+            except Exception as lite_error:
+                raise Exception(f"Both models failed. Flash error: {flash_error}, Lite error: {lite_error}")
+
+
+class StubProvider(SummaryProvider):
+    """Deterministic local stand-in for tests and benchmarks: echoes the space's title and graph size."""
+    name = 'stub'
+
+    def stream(self, prompt):
+        self.model_used = 'stub'
+        yield '### Overview\n'
+        for line in prompt.splitlines():
+            if line.startswith('- Title:') or line.startswith('- Total '):
+                yield f'- {line[2:]}\n'
+
+
+PROVIDERS = {
+    GeminiProvider.name: GeminiProvider,
+    StubProvider.name: StubProvider,
+}
+
+
+def get_provider(name=None):
+    name = name or getattr(settings, 'SPACE_SUMMARY_PROVIDER', GeminiProvider.name)
+    provider_class = PROVIDERS.get(name) or import_string(name)
+    return provider_class()
@@ -0,0 +1,90 @@
+"""
+Django management command to keep the partitioned Activity table bounded.
+
+It pre-creates monthly partitions ahead of time and moves partitions older
+than the retention window to compressed NDJSON files in ACTIVITY_ARCHIVE_DIR,
+detaching them from the hot table. Run it daily from cron.
+
+Usage:
+    python manage.py archive_activities
+    python manage.py archive_activities --dry-run
+    python manage.py archive_activities --retention-months 6 --archive-dir /data/activity
+    python manage.py archive_activities --keep-detached
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api import activity_archive
+
+
+class Command(BaseCommand):
+    help = 'Create upcoming Activity partitions and archive partitions past the retention window'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be done without making changes',
+        )
+        parser.add_argument(
+            '--retention-months',
+            type=int,
+            default=settings.ACTIVITY_RETENTION_MONTHS,
+            help=f'Months of activity to keep in the hot table (default: {settings.ACTIVITY_RETENTION_MONTHS})',
+        )
+        parser.add_argument(
+            '--premake-months',
+            type=int,
+            default=settings.ACTIVITY_PARTITION_PREMAKE_MONTHS,
+            help='Number of future monthly partitions to create ahead of time',
+        )
+        parser.add_argument(
+            '--archive-dir',
+            default=settings.ACTIVITY_ARCHIVE_DIR,
+            help='Directory the NDJSON archive files are written to',
+        )
+        parser.add_argument(
+            '--keep-detached',
+            action='store_true',
+            help='Keep detached partitions as standalone tables instead of dropping them',
+        )
+
+    def handle(self, *args, **options):
+        if not activity_archive.is_partitioned():
+            raise CommandError('api_activity is not a partitioned PostgreSQL table; run migrations first')
+
+        dry_run = options['dry_run']
+        retention = options['retention_months']
+        if retention < 1:
+            raise CommandError('--retention-months must be at least 1')
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No changes will be made'))
+            existing = activity_archive.list_partitions()
+            self.stdout.write(f'{len(existing)} monthly partitions attached')
+            for month, name in activity_archive.expired_partitions(retention):
+                self.stdout.write(f'  - would archive {name} to {activity_archive.archive_path(month, options["archive_dir"])}')
+            return
+
+        created = activity_archive.ensure_partitions(options['premake_months'])
+        for name in created:
+            self.stdout.write(f'Created partition {name}')
+
+        # Rows parked in the default partition only become archivable once
+        # their month has a partition of its own, so look for expired ones last.
+        expired = activity_archive.expired_partitions(retention)
+
+        total_rows = 0
+        for month, name in expired:
+            rows = activity_archive.archive_partition(
+                month,
+                archive_dir=options['archive_dir'],
+                drop=not options['keep_detached'],
+            )
+            total_rows += rows
+            self.stdout.write(self.style.SUCCESS(f'✓ Archived {name} ({rows} activities)'))
+
+        if not expired:
+            self.stdout.write(self.style.SUCCESS('✓ No partitions past the retention window'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Archived {len(expired)} partition(s), {total_rows} activities'))
@@ -0,0 +1,101 @@
+"""
+Django management command to fill in location names for nodes that only have
+coordinates, using the offline gazetteer (see api/gazetteer.py).
+
+Nodes with latitude/longitude but no country, city or location name get the
+nearest city and its country. Runs entirely offline; nodes with no city
+within GAZETTEER_MAX_DISTANCE_KM can optionally be queued for Nominatim.
+Updated rows skip the save signals, so the content version of their spaces
+is bumped and their map tiles are retired here.
+
+The gazetteer is GeoNames data, which is not shipped with the repository
+(api/tests/data only has a small sample). Download and unzip
+https://download.geonames.org/export/dump/cities15000.zip and
+https://download.geonames.org/export/dump/countryInfo.txt, then point
+GAZETTEER_CITIES_FILE and GAZETTEER_COUNTRIES_FILE at the two files.
+
+Usage:
+    python manage.py backfill_node_locations
+    python manage.py backfill_node_locations --dry-run
+    python manage.py backfill_node_locations --queue-missing
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from api.gazetteer import get_gazetteer, offline_reverse_geocode
+from api.geo import invalidate_map_tiles
+from api.geocoding import schedule_node_reverse_geocode
+from api.models import Node, bump_content_version
+
+FIELDS = ('country', 'city', 'location_name')
+
+
+def save_batch(nodes):
+    """bulk_update the location fields, plus what the skipped save signals would have done."""
+    Node.objects.bulk_update(nodes, FIELDS)
+    geohashes = {}
+    for node in nodes:
+        geohashes.setdefault(node.space_id, []).append(node.geohash)
+    bump_content_version(space_ids=list(geohashes))
+    for space_id, space_geohashes in geohashes.items():
+        invalidate_map_tiles(f'nodes:{space_id}', space_geohashes)
+
+
+class Command(BaseCommand):
+    help = 'Fill in country/city/location name of nodes that only have coordinates, offline'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show what would be done without making changes',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Nodes updated per query (default: 500)',
+        )
+        parser.add_argument(
+            '--queue-missing',
+            action='store_true',
+            help='Queue a Nominatim job for nodes without a city in range',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        batch_size = options['batch_size']
+        if get_gazetteer() is None:
+            raise CommandError('GAZETTEER_CITIES_FILE is not set')
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No changes will be made'))
+
+        nodes = Node.objects.filter(latitude__isnull=False, longitude__isnull=False)
+        for field in FIELDS:
+            nodes = nodes.filter(Q(**{f'{field}__isnull': True}) | Q(**{field: ''}))
+
+        updated, missing, batch = 0, [], []
+        for node in nodes.only('id', 'space', 'geohash', 'latitude', 'longitude', *FIELDS).iterator(chunk_size=batch_size):
+            location = offline_reverse_geocode(node.latitude, node.longitude)
+            if location is None:
+                missing.append(node)
+                continue
+            for field in FIELDS:
+                setattr(node, field, location[field])
+            batch.append(node)
+            updated += 1
+            if dry_run and updated <= 10:
+                self.stdout.write(f'  - Node {node.id}: {node.location_name}')
+            if len(batch) >= batch_size:
+                if not dry_run:
+                    save_batch(batch)
+                batch = []
+        if batch and not dry_run:
+            save_batch(batch)
+
+        verb = 'Would update' if dry_run else 'Updated'
+        self.stdout.write(self.style.SUCCESS(f'✓ {verb} {updated} node(s); {len(missing)} without a city in range'))
+
+        if options['queue_missing'] and missing and not dry_run:
+            queued = sum(1 for node in missing if schedule_node_reverse_geocode(node) is not None)
+            self.stdout.write(self.style.SUCCESS(f'✓ Queued {queued} node(s) for Nominatim'))
@@ -0,0 +1,50 @@
+"""
+Django management command to build the offline Wikidata index from a JSON dump.
+
+Streams a Wikidata JSON dump (https://dumps.wikimedia.org/wikidatawiki/entities/,
+plain, .gz or .bz2; a filtered subset in the same format works too) into the
+SQLite file read by api.wikidata_offline. The index is written next to the
+target and swapped in when complete, so running workers keep serving the old
+one until then.
+
+Usage:
+    python manage.py build_wikidata_index latest-all.json.gz
+    python manage.py build_wikidata_index subset.json --output /var/lib/ctd/wikidata.sqlite3
+    python manage.py build_wikidata_index subset.json --properties P31,P279,P625,P17
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api.wikidata_offline import DEFAULT_PROPERTIES, build_index
+
+
+class Command(BaseCommand):
+    help = 'Build the offline Wikidata index (labels, descriptions, P31/P279/P625) from a JSON dump'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dump', help='Path to the Wikidata JSON dump')
+        parser.add_argument(
+            '--output',
+            default=None,
+            help='Index file to write (default: WIKIDATA_OFFLINE_INDEX)',
+        )
+        parser.add_argument(
+            '--properties',
+            default=','.join(DEFAULT_PROPERTIES),
+            help='Comma-separated properties whose statements are kept (default: %(default)s)',
+        )
+        parser.add_argument(
+            '--language',
+            default='en',
+            help='Language of the stored labels and descriptions (default: en)',
+        )
+
+    def handle(self, *args, **options):
+        output = options['output'] or getattr(settings, 'WIKIDATA_OFFLINE_INDEX', '')
+        if not output:
+            raise CommandError('No output path: pass --output or set WIKIDATA_OFFLINE_INDEX')
+
+        properties = tuple(p.strip().upper() for p in options['properties'].split(',') if p.strip())
+        self.stdout.write(f"Indexing {options['dump']} ({', '.join(properties)}) into {output}...")
+        entities, claims = build_index(options['dump'], output, properties=properties, language=options['language'])
+        self.stdout.write(self.style.SUCCESS(f'✓ Indexed {entities} entities and {claims} statements'))
@@ -3,19 +3,38 @@ Django management command to fetch missing P31 (instance of) properties
 for existing nodes that have Wikidata IDs but no P31 properties.
 
 This is a one-time migration command that can be run safely multiple times.
-It will only fetch P31 for nodes that don't already have it.
+It will only fetch P31 for nodes that don't already have it. Candidates are
+found with a single annotated query and their P31 statements are fetched
+with one batched SPARQL query per --batch-size entities.
 
 Usage:
     python manage.py fetch_missing_p31
     python manage.py fetch_missing_p31 --dry-run
     python manage.py fetch_missing_p31 --limit 100
+    python manage.py fetch_missing_p31 --batch-size 50
 """
 
+import time
+from collections import defaultdict
+
 from django.core.management.base import BaseCommand
-from api.models import Node, Property
-from api.wikidata import get_wikidata_properties
+from django.db import transaction
+from django.db.models import Count, Q
+
+from api.models import Node, Property, bump_content_version
+from api.wikidata import SPARQL_BATCH_SIZE, get_wikidata_properties_many
 from api.views import _normalize_property_value_for_storage
-import time
+
+
+def nodes_missing_p31():
+    """Nodes with a Wikidata id and no P31 property carrying a value id, annotated with their P31 count."""
+    return Node.objects.filter(wikidata_id__gt='').annotate(
+        p31_count=Count('node_properties', filter=Q(node_properties__property_id='P31')),
+        valid_p31_count=Count(
+            'node_properties',
+            filter=Q(node_properties__property_id='P31', node_properties__value_id__gt=''),
+        ),
+    ).filter(valid_p31_count=0).order_by('id')
 
 
 class Command(BaseCommand):
@@ -33,165 +52,121 @@ class Command(BaseCommand):
             default=None,
             help='Limit the number of nodes to process',
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=SPARQL_BATCH_SIZE,
+            help=f'Nodes per SPARQL query (default: {SPARQL_BATCH_SIZE})',
+        )
         parser.add_argument(
             '--delay',
             type=float,
-            default=1.0,
-            help='Delay in seconds between Wikidata API calls (default: 1.0)',
+            default=0.0,
+            help='Delay in seconds between batches (default: 0)',
         )
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
         limit = options['limit']
+        batch_size = max(1, options['batch_size'])
         delay = options['delay']
-        
+
         if dry_run:
             self.stdout.write(self.style.WARNING('DRY RUN MODE - No changes will be made'))
-        
-        nodes_with_wikidata = Node.objects.filter(
-            wikidata_id__isnull=False
-        ).exclude(wikidata_id='')
-        
-        nodes_without_p31 = []
-        nodes_with_broken_p31 = []
-        
-        for node in nodes_with_wikidata:
-            p31_props = Property.objects.filter(
-                node=node,
-                property_id='P31'
-            )
-            
-            has_p31 = p31_props.exists()
-            has_valid_p31 = p31_props.filter(value_id__isnull=False).exclude(value_id='').exists()
-            
-            if not has_p31:
-                nodes_without_p31.append(node)
-            elif not has_valid_p31:
-                nodes_with_broken_p31.append(node)
-            
-            total_needs_fix = len(nodes_without_p31) + len(nodes_with_broken_p31)
-            if limit and total_needs_fix >= limit:
-                break
-        
-        total_nodes = len(nodes_without_p31) + len(nodes_with_broken_p31)
-        
+
+        candidates = nodes_missing_p31().only('id', 'label', 'wikidata_id')
+        if limit:
+            candidates = candidates[:limit]
+        nodes = list(candidates)
+        total_nodes = len(nodes)
+
         if total_nodes == 0:
             self.stdout.write(self.style.SUCCESS('✓ All nodes with Wikidata IDs already have valid P31 properties!'))
             return
-        
-        self.stdout.write(f'Found {len(nodes_without_p31)} nodes without P31 properties')
-        if nodes_with_broken_p31:
-            self.stdout.write(f'Found {len(nodes_with_broken_p31)} nodes with P31 properties but missing value data')
-        
+
+        broken_count = sum(1 for node in nodes if node.p31_count)
+        self.stdout.write(f'Found {total_nodes - broken_count} nodes without P31 properties')
+        if broken_count:
+            self.stdout.write(f'Found {broken_count} nodes with P31 properties but missing value data')
+
         if dry_run:
             self.stdout.write('Would process the following nodes:')
-            for node in (nodes_without_p31 + nodes_with_broken_p31)[:10]:
-                node_type = 'missing P31' if node in nodes_without_p31 else 'broken P31'
+            for node in nodes[:10]:
+                node_type = 'broken P31' if node.p31_count else 'missing P31'
                 self.stdout.write(f'  - {node.label} ({node.wikidata_id}) [{node_type}]')
             if total_nodes > 10:
                 self.stdout.write(f'  ... and {total_nodes - 10} more')
             return
-        
-        all_nodes_to_fix = nodes_without_p31 + nodes_with_broken_p31
-        
-        success_count = 0
-        error_count = 0
-        p31_found_count = 0
-        p31_not_found_count = 0
-        p31_fixed_count = 0
-        
-        for i, node in enumerate(all_nodes_to_fix, 1):
+
+        totals = defaultdict(int)
+        for start in range(0, total_nodes, batch_size):
+            batch = nodes[start:start + batch_size]
+            self.stdout.write(f'[{start + len(batch)}/{total_nodes}] Fetching P31 for {len(batch)} nodes...')
             try:
-                self.stdout.write(f'[{i}/{total_nodes}] Processing: {node.label} ({node.wikidata_id})...')
-                
-                all_properties = get_wikidata_properties(node.wikidata_id)
-                
-                if not all_properties:
-                    self.stdout.write(
-                        self.style.WARNING(f'  ⚠ No properties returned from Wikidata (entity may not exist or query failed)')
-                    )
-                    success_count += 1
-                    p31_not_found_count += 1
-                    if i < total_nodes:
-                        time.sleep(delay)
-                    continue
-                
-                p31_props = [p for p in all_properties if p.get('property') == 'P31']
-                
-                if p31_props:
-                    existing_p31 = Property.objects.filter(node=node, property_id='P31')
-                    is_fixing_broken = existing_p31.exists() and not existing_p31.filter(value_id__isnull=False).exclude(value_id='').exists()
-                    
-                    if is_fixing_broken:
-                        fixed_count = 0
-                        for existing_prop in existing_p31:
-                            matching_p31 = next((p for p in p31_props if p.get('statement_id') == existing_prop.statement_id), p31_props[0])
-                            value_text, value_id = _normalize_property_value_for_storage(matching_p31.get('value'))
-                            
-                            existing_prop.value = matching_p31.get('value')
-                            existing_prop.value_text = value_text
-                            existing_prop.value_id = value_id
-                            existing_prop.property_label = matching_p31.get('property_label', 'instance of')
-                            existing_prop.save()
-                            fixed_count += 1
-                        
-                        self.stdout.write(
-                            self.style.SUCCESS(f'  ✓ Fixed {fixed_count} broken P31 property(ies)')
-                        )
-                        p31_found_count += fixed_count
-                    else:
-                        for p31 in p31_props:
-                            value_text, value_id = _normalize_property_value_for_storage(p31.get('value'))
-                            Property.objects.create(
-                                node=node,
-                                property_id='P31',
-                                statement_id=p31.get('statement_id'),
-                                property_label=p31.get('property_label', 'instance of'),
-                                value=p31.get('value'),
-                                value_text=value_text,
-                                value_id=value_id
-                            )
-                        
-                        self.stdout.write(
-                            self.style.SUCCESS(f'  ✓ Added {len(p31_props)} P31 property(ies)')
-                        )
-                        p31_found_count += len(p31_props)
-                    
-                    success_count += 1
-                else:
-                    total_props = len(all_properties)
-                    if total_props > 0:
-                        self.stdout.write(
-                            self.style.WARNING(f'  ⚠ No P31 found (entity exists with {total_props} properties, may be a class/concept)')
-                        )
-                    else:
-                        self.stdout.write(
-                            self.style.WARNING(f'  ⚠ No properties returned (entity may not exist in Wikidata)')
-                        )
-                    success_count += 1
-                    p31_not_found_count += 1
-                
-                if i < total_nodes:
-                    time.sleep(delay)
-                    
+                self.process_batch(batch, totals)
             except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(f'  ✗ Error: {str(e)}')
-                )
-                error_count += 1
-                continue
-        
+                self.stdout.write(self.style.ERROR(f'  ✗ Error: {str(e)}'))
+                totals['errors'] += len(batch)
+            if delay and start + batch_size < total_nodes:
+                time.sleep(delay)
+
         # Summary
         self.stdout.write('')
         self.stdout.write(self.style.SUCCESS('=' * 60))
         self.stdout.write(self.style.SUCCESS('SUMMARY'))
         self.stdout.write(self.style.SUCCESS('=' * 60))
         self.stdout.write(f'Total nodes processed: {total_nodes}')
-        self.stdout.write(self.style.SUCCESS(f'Successfully processed: {success_count}'))
-        self.stdout.write(self.style.SUCCESS(f'  - Nodes with P31 found: {p31_found_count}'))
-        if p31_not_found_count > 0:
-            self.stdout.write(self.style.WARNING(f'  - Nodes without P31: {p31_not_found_count}'))
+        self.stdout.write(self.style.SUCCESS(f'Successfully processed: {total_nodes - totals["errors"]}'))
+        self.stdout.write(self.style.SUCCESS(f'  - P31 properties added: {totals["added"]}'))
+        self.stdout.write(self.style.SUCCESS(f'  - Broken P31 properties fixed: {totals["fixed"]}'))
+        if totals['not_found']:
+            self.stdout.write(self.style.WARNING(f'  - Nodes without P31: {totals["not_found"]}'))
             self.stdout.write(self.style.WARNING('    (These may be classes/concepts without instance types)'))
-        if error_count > 0:
-            self.stdout.write(self.style.ERROR(f'Errors: {error_count}'))
+        if totals['errors']:
+            self.stdout.write(self.style.ERROR(f'Errors: {totals["errors"]}'))
         self.stdout.write(self.style.SUCCESS('=' * 60))
+
+    def process_batch(self, nodes, totals):
+        fetched = get_wikidata_properties_many([node.wikidata_id for node in nodes], property_filter=['P31'])
+
+        broken = defaultdict(list)
+        for prop in Property.objects.filter(node__in=[node for node in nodes if node.p31_count], property_id='P31'):
+            broken[prop.node_id].append(prop)
+
+        to_create, to_update = [], []
+        for node in nodes:
+            if node.wikidata_id not in fetched:
+                totals['errors'] += 1
+                continue
+            p31_props = fetched[node.wikidata_id]
+            if not p31_props:
+                totals['not_found'] += 1
+                continue
+            if node.pk in broken:
+                for existing_prop in broken[node.pk]:
+                    matching_p31 = next((p for p in p31_props if p.get('statement_id') == existing_prop.statement_id), p31_props[0])
+                    value_text, value_id = _normalize_property_value_for_storage(matching_p31.get('value'))
+                    existing_prop.value = matching_p31.get('value')
+                    existing_prop.value_text = value_text
+                    existing_prop.value_id = value_id
+                    existing_prop.property_label = matching_p31.get('property_label', 'instance of')
+                    to_update.append(existing_prop)
+            else:
+                for p31 in p31_props:
+                    value_text, value_id = _normalize_property_value_for_storage(p31.get('value'))
+                    to_create.append(Property(
+                        node=node,
+                        property_id='P31',
+                        statement_id=p31.get('statement_id'),
+                        property_label=p31.get('property_label', 'instance of'),
+                        value=p31.get('value'),
+                        value_text=value_text,
+                        value_id=value_id
+                    ))
+
+        with transaction.atomic():
+            Property.objects.bulk_create(to_create, ignore_conflicts=True)
+            Property.objects.bulk_update(to_update, ['value', 'value_text', 'value_id', 'property_label'])
+            bump_content_version(node_ids=[prop.node_id for prop in to_create + to_update])
+        totals['added'] += len(to_create)
+        totals['fixed'] += len(to_update)
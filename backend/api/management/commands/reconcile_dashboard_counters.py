@@ -0,0 +1,49 @@
+"""
+Django management command to correct drift in the dashboard counters.
+
+The counters behind /api/dashboard/stats/ are updated incrementally on create,
+delete, archive and restore. Writes that bypass those paths (bulk operations,
+the Django admin, raw SQL) can make them drift; this recounts every total from
+the underlying tables. Safe to run from cron.
+
+Usage:
+    python manage.py reconcile_dashboard_counters
+    python manage.py reconcile_dashboard_counters --dry-run
+"""
+
+from django.core.management.base import BaseCommand
+from api.models import DashboardCounters
+
+
+class Command(BaseCommand):
+    help = 'Recount the dashboard totals and fix any drift in DashboardCounters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show the drift without updating the counters',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN MODE - No changes will be made'))
+
+        current = DashboardCounters.objects.filter(pk=DashboardCounters.SINGLETON_ID).first()
+        actual = DashboardCounters.count_all()
+
+        drifted = 0
+        for name in DashboardCounters.FIELDS:
+            stored = getattr(current, name) if current else None
+            if stored != actual[name]:
+                drifted += 1
+                self.stdout.write(f'  - {name}: stored {stored}, actual {actual[name]}')
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('✓ Dashboard counters are up to date'))
+            return
+
+        if not dry_run:
+            DashboardCounters.reconcile()
+            self.stdout.write(self.style.SUCCESS(f'✓ Corrected {drifted} counter(s)'))
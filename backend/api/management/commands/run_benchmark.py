@@ -0,0 +1,78 @@
+"""
+Django management command to benchmark the hot API endpoints.
+
+Requests nodes, edges, graph-search, search/query, top-scored, discussions
+and activity-stream against the largest benchmark space (see
+seed_benchmark_data) and writes p50/p95 latency and query counts per
+endpoint to a JSON report. Given the report of an earlier release with
+--baseline, it also prints the change of each figure.
+
+Usage:
+    python manage.py run_benchmark
+    python manage.py run_benchmark --iterations 50 --output reports/benchmark-2.3.json --label 2.3
+    python manage.py run_benchmark --endpoint nodes --endpoint edges --space 42
+    python manage.py run_benchmark --baseline reports/benchmark-2.2.json
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from api import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Measure latency and query counts of the hot API endpoints and write a JSON report'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help='Measured requests per endpoint (default: 20)')
+        parser.add_argument('--warmup', type=int, default=2, help='Unmeasured requests per endpoint first (default: 2)')
+        parser.add_argument('--space', type=int, help='Space to benchmark (default: the largest benchmark space)')
+        parser.add_argument(
+            '--endpoint',
+            action='append',
+            choices=list(benchmark.ENDPOINTS),
+            help='Endpoint to benchmark; repeat for several (default: all)',
+        )
+        parser.add_argument('--output', default='benchmark_report.json', help='Report file (default: benchmark_report.json)')
+        parser.add_argument('--label', default='', help='Stored in the report, e.g. the release')
+        parser.add_argument('--baseline', help='Earlier report to compare against')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1 or options['warmup'] < 0:
+            raise CommandError('--iterations must be at least 1 and --warmup not negative')
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Cannot read {options["baseline"]}: {e}')
+
+        try:
+            report = benchmark.run(
+                space=options['space'],
+                iterations=options['iterations'],
+                warmup=options['warmup'],
+                endpoints=options['endpoint'],
+                label=options['label'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+
+        space = report['space']
+        self.stdout.write(f'Space {space["id"]}: {space["nodes"]} nodes, {space["edges"]} edges')
+        for name, result in report['endpoints'].items():
+            statuses = ', '.join(f'{status}×{count}' for status, count in result['statuses'].items())
+            self.stdout.write(
+                f'  - {name}: p50 {result["p50_ms"]:.1f} ms, p95 {result["p95_ms"]:.1f} ms, '
+                f'{result["queries_p50"]} queries ({statuses})'
+            )
+        if baseline:
+            self.stdout.write(f'Compared with {baseline.get("label") or options["baseline"]}:')
+            for name, metric, old, new, change in benchmark.compare(report, baseline):
+                delta = f'{change:+.1f}%' if change is not None else 'n/a'
+                self.stdout.write(f'  - {name} {metric}: {old} → {new} ({delta})')
+        self.stdout.write(self.style.SUCCESS(f'✓ Wrote {options["output"]}'))
@@ -0,0 +1,68 @@
+"""
+Django management command to run queued background jobs (see api/jobs.py).
+
+Runs as a long-lived worker by default, polling for due jobs; with --once it
+drains what is due and exits, which suits cron. Jobs that raise are retried
+with exponential backoff and marked failed after jobs.MAX_ATTEMPTS attempts.
+
+Usage:
+    python manage.py run_jobs
+    python manage.py run_jobs --once
+    python manage.py run_jobs --kind geocode_space --kind geocode_profile
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from api.jobs import requeue_stale_jobs, run_pending
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (geocoding, ...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run the jobs that are due and exit',
+        )
+        parser.add_argument(
+            '--kind',
+            action='append',
+            default=None,
+            help='Only run jobs of this kind (repeatable)',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Stop after this many jobs (with --once)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to wait when the queue is empty (default: 2.0)',
+        )
+
+    def handle(self, *args, **options):
+        kinds = options['kind']
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'Requeued {requeued} abandoned job(s)'))
+
+        if options['once']:
+            succeeded, failed = run_pending(limit=options['limit'], kinds=kinds)
+            self.stdout.write(self.style.SUCCESS(f'✓ Ran {succeeded + failed} job(s), {failed} failed'))
+            return
+
+        self.stdout.write('Waiting for jobs (Ctrl+C to stop)...')
+        try:
+            while True:
+                succeeded, failed = run_pending(kinds=kinds)
+                if succeeded or failed:
+                    self.stdout.write(f'Ran {succeeded + failed} job(s), {failed} failed')
+                else:
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS('✓ Stopped'))
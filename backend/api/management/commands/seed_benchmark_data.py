@@ -0,0 +1,86 @@
+"""
+Django management command to fill the database with synthetic benchmark data.
+
+Adds benchmark spaces (titled "[benchmark] ...") with power-law connected
+nodes, Wikidata-style properties and P31 values, discussions, reactions,
+reports and activities, for run_benchmark. The same arguments and --seed
+give the same data. Don't run it against a production database.
+
+Usage:
+    python manage.py seed_benchmark_data
+    python manage.py seed_benchmark_data --spaces 5 --nodes 5000 --edges 20000 --skew 1.2
+    python manage.py seed_benchmark_data --clear --neo4j
+    python manage.py seed_benchmark_data --clear --spaces 0
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from api import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic spaces, graphs, discussions, reports and activities for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--spaces', type=int, default=3, help='Benchmark spaces to add (default: 3)')
+        parser.add_argument('--nodes', type=int, default=1000, help='Nodes per space (default: 1000)')
+        parser.add_argument('--edges', type=int, default=3000, help='Edges per space (default: 3000)')
+        parser.add_argument(
+            '--properties',
+            type=int,
+            default=4,
+            help='Properties per node, its P31 value included (default: 4)',
+        )
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=1.0,
+            help='Zipf exponent of the edge endpoints and P31 values; higher means bigger hubs (default: 1.0)',
+        )
+        parser.add_argument('--users', type=int, default=50, help='Benchmark users to draw actors from (default: 50)')
+        parser.add_argument('--collaborators', type=int, default=10, help='Collaborators per space (default: 10)')
+        parser.add_argument('--discussions', type=int, default=200, help='Discussions per space (default: 200)')
+        parser.add_argument('--reactions', type=int, default=5, help='Most reactions per discussion (default: 5)')
+        parser.add_argument('--reports', type=int, default=20, help='Open reports per space (default: 20)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+        parser.add_argument(
+            '--neo4j',
+            action='store_true',
+            help='Also write the nodes and edges to Neo4j, for graph-search',
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete the existing benchmark spaces and users first',
+        )
+
+    def handle(self, *args, **options):
+        counts = ('spaces', 'nodes', 'edges', 'properties', 'users', 'collaborators', 'discussions', 'reactions',
+                  'reports')
+        if any(options[name] < 0 for name in counts):
+            raise CommandError('Counts must not be negative')
+        if options['spaces'] and options['properties'] < 1:
+            raise CommandError('--properties must be at least 1 (the P31 value)')
+
+        if options['clear']:
+            removed = benchmark.clear()
+            self.stdout.write(self.style.SUCCESS(f'✓ Removed {removed} benchmark space(s)'))
+        if not options['spaces']:
+            return
+
+        created = benchmark.seed(
+            spaces=options['spaces'],
+            nodes=options['nodes'],
+            edges=options['edges'],
+            properties=options['properties'],
+            skew=options['skew'],
+            users=options['users'],
+            collaborators=options['collaborators'],
+            discussions=options['discussions'],
+            reactions=options['reactions'],
+            reports=options['reports'],
+            rng_seed=options['seed'],
+            neo4j=options['neo4j'],
+        )
+        for name, count in created.items():
+            self.stdout.write(f'  - {name}: {count}')
+        self.stdout.write(self.style.SUCCESS(f'✓ Seeded {created["spaces"]} benchmark space(s)'))
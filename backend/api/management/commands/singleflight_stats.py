@@ -0,0 +1,36 @@
+"""
+Django management command to report how many upstream calls were collapsed.
+
+For each single-flight layer (Wikidata entities, Wikidata search, geocoding)
+counts the calls that went upstream, the calls that waited on an identical
+call in the same process, and the calls that waited on another worker and
+reused its stored result. The counts come from the metrics snapshots in
+METRICS_DIR, so they cover every worker since the server started; without
+METRICS_DIR only this command's own process is counted.
+
+Usage:
+    python manage.py singleflight_stats
+"""
+
+from django.core.management.base import BaseCommand
+
+# Importing the modules registers their flights
+from api import geocoding, wikidata  # noqa: F401
+from api.metrics import metrics_dir
+from api.singleflight import FLIGHT_OUTCOMES, FLIGHTS, flight_stats
+
+
+class Command(BaseCommand):
+    help = 'Show how many identical upstream calls were collapsed'
+
+    def handle(self, *args, **options):
+        if not metrics_dir():
+            self.stdout.write(self.style.WARNING('METRICS_DIR is not set; the server workers\' counts are not visible'))
+        for name in sorted(FLIGHTS):
+            stats = flight_stats(name)
+            self.stdout.write(f'{name}:')
+            for outcome in FLIGHT_OUTCOMES:
+                self.stdout.write(f'  - {outcome}: {stats[outcome]}')
+            self.stdout.write(self.style.SUCCESS(
+                f"✓ {name}: collapsed {stats['collapsed']} of {stats['total']} calls ({stats['collapse_rate']:.1%})"
+            ))
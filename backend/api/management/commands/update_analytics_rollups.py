@@ -0,0 +1,57 @@
+"""
+Django management command to update the rollup tables behind the Grafana
+analytics dashboards (see api/analytics.py).
+
+Each run only reads the users, spaces, nodes and edges created since the
+previous one. --rebuild recounts from scratch, which also drops rows that
+have since been deleted. --schedule queues a background job that keeps the
+rollups current from the run_jobs worker, every ANALYTICS_ROLLUP_INTERVAL
+seconds.
+
+Usage:
+    python manage.py update_analytics_rollups
+    python manage.py update_analytics_rollups --metric users --metric spaces
+    python manage.py update_analytics_rollups --rebuild
+    python manage.py update_analytics_rollups --schedule
+"""
+
+from django.core.management.base import BaseCommand
+from api.analytics import METRICS, rebuild_rollups, schedule_rollups, update_rollups
+from api.models import RollupWatermark
+
+
+class Command(BaseCommand):
+    help = 'Roll up new users, spaces, nodes and edges per day, week and month for the analytics dashboards'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--metric',
+            action='append',
+            choices=sorted(METRICS),
+            default=None,
+            help='Only update this metric (repeatable)',
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Drop the rollups and count everything again',
+        )
+        parser.add_argument(
+            '--schedule',
+            action='store_true',
+            help='Queue the periodic rollup job for run_jobs instead of running now',
+        )
+
+    def handle(self, *args, **options):
+        if options['schedule']:
+            schedule_rollups()
+            self.stdout.write(self.style.SUCCESS('✓ Queued the update_analytics_rollups job'))
+            return
+
+        metrics = options['metric']
+        counts = rebuild_rollups(metrics) if options['rebuild'] else update_rollups(metrics)
+        watermarks = dict(RollupWatermark.objects.filter(metric__in=list(counts)).values_list('metric', 'processed_until'))
+        for metric, count in counts.items():
+            self.stdout.write(f'  - {metric}: {count} new, rolled up to {watermarks.get(metric)}')
+        verb = 'Rebuilt' if options['rebuild'] else 'Updated'
+        self.stdout.write(self.style.SUCCESS(f'✓ {verb} rollups for {len(counts)} metric(s)'))
@@ -0,0 +1,32 @@
+"""
+Django management command to report the Wikidata autocomplete cache hit rate.
+
+Counts every search served by the wikidata-search, wikidata-property-search
+and tag search endpoints: exact cache hits, answers filtered from a cached
+shorter prefix, searches that joined an identical in-flight request, and
+misses that called wbsearchentities. The counts are the
+``cache_requests_total{cache="wikidata_search"}`` metric, read from the
+snapshots in METRICS_DIR, so they cover every worker since the server
+started; without METRICS_DIR only this command's own process is counted.
+
+Usage:
+    python manage.py wikidata_search_stats
+"""
+
+from django.core.management.base import BaseCommand
+from api.metrics import metrics_dir
+from api.wikidata import SEARCH_OUTCOMES, search_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Show the hit rate of the Wikidata search cache'
+
+    def handle(self, *args, **options):
+        if not metrics_dir():
+            self.stdout.write(self.style.WARNING('METRICS_DIR is not set; the server workers\' counts are not visible'))
+        stats = search_cache_stats()
+        for outcome in SEARCH_OUTCOMES:
+            self.stdout.write(f'  - {outcome}: {stats[outcome]}')
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Hit rate {stats['hit_rate']:.1%} over {stats['total']} searches"
+        ))
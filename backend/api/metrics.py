@@ -0,0 +1,362 @@
+"""
+Process metrics in the Prometheus text format, served at /metrics.
+
+Counters and histograms live in memory and are updated under one lock, so
+recording a value costs a dict lookup and a few additions. What is recorded:
+
+- per-route request counts and latency (MetricsMiddleware, api/middleware.py);
+- database queries and query time per request;
+- Neo4j calls per operation, their latency and errors (Neo4jConnection.session);
+- outbound HTTP calls per host, their latency and outcome (api/http_client.py);
+- cache hits and misses per cache (``record_cache``);
+- calls collapsed by each single-flight layer (api/singleflight.py).
+
+Routes are labelled by URL pattern name (e.g. ``space-nodes``), never by
+path, so ids don't multiply the series.
+
+Under gunicorn every worker has its own registry. When ``METRICS_DIR`` is
+set, each process writes a snapshot of its values to ``<METRICS_DIR>/<pid>.json``
+at most every METRICS_FLUSH_SECONDS and at exit, and /metrics adds up the
+snapshots of all processes, including ones that have exited, so counters
+never go backwards. Empty the directory when the server (re)starts, as with
+prometheus_client's multiprocess mode.
+
+The dependency and phase timings of the request being handled are also
+collected in a RequestStats (``current_request()``), for the Server-Timing
+header and the slow-request log (ServerTimingMiddleware).
+"""
+import atexit
+import contextvars
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from rest_framework.renderers import JSONRenderer
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+DEFAULT_FLUSH_SECONDS = 5
+# Distinct SQL statements timed per request
+MAX_STATEMENTS_PER_REQUEST = 200
+
+
+class Metric:
+    type = ''
+
+    def __init__(self, registry, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = registry.lock
+        self.values = {}
+        registry.register(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[label]) for label in self.labels)
+
+    def reset(self):
+        with self._lock:
+            self.values.clear()
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def merge(self, values, other):
+        for key, value in other:
+            key = tuple(key)
+            values[key] = values.get(key, 0) + value
+
+    def samples(self, values):
+        for key, value in sorted(values.items()):
+            yield self.name, dict(zip(self.labels, key)), value
+
+
+class Histogram(Metric):
+    """Buckets as in Prometheus; each value is [count per bucket..., count above the last, sum]."""
+    type = 'histogram'
+
+    def __init__(self, registry, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self.values.get(key)
+            if counts is None:
+                counts = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def merge(self, values, other):
+        for key, counts in other:
+            key = tuple(key)
+            current = values.get(key)
+            values[key] = list(counts) if current is None else [a + b for a, b in zip(current, counts)]
+
+    def samples(self, values):
+        for key, counts in sorted(values.items()):
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield f'{self.name}_bucket', {**labels, 'le': str(bound)}, cumulative
+            yield f'{self.name}_sum', labels, counts[-1]
+            yield f'{self.name}_count', labels, cumulative
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self._flushed_at = 0.0
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+
+    def reset(self):
+        for metric in self.metrics.values():
+            metric.reset()
+        self._flushed_at = 0.0
+
+    def after_fork(self):
+        # The parent's lock may have been held by one of its threads; nothing
+        # of its counts belongs to the child, which the parent reports itself
+        self.lock = threading.Lock()
+        for metric in self.metrics.values():
+            metric._lock = self.lock
+            metric.values = {}
+        self._flushed_at = 0.0
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                name: [[list(key), value if isinstance(value, (int, float)) else list(value)]
+                       for key, value in metric.values.items()]
+                for name, metric in self.metrics.items()
+            }
+
+    def flush(self):
+        """Write this process's snapshot to METRICS_DIR, if it is set."""
+        directory = metrics_dir()
+        if not directory:
+            return
+        self._flushed_at = time.monotonic()
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        try:
+            with open(f'{path}.tmp', 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(f'{path}.tmp', path)
+        except OSError as e:
+            logger.warning("Failed to write metrics snapshot to %s: %s", path, e)
+
+    def maybe_flush(self):
+        if time.monotonic() - self._flushed_at >= getattr(settings, 'METRICS_FLUSH_SECONDS', DEFAULT_FLUSH_SECONDS):
+            self.flush()
+
+    def collect(self):
+        """{name: {label values: value}} over every process's snapshot, or this process's alone."""
+        directory = metrics_dir()
+        if directory:
+            self.flush()
+            snapshots = []
+            for path in glob.glob(os.path.join(directory, '*.json')):
+                try:
+                    with open(path) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue  # being replaced
+        else:
+            snapshots = [self.snapshot()]
+
+        merged = {name: {} for name in self.metrics}
+        for snapshot in snapshots:
+            for name, values in snapshot.items():
+                if name in self.metrics:
+                    self.metrics[name].merge(merged[name], values)
+        return merged
+
+    def render(self):
+        lines = []
+        for name, values in self.collect().items():
+            metric = self.metrics[name]
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            for sample, labels, value in metric.samples(values):
+                lines.append(f'{sample}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def metrics_dir():
+    return getattr(settings, 'METRICS_DIR', None)
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = Counter(REGISTRY, 'http_requests_total', 'Requests handled, by route and status.', ('method', 'route', 'status'))
+HTTP_LATENCY = Histogram(REGISTRY, 'http_request_duration_seconds', 'Time to build the response, by route.', ('method', 'route'))
+DB_QUERIES = Histogram(
+    REGISTRY, 'http_request_db_queries', 'Database queries per request, by route.', ('route',), buckets=QUERY_COUNT_BUCKETS,
+)
+DB_TIME = Histogram(REGISTRY, 'http_request_db_seconds', 'Time spent in database queries per request, by route.', ('route',))
+NEO4J_LATENCY = Histogram(REGISTRY, 'neo4j_call_duration_seconds', 'Neo4j calls, by operation.', ('operation',))
+NEO4J_ERRORS = Counter(REGISTRY, 'neo4j_call_errors_total', 'Failed Neo4j calls, by operation.', ('operation',))
+OUTBOUND_LATENCY = Histogram(REGISTRY, 'outbound_http_duration_seconds', 'Outbound HTTP calls, retries included, by host.', ('host',))
+OUTBOUND_REQUESTS = Counter(
+    REGISTRY, 'outbound_http_requests_total',
+    'Outbound HTTP calls by host and outcome (status code, error, circuit_open or bulkhead_full).', ('host', 'outcome'),
+)
+CACHE_REQUESTS = Counter(REGISTRY, 'cache_requests_total', 'Cache lookups, by cache and result.', ('cache', 'result'))
+SINGLEFLIGHT_CALLS = Counter(
+    REGISTRY, 'singleflight_calls_total',
+    'Calls through a single-flight layer, by flight and outcome (leader, coalesced or waited).', ('flight', 'outcome'),
+)
+
+
+class RequestStats:
+    """
+    Calls to each dependency or phase ('db', 'neo4j', 'http', 'auth',
+    'permissions', 'serialize', 'render') during one request and the time
+    they took, and the time per distinct SQL statement.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        # Phases being timed; a block nested in the same phase is not counted again
+        self.open_phases = set()
+        # dependency: [calls, seconds]
+        self.dependencies = {}
+        # sql: [calls, seconds]
+        self.statements = {}
+
+    def add(self, dependency, seconds):
+        calls = self.dependencies.setdefault(dependency, [0, 0.0])
+        calls[0] += 1
+        calls[1] += seconds
+
+    def add_query(self, sql, seconds):
+        self.add('db', seconds)
+        calls = self.statements.get(sql)
+        if calls is None:
+            if len(self.statements) >= MAX_STATEMENTS_PER_REQUEST:
+                return
+            calls = self.statements[sql] = [0, 0.0]
+        calls[0] += 1
+        calls[1] += seconds
+
+    def get(self, dependency):
+        """(calls, seconds) for a dependency."""
+        return tuple(self.dependencies.get(dependency, (0, 0.0)))
+
+    def top_statements(self, count):
+        """The ``count`` SQL statements that took the most time in total: [(sql, calls, seconds)]."""
+        ranked = sorted(self.statements.items(), key=lambda item: item[1][1], reverse=True)
+        return [(sql, calls, seconds) for sql, (calls, seconds) in ranked[:count]]
+
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+
+def current_request():
+    """The RequestStats of the request being handled, or None outside one."""
+    return _current.get()
+
+
+def start_request():
+    stats = RequestStats()
+    return stats, _current.set(stats)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def record_dependency(dependency, seconds):
+    stats = _current.get()
+    if stats is not None:
+        stats.add(dependency, seconds)
+
+
+@contextmanager
+def phase(name):
+    """Add the time spent in the block to the current request's ``name`` phase."""
+    stats = _current.get()
+    if stats is None or name in stats.open_phases:
+        yield
+        return
+    stats.open_phases.add(name)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.open_phases.discard(name)
+        stats.add(name, time.perf_counter() - started)
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that counts its time, the JSON encoding, as the request's
+    'render' phase. Building ``serializer.data`` is the 'serialize' phase
+    (see TimedModelSerializer in api/serializers.py).
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with phase('render'):
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+def record_cache(cache, hits=0, misses=0):
+    if hits:
+        CACHE_REQUESTS.inc(hits, cache=cache, result='hit')
+    if misses:
+        CACHE_REQUESTS.inc(misses, cache=cache, result='miss')
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint; requires ``Authorization: Bearer <METRICS_TOKEN>``.
+    Without METRICS_TOKEN it is only served with DEBUG on.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if not token and not settings.DEBUG:
+        return HttpResponse('Set METRICS_TOKEN to enable /metrics\n', status=403, content_type='text/plain')
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse('Unauthorized\n', status=401, content_type='text/plain')
+    return HttpResponse(REGISTRY.render(), content_type=CONTENT_TYPE)
+
+
+os.register_at_fork(after_in_child=REGISTRY.after_fork)
+atexit.register(REGISTRY.flush)
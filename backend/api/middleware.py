@@ -0,0 +1,166 @@
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from . import metrics, profiling
+
+slow_request_logger = logging.getLogger('api.slow_requests')
+
+# Server-Timing metrics: (name, RequestStats key, description)
+TIMING_PHASES = (
+    ('auth', 'auth', 'Authentication'),
+    ('perm', 'permissions', 'Permission checks'),
+    ('db', 'db', 'ORM'),
+    ('neo4j', 'neo4j', 'Neo4j'),
+    ('http', 'http', 'Outbound HTTP'),
+    ('ser', 'serialize', 'Serialization'),
+    ('render', 'render', 'JSON rendering'),
+)
+# Phases that never overlap; 'app' is the time spent outside all of them
+EXCLUSIVE_PHASES = ('db', 'neo4j', 'http', 'render')
+DEFAULT_SLOW_REQUEST_MS = 1000
+SLOW_REQUEST_TOP_SQL = 5
+SLOW_REQUEST_SQL_CHARS = 1000
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route or 'unnamed'
+
+
+class MetricsMiddleware:
+    """
+    Records each request's latency, status and database usage under its
+    route (see api/metrics.py), and collects the time spent in dependencies
+    in a RequestStats while it is handled.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats, token = metrics.start_request()
+
+        def timed_query(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                stats.add_query(sql, time.perf_counter() - started)
+
+        try:
+            with connection.execute_wrapper(timed_query):
+                response = self.get_response(request)
+        finally:
+            metrics.end_request(token)
+
+        route = _route(request)
+        metrics.HTTP_REQUESTS.inc(method=request.method, route=route, status=response.status_code)
+        metrics.HTTP_LATENCY.observe(time.perf_counter() - stats.started, method=request.method, route=route)
+        queries, db_seconds = stats.get('db')
+        metrics.DB_QUERIES.observe(queries, route=route)
+        metrics.DB_TIME.observe(db_seconds, route=route)
+        metrics.REGISTRY.maybe_flush()
+        return response
+
+
+class ServerTimingMiddleware:
+    """
+    Splits each request's time between authentication, permission checks,
+    ORM, Neo4j, outbound HTTP, serialization (building ``serializer.data``)
+    and JSON rendering in a ``Server-Timing`` header, plus 'app' for the
+    rest and the total. Authentication, permission and serialization times
+    include their own queries, which also count under 'db'. Requests slower
+    than SLOW_REQUEST_MS are logged to the ``api.slow_requests`` logger as
+    one JSON line with the slowest SQL statements. Reads the RequestStats of MetricsMiddleware, which must come
+    before it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        stats = metrics.current_request()
+        if stats is None:
+            return response
+
+        total_ms = (time.perf_counter() - stats.started) * 1000
+        phases = {}
+        for name, key, description in TIMING_PHASES:
+            calls, seconds = stats.get(key)
+            if calls:
+                phases[name] = (calls, seconds * 1000, description)
+        app_ms = max(0.0, total_ms - sum(phases[name][1] for name in EXCLUSIVE_PHASES if name in phases))
+
+        entries = []
+        for name, (calls, ms, description) in phases.items():
+            if name in ('db', 'neo4j', 'http'):
+                description = f'{description} ({calls} call{"s" if calls != 1 else ""})'
+            entries.append(f'{name};dur={ms:.1f};desc="{description}"')
+        entries.append(f'app;dur={app_ms:.1f}')
+        entries.append(f'total;dur={total_ms:.1f}')
+        response['Server-Timing'] = ', '.join(entries)
+
+        if total_ms >= getattr(settings, 'SLOW_REQUEST_MS', DEFAULT_SLOW_REQUEST_MS):
+            self.log_slow_request(request, response, stats, total_ms, phases, app_ms)
+        return response
+
+    def log_slow_request(self, request, response, stats, total_ms, phases, app_ms):
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'route': _route(request),
+            'status': response.status_code,
+            'user_id': getattr(getattr(request, 'user', None), 'pk', None),
+            'total_ms': round(total_ms, 1),
+            'phases': {name: {'calls': calls, 'ms': round(ms, 1)} for name, (calls, ms, _) in phases.items()},
+            'app_ms': round(app_ms, 1),
+            'top_sql': [
+                {'sql': sql[:SLOW_REQUEST_SQL_CHARS], 'calls': calls, 'ms': round(seconds * 1000, 1)}
+                for sql, calls, seconds in stats.top_statements(SLOW_REQUEST_TOP_SQL)
+            ],
+        }
+        slow_request_logger.warning("slow_request %s", json.dumps(record))
+
+
+class ProfilingMiddleware:
+    """
+    Runs requests flagged with ``X-Profile: 1`` or ``?_profile=1`` by an admin
+    under the request profiler and stores the result (see api/profiling.py).
+    Must come after AuthenticationMiddleware, for session users.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not profiling.wants_profile(request):
+            return self.get_response(request)
+        user = profiling.profiling_user(request)
+        if user is None:
+            return self.get_response(request)
+
+        profile, token = profiling.start_profile(profiling.new_request_id(request))
+
+        def recorded_query(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                profile.record_sql(sql, time.perf_counter() - started)
+
+        try:
+            with connection.execute_wrapper(recorded_query):
+                response = self.get_response(request)
+        finally:
+            profiling.stop_profile(profile, token)
+
+        profile.save(request, response, user)
+        response['X-Profile-Id'] = profile.request_id
+        return response
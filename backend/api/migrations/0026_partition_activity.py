@@ -0,0 +1,102 @@
+from datetime import date
+
+from django.db import migrations
+from django.utils import timezone
+
+
+ACTIVITY_INDEXES = [
+    ('api_activit_publish_7d0ac6_idx', 'published'),
+    ('api_activit_type_f049ed_idx', 'type'),
+    ('api_activit_actor_97e164_idx', 'actor'),
+    ('api_activit_object_3e45a7_idx', 'object'),
+]
+
+PREMAKE_MONTHS = 3
+
+
+def _add_months(month, count):
+    index = month.year * 12 + (month.month - 1) + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_indexes(cursor):
+    for name, column in ACTIVITY_INDEXES:
+        cursor.execute(f'CREATE INDEX "{name}" ON "api_activity" ("{column}")')
+
+
+def partition_activity_table(apps, schema_editor):
+    """
+    Rebuild api_activity as a table range-partitioned by month on published.
+
+    Postgres requires the partition key in every unique constraint, so the
+    primary key becomes (id, published); ids still come from a single sequence.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('ALTER TABLE "api_activity" RENAME TO "api_activity_unpartitioned"')
+        cursor.execute(
+            'CREATE TABLE "api_activity" (LIKE "api_activity_unpartitioned" INCLUDING DEFAULTS) '
+            'PARTITION BY RANGE ("published")'
+        )
+        cursor.execute('CREATE TABLE "api_activity_default" PARTITION OF "api_activity" DEFAULT')
+
+        cursor.execute('SELECT MIN("published"), MAX("id") FROM "api_activity_unpartitioned"')
+        oldest, max_id = cursor.fetchone()
+        current = timezone.now().date().replace(day=1)
+        month = oldest.date().replace(day=1) if oldest else current
+        while month <= _add_months(current, PREMAKE_MONTHS):
+            upper = _add_months(month, 1)
+            cursor.execute(
+                f'CREATE TABLE "api_activity_p{month:%Y_%m}" PARTITION OF "api_activity" '
+                f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{upper.isoformat()} 00:00:00+00')"
+            )
+            month = upper
+
+        cursor.execute('INSERT INTO "api_activity" SELECT * FROM "api_activity_unpartitioned"')
+        cursor.execute('DROP TABLE "api_activity_unpartitioned"')
+
+        cursor.execute('ALTER TABLE "api_activity" ADD CONSTRAINT "api_activity_pkey" PRIMARY KEY ("id", "published")')
+        cursor.execute('CREATE SEQUENCE "api_activity_id_seq" AS bigint OWNED BY "api_activity"."id"')
+        cursor.execute('ALTER TABLE "api_activity" ALTER COLUMN "id" SET DEFAULT nextval(\'"api_activity_id_seq"\')')
+        if max_id:
+            cursor.execute('SELECT setval(\'"api_activity_id_seq"\', %s)', [max_id])
+        _create_indexes(cursor)
+
+
+def unpartition_activity_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        for name, _column in ACTIVITY_INDEXES:
+            cursor.execute(f'DROP INDEX IF EXISTS "{name}"')
+        cursor.execute('ALTER TABLE "api_activity" RENAME TO "api_activity_partitioned"')
+        cursor.execute('ALTER TABLE "api_activity_partitioned" DROP CONSTRAINT "api_activity_pkey"')
+        cursor.execute('ALTER TABLE "api_activity_partitioned" ALTER COLUMN "id" DROP DEFAULT')
+        cursor.execute('DROP SEQUENCE IF EXISTS "api_activity_id_seq"')
+
+        cursor.execute('CREATE TABLE "api_activity" (LIKE "api_activity_partitioned" INCLUDING DEFAULTS)')
+        cursor.execute('INSERT INTO "api_activity" SELECT * FROM "api_activity_partitioned"')
+        cursor.execute('DROP TABLE "api_activity_partitioned" CASCADE')
+
+        cursor.execute('ALTER TABLE "api_activity" ADD CONSTRAINT "api_activity_pkey" PRIMARY KEY ("id")')
+        cursor.execute('ALTER TABLE "api_activity" ALTER COLUMN "id" ADD GENERATED BY DEFAULT AS IDENTITY')
+        cursor.execute(
+            'SELECT setval(pg_get_serial_sequence(\'"api_activity"\', \'id\'), '
+            'COALESCE((SELECT MAX("id") FROM "api_activity"), 1), '
+            '(SELECT MAX("id") IS NOT NULL FROM "api_activity"))'
+        )
+        _create_indexes(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_node_description'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_activity_table, unpartition_activity_table),
+    ]
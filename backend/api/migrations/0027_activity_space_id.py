@@ -0,0 +1,46 @@
+# Generated by Django 5.1.7 on 2026-10-19 14:34
+
+from django.db import migrations, models
+
+
+def backfill_space_id(apps, schema_editor):
+    """Derive space_id for existing rows the same way record_activity does."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            """
+            UPDATE "api_activity" SET "space_id" = COALESCE(
+                substring("target" FROM '^Space:([0-9]+)$')::integer,
+                substring("object" FROM '^Space:([0-9]+)$')::integer,
+                CASE WHEN "payload"->>'space_id' ~ '^[0-9]+$'
+                     THEN ("payload"->>'space_id')::integer END
+            )
+            WHERE "space_id" IS NULL
+            """
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0026_partition_activity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='space_id',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_space_id, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['target'], name='api_activit_target_14c18c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['space_id', 'published'], name='api_activit_space_i_d80443_idx'),
+        ),
+    ]
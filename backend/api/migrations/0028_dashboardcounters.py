@@ -0,0 +1,47 @@
+# Generated by Django 5.1.7 on 2026-10-19 14:39
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def populate_counters(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    Space = apps.get_model('api', 'Space')
+    Node = apps.get_model('api', 'Node')
+    Edge = apps.get_model('api', 'Edge')
+    Discussion = apps.get_model('api', 'Discussion')
+    DashboardCounters = apps.get_model('api', 'DashboardCounters')
+
+    DashboardCounters.objects.update_or_create(
+        pk=1,
+        defaults={
+            'users': User.objects.filter(profile__is_archived=False).count(),
+            'spaces': Space.objects.filter(is_archived=False).count(),
+            'nodes': Node.objects.filter(is_archived=False).count(),
+            'edges': Edge.objects.filter(source__is_archived=False, target__is_archived=False).count(),
+            'discussions': Discussion.objects.count(),
+        },
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0027_activity_space_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounters',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('users', models.IntegerField(default=0)),
+                ('spaces', models.IntegerField(default=0)),
+                ('nodes', models.IntegerField(default=0)),
+                ('edges', models.IntegerField(default=0)),
+                ('discussions', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
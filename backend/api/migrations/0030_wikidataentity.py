@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-19 14:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0029_tokenrevocation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WikidataEntity',
+            fields=[
+                ('qid', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('properties', models.JSONField(default=list)),
+                ('etag', models.CharField(blank=True, default='', max_length=32)),
+                ('fetched_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.7 on 2026-10-19 15:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0031_background_jobs_geocode_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='space',
+            name='content_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='SpaceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_version', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=16)),
+                ('summary', models.TextField(blank=True, default='')),
+                ('model_used', models.CharField(blank=True, default='', max_length=64)),
+                ('metadata', models.JSONField(default=dict)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('space', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summaries', to='api.space')),
+            ],
+            options={
+                'unique_together': {('space', 'content_version')},
+            },
+        ),
+    ]
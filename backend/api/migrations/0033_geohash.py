@@ -0,0 +1,60 @@
+# Generated by Django 5.1.7 on 2026-10-19 15:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+from api.geo import geohash_encode
+
+
+def populate_geohashes(apps, schema_editor):
+    for model_name in ('Profile', 'Space', 'Node'):
+        model = apps.get_model('api', model_name)
+        rows = model.objects.filter(latitude__isnull=False, longitude__isnull=False).only('id', 'latitude', 'longitude')
+        batch = []
+        for row in rows.iterator(chunk_size=1000):
+            row.geohash = geohash_encode(row.latitude, row.longitude)
+            batch.append(row)
+            if len(batch) >= 1000:
+                model.objects.bulk_update(batch, ['geohash'])
+                batch = []
+        if batch:
+            model.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0032_space_summaries'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='node',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, max_length=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, max_length=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='space',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, max_length=12, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='node',
+            index=models.Index(fields=['space', 'geohash'], name='api_node_space_i_1a5e92_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['geohash'], name='api_profile_geohash_a36561_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='space',
+            index=models.Index(fields=['geohash'], name='api_space_geohash_073c2a_idx'),
+        ),
+        migrations.RunPython(populate_geohashes, migrations.RunPython.noop),
+    ]
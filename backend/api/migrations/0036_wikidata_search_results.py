@@ -0,0 +1,22 @@
+# Generated by Django 5.1.7 on 2026-10-19 17:13
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0035_request_profiles'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WikidataSearchResult',
+            fields=[
+                ('key', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('entry', models.JSONField()),
+                ('fetched_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+    ]
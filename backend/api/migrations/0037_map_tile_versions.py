@@ -0,0 +1,25 @@
+# Generated by Django 5.1.7 on 2026-10-19 17:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0036_wikidata_search_results'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MapTileVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=64)),
+                ('region', models.CharField(max_length=12)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('scope', 'region')},
+            },
+        ),
+    ]
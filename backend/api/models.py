@@ -1,11 +1,36 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.db.models.signals import post_save
+from django.db.models import F, Q
+from django.db.models.signals import m2m_changed, post_save, post_delete
 from django.dispatch import receiver
 from uuid import uuid4
 
-class Profile(models.Model):
+from .geo import geohash_encode, invalidate_map_tiles
+
+class GeohashedModel(models.Model):
+    """Keeps ``geohash`` in step with latitude/longitude on save; see api/geo.py."""
+    geohash = models.CharField(max_length=12, blank=True, null=True, editable=False)
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What the map's cluster tiles were built from; see map_location_changed
+        instance._saved_map_state = (instance.__dict__.get('geohash'), instance.__dict__.get('is_archived'))
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.geohash = geohash_encode(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        super().save(*args, **kwargs)
+
+
+class Profile(GeohashedModel):
     # User types
     ADMIN = 1
     MODERATOR = 2
@@ -43,6 +68,9 @@ class Profile(models.Model):
 
     def __str__(self):
         return f"{self.user.username}'s profile"
+
+    class Meta:
+        indexes = [models.Index(fields=['geohash'])]
     
     def is_admin(self):
         """Check if user is an admin"""
@@ -81,10 +109,10 @@ class Tag(models.Model):
     def __str__(self):
         return self.name
 
-class Space(models.Model):
+class Space(GeohashedModel):
     title = models.CharField(max_length=200)
     description = models.TextField()
-    created_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
     creator = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_spaces')
     collaborators = models.ManyToManyField(User, related_name='joined_spaces', blank=True)
     tags = models.ManyToManyField(Tag, blank=True)
@@ -97,9 +125,20 @@ class Space(models.Model):
     report_count = models.IntegerField(default=0)
     is_reported = models.BooleanField(default=False)
     is_archived = models.BooleanField(default=False)
+    # Bumped whenever content that goes into the AI summary changes; see bump_content_version
+    content_version = models.PositiveIntegerField(default=0)
     
     def __str__(self):
         return self.title
+
+    def save(self, *args, **kwargs):
+        # content_version only moves in the database; never write back a stale in-memory copy
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'content_version'
+            ]
+        super().save(*args, **kwargs)
     
     def full_location(self):
         """Return a human-readable location string."""
@@ -116,6 +155,7 @@ class Space(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=['geohash'])]
 
 class SpaceModerator(models.Model):
     """Model to assign moderators to specific spaces"""
@@ -142,10 +182,10 @@ class Property(models.Model):
     class Meta:
         unique_together = ('node', 'statement_id')
     
-class Node(models.Model):
+class Node(GeohashedModel):
     label = models.CharField(max_length=255)
     wikidata_id = models.CharField(max_length=50, blank=True, null=True)
-    created_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE)
     space = models.ForeignKey(Space, on_delete=models.CASCADE)
     country = models.CharField(max_length=100, blank=True, null=True)
@@ -164,10 +204,13 @@ class Node(models.Model):
         """Get the total number of connections (incoming + outgoing edges) for this node"""
         return self.source_edges.count() + self.target_edges.count()
 
+    class Meta:
+        indexes = [models.Index(fields=['space', 'geohash'])]
+
 class Edge(models.Model):
     source = models.ForeignKey(Node, related_name='source_edges', on_delete=models.CASCADE)
     target = models.ForeignKey(Node, related_name='target_edges', on_delete=models.CASCADE)
-    created_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
     relation_property = models.CharField(max_length=255)
     wikidata_property_id = models.CharField(max_length=50, blank=True, null=True)
 
@@ -271,6 +314,96 @@ class Report(models.Model):
         return f"Report({self.content_type} #{self.content_id}, {self.reason}, {self.status})"
 
 
+class WikidataEntity(models.Model):
+    """Persistent copy of an entity's properties, as returned by wikidata.get_wikidata_properties."""
+    qid = models.CharField(max_length=32, primary_key=True)
+    properties = models.JSONField(default=list)
+    # Wikidata lastrevid at fetch time; lets a refresh skip the SPARQL query when unchanged
+    etag = models.CharField(max_length=32, blank=True, default='')
+    fetched_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"WikidataEntity({self.qid}, fetched {self.fetched_at:%Y-%m-%d %H:%M})"
+
+
+class WikidataSearchResult(models.Model):
+    """wbsearchentities answer for a search cache key, so workers waiting on the same search can reuse it."""
+    key = models.CharField(max_length=255, primary_key=True)
+    entry = models.JSONField()
+    fetched_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"WikidataSearchResult({self.key})"
+
+
+class TokenRevocation(models.Model):
+    """Role claims in access tokens issued to ``user`` before ``revoked_at`` are no longer trusted."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='token_revocation')
+    revoked_at = models.DateTimeField(default=timezone.now)
+    reason = models.CharField(max_length=64, blank=True, default='')
+
+    def __str__(self):
+        return f"TokenRevocation({self.user_id} at {self.revoked_at:%Y-%m-%d %H:%M:%S})"
+
+
+class BackgroundJob(models.Model):
+    """Deferred work picked up by ``manage.py run_jobs``; see api/jobs.py."""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=64)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+
+    def __str__(self):
+        return f"BackgroundJob({self.kind} #{self.pk}, {self.status})"
+
+
+class GeocodeCacheEntry(models.Model):
+    """Nominatim answer keyed by normalized address or rounded coordinates; ``result`` is null when nothing matched."""
+    key = models.CharField(max_length=255, primary_key=True)
+    result = models.JSONField(null=True, blank=True)
+    fetched_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"GeocodeCacheEntry({self.key})"
+
+
+class MapTileVersion(models.Model):
+    """
+    Bumped when a row of a map scope (e.g. 'spaces') moves, appears or
+    disappears in a region, a geohash prefix of geo.TILE_VERSION_PRECISION
+    characters; part of the keys of the cluster tiles over the region.
+    """
+    scope = models.CharField(max_length=64)
+    region = models.CharField(max_length=12)
+    version = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('scope', 'region')
+
+    def __str__(self):
+        return f"MapTileVersion({self.scope}, {self.region}, {self.version})"
+
+
 class Archive(models.Model):
     CONTENT_SPACE = 'space'
     CONTENT_NODE = 'node'
@@ -313,18 +446,37 @@ class Activity(models.Model):
 
     payload = models.JSONField(blank=True, default=dict)
 
+    # Denormalised from target/object/payload so per-space timelines are an
+    # index range scan on (space_id, published).
+    space_id = models.IntegerField(blank=True, null=True)
+
     class Meta:
         indexes = [
             models.Index(fields=['published']),
             models.Index(fields=['type']),
             models.Index(fields=['actor']),
             models.Index(fields=['object']),
+            models.Index(fields=['target']),
+            models.Index(fields=['space_id', 'published']),
         ]
 
     def __str__(self):
         return f"Activity({self.type} {self.object} by {self.actor})"
 
 
+def activity_space_id(target=None, object=None, payload=None):
+    """Space an activity belongs to: a Space:<id> target or object, else payload['space_id']."""
+    for ref in (target, object):
+        if isinstance(ref, str) and ref.startswith('Space:'):
+            space_id = ref[len('Space:'):]
+            if space_id.isdigit():
+                return int(space_id)
+    space_id = (payload or {}).get('space_id')
+    if isinstance(space_id, int) or (isinstance(space_id, str) and space_id.isdigit()):
+        return int(space_id)
+    return None
+
+
 def record_activity(*, actor_user, type: str, object: str, target=None,
                     summary: str = "", to=None, cc=None, payload=None):
 
@@ -339,5 +491,318 @@ def record_activity(*, actor_user, type: str, object: str, target=None,
         to=to or [],
         cc=cc or [],
         payload=payload or {},
+        space_id=activity_space_id(target, object, payload),
     )
     return act
+
+
+class DashboardCounters(models.Model):
+    """
+    Single-row table of the admin dashboard totals, kept current by the signal
+    handlers below and by the archive/restore views. Each count mirrors the
+    query in reconcile(); `manage.py reconcile_dashboard_counters` fixes drift.
+    """
+    SINGLETON_ID = 1
+    FIELDS = ('users', 'spaces', 'nodes', 'edges', 'discussions')
+
+    users = models.IntegerField(default=0)
+    spaces = models.IntegerField(default=0)
+    nodes = models.IntegerField(default=0)
+    edges = models.IntegerField(default=0)
+    discussions = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return "DashboardCounters(" + ", ".join(f"{name}={getattr(self, name)}" for name in self.FIELDS) + ")"
+
+    @classmethod
+    def count_all(cls):
+        """Exact totals computed from the underlying tables."""
+        return {
+            'users': User.objects.filter(profile__is_archived=False).count(),
+            'spaces': Space.objects.filter(is_archived=False).count(),
+            'nodes': Node.objects.filter(is_archived=False).count(),
+            'edges': Edge.objects.filter(source__is_archived=False, target__is_archived=False).count(),
+            'discussions': Discussion.objects.count(),
+        }
+
+    @classmethod
+    def reconcile(cls):
+        counters, _ = cls.objects.update_or_create(
+            pk=cls.SINGLETON_ID,
+            defaults={**cls.count_all(), 'updated_at': timezone.now()},
+        )
+        return counters
+
+    @classmethod
+    def load(cls):
+        try:
+            return cls.objects.get(pk=cls.SINGLETON_ID)
+        except cls.DoesNotExist:
+            return cls.reconcile()
+
+    @classmethod
+    def adjust(cls, **deltas):
+        deltas = {name: delta for name, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        updated = cls.objects.filter(pk=cls.SINGLETON_ID).update(
+            updated_at=timezone.now(),
+            **{name: F(name) + delta for name, delta in deltas.items()},
+        )
+        if not updated:
+            # No row yet: a full count already includes this change.
+            cls.reconcile()
+
+
+def _active_edge_count(node):
+    """Edges touching ``node`` that count towards the dashboard total."""
+    return Edge.objects.filter(
+        Q(source=node) | Q(target=node),
+        source__is_archived=False,
+        target__is_archived=False,
+    ).count()
+
+
+def _edge_endpoints_active(edge):
+    if Edge.source.is_cached(edge) and Edge.target.is_cached(edge):
+        return not (edge.source.is_archived or edge.target.is_archived)
+    return not Node.objects.filter(pk__in=[edge.source_id, edge.target_id], is_archived=True).exists()
+
+
+def set_archived(instance, archived):
+    """
+    Archive or restore a Space, Node or Profile and update the dashboard
+    counters. Returns False when the item was already in that state.
+    """
+    if instance.is_archived == archived:
+        return False
+
+    delta = -1 if archived else 1
+    if isinstance(instance, Node):
+        # Count the node's edges while they are still visible on both ends.
+        edges = _active_edge_count(instance) if archived else 0
+        instance.is_archived = archived
+        instance.save(update_fields=['is_archived'])
+        if not archived:
+            edges = _active_edge_count(instance)
+        DashboardCounters.adjust(nodes=delta, edges=delta * edges)
+        return True
+
+    instance.is_archived = archived
+    instance.save(update_fields=['is_archived'])
+    if isinstance(instance, Space):
+        DashboardCounters.adjust(spaces=delta)
+    elif isinstance(instance, Profile):
+        DashboardCounters.adjust(users=delta)
+    return True
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_save, sender=Space)
+@receiver(post_save, sender=Node)
+@receiver(post_save, sender=Edge)
+@receiver(post_save, sender=Discussion)
+def count_created(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
+        return
+    if sender is Edge:
+        if _edge_endpoints_active(instance):
+            DashboardCounters.adjust(edges=1)
+    elif sender is Discussion:
+        DashboardCounters.adjust(discussions=1)
+    elif not instance.is_archived:
+        field = {Profile: 'users', Space: 'spaces', Node: 'nodes'}[sender]
+        DashboardCounters.adjust(**{field: 1})
+
+
+@receiver(post_delete, sender=Profile)
+@receiver(post_delete, sender=Space)
+@receiver(post_delete, sender=Node)
+@receiver(post_delete, sender=Edge)
+@receiver(post_delete, sender=Discussion)
+def count_deleted(sender, instance, **kwargs):
+    # Cascades delete edges before their nodes, so endpoints can still be read.
+    if sender is Edge:
+        if _edge_endpoints_active(instance):
+            DashboardCounters.adjust(edges=-1)
+    elif sender is Discussion:
+        DashboardCounters.adjust(discussions=-1)
+    elif not instance.is_archived:
+        field = {Profile: 'users', Space: 'spaces', Node: 'nodes'}[sender]
+        DashboardCounters.adjust(**{field: -1})
+
+
+class SpaceSummary(models.Model):
+    """AI summary of a space at one content version; generated by the summarize_space job (api/summaries.py)."""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    space = models.ForeignKey(Space, on_delete=models.CASCADE, related_name='summaries')
+    content_version = models.PositiveIntegerField()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    summary = models.TextField(blank=True, default='')
+    model_used = models.CharField(max_length=64, blank=True, default='')
+    metadata = models.JSONField(default=dict)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('space', 'content_version')
+
+    def __str__(self):
+        return f"SpaceSummary({self.space_id} v{self.content_version}, {self.status})"
+
+
+class AnalyticsRollup(models.Model):
+    """
+    Rows created per day, week or month for the Grafana analytics dashboards,
+    maintained incrementally by api/analytics.py so dashboard queries don't
+    scan the base tables.
+    """
+    PERIOD_DAY = 'day'
+    PERIOD_WEEK = 'week'
+    PERIOD_MONTH = 'month'
+    PERIOD_CHOICES = [
+        (PERIOD_DAY, 'Day'),
+        (PERIOD_WEEK, 'Week'),
+        (PERIOD_MONTH, 'Month'),
+    ]
+
+    metric = models.CharField(max_length=32)
+    period = models.CharField(max_length=8, choices=PERIOD_CHOICES)
+    period_start = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('metric', 'period', 'period_start')
+
+    def __str__(self):
+        return f"{self.metric} {self.period} {self.period_start:%Y-%m-%d}: {self.count}"
+
+
+class RollupWatermark(models.Model):
+    """How far each AnalyticsRollup metric has been rolled up: rows created before processed_until."""
+    metric = models.CharField(max_length=32, unique=True)
+    processed_until = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.metric} until {self.processed_until}"
+
+
+class RequestProfile(models.Model):
+    """One request run under the opt-in profiler (see api/profiling.py)."""
+    request_id = models.CharField(max_length=64, unique=True)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=500)
+    route = models.CharField(max_length=200, blank=True, default='')
+    status_code = models.PositiveSmallIntegerField()
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='request_profiles')
+    duration_ms = models.FloatField()
+    sql_count = models.PositiveIntegerField(default=0)
+    sql_ms = models.FloatField(default=0)
+    cypher_count = models.PositiveIntegerField(default=0)
+    cypher_ms = models.FloatField(default=0)
+    # Stack samples as [stack, count] pairs (frames root first, ';'-joined), most frequent first
+    samples = models.PositiveIntegerField(default=0)
+    stacks = models.JSONField(default=list)
+    # [{'sql': ..., 'ms': ...}] and [{'query': ..., 'ms': ...}] in execution order
+    sql = models.JSONField(default=list)
+    cypher = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
+
+
+# Fields of a space that appear in its summary prompt
+SUMMARY_SPACE_FIELDS = {'title', 'description', 'creator', 'country', 'city'}
+
+
+def bump_content_version(space_ids=None, node_ids=None):
+    """Mark the content of the given spaces (or the spaces of the given nodes) as changed."""
+    spaces = Space.objects.none()
+    if space_ids:
+        spaces = Space.objects.filter(pk__in=space_ids)
+    elif node_ids:
+        spaces = Space.objects.filter(pk__in=Node.objects.filter(pk__in=node_ids).values('space_id'))
+    spaces.update(content_version=F('content_version') + 1)
+
+
+@receiver(post_save, sender=Node)
+@receiver(post_delete, sender=Node)
+@receiver(post_save, sender=Discussion)
+@receiver(post_delete, sender=Discussion)
+def space_content_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_content_version(space_ids=[instance.space_id])
+
+
+@receiver(post_save, sender=Edge)
+@receiver(post_delete, sender=Edge)
+def edge_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_content_version(node_ids=[instance.source_id])
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+def property_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_content_version(node_ids=[instance.node_id])
+
+
+@receiver(post_save, sender=Space)
+def space_details_changed(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if not (created or raw) and SUMMARY_SPACE_FIELDS.intersection(update_fields or SUMMARY_SPACE_FIELDS):
+        bump_content_version(space_ids=[instance.pk])
+
+
+@receiver(m2m_changed, sender=Space.collaborators.through)
+@receiver(m2m_changed, sender=Space.tags.through)
+def space_members_changed(sender, instance, action, reverse, pk_set=None, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # user.joined_spaces.add(space) / tag.space_set.remove(space)
+        if pk_set:
+            bump_content_version(space_ids=pk_set)
+    else:
+        bump_content_version(space_ids=[instance.pk])
+
+
+# Map cluster tiles (see api/geo.py)
+
+def _map_scope(instance):
+    return f'nodes:{instance.space_id}' if isinstance(instance, Node) else 'spaces'
+
+
+@receiver(post_save, sender=Space)
+@receiver(post_save, sender=Node)
+def map_location_changed(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_saved_map_state', (None, None))
+    current = (instance.geohash, instance.is_archived)
+    if created or previous != current:
+        invalidate_map_tiles(_map_scope(instance), [previous[0], current[0]])
+    instance._saved_map_state = current
+
+
+@receiver(post_delete, sender=Space)
+@receiver(post_delete, sender=Node)
+def map_location_deleted(sender, instance, **kwargs):
+    invalidate_map_tiles(_map_scope(instance), [instance.geohash])
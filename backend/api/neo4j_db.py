@@ -1,7 +1,11 @@
+from contextlib import contextmanager
 from neo4j import GraphDatabase
 from neo4j.exceptions import AuthError, ServiceUnavailable
 from django.conf import settings
 import logging
+import time
+
+from . import metrics, profiling
 
 logger = logging.getLogger(__name__)
 
@@ -27,6 +31,27 @@ class Neo4jConnection:
                 raise
         return cls._driver
 
+    @classmethod
+    @contextmanager
+    def session(cls, operation):
+        """
+        A driver session whose use is timed and counted under ``operation``
+        in the metrics, errors included (see api/metrics.py). Its queries are
+        recorded when the request is being profiled (see api/profiling.py).
+        """
+        started = time.perf_counter()
+        try:
+            with cls.get_driver().session() as session:
+                profile = profiling.active_profile()
+                yield session if profile is None else profiling.CypherRecorder(session, profile)
+        except Exception:
+            metrics.NEO4J_ERRORS.inc(operation=operation)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.NEO4J_LATENCY.observe(elapsed, operation=operation)
+            metrics.record_dependency('neo4j', elapsed)
+
     @classmethod
     def close(cls):
         if cls._driver:
@@ -56,8 +81,7 @@ class Neo4jConnection:
         """
         
         try:
-            driver = Neo4jConnection.get_driver()
-            with driver.session() as session:
+            with Neo4jConnection.session('create_node') as session:
                 session.run(query, space_id=space_id, properties=properties)
         except Exception as e:
             logger.error(f"Failed to create node in Neo4j: {e}")
@@ -87,8 +111,7 @@ class Neo4jConnection:
         """
         
         try:
-            driver = Neo4jConnection.get_driver()
-            with driver.session() as session:
+            with Neo4jConnection.session('create_edge') as session:
                 session.run(query, source_id=source_node_id, target_id=target_node_id, properties=properties)
         except Exception as e:
             logger.error(f"Failed to create edge in Neo4j: {e}")
@@ -104,8 +127,7 @@ class Neo4jConnection:
         RETURN n
         """
         try:
-            driver = Neo4jConnection.get_driver()
-            with driver.session() as session:
+            with Neo4jConnection.session('update_node') as session:
                 session.run(query, node_id=node_id, properties=properties)
         except Exception as e:
             logger.error(f"Failed to update node in Neo4j: {e}")
@@ -122,8 +144,7 @@ class Neo4jConnection:
         RETURN r
         """
         try:
-            driver = Neo4jConnection.get_driver()
-            with driver.session() as session:
+            with Neo4jConnection.session('update_edge') as session:
                 session.run(query, edge_id=edge_id, properties=properties)
         except Exception as e:
             logger.error(f"Failed to update edge in Neo4j: {e}")
@@ -138,8 +159,7 @@ class Neo4jConnection:
         DETACH DELETE n
         """
         try:
-            driver = Neo4jConnection.get_driver()
-            with driver.session() as session:
+            with Neo4jConnection.session('delete_node') as session:
                 session.run(query, node_id=node_id)
         except Exception as e:
             logger.error(f"Failed to delete node in Neo4j: {e}")
@@ -155,8 +175,7 @@ class Neo4jConnection:
         DELETE r
         """
         try:
-            driver = Neo4jConnection.get_driver()
-            with driver.session() as session:
+            with Neo4jConnection.session('delete_edge') as session:
                 session.run(query, edge_id=edge_id)
         except Exception as e:
             logger.error(f"Failed to delete edge in Neo4j: {e}")
@@ -172,8 +191,7 @@ class Neo4jConnection:
         RETURN n
         """
         try:
-            driver = Neo4jConnection.get_driver()
-            with driver.session() as session:
+            with Neo4jConnection.session('delete_node_property') as session:
                 session.run(query, node_id=node_id)
         except Exception as e:
             logger.error(f"Failed to delete node property in Neo4j: {e}")
@@ -208,13 +226,13 @@ class Neo4jConnection:
         property_node_ids = []
         if property_queries:
             from .models import Property, Node as DjangoNode
-            logger.info(f"Searching for nodes with properties: {property_queries}")
+            logger.debug(f"Searching for nodes with properties: {property_queries}")
             property_matches = Property.objects.filter(
                 node__space_id=space_id,
                 property_id__in=property_queries if isinstance(property_queries, list) else [property_queries]
             ).values_list('node__id', flat=True).distinct()
             property_node_ids = list(property_matches)
-            logger.info(f"Found {len(property_node_ids)} nodes with these properties: {property_node_ids}")
+            logger.debug(f"Found {len(property_node_ids)} nodes with these properties: {property_node_ids}")
         
         # If property_values are provided, get matching node IDs from Postgres
         property_value_node_ids = []
@@ -223,7 +241,7 @@ class Neo4jConnection:
             # Property value IDs are strings like "P569:1893-04-04T00:00:00Z"
             values_list = property_values if isinstance(property_values, list) else [property_values]
             
-            logger.info(f"Searching for nodes with property values: {values_list}")
+            logger.debug(f"Searching for nodes with property values: {values_list}")
             
             # Query using the value_text field which contains the full value string
             property_value_matches = Property.objects.filter(
@@ -231,7 +249,7 @@ class Neo4jConnection:
                 value_text__in=values_list
             ).values_list('node__id', flat=True).distinct()
             property_value_node_ids = list(property_value_matches)
-            logger.info(f"Found {len(property_value_node_ids)} nodes matching property values: {property_value_node_ids}")
+            logger.debug(f"Found {len(property_value_node_ids)} nodes matching property values: {property_value_node_ids}")
         
         # Convert queries to lists and parse before building query
         if node_queries is None:
@@ -263,7 +281,7 @@ class Neo4jConnection:
         edge_depth = max(0, depth - 1)
         node_depth = depth
         
-        logger.info(f"Search type: edge={has_edge_search}, node={has_node_search}, node_depth={node_depth}, edge_depth={edge_depth}")
+        logger.debug(f"Search type: edge={has_edge_search}, node={has_node_search}, node_depth={node_depth}, edge_depth={edge_depth}")
         
         query = """
         // 1. Find matching nodes (by ID or text search)
@@ -327,11 +345,10 @@ class Neo4jConnection:
         
         result_data = {'nodes': [], 'edges': []}
         
-        logger.info(f"Graph search executing with space_id={space_id}, node_ids={node_ids}, node_text_queries={node_text_queries}, edge_queries={edge_queries}, property_node_ids={property_node_ids}, property_value_node_ids={property_value_node_ids}, node_depth={node_depth}, edge_depth={edge_depth}")
+        logger.debug(f"Graph search executing with space_id={space_id}, node_ids={node_ids}, node_text_queries={node_text_queries}, edge_queries={edge_queries}, property_node_ids={property_node_ids}, property_value_node_ids={property_value_node_ids}, node_depth={node_depth}, edge_depth={edge_depth}")
         
         try:
-            driver = Neo4jConnection.get_driver()
-            with driver.session() as session:
+            with Neo4jConnection.session('search_graph') as session:
                 result = session.run(query, 
                                     space_id=space_id, 
                                     node_ids=node_ids,  # Numeric node IDs
@@ -350,9 +367,9 @@ class Neo4jConnection:
                     # Create a map of node_id -> depth
                     node_depth_map = {item['id']: item['depth'] for item in node_depths_list}
                     
-                    logger.info(f"Graph search found {len(nodes)} nodes and {len(edges)} edges")
-                    logger.info(f"Property node IDs (has property): {property_node_ids}")
-                    logger.info(f"Property value node IDs (has property value): {property_value_node_ids}")
+                    logger.debug(f"Graph search found {len(nodes)} nodes and {len(edges)} edges")
+                    logger.debug(f"Property node IDs (has property): {property_node_ids}")
+                    logger.debug(f"Property value node IDs (has property value): {property_value_node_ids}")
                     
                     # Fetch properties for all nodes in the result
                     from .models import Property
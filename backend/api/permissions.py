@@ -1,6 +1,6 @@
 from rest_framework import permissions
 from rest_framework.exceptions import PermissionDenied
-from .models import Profile, SpaceModerator
+from .authorization import get_authz
 
 class IsCollaboratorOrReadOnly(permissions.BasePermission):
     """
@@ -24,7 +24,7 @@ class IsCollaboratorOrReadOnly(permissions.BasePermission):
         if request.user.is_staff or request.user.is_superuser:
             return True
             
-        return request.user in obj.collaborators.all() or request.user == obj.creator
+        return request.user == obj.creator or get_authz(request).is_collaborator(obj)
 
 class IsSpaceCollaborator(permissions.BasePermission):
     """
@@ -34,13 +34,8 @@ class IsSpaceCollaborator(permissions.BasePermission):
     def has_permission(self, request, view):
         space_pk = view.kwargs.get('space_pk')
         if space_pk:
-            from .models import Space
-            try:
-                space = Space.objects.get(pk=space_pk)
-                return request.user in space.collaborators.all()
-            except Space.DoesNotExist:
-                return False
-        return True 
+            return get_authz(request).is_collaborator(space_pk)
+        return True
 
 class IsProfileOwner(permissions.BasePermission):
     """
@@ -59,26 +54,14 @@ class IsAdmin(permissions.BasePermission):
     def has_permission(self, request, view):
         if not request.user.is_authenticated:
             return False
-        try:
-            profile = request.user.profile
-            return profile.is_admin()
-        except Profile.DoesNotExist:
-            return False
+        return get_authz(request).is_admin()
 
 class IsAdminOrModerator(permissions.BasePermission):
     def has_permission(self, request, view):
         if not request.user.is_authenticated:
             return False
-        try:
-            profile = request.user.profile
-            if profile.is_admin():
-                return True
-            if profile.is_moderator():
-                return True
-            has_moderator_assignments = SpaceModerator.objects.filter(user=request.user).exists()
-            return has_moderator_assignments
-        except Profile.DoesNotExist:
-            return False
+        authz = get_authz(request)
+        return authz.is_admin() or authz.is_moderator() or authz.has_moderator_assignments()
 
 class IsSpaceModerator(permissions.BasePermission):
     """
@@ -91,17 +74,7 @@ class IsSpaceModerator(permissions.BasePermission):
         space_pk = view.kwargs.get('space_pk') or view.kwargs.get('pk')
         if not space_pk:
             return False
-            
-        try:
-            profile = request.user.profile
-            if profile.is_admin():
-                return True
-                
-            from .models import Space
-            space = Space.objects.get(pk=space_pk)
-            return profile.can_moderate_space(space)
-        except (Profile.DoesNotExist, Space.DoesNotExist):
-            return False
+        return get_authz(request).can_moderate(space_pk)
 
 class CanChangeUserType(permissions.BasePermission):
     """
@@ -113,21 +86,10 @@ class CanChangeUserType(permissions.BasePermission):
         if not request.user.is_authenticated:
             return False
         
-        try:
-            profile = request.user.profile
-            # Admins can always change user types
-            if profile.is_admin():
-                return True
-            
-            # Moderators can only change user types in specific contexts
-            if profile.is_moderator():
-                # This permission will be further checked in the view
-                return True
-                
-        except Profile.DoesNotExist:
-            pass
-        
-        return False
+        authz = get_authz(request)
+        # Admins can always change user types; moderators only in specific
+        # contexts, which the view checks further
+        return authz.is_admin() or authz.is_moderator()
 
 
 class IsNotArchivedUser(permissions.BasePermission):
@@ -139,11 +101,4 @@ class IsNotArchivedUser(permissions.BasePermission):
     def has_permission(self, request, view):
         if not request.user.is_authenticated:
             return True
-        
-        try:
-            profile = request.user.profile
-            if profile.is_archived:
-                return False
-            return True
-        except Profile.DoesNotExist:
-            return True
\ No newline at end of file
+        return not get_authz(request).is_archived()
\ No newline at end of file
@@ -0,0 +1,189 @@
+"""
+Opt-in profiling of single requests, for admins.
+
+A request sent with ``X-Profile: 1`` (or ``?_profile=1``) by an admin runs
+under a sampling profiler: a background thread records the Python stack of
+the request's thread every PROFILER_INTERVAL_MS. The SQL statements and Cypher
+queries it runs are recorded with their timings, and the whole profile is
+stored as a RequestProfile keyed by the request id, which is returned in the
+``X-Profile-Id`` header. ``GET /api/request-profiles/`` lists recent profiles
+slower than PROFILER_SLOW_MS.
+
+Without the flag the middleware does nothing but look at one header and one
+query parameter, and Neo4jConnection.session only checks ``active_profile()``.
+"""
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+
+from django.conf import settings
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .authorization import AuthorizationContext
+from .models import RequestProfile
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_PARAM = '_profile'
+DEFAULT_INTERVAL_MS = 5
+DEFAULT_SLOW_MS = 500
+DEFAULT_KEEP = 500
+# Statements and stacks kept per profile
+MAX_STATEMENTS = 500
+MAX_STACKS = 200
+MAX_STACK_DEPTH = 64
+
+_active = ContextVar('active_profile', default=None)
+
+
+def active_profile():
+    """The Profile being recorded for the current request, or None."""
+    return _active.get()
+
+
+def start_profile(request_id):
+    profile = Profile(request_id)
+    token = _active.set(profile)
+    profile.sampler.start()
+    return profile, token
+
+
+def stop_profile(profile, token):
+    profile.sampler.stop()
+    _active.reset(token)
+
+
+_short_paths = {}
+
+
+def _short_path(filename):
+    """The file's path relative to the project or the sys.path entry it was imported from."""
+    short = _short_paths.get(filename)
+    if short is None:
+        short = filename
+        for root in (str(settings.BASE_DIR),) + tuple(sys.path):
+            if root and filename.startswith(root):
+                short = filename[len(root):].lstrip('/')
+                break
+        _short_paths[filename] = short
+    return short
+
+
+def _frame_label(frame):
+    return f'{_short_path(frame.f_code.co_filename)}:{frame.f_code.co_name}:{frame.f_lineno}'
+
+
+class SamplingProfiler:
+    """Samples the stack of one thread from a background thread; stacks are counted root first, ';'-joined."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None and len(labels) < MAX_STACK_DEPTH:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(labels))] += 1
+            self.samples += 1
+
+
+class Profile:
+    def __init__(self, request_id):
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self.sql = []
+        self.cypher = []
+        interval = getattr(settings, 'PROFILER_INTERVAL_MS', DEFAULT_INTERVAL_MS) / 1000
+        self.sampler = SamplingProfiler(threading.get_ident(), interval)
+
+    def record_sql(self, sql, seconds):
+        self.sql.append({'sql': sql, 'ms': round(seconds * 1000, 3)})
+
+    def record_cypher(self, query, seconds):
+        self.cypher.append({'query': ' '.join(query.split()), 'ms': round(seconds * 1000, 3)})
+
+    def save(self, request, response, user):
+        duration_ms = (time.perf_counter() - self.started) * 1000
+        match = getattr(request, 'resolver_match', None)
+        RequestProfile.objects.create(
+            request_id=self.request_id,
+            method=request.method,
+            path=request.get_full_path()[:500],
+            route=(match.view_name if match else '')[:200],
+            status_code=response.status_code,
+            user=user if user.is_authenticated else None,
+            duration_ms=duration_ms,
+            sql_count=len(self.sql),
+            sql_ms=sum(statement['ms'] for statement in self.sql),
+            cypher_count=len(self.cypher),
+            cypher_ms=sum(query['ms'] for query in self.cypher),
+            samples=self.sampler.samples,
+            stacks=[[stack, count] for stack, count in self.sampler.stacks.most_common(MAX_STACKS)],
+            sql=self.sql[:MAX_STATEMENTS],
+            cypher=self.cypher[:MAX_STATEMENTS],
+        )
+        keep = getattr(settings, 'PROFILER_KEEP', DEFAULT_KEEP)
+        stale = RequestProfile.objects.order_by('-created_at', '-id').values_list('id', flat=True)[keep:keep + 100]
+        RequestProfile.objects.filter(id__in=list(stale)).delete()
+
+
+class CypherRecorder:
+    """Neo4j session wrapper that records each ``run`` in the active profile."""
+
+    def __init__(self, session, profile):
+        self._session = session
+        self._profile = profile
+
+    def run(self, query, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._session.run(query, *args, **kwargs)
+        finally:
+            self._profile.record_cypher(query, time.perf_counter() - started)
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+def new_request_id(request):
+    """The client's X-Request-ID when it is usable as a profile key, otherwise a fresh one."""
+    request_id = request.headers.get('X-Request-ID', '')[:64]
+    if request_id and not RequestProfile.objects.filter(request_id=request_id).exists():
+        return request_id
+    return uuid.uuid4().hex
+
+
+def wants_profile(request):
+    return request.headers.get(PROFILE_HEADER) == '1' or request.GET.get(PROFILE_PARAM) == '1'
+
+
+def profiling_user(request):
+    """The user the API will see for this request, if they may profile it; otherwise None."""
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = drf_request.user
+    except APIException:
+        return None
+    # Same rule as the IsAdmin permission guarding the stored profiles
+    return user if AuthorizationContext(user).is_admin() else None
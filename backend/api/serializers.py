@@ -1,10 +1,38 @@
 from django.contrib.auth.models import User
-from .models import Profile, Space, Tag, Discussion, DiscussionReaction, Node, Report, Activity, Archive
+from .models import Profile, Space, Tag, Discussion, DiscussionReaction, Node, Report, Activity, Archive, RequestProfile
 from .reporting import ALLOWED_REASON_CODES
+from .geocoding import schedule_profile_geocode, schedule_space_geocode
 from datetime import date
 from rest_framework import serializers
+from . import metrics
 
-class RegisterSerializer(serializers.ModelSerializer):
+
+class TimedListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        with metrics.phase('serialize'):
+            return super().data
+
+
+class TimedModelSerializer(serializers.ModelSerializer):
+    """
+    ModelSerializer whose ``.data`` (to_representation, queries included)
+    counts as the request's 'serialize' phase in the Server-Timing header,
+    with ``many=True`` too (see api/middleware.py).
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        meta = cls.__dict__.get('Meta')
+        if meta is not None and not hasattr(meta, 'list_serializer_class'):
+            meta.list_serializer_class = TimedListSerializer
+
+    @property
+    def data(self):
+        with metrics.phase('serialize'):
+            return super().data
+
+class RegisterSerializer(TimedModelSerializer):
     profession = serializers.CharField(write_only=True, required=True)
     dob = serializers.DateField(write_only=True, required=True)
     latitude = serializers.FloatField(write_only=True, required=False, allow_null=True)
@@ -54,14 +82,14 @@ class RegisterSerializer(serializers.ModelSerializer):
         user.profile.save()
         return user
     
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedModelSerializer):
     is_staff = serializers.BooleanField(read_only=True)
     is_superuser = serializers.BooleanField(read_only=True)
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'is_staff', 'is_superuser']
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(TimedModelSerializer):
     user = UserSerializer(read_only=True)
     user_type_display = serializers.CharField(source='get_user_type_display', read_only=True)
     joined_spaces = serializers.SerializerMethodField()
@@ -69,47 +97,6 @@ class ProfileSerializer(serializers.ModelSerializer):
     moderated_spaces = serializers.SerializerMethodField()
     can_access_admin_dashboard = serializers.SerializerMethodField()
 
-    def geocode_location(self, country, city):
-        """Convert location text to coordinates using Nominatim API"""
-        import requests
-        import time
-        
-        # Build address string
-        address_parts = []
-        if city:
-            address_parts.append(city)
-        if country:
-            address_parts.append(country)
-            
-        if not address_parts:
-            return None, None
-            
-        address = ", ".join(address_parts)
-        
-        try:
-            # Use Nominatim API for geocoding
-            url = "https://nominatim.openstreetmap.org/search"
-            params = {
-                'q': address,
-                'format': 'json',
-                'limit': 1
-            }
-            headers = {
-                'User-Agent': 'ConnectTheDots/1.0'
-            }
-            
-            response = requests.get(url, params=params, headers=headers, timeout=10)
-            time.sleep(1)  # Be respectful to the API
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data:
-                    return float(data[0]['lat']), float(data[0]['lon'])
-        except Exception as e:
-            print(f"Profile geocoding error: {e}")
-            
-        return None, None
-
     class Meta:
         model = Profile
         fields = ['user', 'user_type', 'user_type_display', 'profession', 'bio', 'dob', 
@@ -174,25 +161,16 @@ class ProfileSerializer(serializers.ModelSerializer):
         location_changed = any(field in validated_data for field in location_fields)
         coordinates_provided = 'latitude' in validated_data and 'longitude' in validated_data
         location_name_provided = 'location_name' in validated_data
+        geocode = False
         
         # Scenario 1: Country/City changed and coordinates NOT manually provided
         if location_changed and not coordinates_provided:
             country = validated_data.get('country', instance.country)
             city = validated_data.get('city', instance.city)
             
-            if country or city:  # Geocode if we have location info
-                lat, lon = self.geocode_location(country, city)
-                if lat and lon:
-                    validated_data['latitude'] = lat
-                    validated_data['longitude'] = lon
-                    # Auto-generate location_name if not manually provided
-                    if not location_name_provided:
-                        if country and city:
-                            validated_data['location_name'] = f"{city}, {country}"
-                        elif city:
-                            validated_data['location_name'] = city
-                        elif country:
-                            validated_data['location_name'] = country
+            if country or city:
+                # Coordinates (and location_name unless provided) are filled in by geocoding
+                geocode = True
             else:
                 # Clear coordinates if no location info provided
                 validated_data['latitude'] = None
@@ -215,14 +193,17 @@ class ProfileSerializer(serializers.ModelSerializer):
         # Scenario 3: Only location_name provided - keep existing coordinates and country/city
         # (This is handled automatically by the parent update method)
         
-        return super().update(instance, validated_data)
+        instance = super().update(instance, validated_data)
+        if geocode:
+            schedule_profile_geocode(instance, set_location_name=not location_name_provided)
+        return instance
     
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedModelSerializer):
     class Meta:
         model = Tag
         fields = ['id', 'name', 'wikidata_id', 'wikidata_label'] 
 
-class SpaceSerializer(serializers.ModelSerializer):
+class SpaceSerializer(TimedModelSerializer):
     creator_username = serializers.ReadOnlyField(source='creator.username')
     tags = TagSerializer(many=True, read_only=True)
     tag_ids = serializers.PrimaryKeyRelatedField(
@@ -233,51 +214,6 @@ class SpaceSerializer(serializers.ModelSerializer):
     )
     collaborators = serializers.SerializerMethodField()
     
-    def geocode_location(self, country, city, district=None, street=None):
-        """Convert location text to coordinates using Nominatim API"""
-        import requests
-        import time
-        
-        # Build address string
-        address_parts = []
-        if street:
-            address_parts.append(street)
-        if district:
-            address_parts.append(district)
-        if city:
-            address_parts.append(city)
-        if country:
-            address_parts.append(country)
-            
-        if not address_parts:
-            return None, None
-            
-        address = ", ".join(address_parts)
-        
-        try:
-            # Use Nominatim API for geocoding
-            url = "https://nominatim.openstreetmap.org/search"
-            params = {
-                'q': address,
-                'format': 'json',
-                'limit': 1
-            }
-            headers = {
-                'User-Agent': 'ConnectTheDots/1.0'
-            }
-            
-            response = requests.get(url, params=params, headers=headers, timeout=10)
-            time.sleep(1)  # Be respectful to the API
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data:
-                    return float(data[0]['lat']), float(data[0]['lon'])
-        except Exception as e:
-            print(f"Geocoding error: {e}")
-            
-        return None, None
-    
     class Meta:
         model = Space
         fields = [
@@ -293,25 +229,16 @@ class SpaceSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         tag_ids = validated_data.pop('tag_ids', [])
         
-        # Geocode location if coordinates are not provided
-        if not validated_data.get('latitude') or not validated_data.get('longitude'):
-            country = validated_data.get('country')
-            city = validated_data.get('city')
-            district = validated_data.get('district')
-            street = validated_data.get('street')
-            
-            if country or city:  # Only geocode if we have at least country or city
-                lat, lon = self.geocode_location(country, city, district, street)
-                if lat and lon:
-                    validated_data['latitude'] = lat
-                    validated_data['longitude'] = lon
-        
         space = Space.objects.create(**validated_data)
         
         space.collaborators.add(validated_data['creator'])
         
         for tag in tag_ids:
             space.tags.add(tag)
+        
+        # Geocode location if coordinates are not provided
+        if not validated_data.get('latitude') or not validated_data.get('longitude'):
+            schedule_space_geocode(space)
             
         return space
     
@@ -322,21 +249,12 @@ class SpaceSerializer(serializers.ModelSerializer):
         location_changed = any(field in validated_data for field in location_fields)
         coordinates_provided = 'latitude' in validated_data and 'longitude' in validated_data
         
+        instance = super().update(instance, validated_data)
         if location_changed and not coordinates_provided:
-            country = validated_data.get('country', instance.country)
-            city = validated_data.get('city', instance.city)
-            district = validated_data.get('district', instance.district)
-            street = validated_data.get('street', instance.street)
-            
-            if country or city:  # Only geocode if we have at least country or city
-                lat, lon = self.geocode_location(country, city, district, street)
-                if lat and lon:
-                    validated_data['latitude'] = lat
-                    validated_data['longitude'] = lon
-        
-        return super().update(instance, validated_data)
+            schedule_space_geocode(instance)
+        return instance
 
-class NodeSerializer(serializers.ModelSerializer):
+class NodeSerializer(TimedModelSerializer):
     created_by_username = serializers.ReadOnlyField(source='created_by.username')
     connection_count = serializers.SerializerMethodField()
     instance_type = serializers.SerializerMethodField()
@@ -432,7 +350,7 @@ class NodeSerializer(serializers.ModelSerializer):
         
         return None
 
-class DiscussionSerializer(serializers.ModelSerializer):
+class DiscussionSerializer(TimedModelSerializer):
     username = serializers.ReadOnlyField(source='user.username')
     upvotes = serializers.SerializerMethodField()
     downvotes = serializers.SerializerMethodField()
@@ -459,7 +377,7 @@ class DiscussionSerializer(serializers.ModelSerializer):
         return 'up' if reaction.value == DiscussionReaction.UPVOTE else 'down'
 
 
-class ReportSerializer(serializers.ModelSerializer):
+class ReportSerializer(TimedModelSerializer):
     reporter_username = serializers.ReadOnlyField(source='reporter.username')
     entity_report_count = serializers.SerializerMethodField()
     entity_is_reported = serializers.SerializerMethodField()
@@ -574,7 +492,7 @@ class ReportSerializer(serializers.ModelSerializer):
         target = self._get_target_entity(obj)
         return getattr(target, 'is_reported', None) if target else None
     
-class ActivityStreamSerializer(serializers.ModelSerializer):
+class ActivityStreamSerializer(TimedModelSerializer):
     """
     Serialize Activity rows into ActivityStreams 2.0 compatible entries.
     """
@@ -634,7 +552,7 @@ class ActivityStreamSerializer(serializers.ModelSerializer):
         return self._format_reference(obj.target)
 
 
-class ArchiveSerializer(serializers.ModelSerializer):
+class ArchiveSerializer(TimedModelSerializer):
     archived_by_username = serializers.ReadOnlyField(source='archived_by.username')
     name = serializers.SerializerMethodField()
     
@@ -664,3 +582,19 @@ class ArchiveSerializer(serializers.ModelSerializer):
             except Profile.DoesNotExist:
                 return f"User #{obj.content_id} (deleted)"
         return "Unknown"
+
+
+class RequestProfileSummarySerializer(TimedModelSerializer):
+    username = serializers.ReadOnlyField(source='user.username', default=None)
+
+    class Meta:
+        model = RequestProfile
+        fields = [
+            'request_id', 'method', 'path', 'route', 'status_code', 'username', 'duration_ms',
+            'sql_count', 'sql_ms', 'cypher_count', 'cypher_ms', 'samples', 'created_at',
+        ]
+
+
+class RequestProfileSerializer(RequestProfileSummarySerializer):
+    class Meta(RequestProfileSummarySerializer.Meta):
+        fields = RequestProfileSummarySerializer.Meta.fields + ['stacks', 'sql', 'cypher']
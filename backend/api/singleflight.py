@@ -0,0 +1,166 @@
+"""
+Coalesce concurrent calls for the same key into a single execution.
+
+``SingleFlight`` works within a process. ``SharedFlight`` also coordinates
+worker processes: the in-process leader takes a short lock (a PostgreSQL
+advisory lock, or ``cache.add`` on other databases) before calling ``fn``.
+A worker that finds the lock taken waits for it, then asks ``lookup()``
+whether the holder's result is now cached and uses it instead of calling
+``fn`` itself, so ``lookup`` must read something every worker sees (a
+database table), not the per-process cache. Each flight counts how many calls
+went upstream and how many were collapsed in ``singleflight_calls_total``
+(see api/metrics.py, ``flight_stats`` and ``manage.py singleflight_stats``).
+"""
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Returned by SharedFlight lookups when nothing is cached yet
+MISS = object()
+
+FLIGHTS = {}
+FLIGHT_OUTCOMES = ('leader', 'coalesced', 'waited')
+LOCK_KEY = 'singleflight_lock:{key}'
+LOCK_POLL_SECONDS = 0.05
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """
+        Run ``fn()`` unless a call for ``key`` is already in flight, in which
+        case wait for it and share its result (or exception).
+
+        Returns ``(result, shared)`` where ``shared`` is True for callers that
+        did not run ``fn`` themselves.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self, key):
+        return key in self._calls
+
+
+def _lock_id(key):
+    """Signed 64-bit advisory lock id for a key."""
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big', signed=True)
+
+
+def _try_lock(key, timeout):
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_try_advisory_lock(%s)', [_lock_id(key)])
+            return cursor.fetchone()[0]
+    return cache.add(LOCK_KEY.format(key=key), 1, timeout)
+
+
+def _unlock(key):
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(%s)', [_lock_id(key)])
+    else:
+        cache.delete(LOCK_KEY.format(key=key))
+
+
+class SharedFlight(SingleFlight):
+    """A SingleFlight that also collapses identical calls made by other workers."""
+
+    def __init__(self, name):
+        super().__init__()
+        self.name = name
+        FLIGHTS[name] = self
+
+    def do(self, key, fn, lookup=None):
+        """
+        Like SingleFlight.do. ``lookup()`` returns the cached result for
+        ``key`` or MISS; without it only calls in this process are collapsed.
+        """
+        (result, waited), shared = super().do(key, lambda: self._run_locked(key, fn, lookup))
+        self._record('coalesced' if shared else 'waited' if waited else 'leader')
+        return result, shared or waited
+
+    def _run_locked(self, key, fn, lookup):
+        """(result, True if another worker's result was used)."""
+        if lookup is None:
+            return fn(), False
+        timeout = getattr(settings, 'SINGLEFLIGHT_LOCK_TIMEOUT', 10)
+        deadline = time.monotonic() + timeout
+        waited = False
+        try:
+            while not _try_lock(key, timeout):
+                waited = True
+                if time.monotonic() >= deadline:
+                    # The holder is stuck or slow; don't keep this request waiting on it
+                    return fn(), False
+                time.sleep(LOCK_POLL_SECONDS)
+        except DatabaseError as e:
+            logger.warning("Single-flight lock for %s unavailable: %s", key, e)
+            return fn(), False
+
+        try:
+            if waited:
+                result = lookup()
+                if result is not MISS:
+                    return result, True
+            return fn(), False
+        finally:
+            try:
+                _unlock(key)
+            except DatabaseError as e:
+                logger.warning("Failed to release single-flight lock for %s: %s", key, e)
+
+    def _record(self, outcome):
+        metrics.SINGLEFLIGHT_CALLS.inc(flight=self.name, outcome=outcome)
+
+
+def flight_stats(name):
+    """
+    Calls per outcome for a SharedFlight, over every worker when METRICS_DIR
+    is set, and the share that was collapsed.
+    """
+    values = metrics.REGISTRY.collect()[metrics.SINGLEFLIGHT_CALLS.name]
+    stats = {outcome: values.get((name, outcome), 0) for outcome in FLIGHT_OUTCOMES}
+    total = sum(stats.values())
+    stats['total'] = total
+    stats['collapsed'] = stats['coalesced'] + stats['waited']
+    stats['collapse_rate'] = stats['collapsed'] / total if total else 0.0
+    return stats
@@ -0,0 +1,291 @@
+"""
+AI summaries of spaces, generated in the background and cached per content version.
+
+``Space.content_version`` is bumped whenever anything that goes into the
+prompt changes (see models.bump_content_version). ``request_summary`` returns
+the SpaceSummary for the current version, creating it and queueing the
+``summarize_space`` job when there is none yet, so repeated requests for an
+unchanged space never reach the model. The prompt is trimmed to
+SPACE_SUMMARY_PROMPT_TOKENS by dropping the least connected nodes and edges.
+The job streams the answer from the configured provider (api/llm.py) into
+the SpaceSummary row, and ``summary_events`` relays it to clients as
+server-sent events while it is being written. A stream holds a (sync)
+gunicorn worker, so it lasts at most STREAM_WINDOW_SECONDS and then tells
+the client to reconnect from the text it has, freeing the worker between
+windows.
+"""
+import json
+import logging
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Func, IntegerField, OuterRef, Prefetch, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .jobs import enqueue, job
+from .llm import estimate_tokens, get_provider
+from .models import Discussion, Edge, Node, Property, Space, SpaceSummary
+
+logger = logging.getLogger(__name__)
+
+PROMPT_NODES = 30
+PROMPT_EDGES = 20
+PROMPT_DISCUSSIONS = 5
+PROMPT_PROPERTIES_PER_NODE = 5
+DEFAULT_PROMPT_TOKENS = 4000
+
+# How often the job writes partial output, and how often streams look for it
+PARTIAL_FLUSH_SECONDS = 0.5
+STREAM_POLL_SECONDS = 0.5
+# Well under gunicorn's 30 s worker timeout
+STREAM_WINDOW_SECONDS = 5
+
+
+def _count(queryset):
+    """Correlated COUNT(*) subquery, for annotating several counts in one query."""
+    counted = queryset.order_by().annotate(count=Func(F('pk'), function='COUNT')).values('count')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), Value(0))
+
+
+def _active_edges():
+    return Edge.objects.filter(source__is_archived=False, target__is_archived=False)
+
+
+def space_counts(space_id):
+    """Node, edge, discussion and collaborator counts and the content version, in one query."""
+    return Space.objects.filter(pk=space_id).annotate(
+        node_count=_count(Node.objects.filter(space=OuterRef('pk'), is_archived=False)),
+        edge_count=_count(_active_edges().filter(source__space=OuterRef('pk'))),
+        discussion_count=_count(Discussion.objects.filter(space=OuterRef('pk'))),
+        collaborator_count=_count(Space.collaborators.through.objects.filter(space_id=OuterRef('pk'))),
+    ).values('node_count', 'edge_count', 'discussion_count', 'collaborator_count', 'content_version').get()
+
+
+def _degree(node_ref):
+    return _count(_active_edges().filter(Q(source=node_ref) | Q(target=node_ref)))
+
+
+def _render_prompt(space, counts, collaborators, tags, node_lines, edge_lines, discussions_section):
+    nodes_section = '\n'.join(node_lines) if node_lines else 'No nodes yet'
+    edges_section = '\n'.join(edge_lines) if edge_lines else 'No edges yet'
+    return f"""Analyze and summarize the following knowledge graph space:
+
+**Space Information:**
+- Title: {space.title}
+- Description: {space.description or 'No description'}
+- Creator: {space.creator.username}
+- Collaborators: {', '.join(collaborators) if collaborators else 'None'}
+- Tags: {', '.join(tags) if tags else 'None'}
+- Location: {space.city or 'Not specified'}, {space.country or 'Not specified'}
+
+**Graph Structure:**
+- Total Nodes: {counts['node_count']}
+- Total Edges: {counts['edge_count']}
+
+**Sample Nodes (most connected first):**
+{nodes_section}
+
+**Sample Connections:**
+{edges_section}
+
+**Recent Discussions:**
+{discussions_section}
+
+Please provide a comprehensive summary using markdown formatting:
+- Use **bold** for important concepts, entities, and key insights
+- Use ### for section headings
+- Use bullet points (-) for lists
+- Keep it organized and easy to scan
+- Make it engaging and informative
+
+Include these sections:
+### Overview
+Briefly describe the main theme and purpose of this knowledge graph (2-3 sentences with key terms in **bold**)
+
+### Key Entities & Relationships
+List the most important entities and their connections using **bold** for entity names
+
+### Insights & Patterns
+Highlight interesting patterns or notable findings with **bold** emphasis on key points
+
+### Activity & Collaboration
+Describe the collaboration level and discussion activity with important metrics in **bold**
+
+Keep the summary concise (2-3 paragraphs total) but well-formatted for easy reading."""
+
+
+def build_space_prompt(space, token_budget=None):
+    """
+    (prompt, metadata) for a space; metadata holds the counts shown next to
+    the summary. Nodes and edges are listed by degree (an edge by the sum of
+    its endpoints'); while the prompt is over ``token_budget`` the least
+    connected of them are dropped.
+    """
+    if token_budget is None:
+        token_budget = getattr(settings, 'SPACE_SUMMARY_PROMPT_TOKENS', DEFAULT_PROMPT_TOKENS)
+    counts = space_counts(space.pk)
+
+    top_nodes = list(
+        Node.objects.filter(space=space, is_archived=False)
+        .annotate(connections=_degree(OuterRef('pk')))
+        .order_by('-connections', 'id')
+        .prefetch_related(Prefetch('node_properties', queryset=Property.objects.order_by('id')))
+        [:PROMPT_NODES]
+    )
+    sample_edges = list(
+        _active_edges().filter(source__space=space)
+        .select_related('source', 'target')
+        .annotate(weight=_degree(OuterRef('source_id')) + _degree(OuterRef('target_id')))
+        .order_by('-weight', 'id')
+        [:PROMPT_EDGES]
+    )
+    discussions = Discussion.objects.filter(space=space).select_related('user').order_by('-created_at')[:PROMPT_DISCUSSIONS]
+    collaborators = list(space.collaborators.values_list('username', flat=True))
+    tags = list(space.tags.values_list('name', flat=True))
+
+    node_lines = []
+    for node in top_nodes:
+        connection_info = f"[{node.connections} connections]"
+        props = list(node.node_properties.all())[:PROMPT_PROPERTIES_PER_NODE]
+        if props:
+            props_text = ', '.join(
+                f"{p.property_label or p.property_id or 'Unknown'}: {p.value_text or p.value_id or 'N/A'}" for p in props
+            )
+            node_lines.append(f"- {node.label or 'Unlabeled'} ({node.wikidata_id or 'N/A'}) {connection_info}: {props_text}")
+        else:
+            node_lines.append(f"- {node.label or 'Unlabeled'} ({node.wikidata_id or 'N/A'}) {connection_info}: No properties")
+    edge_lines = [
+        f"- {e.source.label or 'Unknown'} → [{e.relation_property or 'connected to'}] → {e.target.label or 'Unknown'}"
+        for e in sample_edges
+    ]
+    discussions_section = '\n'.join(
+        f"- {d.user.username} ({d.created_at.strftime('%Y-%m-%d')}): {d.text[:200] if d.text else 'No text'}"
+        for d in discussions
+    ) or 'No discussions yet'
+
+    node_degrees = [node.connections for node in top_nodes]
+    # Edge weights count both endpoints; halve them to compare with node degrees
+    edge_degrees = [e.weight / 2 for e in sample_edges]
+
+    def render():
+        return _render_prompt(space, counts, collaborators, tags, node_lines, edge_lines, discussions_section)
+
+    prompt = render()
+    while estimate_tokens(prompt) > token_budget and (node_lines or edge_lines):
+        if edge_lines and (not node_lines or edge_degrees[-1] <= node_degrees[-1]):
+            edge_lines.pop()
+            edge_degrees.pop()
+        else:
+            node_lines.pop()
+            node_degrees.pop()
+        prompt = render()
+
+    metadata = {
+        'node_count': counts['node_count'],
+        'edge_count': counts['edge_count'],
+        'discussion_count': counts['discussion_count'],
+        'collaborator_count': counts['collaborator_count'],
+        'prompt_tokens': estimate_tokens(prompt),
+    }
+    return prompt, metadata
+
+
+def request_summary(space):
+    """
+    The SpaceSummary for the space's current content, queueing its generation
+    if it does not exist yet or failed.
+    """
+    version = Space.objects.filter(pk=space.pk).values_list('content_version', flat=True).get()
+    summary = SpaceSummary.objects.filter(space=space, content_version=version).first()
+    if summary is None:
+        try:
+            with transaction.atomic():
+                summary = SpaceSummary.objects.create(space=space, content_version=version)
+        except IntegrityError:
+            # Another request created it first
+            return SpaceSummary.objects.get(space=space, content_version=version)
+    elif summary.status != SpaceSummary.STATUS_FAILED:
+        return summary
+    else:
+        summary.status = SpaceSummary.STATUS_PENDING
+        summary.error = ''
+        summary.save(update_fields=['status', 'error', 'updated_at'])
+    enqueue('summarize_space', {'summary_id': summary.pk}, dedupe=True)
+    return summary
+
+
+def latest_summary(space):
+    """The summary of the current content version if there is one, otherwise the newest finished one."""
+    version = Space.objects.filter(pk=space.pk).values_list('content_version', flat=True).get()
+    current = SpaceSummary.objects.filter(space=space, content_version=version).first()
+    return current or SpaceSummary.objects.filter(space=space, status=SpaceSummary.STATUS_DONE).order_by('-content_version').first()
+
+
+def _update_summary(summary_id, **values):
+    SpaceSummary.objects.filter(pk=summary_id).update(updated_at=timezone.now(), **values)
+
+
+@job('summarize_space')
+def summarize_space(payload):
+    summary = SpaceSummary.objects.select_related('space__creator').filter(pk=payload['summary_id']).first()
+    if summary is None or summary.status == SpaceSummary.STATUS_DONE:
+        return
+    _update_summary(summary.pk, status=SpaceSummary.STATUS_RUNNING, summary='', error='')
+
+    provider = get_provider()
+    text = ''
+    try:
+        prompt, metadata = build_space_prompt(summary.space)
+        flushed_at = time.monotonic()
+        for chunk in provider.stream(prompt):
+            text += chunk
+            if time.monotonic() - flushed_at >= PARTIAL_FLUSH_SECONDS:
+                _update_summary(summary.pk, summary=text)
+                flushed_at = time.monotonic()
+    except Exception as e:
+        _update_summary(summary.pk, status=SpaceSummary.STATUS_FAILED, error=str(e))
+        raise
+
+    _update_summary(
+        summary.pk, status=SpaceSummary.STATUS_DONE, summary=text, model_used=provider.model_used,
+        metadata=metadata, error='',
+    )
+    # Older versions are no longer served once this one is done
+    SpaceSummary.objects.filter(space_id=summary.space_id, content_version__lt=summary.content_version).delete()
+
+
+def _event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+def summary_events(summary_id, offset=0):
+    """
+    Server-sent events for a summary, from character ``offset`` on: ``delta``
+    events with text as the job writes it, then one ``done`` (with the model
+    and metadata) or ``error``. A summary still being written after
+    STREAM_WINDOW_SECONDS ends with ``pending``, whose ``offset`` the client
+    passes back when it reconnects.
+    """
+    sent = offset
+    deadline = time.monotonic() + STREAM_WINDOW_SECONDS
+    while True:
+        summary = SpaceSummary.objects.filter(pk=summary_id).values('status', 'summary', 'model_used', 'metadata', 'error').first()
+        if summary is None:
+            yield _event('error', {'error': 'Summary not found'})
+            return
+        text = summary['summary']
+        if len(text) > sent:
+            yield _event('delta', {'text': text[sent:]})
+            sent = len(text)
+        if summary['status'] == SpaceSummary.STATUS_DONE:
+            yield _event('done', {'model_used': summary['model_used'], 'metadata': summary['metadata']})
+            return
+        if summary['status'] == SpaceSummary.STATUS_FAILED:
+            yield _event('error', {'error': f"Failed to generate summary: {summary['error']}"})
+            return
+        if time.monotonic() >= deadline:
+            yield _event('pending', {'offset': sent})
+            return
+        time.sleep(STREAM_POLL_SECONDS)
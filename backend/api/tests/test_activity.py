@@ -1,11 +1,18 @@
+import os
+import shutil
+import tempfile
 from datetime import timedelta
+from io import StringIO
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
 from django.urls import reverse
 from django.utils import timezone
 from rest_framework.test import APITestCase
 from rest_framework import status
 
-from api.models import Space, Node, Edge, Discussion, Activity
+from api import activity_archive
+from api.models import Space, Node, Edge, Discussion, Activity, record_activity
 
 
 class ActivityOutboxTests(APITestCase):
@@ -438,3 +445,129 @@ class ActivityStreamViewTests(APITestCase):
         returned_ids = [item['id'] for item in body['orderedItems']]
         self.assertIn('urn:uuid:nnn', returned_ids)
 
+
+
+class ActivityArchiveTests(APITestCase):
+    def setUp(self):
+        self.url = reverse('activity_stream')
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir, ignore_errors=True)
+        self.old = timezone.now() - timedelta(days=800)
+        for i, actor in enumerate(['alice', 'bob', 'alice']):
+            Activity.objects.create(
+                as2_id=f'urn:uuid:old-{i}',
+                type='Create',
+                actor=actor,
+                object=f'Space:{i}',
+                summary=f'Old activity {i}',
+                published=self.old + timedelta(minutes=i),
+            )
+        self.recent = Activity.objects.create(
+            as2_id='urn:uuid:recent', type='Join', actor='carol', object='Space:9', summary='Recent'
+        )
+
+    def _archive(self):
+        with self.settings(ACTIVITY_ARCHIVE_DIR=self.archive_dir):
+            call_command('archive_activities', retention_months=12, stdout=StringIO())
+
+    def test_archive_command_moves_old_partitions_out_of_hot_table(self):
+        self._archive()
+
+        self.assertEqual(Activity.objects.count(), 1)
+        self.assertTrue(Activity.objects.filter(pk=self.recent.pk).exists())
+        archived = [name for name in os.listdir(self.archive_dir) if name.endswith('.ndjson.gz')]
+        self.assertEqual(archived, [f'activity_{self.old:%Y_%m}.ndjson.gz'])
+        self.assertNotIn(self.old.date().replace(day=1), [month for month, _ in activity_archive.list_partitions()])
+
+    def test_archive_read_path_streams_archived_activities(self):
+        self._archive()
+
+        with self.settings(ACTIVITY_ARCHIVE_DIR=self.archive_dir):
+            response = self.client.get(self.url, {'source': 'archive'})
+            filtered = self.client.get(self.url, {'source': 'archive', 'actor': 'ALICE', 'limit': 1})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.json()
+        self.assertEqual([item['id'] for item in body['orderedItems']],
+                         ['urn:uuid:old-2', 'urn:uuid:old-1', 'urn:uuid:old-0'])
+        self.assertNotIn('next', body)
+
+        filtered_body = filtered.json()
+        self.assertEqual([item['id'] for item in filtered_body['orderedItems']], ['urn:uuid:old-2'])
+        self.assertIn('next', filtered_body)
+
+    def test_hot_stream_still_serves_recent_activities(self):
+        self._archive()
+        body = self.client.get(self.url).json()
+        self.assertEqual(body['totalItems'], 1)
+        self.assertEqual(body['orderedItems'][0]['id'], 'urn:uuid:recent')
+
+    def test_invalid_source_parameter(self):
+        response = self.client.get(self.url, {'source': 'cold'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ids_come_from_a_bigint_sequence(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT data_type FROM information_schema.sequences WHERE sequence_name = 'api_activity_id_seq'")
+            self.assertEqual(cursor.fetchone(), ('bigint',))
+
+
+class SpaceActivityStreamTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='viewer', password='pw')
+        self.space = Space.objects.create(title='S', description='D', creator=self.user)
+        self.other_space = Space.objects.create(title='Other', description='D', creator=self.user)
+        self.url = reverse('space_activity_stream', kwargs={'space_id': self.space.id})
+        self.client.force_authenticate(self.user)
+
+    def _record(self, **kwargs):
+        return record_activity(actor_user=self.user, type=kwargs.pop('type', 'Create'), **kwargs)
+
+    def test_record_activity_derives_space_id(self):
+        by_object = self._record(object=f'Space:{self.space.id}')
+        by_target = self._record(object='Node:5', target=f'Space:{self.space.id}')
+        by_payload = self._record(object='Discussion:3', target='Discussion:3', payload={'space_id': self.space.id})
+        unscoped = self._record(object='Profile:1')
+
+        self.assertEqual(by_object.space_id, self.space.id)
+        self.assertEqual(by_target.space_id, self.space.id)
+        self.assertEqual(by_payload.space_id, self.space.id)
+        self.assertIsNone(unscoped.space_id)
+
+    def test_space_timeline_only_contains_that_space(self):
+        self._record(object=f'Space:{self.space.id}')
+        self._record(type='Add', object='Node:5', target=f'Space:{self.space.id}')
+        self._record(object=f'Space:{self.other_space.id}')
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.json()
+        self.assertEqual(body['totalItems'], 2)
+        self.assertEqual(body['orderedItems'][0]['type'], 'Add')
+        self.assertTrue(body['id'].startswith(f'http://testserver/api/spaces/{self.space.id}/activity/'))
+
+        filtered = self.client.get(self.url, {'type': 'Create'}).json()
+        self.assertEqual(filtered['totalItems'], 1)
+
+    def test_global_stream_filters_by_target_and_space(self):
+        self._record(type='Add', object='Node:5', target=f'Space:{self.space.id}')
+        self._record(object=f'Space:{self.space.id}')
+
+        url = reverse('activity_stream')
+        by_target = self.client.get(url, {'target': f'space:{self.space.id}'}).json()
+        self.assertEqual(by_target['totalItems'], 1)
+        by_space = self.client.get(url, {'space': self.space.id}).json()
+        self.assertEqual(by_space['totalItems'], 2)
+        self.assertEqual(self.client.get(url, {'space': 'x'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_anonymous_users_can_read_the_timeline(self):
+        self._record(object=f'Space:{self.space.id}')
+        self.client.force_authenticate(None)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['totalItems'], 1)
+
+    def test_unknown_space_returns_404(self):
+        url = reverse('space_activity_stream', kwargs={'space_id': 999999})
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
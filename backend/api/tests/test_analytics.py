@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from api import analytics, jobs
+from api.models import AnalyticsRollup, BackgroundJob, RollupWatermark, Space
+
+
+def at(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class AnalyticsRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='pw')
+        User.objects.filter(pk=self.user.pk).update(date_joined=at(2025, 1, 30, 9))
+
+    def space(self, created_at):
+        space = Space.objects.create(title='S', description='D', creator=self.user)
+        Space.objects.filter(pk=space.pk).update(created_at=created_at)
+        return space
+
+    def rollups(self, metric, period):
+        return dict(
+            AnalyticsRollup.objects.filter(metric=metric, period=period)
+            .order_by('period_start').values_list('period_start', 'count')
+        )
+
+    def test_rollups_are_updated_incrementally(self):
+        self.space(at(2025, 1, 31, 10))
+        self.space(at(2025, 1, 31, 23))
+        self.space(at(2025, 2, 1, 8))
+
+        self.assertEqual(analytics.update_metric('spaces', now=at(2025, 2, 2)), 3)
+        self.assertEqual(self.rollups('spaces', 'day'), {at(2025, 1, 31): 2, at(2025, 2, 1): 1})
+        self.assertEqual(self.rollups('spaces', 'week'), {at(2025, 1, 27): 3})
+        self.assertEqual(self.rollups('spaces', 'month'), {at(2025, 1, 1): 2, at(2025, 2, 1): 1})
+
+        # Only rows past the watermark are read; earlier buckets keep their counts
+        self.space(at(2025, 2, 1, 9))
+        self.space(at(2025, 1, 31, 12))  # behind the watermark: not counted until a rebuild
+        self.assertEqual(analytics.update_metric('spaces', now=at(2025, 2, 2, 12)), 0)
+        self.space(at(2025, 2, 2, 12))
+        self.assertEqual(analytics.update_metric('spaces', now=at(2025, 2, 3)), 1)
+        self.assertEqual(self.rollups('spaces', 'day'), {at(2025, 1, 31): 2, at(2025, 2, 1): 1, at(2025, 2, 2): 1})
+        self.assertEqual(self.rollups('spaces', 'week'), {at(2025, 1, 27): 4})
+
+        self.assertEqual(analytics.rebuild_rollups(['spaces'], now=at(2025, 2, 3))['spaces'], 6)
+        self.assertEqual(self.rollups('spaces', 'month'), {at(2025, 1, 1): 3, at(2025, 2, 1): 3})
+
+    def test_recent_rows_wait_for_the_next_run(self):
+        now = timezone.now()
+        self.space(now - timedelta(minutes=1))
+        self.assertEqual(analytics.update_metric('spaces', now=now), 0)
+        self.assertEqual(RollupWatermark.objects.get(metric='spaces').processed_until, now - analytics.ROLLUP_LAG)
+        self.assertEqual(analytics.update_metric('spaces', now=now + analytics.ROLLUP_LAG), 1)
+
+    def test_job_reschedules_itself(self):
+        analytics.schedule_rollups()
+        analytics.schedule_rollups()
+        self.assertEqual(BackgroundJob.objects.filter(kind='update_analytics_rollups').count(), 1)
+
+        self.assertEqual(jobs.run_pending(kinds=['update_analytics_rollups']), (1, 0))
+        self.assertEqual(self.rollups('users', 'month'), {at(2025, 1, 1): 1})
+        upcoming = BackgroundJob.objects.get(kind='update_analytics_rollups', status=BackgroundJob.STATUS_PENDING)
+        self.assertGreater(upcoming.run_after, timezone.now() + timedelta(seconds=200))
+
+    def test_command(self):
+        self.space(at(2025, 1, 31, 10))
+        out = StringIO()
+        call_command('update_analytics_rollups', '--metric', 'spaces', stdout=out)
+        self.assertIn('spaces: 1 new', out.getvalue())
+        self.assertEqual(set(RollupWatermark.objects.values_list('metric', flat=True)), {'spaces'})
+
+        call_command('update_analytics_rollups', '--rebuild', stdout=out)
+        self.assertIn('Rebuilt rollups for 4 metric(s)', out.getvalue())
+        self.assertEqual(self.rollups('users', 'day'), {at(2025, 1, 30): 1})
+
+        call_command('update_analytics_rollups', '--schedule', stdout=out)
+        self.assertTrue(BackgroundJob.objects.filter(kind='update_analytics_rollups').exists())
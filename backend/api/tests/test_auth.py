@@ -1,6 +1,14 @@
 from django.contrib.auth.models import User
-from rest_framework.test import APITestCase
+from django.core.cache import cache
+from rest_framework.test import APITestCase, APIRequestFactory
+from rest_framework.request import Request
 from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import ClaimsJWTAuthentication, issue_access_token
+from api.models import Profile, Space, SpaceModerator, TokenRevocation
+from api.permissions import IsNotArchivedUser, IsAdmin
 
 class AuthTestCase(APITestCase):
 
@@ -102,3 +110,95 @@ class AuthTestCase(APITestCase):
         data = {"username": "testuser", "password": "wrongpassword"}
         response = self.client.post(self.login_url, data)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TokenClaimsTestCase(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="claimsuser", password="testpassword")
+        self.factory = APIRequestFactory()
+        self.auth = ClaimsJWTAuthentication()
+
+    def _request(self, token, method='get'):
+        django_request = getattr(self.factory, method)('/api/spaces/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return Request(django_request, authenticators=[self.auth])
+
+    def test_login_token_carries_role_claims(self):
+        response = self.client.post("/api/login/", {"username": "claimsuser", "password": "testpassword"})
+        token = AccessToken(response.data["token"])
+        self.assertEqual(token["username"], "claimsuser")
+        self.assertEqual(token["user_type"], Profile.USER)
+        self.assertFalse(token["is_archived"])
+        self.assertEqual(token["mod_spaces"], "")
+
+    def test_reads_skip_user_and_profile_queries(self):
+        token = issue_access_token(self.user)
+        request = self._request(token)
+        # One query for the user row and its revocation
+        with self.assertNumQueries(1):
+            self.assertEqual(request.user.pk, self.user.pk)
+            self.assertEqual(request.user.username, "claimsuser")
+            # Fields serializers read are loaded with it
+            self.assertEqual((request.user.email, request.user.first_name, request.user.last_name), ("", "", ""))
+            self.assertTrue(IsNotArchivedUser().has_permission(request, None))
+            self.assertFalse(IsAdmin().has_permission(request, None))
+
+        response = self.client.get("/api/spaces/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_writes_load_the_user(self):
+        token = issue_access_token(self.user)
+        request = self._request(token, method='post')
+        self.assertFalse(hasattr(request.user, 'token_claims'))
+        self.assertEqual(request.user.pk, self.user.pk)
+
+    def test_role_change_revokes_claims(self):
+        token = issue_access_token(self.user)
+        self.assertTrue(hasattr(self._request(token).user, 'token_claims'))
+
+        profile = Profile.objects.get(user=self.user)
+        profile.user_type = Profile.ADMIN
+        profile.save()
+
+        request = self._request(token)
+        self.assertFalse(hasattr(request.user, 'token_claims'))
+        self.assertTrue(IsAdmin().has_permission(request, None))
+
+        fresh = issue_access_token(User.objects.get(pk=self.user.pk))
+        self.assertEqual(fresh["user_type"], Profile.ADMIN)
+
+    def test_archival_and_moderator_changes_revoke_claims(self):
+        token = issue_access_token(self.user)
+        space = Space.objects.create(title="S", description="D", creator=self.user)
+        SpaceModerator.objects.create(user=self.user, space=space, assigned_by=self.user)
+        self.assertFalse(hasattr(self._request(token).user, 'token_claims'))
+
+        token = issue_access_token(self.user)
+        self.assertNotEqual(AccessToken(str(token))["mod_spaces"], "")
+        profile = Profile.objects.get(user=self.user)
+        profile.is_archived = True
+        profile.save()
+
+        request = self._request(token)
+        self.assertFalse(IsNotArchivedUser().has_permission(request, None))
+
+    def test_revocations_from_other_processes_apply(self):
+        token = issue_access_token(self.user)
+        self.assertTrue(hasattr(self._request(token).user, 'token_claims'))
+        # As written by another worker or run_jobs, whose cache this process can't see
+        TokenRevocation.objects.create(user=self.user, reason='elsewhere')
+        self.assertFalse(hasattr(self._request(token).user, 'token_claims'))
+
+    def test_deleted_users_tokens_are_rejected(self):
+        token = issue_access_token(self.user)
+        self.user.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self._request(token).user
+
+    def test_unrelated_saves_keep_claims_trusted(self):
+        token = issue_access_token(self.user)
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = "Renamed"
+        user.save()
+        self.assertTrue(hasattr(self._request(token).user, 'token_claims'))
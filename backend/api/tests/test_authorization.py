@@ -1,10 +1,12 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, RequestFactory, override_settings
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 from api.models import Profile, Space, SpaceModerator, Tag
 from api.permissions import IsAdmin, IsAdminOrModerator, IsSpaceModerator, CanChangeUserType
+from api.authorization import get_authz
 
 
 class ProfileModelTest(TestCase):
@@ -730,4 +732,75 @@ class AdminDashboardAccessTest(APITestCase):
         self.client.force_authenticate(user=self.moderator_user)
         response = self.client.get('/api/profiles/me/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertFalse(response.data['can_access_admin_dashboard'])
\ No newline at end of file
+        self.assertFalse(response.data['can_access_admin_dashboard'])
+
+class AuthorizationContextTest(TestCase):
+    """Test the request-scoped authorization context"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='member', password='testpass123')
+        self.moderator = User.objects.create_user(username='spacemod', password='testpass123')
+        self.moderator.profile.user_type = Profile.MODERATOR
+        self.moderator.profile.save()
+        self.space = Space.objects.create(title='Space', description='D', creator=self.moderator)
+        self.space.collaborators.add(self.user)
+        SpaceModerator.objects.create(user=self.moderator, space=self.space, assigned_by=self.moderator)
+        self.factory = RequestFactory()
+
+    def _request(self, user):
+        request = self.factory.get('/')
+        request.user = User.objects.get(pk=user.pk)
+        return request
+
+    def test_answers_are_memoized_per_request(self):
+        request = self._request(self.user)
+        with self.assertNumQueries(2):
+            for _ in range(3):
+                self.assertTrue(get_authz(request).is_collaborator(self.space))
+                self.assertTrue(get_authz(request).is_collaborator(str(self.space.id)))
+                self.assertFalse(get_authz(request).is_archived())
+                self.assertFalse(get_authz(request).is_admin())
+        self.assertIs(get_authz(request), get_authz(request))
+
+        # A new request asks the database again
+        request = self._request(self.user)
+        with self.assertNumQueries(1):
+            self.assertTrue(get_authz(request).is_collaborator(self.space.id))
+
+    def test_can_moderate_matches_profile_rule(self):
+        request = self._request(self.moderator)
+        self.assertTrue(get_authz(request).can_moderate(self.space))
+        self.assertEqual(
+            get_authz(request).can_moderate(self.space),
+            self.moderator.profile.can_moderate_space(self.space),
+        )
+        self.assertFalse(get_authz(self._request(self.user)).can_moderate(self.space))
+        self.assertFalse(get_authz(request).is_collaborator('not-an-id'))
+
+    @override_settings(AUTHZ_CACHE_TTL=30)
+    def test_shared_cache_is_invalidated_by_membership_changes(self):
+        cache.clear()
+        self.assertTrue(get_authz(self._request(self.user)).is_collaborator(self.space))
+        request = self._request(self.user)
+        with self.assertNumQueries(0):
+            self.assertTrue(get_authz(request).is_collaborator(self.space))
+
+        self.space.collaborators.remove(self.user)
+        self.assertFalse(get_authz(self._request(self.user)).is_collaborator(self.space))
+
+        profile = Profile.objects.get(user=self.user)
+        self.assertFalse(get_authz(self._request(self.user)).is_archived())
+        profile.is_archived = True
+        profile.save()
+        self.assertTrue(get_authz(self._request(self.user)).is_archived())
+
+    @override_settings(AUTHZ_CACHE_TTL=30)
+    def test_unrelated_profile_saves_keep_the_cache(self):
+        cache.clear()
+        get_authz(self._request(self.user)).is_collaborator(self.space)
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Renamed'
+        user.save()
+        request = self._request(self.user)
+        with self.assertNumQueries(0):
+            self.assertTrue(get_authz(request).is_collaborator(self.space))
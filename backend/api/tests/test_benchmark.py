@@ -0,0 +1,106 @@
+import json
+import os
+import tempfile
+from collections import Counter
+from io import StringIO
+from unittest.mock import MagicMock, patch
+
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+
+from api import benchmark
+from api.models import (
+    Activity, DashboardCounters, Discussion, DiscussionReaction, Edge, Node, Property, Report, Space,
+)
+from api.neo4j_db import Neo4jConnection
+
+
+class SeedBenchmarkDataTests(TestCase):
+    def test_seed(self):
+        created = benchmark.seed(spaces=2, nodes=60, edges=300, properties=3, users=8, collaborators=4,
+                                 discussions=10, reactions=3, reports=5)
+
+        spaces = benchmark.benchmark_spaces()
+        self.assertEqual(spaces.count(), 2)
+        self.assertEqual(created['nodes'], 120)
+        self.assertEqual(Edge.objects.filter(source__space__in=spaces).count(), 600)
+        self.assertFalse(Edge.objects.exclude(source__space=F('target__space')).exists())
+        self.assertEqual(Property.objects.filter(node__space__in=spaces, property_id='P31').count(), 120)
+        self.assertEqual(Property.objects.filter(node__space__in=spaces).count(), 360)
+        self.assertEqual(spaces.first().collaborators.count(), 4)
+
+        # Power law: the biggest hub has many times the mean degree
+        degrees = Counter()
+        for source_id, target_id in Edge.objects.values_list('source_id', 'target_id'):
+            self.assertNotEqual(source_id, target_id)
+            degrees.update((source_id, target_id))
+        self.assertGreater(max(degrees.values()), 4 * sum(degrees.values()) / 120)
+
+        self.assertEqual(Discussion.objects.count(), 20)
+        self.assertLessEqual(DiscussionReaction.objects.count(), 60)
+        self.assertEqual(Report.objects.filter(status=Report.STATUS_OPEN).count(), 10)
+        self.assertEqual(sum(Node.objects.values_list('report_count', flat=True))
+                         + sum(Discussion.objects.values_list('report_count', flat=True)), 10)
+        self.assertEqual(Activity.objects.filter(space_id__in=spaces.values('id')).count(), 120 + 600 + 20 + 10)
+        self.assertEqual(DashboardCounters.load().nodes, 120)
+        self.assertEqual(created['activities'], 750)
+
+    def test_same_seed_same_data(self):
+        def labels():
+            return list(Node.objects.order_by('id').values_list('label', flat=True))
+
+        benchmark.seed(spaces=1, nodes=20, edges=40, discussions=0, reports=0, rng_seed=7)
+        first = labels()
+        benchmark.clear()
+        self.assertFalse(Node.objects.exists())
+        benchmark.seed(spaces=1, nodes=20, edges=40, discussions=0, reports=0, rng_seed=7)
+        self.assertEqual(labels(), first)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('seed_benchmark_data', '--spaces', '1', '--nodes', '10', '--edges', '20', '--users', '3',
+                     '--collaborators', '2', stdout=out)
+        self.assertIn('nodes: 10', out.getvalue())
+        self.assertIn('Seeded 1 benchmark space(s)', out.getvalue())
+
+        call_command('seed_benchmark_data', '--clear', '--spaces', '0', stdout=out)
+        self.assertIn('Removed 1 benchmark space(s)', out.getvalue())
+        self.assertFalse(Space.objects.exists())
+
+
+class RunBenchmarkTests(TestCase):
+    def setUp(self):
+        benchmark.seed(spaces=1, nodes=30, edges=60, users=3, collaborators=2, discussions=5, reports=2)
+
+    def test_report(self):
+        with patch.object(Neo4jConnection, 'get_driver', return_value=MagicMock()):
+            report = benchmark.run(iterations=3, warmup=1, label='test')
+
+        self.assertEqual(report['label'], 'test')
+        self.assertEqual(report['space']['nodes'], 30)
+        self.assertEqual(set(report['endpoints']), set(benchmark.ENDPOINTS))
+        for name, result in report['endpoints'].items():
+            self.assertEqual(result['statuses'], {'200': 3}, name)
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+        self.assertGreater(report['endpoints']['nodes']['queries_p50'], 0)
+        self.assertIn('"value_id": "Q', json.dumps(report['endpoints']['search/query']))
+
+        slower = json.loads(json.dumps(report))
+        slower['endpoints']['nodes']['p50_ms'] = report['endpoints']['nodes']['p50_ms'] * 2
+        rows = {(name, metric): change for name, metric, old, new, change in benchmark.compare(report, slower)}
+        self.assertAlmostEqual(rows[('nodes', 'p50_ms')], -50)
+
+    def test_command(self):
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'report.json')
+            call_command('run_benchmark', '--iterations', '2', '--endpoint', 'nodes', '--endpoint', 'discussions',
+                         '--output', output, stdout=out)
+            with open(output) as f:
+                report = json.load(f)
+            self.assertEqual(set(report['endpoints']), {'nodes', 'discussions'})
+
+            call_command('run_benchmark', '--iterations', '2', '--endpoint', 'nodes', '--output', output,
+                         '--baseline', output, stdout=out)
+        self.assertIn('nodes p50_ms', out.getvalue())
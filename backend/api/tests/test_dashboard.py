@@ -0,0 +1,99 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APITestCase, APIClient
+
+from api.models import Space, Node, Edge, Discussion, Profile, DashboardCounters
+
+
+class DashboardCountersTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='pass')
+        self.admin.profile.user_type = Profile.ADMIN
+        self.admin.profile.save()
+        self.user = User.objects.create_user(username='user', password='pass')
+
+        self.space = Space.objects.create(title='Space', description='D', creator=self.admin)
+        self.n1 = Node.objects.create(label='N1', created_by=self.admin, space=self.space)
+        self.n2 = Node.objects.create(label='N2', created_by=self.admin, space=self.space)
+        self.n3 = Node.objects.create(label='N3', created_by=self.admin, space=self.space)
+        Edge.objects.create(source=self.n1, target=self.n2, relation_property='rel')
+        Edge.objects.create(source=self.n2, target=self.n3, relation_property='rel')
+        Edge.objects.create(source=self.n1, target=self.n3, relation_property='rel')
+        Discussion.objects.create(space=self.space, user=self.user, text='Hi')
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def assertCountersExact(self):
+        counters = DashboardCounters.load()
+        actual = DashboardCounters.count_all()
+        self.assertEqual({name: getattr(counters, name) for name in DashboardCounters.FIELDS}, actual)
+
+    def test_counters_follow_creates_and_deletes(self):
+        self.assertCountersExact()
+        self.assertEqual(DashboardCounters.load().edges, 3)
+
+        Discussion.objects.all().delete()
+        self.n3.delete()
+        self.assertCountersExact()
+        self.assertEqual(DashboardCounters.load().edges, 1)
+
+        self.space.delete()
+        self.user.delete()
+        self.assertCountersExact()
+
+    def test_archive_and_restore_adjust_counters(self):
+        response = self.client.post(
+            reverse('archive_item'),
+            {'content_type': 'node', 'content_id': self.n2.id, 'reason': 'Test'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertCountersExact()
+        self.assertEqual(DashboardCounters.load().edges, 1)
+
+        for content_type, content_id in (('space', self.space.id), ('profile', self.user.id)):
+            response = self.client.post(
+                reverse('archive_item'),
+                {'content_type': content_type, 'content_id': content_id},
+                format='json'
+            )
+            self.assertEqual(response.status_code, 201)
+        self.assertCountersExact()
+
+        # Archived edges' endpoints are checked on delete as well.
+        self.n2.refresh_from_db()
+        self.n2.delete()
+        self.assertCountersExact()
+
+        archived = self.client.get(reverse('list_archived_items')).data
+        for item in [item for item in archived if item['content_type'] != 'node']:
+            response = self.client.post(reverse('restore_archived_item', args=[item['id']]))
+            self.assertEqual(response.status_code, 200)
+        self.assertCountersExact()
+
+    def test_dashboard_stats_reads_counters(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('dashboard_stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['totalUsers'], 2)
+        self.assertEqual(response.data['totalSpaces'], 1)
+        self.assertEqual(response.data['totalGraphNodes'], 3)
+        self.assertEqual(response.data['totalEdges'], 3)
+        self.assertEqual(response.data['totalDiscussions'], 1)
+
+    def test_reconcile_command_corrects_drift(self):
+        Node.objects.filter(pk=self.n1.pk).update(is_archived=True)
+        DashboardCounters.objects.update(discussions=40)
+
+        out = StringIO()
+        call_command('reconcile_dashboard_counters', '--dry-run', stdout=out)
+        self.assertIn('discussions: stored 40, actual 1', out.getvalue())
+        self.assertEqual(DashboardCounters.load().discussions, 40)
+
+        call_command('reconcile_dashboard_counters', stdout=StringIO())
+        self.assertCountersExact()
+        self.assertEqual(DashboardCounters.load().edges, 1)
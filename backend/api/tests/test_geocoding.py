@@ -0,0 +1,195 @@
+import os
+from io import StringIO
+from unittest.mock import patch, MagicMock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from api import gazetteer, geo, geocoding, jobs
+from api.models import BackgroundJob, GeocodeCacheEntry, MapTileVersion, Node, Space
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+GAZETTEER_SETTINGS = {
+    'GAZETTEER_CITIES_FILE': os.path.join(DATA_DIR, 'cities_sample.txt'),
+    'GAZETTEER_COUNTRIES_FILE': os.path.join(DATA_DIR, 'countries_sample.txt'),
+}
+
+
+def _nominatim(url, params, **kwargs):
+    response = MagicMock()
+    if 'reverse' in url:
+        response.json.return_value = {
+            'address': {'country': 'Germany', 'city': 'Berlin', 'suburb': 'Mitte', 'road': 'Unter den Linden'},
+            'display_name': 'Unter den Linden, Mitte, Berlin, Germany',
+        }
+    elif 'Atlantis' in params['q']:
+        response.json.return_value = []
+    else:
+        response.json.return_value = [{'lat': '52.52', 'lon': '13.40', 'display_name': 'Berlin, Germany'}]
+    return response
+
+
+class GeocodeQueueTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='geo', password='pw')
+        self.client.force_authenticate(user=self.user)
+        patcher = patch('api.http_client.get', side_effect=_nominatim)
+        self.mock_get = patcher.start()
+        self.addCleanup(patcher.stop)
+        sleep_patcher = patch('api.geocoding.time.sleep')
+        sleep_patcher.start()
+        self.addCleanup(sleep_patcher.stop)
+
+    def run_jobs(self):
+        out = StringIO()
+        call_command('run_jobs', '--once', stdout=out)
+        return out.getvalue()
+
+    def test_space_create_returns_before_geocoding(self):
+        response = self.client.post('/api/spaces/', {'title': 'S', 'description': 'D', 'country': 'Germany', 'city': 'Berlin'})
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(response.data['latitude'])
+        self.mock_get.assert_not_called()
+        self.assertEqual(BackgroundJob.objects.get().kind, 'geocode_space')
+
+        self.assertIn('Ran 1 job(s), 0 failed', self.run_jobs())
+        space = Space.objects.get(pk=response.data['id'])
+        self.assertEqual((space.latitude, space.longitude), (52.52, 13.40))
+
+        # Same address, differently spelled: answered from the cache on the request
+        response = self.client.post('/api/spaces/', {'title': 'T', 'description': 'D', 'country': ' germany', 'city': 'BERLIN'})
+        self.assertEqual(response.data['latitude'], 52.52)
+        self.assertEqual(self.mock_get.call_count, 1)
+        self.assertEqual(BackgroundJob.objects.count(), 1)
+
+    def test_job_skips_rows_whose_address_changed(self):
+        space = Space.objects.create(title='S', description='D', creator=self.user, country='Germany', city='Berlin')
+        geocoding.schedule_space_geocode(space)
+        Space.objects.filter(pk=space.pk).update(city='Hamburg')
+
+        self.run_jobs()
+        space.refresh_from_db()
+        self.assertIsNone(space.latitude)
+        self.assertTrue(GeocodeCacheEntry.objects.filter(key='addr:berlin, germany').exists())
+
+    def test_profile_update_geocodes_in_background(self):
+        response = self.client.put(reverse('profile-update-profile'), {'country': 'Germany', 'city': 'Berlin'})
+        self.assertEqual(response.status_code, 200)
+        self.mock_get.assert_not_called()
+
+        self.run_jobs()
+        self.user.profile.refresh_from_db()
+        self.assertEqual(self.user.profile.latitude, 52.52)
+        self.assertEqual(self.user.profile.location_name, 'Berlin, Germany')
+
+    def test_nothing_found_is_cached(self):
+        space = Space.objects.create(title='S', description='D', creator=self.user, city='Atlantis')
+        geocoding.schedule_space_geocode(space)
+        self.run_jobs()
+        self.assertIsNone(GeocodeCacheEntry.objects.get(key='addr:atlantis').result)
+
+        self.assertIsNone(geocoding.schedule_space_geocode(space))
+        self.assertEqual(self.mock_get.call_count, 1)
+
+    def test_failures_are_retried_with_backoff(self):
+        self.mock_get.side_effect = geocoding.http_client.CircuitOpenError('open')
+        space = Space.objects.create(title='S', description='D', creator=self.user, city='Berlin')
+        geocoding.schedule_space_geocode(space)
+
+        self.assertIn('1 failed', self.run_jobs())
+        queued = BackgroundJob.objects.get()
+        self.assertEqual((queued.status, queued.attempts), (BackgroundJob.STATUS_PENDING, 1))
+        self.assertIn('open', queued.last_error)
+        self.assertFalse(GeocodeCacheEntry.objects.exists())
+        # Not due yet
+        self.assertIn('Ran 0 job(s)', self.run_jobs())
+
+    def test_node_names_are_filled_from_coordinates(self):
+        space = Space.objects.create(title='S', description='D', creator=self.user)
+        node = Node.objects.create(label='N', created_by=self.user, space=space, latitude=52.5171, longitude=13.3889, city='')
+        geocoding.schedule_node_reverse_geocode(node)
+        self.run_jobs()
+
+        node.refresh_from_db()
+        self.assertEqual((node.country, node.city, node.district), ('Germany', 'Berlin', 'Mitte'))
+        self.assertEqual(node.location_name, 'Unter den Linden, Mitte, Berlin')
+
+
+class JobQueueTests(TestCase):
+    def test_unknown_kinds_fail_immediately(self):
+        jobs.enqueue('no_such_job')
+        self.assertEqual(jobs.run_pending(), (0, 1))
+        self.assertEqual(BackgroundJob.objects.get().status, BackgroundJob.STATUS_FAILED)
+
+    def test_dedupe_reuses_pending_job(self):
+        first = jobs.enqueue('geocode_space', {'space_id': 1, 'address': ['x']}, dedupe=True)
+        second = jobs.enqueue('geocode_space', {'space_id': 1, 'address': ['x']}, dedupe=True)
+        self.assertEqual(first.pk, second.pk)
+
+    def test_token_bucket_spaces_calls(self):
+        bucket = geocoding.TokenBucket(rate=2)
+        with patch('api.geocoding.time.monotonic', return_value=100.0), patch('api.geocoding.time.sleep') as sleep:
+            bucket._updated = 100.0
+            self.assertEqual(bucket.acquire(), 0)
+            self.assertEqual(bucket.acquire(), 0.5)
+            self.assertEqual(bucket.acquire(), 1.0)
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [0.5, 1.0])
+
+
+@override_settings(**GAZETTEER_SETTINGS)
+class GazetteerTests(TestCase):
+    def test_nearest_city(self):
+        self.assertEqual(gazetteer.offline_reverse_geocode(52.5171, 13.3889), {
+            'country': 'Germany', 'city': 'Berlin', 'district': None, 'street': None,
+            'location_name': 'Berlin, Germany',
+        })
+        self.assertEqual(gazetteer.offline_reverse_geocode(52.41, 13.1)['city'], 'Potsdam')
+        # Nothing within GAZETTEER_MAX_DISTANCE_KM
+        self.assertIsNone(gazetteer.offline_reverse_geocode(45.0, 0.0))
+
+    @override_settings(GAZETTEER_MAX_DISTANCE_KM=100)
+    def test_wraps_around_the_antimeridian_and_near_poles(self):
+        self.assertEqual(gazetteer.offline_reverse_geocode(-16.5, -179.95)['city'], 'Labasa')
+        self.assertEqual(gazetteer.offline_reverse_geocode(78.3, 16.5)['city'], 'Longyearbyen')
+
+    def test_disabled_without_a_cities_file(self):
+        with self.settings(GAZETTEER_CITIES_FILE=''):
+            self.assertIsNone(gazetteer.offline_reverse_geocode(52.5171, 13.3889))
+
+    @patch('api.http_client.get')
+    def test_nodes_are_named_without_network(self, mock_get):
+        user = User.objects.create_user(username='geo', password='pw')
+        space = Space.objects.create(title='S', description='D', creator=user)
+        node = Node.objects.create(label='N', created_by=user, space=space, latitude=41.0, longitude=28.97)
+        self.assertIsNone(geocoding.schedule_node_reverse_geocode(node))
+        self.assertEqual(node.location_name, 'Istanbul, Turkey')
+        mock_get.assert_not_called()
+
+    def test_backfill_command(self):
+        user = User.objects.create_user(username='geo', password='pw')
+        space = Space.objects.create(title='S', description='D', creator=user)
+        paris = Node.objects.create(label='P', created_by=user, space=space, latitude=48.86, longitude=2.35, city='')
+        nowhere = Node.objects.create(label='X', created_by=user, space=space, latitude=0.0, longitude=-30.0)
+        named = Node.objects.create(label='N', created_by=user, space=space, latitude=52.52, longitude=13.4, city='Mitte')
+
+        content_version = Space.objects.get(pk=space.pk).content_version
+
+        out = StringIO()
+        call_command('backfill_node_locations', '--queue-missing', stdout=out)
+        self.assertIn('Updated 1 node(s); 1 without a city in range', out.getvalue())
+        self.assertIn('Queued 1 node(s)', out.getvalue())
+
+        paris.refresh_from_db()
+        named.refresh_from_db()
+        self.assertEqual((paris.country, paris.city), ('France', 'Paris'))
+        self.assertEqual(named.city, 'Mitte')
+        # What the save signals skipped by bulk_update would have done
+        self.assertEqual(Space.objects.get(pk=space.pk).content_version, content_version + 1)
+        self.assertTrue(MapTileVersion.objects.filter(
+            scope=f'nodes:{space.id}', region=paris.geohash[:geo.TILE_VERSION_PRECISION], version=2,
+        ).exists())
+        self.assertEqual(BackgroundJob.objects.get().payload['node_id'], nowhere.id)
@@ -0,0 +1,177 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import requests
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APITestCase
+
+from api import http_client
+
+
+class FakeUpstreamHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.record(self)
+        if self.path.startswith('/slow'):
+            self.server.release.wait(5)
+            self._reply(200, b'slow')
+        elif self.path.startswith('/flaky') and self.server.calls[self.path] <= self.server.flaky_failures:
+            self._reply(503, b'busy')
+        elif self.path.startswith('/down'):
+            self._reply(500, b'down')
+        else:
+            self._reply(200, b'ok')
+
+    def do_POST(self):
+        self.server.record(self)
+        self._reply(503, b'busy')
+
+    def _reply(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeUpstream(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeUpstreamHandler)
+        self.calls = {}
+        self.client_ports = set()
+        self.flaky_failures = 2
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+
+    def record(self, handler):
+        with self._lock:
+            self.calls[handler.path] = self.calls.get(handler.path, 0) + 1
+            self.client_ports.add(handler.client_address[1])
+
+    def handle_error(self, request, client_address):
+        # Clients that timed out hang up before the slow reply is written.
+        pass
+
+    @property
+    def host(self):
+        return f'127.0.0.1:{self.server_address[1]}'
+
+
+class HttpClientTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeUpstream()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.release.set()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.calls.clear()
+        self.server.client_ports.clear()
+        self.server.release.clear()
+        self.addCleanup(self.server.release.set)
+        self.configure()
+
+    def configure(self, **config):
+        config = {'backoff': 0, 'read_timeout': 2, **config}
+        override = override_settings(OUTBOUND_HTTP_UPSTREAMS={self.server.host: config})
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def url(self, path):
+        return f'http://{self.server.host}{path}'
+
+    def test_connections_are_kept_alive(self):
+        for _ in range(3):
+            self.assertEqual(http_client.get(self.url('/ok')).text, 'ok')
+        self.assertEqual(self.server.calls['/ok'], 3)
+        self.assertEqual(len(self.server.client_ports), 1)
+
+    def test_idempotent_calls_are_retried(self):
+        response = http_client.get(self.url('/flaky'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.server.calls['/flaky'], 3)
+
+        response = http_client.post(self.url('/post'))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.server.calls['/post'], 1)
+
+        http_client.post(self.url('/sparql'), idempotent=True)
+        self.assertEqual(self.server.calls['/sparql'], 3)
+
+    def test_read_timeout(self):
+        self.configure(read_timeout=0.2, retries=0)
+        started = time.monotonic()
+        with self.assertRaises(requests.exceptions.Timeout):
+            http_client.get(self.url('/slow'))
+        self.assertLess(time.monotonic() - started, 2)
+
+    def test_read_timeouts_are_not_retried_when_disabled(self):
+        self.configure(read_timeout=0.2, retries=2, retry_read_timeouts=False)
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            http_client.get(self.url('/slow'))
+        self.assertEqual(self.server.calls['/slow'], 1)
+
+        # Server errors still are
+        http_client.get(self.url('/flaky'))
+        self.assertEqual(self.server.calls['/flaky'], 3)
+
+    def test_circuit_opens_and_recovers(self):
+        self.configure(retries=0, failure_threshold=2, reset_timeout=0.2)
+        for _ in range(2):
+            self.assertEqual(http_client.get(self.url('/down')).status_code, 500)
+
+        with self.assertRaises(http_client.CircuitOpenError):
+            http_client.get(self.url('/ok'))
+        self.assertNotIn('/ok', self.server.calls)
+
+        time.sleep(0.25)
+        self.assertEqual(http_client.get(self.url('/ok')).status_code, 200)
+        self.assertEqual(http_client.client_for(self.url('/')).breaker.state, http_client.CircuitBreaker.CLOSED)
+
+    def test_failed_probe_reopens_the_circuit(self):
+        self.configure(retries=0, failure_threshold=1, reset_timeout=0.2)
+        http_client.get(self.url('/down'))
+        time.sleep(0.25)
+        http_client.get(self.url('/down'))
+        with self.assertRaises(http_client.CircuitOpenError):
+            http_client.get(self.url('/ok'))
+
+    def test_bulkhead_fails_fast_when_full(self):
+        self.configure(max_concurrency=1)
+        slow = threading.Thread(target=http_client.get, args=(self.url('/slow'),))
+        slow.start()
+        while not self.server.calls.get('/slow'):
+            time.sleep(0.01)
+
+        with self.assertRaises(http_client.BulkheadFullError):
+            http_client.get(self.url('/ok'))
+
+        self.server.release.set()
+        slow.join(5)
+        self.assertEqual(http_client.get(self.url('/ok')).status_code, 200)
+
+
+class WikidataUnavailableTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='tester', password='pw')
+        self.client.login(username='tester', password='pw')
+
+    @patch('api.http_client.get', side_effect=http_client.CircuitOpenError('open'))
+    def test_search_returns_503_when_upstream_is_unavailable(self, mock_get):
+        response = self.client.get('/api/spaces/wikidata-search/', {'q': 'einstein'})
+        self.assertEqual(response.status_code, 503)
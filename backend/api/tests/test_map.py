@@ -0,0 +1,199 @@
+import random
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import F
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APITestCase
+
+from api import geo, geocoding
+from api.models import MapTileVersion, Node, Space
+
+
+class GeohashTests(SimpleTestCase):
+    def test_encode_and_bounds(self):
+        self.assertEqual(geo.geohash_encode(57.64911, 10.40744), 'u4pruydqq')
+        self.assertEqual(geo.geohash_encode(57.64911, 10.40744, 5), 'u4pru')
+        self.assertIsNone(geo.geohash_encode(None, 10.0))
+        south, west, north, east = geo.geohash_bounds('u4pru')
+        self.assertTrue(south <= 57.64911 <= north and west <= 10.40744 <= east)
+        self.assertAlmostEqual(north - south, geo.cell_size(5)[0])
+
+    def test_covering_cells_contain_every_point_in_the_bbox(self):
+        rng = random.Random(7)
+        for bbox in [(13.0, 52.3, 13.8, 52.7), (-10.0, 35.0, 30.0, 60.0), (170.0, -20.0, -170.0, -10.0), (-180, -90, 180, 90)]:
+            cells = geo.covering_cells(bbox)
+            self.assertLessEqual(len(cells), geo.MAX_COVER_CELLS)
+            west, south, east, north = bbox
+            for _ in range(200):
+                lat = rng.uniform(south, north)
+                lon = rng.uniform(west, east if west <= east else east + 360)
+                lon = lon - 360 if lon > 180 else lon
+                point = geo.geohash_encode(lat, lon)
+                self.assertTrue(any(point.startswith(cell) for cell in cells), (bbox, lat, lon))
+
+    def test_cluster_precision_grows_with_zoom(self):
+        precisions = [geo.cluster_precision(zoom) for zoom in range(geo.MAX_ZOOM + 1)]
+        self.assertEqual(precisions[0], 1)
+        self.assertEqual(precisions, sorted(precisions))
+        self.assertEqual(precisions[-1], geo.GEOHASH_PRECISION)
+
+    def test_successor_bounds_the_prefix_range(self):
+        self.assertEqual(geo._successor('u33'), 'u34')
+        self.assertEqual(geo._successor('bz'), 'c')
+        self.assertIsNone(geo._successor('zz'))
+
+    def test_parse_bbox(self):
+        self.assertEqual(geo.parse_bbox('13,52,14,53'), (13.0, 52.0, 14.0, 53.0))
+        for value in (None, '1,2,3', 'a,b,c,d', '0,10,1,5', '0,0,200,1', 'nan,0,1,1'):
+            with self.assertRaises(ValueError):
+                geo.parse_bbox(value)
+
+
+class MapEndpointTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='mapper', password='pw')
+        self.client.force_authenticate(user=self.user)
+        self.berlin = Space.objects.create(title='Berlin', description='D', creator=self.user, latitude=52.52, longitude=13.40)
+        self.paris = Space.objects.create(title='Paris', description='D', creator=self.user, latitude=48.86, longitude=2.35)
+        self.fiji = Space.objects.create(title='Fiji', description='D', creator=self.user, latitude=-16.5, longitude=179.9)
+        Space.objects.create(title='Nowhere', description='D', creator=self.user)
+        Space.objects.create(title='Gone', description='D', creator=self.user, latitude=52.5, longitude=13.3, is_archived=True)
+
+    def titles(self, response):
+        return sorted(row['title'] for row in response.data['results'])
+
+    def test_spaces_inside_the_viewport(self):
+        response = self.client.get('/api/spaces/map/', {'bbox': '0,45,20,55', 'zoom': 15})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.titles(response), ['Berlin', 'Paris'])
+        self.assertEqual(response.data['zoom'], 15)
+        self.assertFalse(response.data['has_more'])
+
+        # Across the antimeridian
+        response = self.client.get('/api/spaces/map/', {'bbox': '170,-20,-170,-10'})
+        self.assertEqual(self.titles(response), ['Fiji'])
+
+    def test_pagination(self):
+        first = self.client.get('/api/spaces/map/', {'bbox': '-180,-90,180,90', 'page_size': 2})
+        self.assertTrue(first.data['has_more'])
+        second = self.client.get('/api/spaces/map/', {'bbox': '-180,-90,180,90', 'page_size': 2, 'page': 2})
+        self.assertFalse(second.data['has_more'])
+        self.assertEqual(sorted(self.titles(first) + self.titles(second)), ['Berlin', 'Fiji', 'Paris'])
+
+    def test_invalid_parameters(self):
+        for params in ({}, {'bbox': '1,2,3'}, {'bbox': '0,45,20,55', 'zoom': 30}, {'bbox': '0,45,20,55', 'page_size': 0}):
+            self.assertEqual(self.client.get('/api/spaces/map/', params).status_code, 400, params)
+
+    def test_nodes_of_a_space_inside_the_viewport(self):
+        Node.objects.create(label='Gate', created_by=self.user, space=self.berlin, latitude=52.5163, longitude=13.3777)
+        Node.objects.create(label='Tower', created_by=self.user, space=self.paris, latitude=52.5208, longitude=13.4094)
+        far = Node.objects.create(label='Far', created_by=self.user, space=self.berlin, latitude=48.1, longitude=11.6)
+
+        response = self.client.get(f'/api/spaces/{self.berlin.id}/nodes/map/', {'bbox': '13.2,52.4,13.6,52.6'})
+        self.assertEqual([row['label'] for row in response.data['results']], ['Gate'])
+
+        # Moving a node keeps its geohash in step
+        far.latitude, far.longitude = 52.51, 13.39
+        far.save(update_fields=['latitude', 'longitude'])
+        response = self.client.get(f'/api/spaces/{self.berlin.id}/nodes/map/', {'bbox': '13.2,52.4,13.6,52.6'})
+        self.assertEqual(sorted(row['label'] for row in response.data['results']), ['Far', 'Gate'])
+
+    def test_geocoded_coordinates_get_a_geohash(self):
+        space = Space.objects.create(title='S', description='D', creator=self.user, city='Berlin')
+        geocoding._apply_space_geocode(space.pk, [None, 'Berlin', None, None], {'latitude': 52.52, 'longitude': 13.4})
+        space.refresh_from_db()
+        self.assertEqual(space.geohash, geo.geohash_encode(52.52, 13.4))
+
+
+class MapClusterTests(APITestCase):
+    EUROPE = '-10,35,30,60'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='mapper', password='pw')
+        self.client.force_authenticate(user=self.user)
+        self.berlin = [
+            Space.objects.create(title=f'Berlin {i}', description='D', creator=self.user,
+                                 latitude=52.5 + i * 0.01, longitude=13.4 + i * 0.01)
+            for i in range(3)
+        ]
+        self.paris = Space.objects.create(title='Paris', description='D', creator=self.user, latitude=48.86, longitude=2.35)
+
+    def clusters(self, bbox=EUROPE, zoom=4):
+        response = self.client.get('/api/spaces/map/', {'bbox': bbox, 'zoom': zoom})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['clustered'])
+        return sorted(response.data['clusters'], key=lambda cluster: cluster['count'])
+
+    def test_low_zoom_returns_clusters(self):
+        paris, berlin = self.clusters()
+        self.assertEqual((paris['count'], paris['id']), (1, self.paris.id))
+        self.assertEqual(berlin['count'], 3)
+        self.assertNotIn('id', berlin)
+        self.assertAlmostEqual(berlin['latitude'], 52.51)
+        self.assertEqual(berlin['bbox'], [13.4, 52.5, 13.42, 52.52])
+
+        # Past the threshold, individual points
+        response = self.client.get('/api/spaces/map/', {'bbox': '13,52,14,53', 'zoom': 14})
+        self.assertFalse(response.data['clustered'])
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_tiles_are_cached_until_a_location_changes(self):
+        self.clusters()
+        # The scope's tile versions are cached too
+        with self.assertNumQueries(0):
+            self.clusters()
+
+        moved = Space.objects.get(pk=self.berlin[0].pk)
+        moved.latitude, moved.longitude = 48.85, 2.34
+        moved.save()
+        self.assertEqual([cluster['count'] for cluster in self.clusters()], [2, 2])
+
+        self.berlin[1].delete()
+        Space.objects.create(title='Nowhere', description='D', creator=self.user)
+        self.assertEqual([cluster['count'] for cluster in self.clusters()], [1, 2])
+
+        paris = Space.objects.get(pk=self.paris.pk)
+        paris.is_archived = True
+        paris.save(update_fields=['is_archived'])
+        self.assertEqual([cluster['count'] for cluster in self.clusters()], [1, 1])
+
+        geocoding._apply_space_geocode(self.berlin[2].pk, [None, None, None, None], {'latitude': 41.0, 'longitude': 28.97})
+        self.assertEqual(sorted(round(cluster['latitude']) for cluster in self.clusters()), [41, 49])
+
+    def test_a_change_only_retires_the_tiles_over_it(self):
+        bbox = '2,48,14,53'
+        self.clusters(bbox, zoom=9)
+        moved = Space.objects.get(pk=self.berlin[0].pk)
+        moved.latitude += 0.001
+        moved.save()
+
+        with patch.object(geo, '_aggregate', wraps=geo._aggregate) as aggregate:
+            self.clusters(bbox, zoom=9)
+        self.assertEqual(aggregate.call_args.args[1], [geo.geohash_encode(52.5, 13.4, 3)])
+
+    @override_settings(MAP_TILE_VERSION_CACHE_SECONDS=0)
+    def test_changes_made_in_another_process_retire_the_tiles(self):
+        self.clusters()
+        # What a geocode job in run_jobs leaves behind: new coordinates and bumped versions, none of this cache touched
+        new_geohash = geo.geohash_encode(41.0, 28.97)
+        Space.objects.filter(pk=self.paris.pk).update(latitude=41.0, longitude=28.97, geohash=new_geohash)
+        for geohash in (self.paris.geohash, new_geohash):
+            region = geohash[:geo.TILE_VERSION_PRECISION]
+            MapTileVersion.objects.get_or_create(scope='spaces', region=region)
+            MapTileVersion.objects.filter(scope='spaces', region=region).update(version=F('version') + 1)
+        self.assertEqual(sorted(round(cluster['latitude']) for cluster in self.clusters()), [41, 53])
+
+    def test_node_clusters_are_per_space(self):
+        for i in range(4):
+            Node.objects.create(label=f'N{i}', created_by=self.user, space=self.paris, latitude=48.85, longitude=2.35 + i * 0.001)
+        Node.objects.create(label='Other', created_by=self.user, space=self.berlin[0], latitude=48.85, longitude=2.35)
+
+        response = self.client.get(f'/api/spaces/{self.paris.id}/nodes/map/', {'bbox': '2,48,3,49', 'zoom': 9})
+        self.assertEqual([cluster['count'] for cluster in response.data['clusters']], [4])
+
+    def test_viewport_too_large_for_the_zoom(self):
+        response = self.client.get('/api/spaces/map/', {'bbox': '-180,-90,180,90', 'zoom': 12})
+        self.assertEqual(response.status_code, 400)
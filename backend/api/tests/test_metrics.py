@@ -0,0 +1,208 @@
+import json
+import os
+import re
+import tempfile
+from unittest.mock import MagicMock, patch
+
+import requests
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APITestCase
+
+from api import http_client, metrics
+from api.authentication import issue_access_token
+from api.models import Space
+from api.neo4j_db import Neo4jConnection
+
+
+def sample(text, name, **labels):
+    """Value of one sample line in a /metrics body, or None."""
+    label_text = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    line = re.escape(f'{name}{{{label_text}}}' if labels else name)
+    match = re.search(rf'^{line} (\S+)$', text, re.M)
+    return float(match.group(1)) if match else None
+
+
+class RegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.registry = metrics.Registry()
+        self.counter = metrics.Counter(self.registry, 'jobs_total', 'Jobs.', ('kind',))
+        self.histogram = metrics.Histogram(self.registry, 'job_seconds', 'Job time.', ('kind',), buckets=(0.1, 1))
+
+    def test_text_format(self):
+        self.counter.inc(kind='a')
+        self.counter.inc(2, kind='a"b')
+        for value in (0.05, 0.5, 3):
+            self.histogram.observe(value, kind='a')
+
+        text = self.registry.render()
+        self.assertIn('# TYPE jobs_total counter', text)
+        self.assertEqual(sample(text, 'jobs_total', kind='a'), 1)
+        self.assertIn('jobs_total{kind="a\\"b"} 2', text)
+        self.assertIn('# TYPE job_seconds histogram', text)
+        self.assertEqual(sample(text, 'job_seconds_bucket', kind='a', le='0.1'), 1)
+        self.assertEqual(sample(text, 'job_seconds_bucket', kind='a', le='1'), 2)
+        self.assertEqual(sample(text, 'job_seconds_bucket', kind='a', le='+Inf'), 3)
+        self.assertEqual(sample(text, 'job_seconds_count', kind='a'), 3)
+        self.assertAlmostEqual(sample(text, 'job_seconds_sum', kind='a'), 3.55)
+
+    def test_processes_are_added_up(self):
+        self.counter.inc(kind='a')
+        self.histogram.observe(0.5, kind='a')
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            # Another worker's snapshot, and one being written
+            with open(os.path.join(directory, '1.json'), 'w') as f:
+                json.dump({'jobs_total': [[['a'], 4], [['b'], 1]], 'job_seconds': [[['a'], [1, 0, 0, 0.05]]]}, f)
+            with open(os.path.join(directory, '2.json'), 'w') as f:
+                f.write('{"jobs_')
+            text = self.registry.render()
+            self.assertTrue(os.path.exists(os.path.join(directory, f'{os.getpid()}.json')))
+
+        self.assertEqual(sample(text, 'jobs_total', kind='a'), 5)
+        self.assertEqual(sample(text, 'jobs_total', kind='b'), 1)
+        self.assertEqual(sample(text, 'job_seconds_bucket', kind='a', le='0.1'), 1)
+        self.assertEqual(sample(text, 'job_seconds_count', kind='a'), 2)
+
+
+class MetricsEndpointTests(APITestCase):
+    def setUp(self):
+        metrics.REGISTRY.reset()
+        self.user = User.objects.create_user(username='alice', password='pw')
+        self.client.force_authenticate(user=self.user)
+
+    def scrape(self):
+        with self.settings(METRICS_TOKEN='secret'):
+            response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        return response.content.decode()
+
+    def test_requests_are_recorded_per_route(self):
+        self.client.get('/api/spaces/')
+        self.client.get('/api/spaces/')
+        self.client.get('/api/spaces/999999/')
+        self.client.get('/no-such-page/')
+
+        text = self.scrape()
+        self.assertEqual(sample(text, 'http_requests_total', method='GET', route='space-list', status='200'), 2)
+        self.assertEqual(sample(text, 'http_requests_total', method='GET', route='space-detail', status='404'), 1)
+        self.assertEqual(sample(text, 'http_requests_total', method='GET', route='unmatched', status='404'), 1)
+        self.assertEqual(sample(text, 'http_request_duration_seconds_count', method='GET', route='space-list'), 2)
+        self.assertEqual(sample(text, 'http_request_db_queries_count', route='space-list'), 2)
+        self.assertGreater(sample(text, 'http_request_db_queries_sum', route='space-list'), 0)
+        self.assertGreater(sample(text, 'http_request_db_seconds_sum', route='space-list'), 0)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+
+    def test_closed_without_a_token_unless_debugging(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with self.settings(DEBUG=True):
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+    def test_neo4j_calls(self):
+        with patch.object(Neo4jConnection, 'get_driver', side_effect=RuntimeError('down')):
+            Neo4jConnection.create_node(1, 'A', 1)
+        driver = MagicMock()
+        with patch.object(Neo4jConnection, 'get_driver', return_value=driver):
+            Neo4jConnection.delete_node(1)
+
+        text = self.scrape()
+        self.assertEqual(sample(text, 'neo4j_call_errors_total', operation='create_node'), 1)
+        self.assertEqual(sample(text, 'neo4j_call_duration_seconds_count', operation='create_node'), 1)
+        self.assertEqual(sample(text, 'neo4j_call_duration_seconds_count', operation='delete_node'), 1)
+        self.assertIsNone(sample(text, 'neo4j_call_errors_total', operation='delete_node'))
+
+    @override_settings(OUTBOUND_HTTP_UPSTREAMS={'upstream.test': {'failure_threshold': 1, 'retries': 0}})
+    def test_outbound_calls(self):
+        ok = MagicMock(status_code=200)
+        with patch('requests.Session.request', return_value=ok):
+            http_client.get('http://upstream.test/a')
+        with patch('requests.Session.request', side_effect=requests.exceptions.ConnectionError('refused')):
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                http_client.get('http://upstream.test/b')
+        with self.assertRaises(http_client.CircuitOpenError):
+            http_client.get('http://upstream.test/c')
+        http_client.reset_clients()
+
+        text = self.scrape()
+        for outcome in ('200', 'error', 'circuit_open'):
+            self.assertEqual(sample(text, 'outbound_http_requests_total', host='upstream.test', outcome=outcome), 1)
+        self.assertEqual(sample(text, 'outbound_http_duration_seconds_count', host='upstream.test'), 2)
+
+    def test_dependency_time_is_collected_per_request(self):
+        stats, token = metrics.start_request()
+        try:
+            with patch.object(Neo4jConnection, 'get_driver', return_value=MagicMock()):
+                Neo4jConnection.update_node(1, {})
+                Neo4jConnection.update_edge(1, {})
+        finally:
+            metrics.end_request(token)
+        self.assertEqual(stats.get('neo4j')[0], 2)
+        self.assertIsNone(metrics.current_request())
+
+    def test_cache_counters(self):
+        metrics.record_cache('labels', hits=3, misses=1)
+        metrics.record_cache('labels', misses=True)
+        text = self.scrape()
+        self.assertEqual(sample(text, 'cache_requests_total', cache='labels', result='hit'), 3)
+        self.assertEqual(sample(text, 'cache_requests_total', cache='labels', result='miss'), 2)
+
+
+class ServerTimingTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='pw')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {issue_access_token(self.user)}')
+
+    def timings(self, response):
+        entries = {}
+        for entry in response['Server-Timing'].split(', '):
+            name, *params = entry.split(';')
+            entries[name] = dict(param.split('=', 1) for param in params)
+        return entries
+
+    def test_phases(self):
+        Space.objects.create(title='S', description='D', creator=self.user)
+        response = self.client.get('/api/spaces/')
+        timings = self.timings(response)
+        self.assertTrue({'auth', 'db', 'ser', 'render', 'app', 'total'} <= set(timings), timings)
+        self.assertEqual(timings['render']['desc'], '"JSON rendering"')
+        self.assertNotIn('neo4j', timings)
+        self.assertRegex(timings['db']['desc'], r'^"ORM \(\d+ calls?\)"$')
+        self.assertGreaterEqual(float(timings['total']['dur']), float(timings['db']['dur']))
+
+        # Without token claims, the IsAdmin check looks up the profile
+        self.client.credentials()
+        self.client.force_authenticate(user=self.user)
+        timings = self.timings(self.client.get('/api/request-profiles/'))
+        self.assertIn('perm', timings)
+
+    @override_settings(SLOW_REQUEST_MS=0)
+    def test_slow_requests_are_logged_with_their_top_sql(self):
+        Space.objects.create(title='S', description='D', creator=self.user)
+        with self.assertLogs('api.slow_requests', 'WARNING') as logs:
+            self.client.get('/api/spaces/')
+        record = json.loads(logs.records[0].getMessage().split(' ', 1)[1])
+        self.assertEqual((record['route'], record['status'], record['user_id']), ('space-list', 200, self.user.pk))
+        self.assertIn('db', record['phases'])
+        self.assertTrue(record['top_sql'])
+        self.assertTrue(all('ms' in row and 'calls' in row for row in record['top_sql']))
+        self.assertEqual(record['top_sql'], sorted(record['top_sql'], key=lambda row: row['ms'], reverse=True))
+
+    def test_nested_blocks_of_a_phase_count_once(self):
+        stats, token = metrics.start_request()
+        try:
+            with metrics.phase('serialize'):
+                with metrics.phase('serialize'):
+                    pass
+        finally:
+            metrics.end_request(token)
+        self.assertEqual(stats.get('serialize')[0], 1)
+
+    def test_fast_requests_are_not_logged(self):
+        with self.assertNoLogs('api.slow_requests'):
+            self.client.get('/api/spaces/')
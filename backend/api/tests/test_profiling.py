@@ -0,0 +1,91 @@
+import time
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth.models import User
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from api.models import Profile, RequestProfile, Space
+from api.neo4j_db import Neo4jConnection
+
+
+def slow_driver(seconds=0.03):
+    """Neo4j driver stand-in whose queries take ``seconds`` and return no records."""
+    def run(query, **params):
+        time.sleep(seconds)
+        result = MagicMock()
+        result.single.return_value = None
+        return result
+
+    driver = MagicMock()
+    driver.session.return_value.__enter__.return_value.run.side_effect = run
+    return driver
+
+
+@override_settings(PROFILER_INTERVAL_MS=1)
+class RequestProfilerTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='pw')
+        self.admin.profile.user_type = Profile.ADMIN
+        self.admin.profile.save()
+        self.user = User.objects.create_user(username='user', password='pw')
+        self.space = Space.objects.create(title='S', description='D', creator=self.admin)
+        self.search_url = f'/api/spaces/{self.space.id}/graph-search/'
+
+    def test_admin_requests_are_profiled_on_demand(self):
+        self.client.force_authenticate(user=self.admin)
+        with patch.object(Neo4jConnection, 'get_driver', return_value=slow_driver()):
+            response = self.client.get(self.search_url, {'q': 'berlin'}, HTTP_X_PROFILE='1', HTTP_X_REQUEST_ID='req-1')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Profile-Id'], 'req-1')
+        profile = RequestProfile.objects.get(request_id='req-1')
+        self.assertEqual((profile.method, profile.route, profile.user), ('GET', 'space-graph-search', self.admin))
+        self.assertGreaterEqual(profile.duration_ms, 30)
+        self.assertEqual(profile.cypher_count, 1)
+        self.assertIn('MATCH', profile.cypher[0]['query'])
+        self.assertGreaterEqual(profile.cypher[0]['ms'], 30)
+        self.assertEqual(profile.sql_count, len(profile.sql))
+        self.assertGreater(profile.samples, 0)
+        self.assertTrue(any('graph_search' in stack for stack, count in profile.stacks))
+
+        # A reused request id gets a fresh key
+        response = self.client.get('/api/spaces/', {'_profile': '1'}, HTTP_X_REQUEST_ID='req-1')
+        self.assertNotEqual(response['X-Profile-Id'], 'req-1')
+        self.assertEqual(RequestProfile.objects.get(request_id=response['X-Profile-Id']).route, 'space-list')
+
+    def test_nothing_is_recorded_without_the_flag_or_for_other_users(self):
+        self.client.force_authenticate(user=self.admin)
+        self.assertNotIn('X-Profile-Id', self.client.get('/api/spaces/'))
+        self.client.force_authenticate(user=self.user)
+        self.assertNotIn('X-Profile-Id', self.client.get('/api/spaces/', HTTP_X_PROFILE='1'))
+        self.client.force_authenticate(user=None)
+        self.assertNotIn('X-Profile-Id', self.client.get('/api/spaces/', HTTP_X_PROFILE='1'))
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(PROFILER_SLOW_MS=20, PROFILER_KEEP=2)
+    def test_slow_profiles_are_listed(self):
+        self.client.force_authenticate(user=self.admin)
+        with patch.object(Neo4jConnection, 'get_driver', return_value=slow_driver()):
+            slow = self.client.get(self.search_url, {'q': 'berlin'}, HTTP_X_PROFILE='1')['X-Profile-Id']
+        fast = self.client.get(self.search_url, HTTP_X_PROFILE='1')['X-Profile-Id']
+
+        response = self.client.get('/api/request-profiles/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['request_id'] for row in response.data['results']], [slow])
+        self.assertNotIn('sql', response.data['results'][0])
+        response = self.client.get('/api/request-profiles/', {'min_ms': 0})
+        self.assertEqual([row['request_id'] for row in response.data['results']], [fast, slow])
+
+        detail = self.client.get(f'/api/request-profiles/{slow}/')
+        self.assertEqual(detail.data['cypher_count'], 1)
+        self.assertIn('stacks', detail.data)
+        self.assertEqual(self.client.get('/api/request-profiles/missing/').status_code, 404)
+
+        # Only the newest PROFILER_KEEP are kept
+        self.client.get(self.search_url, HTTP_X_PROFILE='1')
+        self.assertEqual(RequestProfile.objects.count(), 2)
+        self.assertFalse(RequestProfile.objects.filter(request_id=slow).exists())
+
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.get('/api/request-profiles/').status_code, 403)
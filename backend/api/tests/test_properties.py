@@ -4,7 +4,8 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.contrib.auth.models import User
-from ..models import Space, Node, Property
+from .. import http_client, jobs
+from ..models import BackgroundJob, Space, Node, Property
 from ..wikidata import get_wikidata_properties
 
 class PropertyAPITests(APITestCase):
@@ -83,7 +84,7 @@ class PropertyAPITests(APITestCase):
 
 class WikidataUtilTests(APITestCase):
 
-    @patch('api.wikidata.requests.post')
+    @patch('api.http_client.post')
     def test_get_wikidata_properties_sparql(self, mock_post):
         mock_response = MagicMock()
         mock_response.status_code = 200
@@ -115,3 +116,69 @@ class WikidataUtilTests(APITestCase):
         self.assertEqual(prop['value']['text'], 'planet')
         self.assertEqual(prop['display'], 'instance of: planet')
         mock_post.assert_called_once()
+
+
+class NodeEnrichmentTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.space = Space.objects.create(title='Test Space', creator=self.user)
+        self.space.collaborators.add(self.user)
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('space-add-node', kwargs={'pk': self.space.pk})
+
+    def sparql_response(self):
+        response = MagicMock()
+        response.json.return_value = {'results': {'bindings': [{
+            'entity': {'type': 'uri', 'value': 'http://www.wikidata.org/entity/Q64'},
+            'statement': {'type': 'uri', 'value': 'http://www.wikidata.org/entity/statement/Q64-p31'},
+            'property': {'type': 'uri', 'value': 'http://www.wikidata.org/entity/P31'},
+            'propertyLabel': {'type': 'literal', 'value': 'instance of'},
+            'value': {'type': 'uri', 'value': 'http://www.wikidata.org/entity/Q515'},
+            'valueLabel': {'type': 'literal', 'value': 'city'},
+        }]}}
+        return response
+
+    @patch('api.http_client.post')
+    def test_add_node_defers_p31_to_a_job(self, mock_post):
+        mock_post.return_value = self.sparql_response()
+        data = {
+            'wikidata_entity': {'id': 'Q64', 'label': 'Berlin'},
+            'selected_properties': [
+                {'property': 'P625', 'statement_id': 'Q64$coords', 'value': 'Point(13.38 52.51)'},
+            ],
+        }
+        response = self.client.post(self.url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(response.data['enrichment_pending'])
+        mock_post.assert_not_called()
+        node = Node.objects.get(pk=response.data['node_id'])
+        self.assertEqual((node.latitude, node.longitude), (52.51, 13.38))
+        self.assertFalse(Property.objects.filter(node=node, property_id='P31').exists())
+
+        self.assertEqual(jobs.run_pending(kinds=['enrich_node']), (1, 0))
+        p31 = Property.objects.get(node=node, property_id='P31')
+        self.assertEqual((p31.value_id, p31.value_text), ('Q515', 'city'))
+        self.assertIn('VALUES ?property { wd:P31 }', mock_post.call_args.kwargs['data']['query'])
+        # The node has coordinates but no names: handed on to the reverse geocoder
+        self.assertTrue(BackgroundJob.objects.filter(kind='reverse_geocode_node', payload__node_id=node.pk).exists())
+
+    @patch('api.http_client.post')
+    def test_nothing_to_enrich(self, mock_post):
+        data = {
+            'wikidata_entity': {'id': 'Q64', 'label': 'Berlin'},
+            'selected_properties': [{'property': 'P31', 'statement_id': 'Q64$p31', 'value': {'id': 'Q515', 'text': 'city'}}],
+        }
+        response = self.client.post(self.url, data, format='json')
+        self.assertFalse(response.data['enrichment_pending'])
+        self.assertFalse(BackgroundJob.objects.exists())
+
+    @patch('api.http_client.post')
+    def test_failed_fetch_is_retried(self, mock_post):
+        mock_post.side_effect = http_client.UpstreamUnavailable('down')
+        self.client.post(self.url, {'wikidata_entity': {'id': 'Q64', 'label': 'Berlin'}}, format='json')
+
+        self.assertEqual(jobs.run_pending(), (0, 1))
+        queued = BackgroundJob.objects.get()
+        self.assertEqual(queued.status, BackgroundJob.STATUS_PENDING)
+        self.assertIn('Failed to fetch P31 for Q64', queued.last_error)
@@ -0,0 +1,134 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest.mock import MagicMock, patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import TestCase, override_settings
+
+from api import geocoding, metrics, singleflight, wikidata
+from api.models import GeocodeCacheEntry, WikidataSearchResult
+from api.singleflight import MISS, SharedFlight, flight_stats
+
+
+def _hold_lock(key, acquired, release):
+    """Hold the advisory lock for ``key`` on a separate connection, like another worker."""
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_lock(%s)', [singleflight._lock_id(key)])
+            acquired.set()
+            release.wait(5)
+            cursor.execute('SELECT pg_advisory_unlock(%s)', [singleflight._lock_id(key)])
+    finally:
+        connections.close_all()
+
+
+class SharedFlightTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.REGISTRY.reset()
+        self.flight = SharedFlight('test')
+
+    def hold(self, key):
+        acquired, release = threading.Event(), threading.Event()
+        worker = threading.Thread(target=_hold_lock, args=(key, acquired, release))
+        worker.start()
+        acquired.wait(5)
+        self.addCleanup(worker.join)
+        self.addCleanup(release.set)
+        return release
+
+    def test_concurrent_calls_in_a_process_share_one_execution(self):
+        gate = threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            gate.wait(5)
+            return 'value'
+
+        results = []
+
+        def call():
+            try:
+                results.append(self.flight.do('k', fetch, lookup=lambda: MISS))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        while not self.flight.in_flight('k'):
+            time.sleep(0.01)
+        time.sleep(0.05)
+        gate.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(shared for _result, shared in results), [False, True, True])
+        stats = flight_stats('test')
+        self.assertEqual((stats['leader'], stats['coalesced'], stats['collapsed']), (1, 2, 2))
+
+    def test_waits_for_another_worker_and_reuses_its_result(self):
+        release = self.hold('k')
+        cached = []
+        threading.Timer(0.2, lambda: (cached.append('theirs'), release.set())).start()
+
+        result = self.flight.do('k', lambda: 'mine', lookup=lambda: cached[0] if cached else MISS)
+
+        self.assertEqual(result, ('theirs', True))
+        self.assertEqual(flight_stats('test')['waited'], 1)
+
+    def test_calls_upstream_when_the_other_worker_failed(self):
+        release = self.hold('k')
+        threading.Timer(0.1, release.set).start()
+        self.assertEqual(self.flight.do('k', lambda: 'mine', lookup=lambda: MISS), ('mine', False))
+
+    @override_settings(SINGLEFLIGHT_LOCK_TIMEOUT=0.2)
+    def test_does_not_wait_forever(self):
+        self.hold('k')
+        self.assertEqual(self.flight.do('k', lambda: 'mine', lookup=lambda: MISS), ('mine', False))
+
+    def test_stats_command(self):
+        self.flight.do('k', lambda: 'value')
+        out = StringIO()
+        call_command('singleflight_stats', stdout=out)
+        self.assertIn('test: collapsed 0 of 1 calls', out.getvalue())
+        self.assertIn('wikidata_entity:', out.getvalue())
+
+        # Other workers' counts come from their metrics snapshots
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            with open(os.path.join(directory, '1.json'), 'w') as f:
+                json.dump({'singleflight_calls_total': [[['test', 'waited'], 3]]}, f)
+            call_command('singleflight_stats', stdout=out)
+        self.assertIn('test: collapsed 3 of 4 calls', out.getvalue())
+
+    def test_geocoder_reuses_a_result_stored_by_another_worker(self):
+        key = geocoding.address_key(None, None, 'Berlin', 'Germany')
+        release = self.hold(key)
+        # The other worker's answer, visible once its lock is released
+        GeocodeCacheEntry.objects.create(key=key, result={'latitude': 1.0, 'longitude': 2.0})
+        threading.Timer(0.1, release.set).start()
+
+        fetch = MagicMock()
+        self.assertEqual(geocoding._lookup_once(key, fetch), {'latitude': 1.0, 'longitude': 2.0})
+        fetch.assert_not_called()
+
+    def test_search_reuses_a_result_stored_by_another_worker(self):
+        key = wikidata._search_cache_key('berlin', 'item', 'en')
+        release = self.hold(key)
+        entry = {'results': [{'id': 'Q64', 'label': 'Berlin', 'description': '', 'url': ''}],
+                 'terms': [['berlin', 'q64']], 'complete': True}
+        WikidataSearchResult.objects.create(key=key, entry=entry)
+        threading.Timer(0.1, release.set).start()
+
+        with patch('api.http_client.get') as mock_get:
+            self.assertEqual(wikidata.search_entities('Berlin'), (entry['results'], 'COALESCED'))
+            mock_get.assert_not_called()
+        self.assertEqual(flight_stats('wikidata_search')['waited'], 1)
@@ -73,7 +73,7 @@ class SpaceAPITest(APITestCase):
         self.node1 = Node.objects.create(label='Node 1', created_by=self.user, space=self.space)
         self.node2 = Node.objects.create(label='Node 2', created_by=self.user, space=self.space)
 
-    @patch('requests.get')
+    @patch('api.http_client.get')
     def test_wikidata_property_search(self, mock_get):
         mock_get.return_value.status_code = 200
         mock_get.return_value.json.return_value = {
@@ -0,0 +1,249 @@
+import json
+import sys
+from unittest.mock import MagicMock, patch
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APITestCase
+
+from api import jobs, llm, summaries
+from api.models import BackgroundJob, Discussion, Edge, Node, Property, Space, SpaceSummary
+
+
+class FailingProvider(llm.SummaryProvider):
+    def stream(self, prompt):
+        yield '### Overview\n'
+        raise RuntimeError('model unavailable')
+
+
+def parse_events(chunks):
+    events = []
+    for block in b''.join(chunks).decode().strip().split('\n\n'):
+        name, data = block.split('\n')
+        events.append((name[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+class SpaceSummaryTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='pw')
+        self.space = Space.objects.create(title='Berlin Walls', description='D', creator=self.user)
+        self.space.collaborators.add(self.user)
+        self.client.force_authenticate(user=self.user)
+        self.url = f'/api/spaces/{self.space.id}/summarize/'
+        self.status_url = f'/api/spaces/{self.space.id}/summary/'
+
+    def add_node(self, label):
+        return Node.objects.create(label=label, created_by=self.user, space=self.space)
+
+    def test_summary_is_generated_in_the_background_and_cached(self):
+        a, b = self.add_node('A'), self.add_node('B')
+        Edge.objects.create(source=a, target=b, relation_property='knows')
+
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertEqual(self.client.get(self.status_url, {'summary_id': response.data['summary_id']}).status_code, 202)
+
+        self.assertEqual(jobs.run_pending(), (1, 0))
+        response = self.client.get(self.status_url, {'summary_id': response.data['summary_id']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['model_used'], 'stub')
+        self.assertIn('Title: Berlin Walls', response.data['summary'])
+        self.assertEqual(response.data['metadata'], {
+            'node_count': 2, 'edge_count': 1, 'discussion_count': 0, 'collaborator_count': 1,
+            'prompt_tokens': response.data['metadata']['prompt_tokens'],
+        })
+
+        # Unchanged content: answered from the stored summary, nothing queued
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(BackgroundJob.objects.filter(kind='summarize_space').count(), 1)
+
+    def test_content_changes_invalidate_the_summary(self):
+        node = self.add_node('A')
+        versions = [Space.objects.get(pk=self.space.pk).content_version]
+
+        def changed():
+            versions.append(Space.objects.get(pk=self.space.pk).content_version)
+            return versions[-1] > versions[-2]
+
+        Property.objects.create(node=node, property_id='P31', statement_id='s1')
+        self.assertTrue(changed())
+        Discussion.objects.create(space=self.space, user=self.user, text='hi')
+        self.assertTrue(changed())
+        self.space.tags.create(name='history')
+        self.assertTrue(changed())
+        self.space.title = 'Renamed'
+        self.space.save()
+        self.assertTrue(changed())
+        self.space.report_count = 1
+        self.space.save(update_fields=['report_count'])
+        self.assertFalse(changed())
+
+    def test_saving_a_stale_instance_keeps_the_version(self):
+        stale = Space.objects.get(pk=self.space.pk)
+        self.add_node('A')
+        version = Space.objects.get(pk=self.space.pk).content_version
+        stale.description = 'New description'
+        stale.save()
+        self.assertEqual(Space.objects.get(pk=self.space.pk).content_version, version + 1)
+
+    def test_new_version_replaces_the_old_summary(self):
+        self.client.post(self.url)
+        jobs.run_pending()
+        self.add_node('A')
+
+        response = self.client.post(self.url)
+        self.assertEqual(response.status_code, 202)
+        # Until the new one is done, the latest finished summary is still served
+        self.assertEqual(self.client.get(self.status_url).status_code, 202)
+        jobs.run_pending()
+        self.assertEqual(self.client.get(self.status_url).data['metadata']['node_count'], 1)
+        self.assertEqual(SpaceSummary.objects.filter(space=self.space).count(), 1)
+
+    @override_settings(SPACE_SUMMARY_PROVIDER='api.tests.test_summaries.FailingProvider')
+    def test_failures_are_reported_and_can_be_retried(self):
+        summary_id = self.client.post(self.url).data['summary_id']
+        self.assertEqual(jobs.run_pending(), (0, 1))
+
+        response = self.client.get(self.status_url, {'summary_id': summary_id})
+        self.assertEqual(response.data['status'], 'failed')
+        self.assertIn('model unavailable', response.data['error'])
+
+        with self.settings(SPACE_SUMMARY_PROVIDER='stub'):
+            self.assertEqual(self.client.post(self.url).data['status'], 'pending')
+            BackgroundJob.objects.update(run_after=BackgroundJob.objects.get().created_at)
+            jobs.run_pending()
+        self.assertEqual(self.client.get(self.status_url).data['status'], 'done')
+
+    def test_no_summary_yet(self):
+        self.assertEqual(self.client.get(self.status_url).status_code, 404)
+
+    def test_prompt_is_built_with_a_fixed_number_of_queries(self):
+        nodes = [self.add_node(f'N{i}') for i in range(40)]
+        hub = nodes[0]
+        for node in nodes[1:]:
+            Edge.objects.create(source=hub, target=node, relation_property='links')
+            Property.objects.create(node=node, property_id='P31', statement_id=f's{node.id}', value_text='thing')
+        space = Space.objects.select_related('creator').get(pk=self.space.pk)
+
+        with self.assertNumQueries(7):
+            prompt, metadata = summaries.build_space_prompt(space)
+
+        self.assertEqual((metadata['node_count'], metadata['edge_count']), (40, 39))
+        self.assertIn('- N0 (N/A) [39 connections]: No properties', prompt)
+        self.assertEqual(prompt.count(' → [links] → '), summaries.PROMPT_EDGES)
+
+    def test_prompt_is_trimmed_to_the_token_budget_least_connected_first(self):
+        hub, spoke = self.add_node('Hub'), self.add_node('Spoke')
+        others = [self.add_node(f'N{i}') for i in range(5)]
+        leaf = self.add_node('Leaf')
+        for node in [spoke] + others:
+            Edge.objects.create(source=hub, target=node, relation_property='links')
+        Edge.objects.create(source=spoke, target=leaf, relation_property='knows')
+        space = Space.objects.select_related('creator').get(pk=self.space.pk)
+
+        full, metadata = summaries.build_space_prompt(space)
+        self.assertIn('- Leaf (N/A) [1 connections]', full)
+        budget = metadata['prompt_tokens'] - 10
+        trimmed, metadata = summaries.build_space_prompt(space, token_budget=budget)
+        self.assertLessEqual(metadata['prompt_tokens'], budget)
+        self.assertNotIn('- Leaf (N/A)', trimmed)
+        self.assertIn('- Hub (N/A) [6 connections]', trimmed)
+        self.assertIn('Spoke → [knows] → Leaf', trimmed)
+
+        # With no room for any of them, only the space itself is described
+        bare, _ = summaries.build_space_prompt(space, token_budget=1)
+        self.assertIn('No nodes yet', bare)
+        self.assertIn('No edges yet', bare)
+        self.assertIn('- Total Nodes: 8', bare)
+
+    def test_partial_output_is_streamed(self):
+        summary_id = self.client.post(self.url).data['summary_id']
+        SpaceSummary.objects.filter(pk=summary_id).update(status=SpaceSummary.STATUS_RUNNING, summary='### Over')
+        progress = iter([
+            {'summary': '### Overview\n- Title'},
+            {'summary': '### Overview\n- Title', 'status': SpaceSummary.STATUS_DONE, 'model_used': 'stub'},
+        ])
+
+        def job_writes(seconds):
+            SpaceSummary.objects.filter(pk=summary_id).update(**next(progress))
+
+        with patch('api.summaries.time.sleep', side_effect=job_writes):
+            response = self.client.get(f'{self.status_url}stream/', {'summary_id': summary_id}, HTTP_ACCEPT='text/event-stream')
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            events = parse_events(response.streaming_content)
+
+        self.assertEqual(events, [
+            ('delta', {'text': '### Over'}),
+            ('delta', {'text': 'view\n- Title'}),
+            ('done', {'model_used': 'stub', 'metadata': {}}),
+        ])
+        self.assertEqual(self.client.get(f'{self.status_url}stream/', {'summary_id': 0}).status_code, 404)
+
+    def test_streams_end_after_a_window_and_resume_from_an_offset(self):
+        summary_id = self.client.post(self.url).data['summary_id']
+        SpaceSummary.objects.filter(pk=summary_id).update(status=SpaceSummary.STATUS_RUNNING, summary='### Over')
+
+        clock = iter(range(0, 100, summaries.STREAM_WINDOW_SECONDS))
+        with patch('api.summaries.time.monotonic', side_effect=lambda: next(clock)), patch('api.summaries.time.sleep'):
+            response = self.client.get(f'{self.status_url}stream/', {'summary_id': summary_id})
+            self.assertEqual(parse_events(response.streaming_content), [
+                ('delta', {'text': '### Over'}),
+                ('pending', {'offset': 8}),
+            ])
+
+        SpaceSummary.objects.filter(pk=summary_id).update(status=SpaceSummary.STATUS_DONE, summary='### Overview')
+        response = self.client.get(f'{self.status_url}stream/', {'summary_id': summary_id, 'offset': 8})
+        self.assertEqual(parse_events(response.streaming_content), [
+            ('delta', {'text': 'view'}),
+            ('done', {'model_used': '', 'metadata': {}}),
+        ])
+        response = self.client.get(f'{self.status_url}stream/', {'summary_id': summary_id, 'offset': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(SPACE_SUMMARY_PROVIDER='api.tests.test_summaries.FailingProvider')
+    def test_failures_end_the_stream(self):
+        summary_id = self.client.post(self.url).data['summary_id']
+        jobs.run_pending()
+        response = self.client.get(f'{self.status_url}stream/', {'summary_id': summary_id})
+        self.assertEqual(parse_events(response.streaming_content), [
+            ('error', {'error': 'Failed to generate summary: model unavailable'}),
+        ])
+
+
+class SummaryProviderTests(SimpleTestCase):
+    PROMPT = '**Space Information:**\n- Title: Walls\n- Creator: alice\n- Total Nodes: 3\n- Total Edges: 2\n'
+
+    def test_stub_is_deterministic(self):
+        provider = llm.get_provider('stub')
+        text = provider.generate(self.PROMPT)
+        self.assertEqual(text, '### Overview\n- Title: Walls\n- Total Nodes: 3\n- Total Edges: 2\n')
+        self.assertEqual(llm.get_provider('stub').generate(self.PROMPT), text)
+        self.assertEqual(provider.model_used, 'stub')
+
+    def test_gemini_falls_back_to_lite_when_out_of_quota(self):
+        def model(name):
+            if name == llm.GeminiProvider.MODEL:
+                raise RuntimeError('429 Resource has been exhausted (e.g. check quota)')
+            instance = MagicMock()
+            instance.generate_content.return_value = [MagicMock(text='Hello '), MagicMock(text='world')]
+            return instance
+
+        genai = MagicMock()
+        genai.GenerativeModel.side_effect = model
+        provider = llm.get_provider('gemini')
+        with patch.object(llm.GeminiProvider, '_genai', return_value=genai):
+            self.assertEqual(provider.generate('prompt'), 'Hello world')
+        self.assertEqual(provider.model_used, llm.GeminiProvider.FALLBACK_MODEL)
+
+    def test_sdk_is_not_imported_at_startup(self):
+        self.assertNotIn('google.generativeai', sys.modules)
+
+    def test_incomplete_providers_fail_when_created(self):
+        class NoStream(llm.SummaryProvider):
+            name = 'incomplete'
+
+        with self.assertRaises(TypeError):
+            NoStream()
@@ -1,7 +1,21 @@
-from unittest.mock import patch
+import json
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch, MagicMock
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.utils import timezone
+
+from api import metrics, wikidata
+from api.models import Node, Property, Space, WikidataEntity
 
 
 class WikidataAPITests(APITestCase):
@@ -9,7 +23,7 @@ class WikidataAPITests(APITestCase):
         # Authenticate to satisfy default IsAuthenticated requirement
         self.user = User.objects.create_user(username='tester', password='pw')
         self.client.login(username='tester', password='pw')
-    @patch('api.views.requests.get')
+    @patch('api.http_client.get')
     def test_wikidata_search_success(self, mock_get):
         mock_get.return_value.status_code = 200
         mock_get.return_value.json.return_value = {
@@ -57,3 +71,465 @@ class WikidataAPITests(APITestCase):
         # Should include an X-Cache header; initial call should be a MISS
         self.assertIn('X-Cache', resp)
         self.assertEqual(resp['X-Cache'], 'MISS')
+
+    @patch('api.views.get_wikidata_properties')
+    def test_wikidata_entity_properties_rejects_invalid_ids(self, mock_get_props):
+        resp = self.client.get('/api/spaces/wikidata-entity-properties/Q1;DROP/')
+        self.assertEqual(resp.status_code, status.HTTP_400_BAD_REQUEST)
+        mock_get_props.assert_not_called()
+
+
+def _sparql_response(label='human'):
+    response = MagicMock()
+    response.json.return_value = {
+        'results': {
+            'bindings': [
+                {
+                    'statement': {'type': 'uri', 'value': 'http://www.wikidata.org/entity/statement/Q937-abc'},
+                    'property': {'type': 'uri', 'value': 'http://www.wikidata.org/entity/P31'},
+                    'propertyLabel': {'type': 'literal', 'value': 'instance of'},
+                    'value': {'type': 'uri', 'value': 'http://www.wikidata.org/entity/Q5'},
+                    'valueLabel': {'type': 'literal', 'value': label},
+                }
+            ]
+        }
+    }
+    return response
+
+
+def _revision_response(revision):
+    response = MagicMock()
+    response.json.return_value = {'entities': {'Q937': {'lastrevid': revision}}}
+    return response
+
+
+class WikidataEntityCacheTests(APITestCase):
+    def setUp(self):
+        wikidata.clear_entity_lru()
+        self.addCleanup(wikidata.clear_entity_lru)
+        self.user = User.objects.create_user(username='tester', password='pw')
+        self.client.login(username='tester', password='pw')
+
+    def _age(self, seconds):
+        WikidataEntity.objects.filter(qid='Q937').update(fetched_at=timezone.now() - timedelta(seconds=seconds))
+        wikidata.clear_entity_lru()
+
+    @patch('api.http_client.post')
+    def test_miss_is_stored_and_served_from_both_tiers(self, mock_post):
+        mock_post.return_value = _sparql_response()
+
+        properties = wikidata.get_wikidata_properties('Q937')
+        self.assertEqual(properties[0]['value']['text'], 'human')
+        self.assertTrue(WikidataEntity.objects.filter(qid='Q937').exists())
+
+        with self.assertNumQueries(0):
+            self.assertEqual(wikidata.get_wikidata_properties('Q937'), properties)
+
+        wikidata.clear_entity_lru()
+        self.assertEqual(wikidata.get_wikidata_properties('Q937'), properties)
+        mock_post.assert_called_once()
+
+    @patch('api.http_client.get')
+    @patch('api.http_client.post')
+    def test_stale_entry_revalidates_by_revision(self, mock_post, mock_get):
+        WikidataEntity.objects.create(qid='Q937', properties=['old'], etag='100')
+        self._age(2 * wikidata.ENTITY_CACHE_TIME)
+
+        mock_get.return_value = _revision_response(100)
+        self.assertEqual(wikidata.get_wikidata_properties('Q937'), ['old'])
+        mock_post.assert_not_called()
+        self.assertEqual(wikidata.entity_cache_status('Q937'), 'HIT')
+
+        self._age(2 * wikidata.ENTITY_CACHE_TIME)
+        mock_get.return_value = _revision_response(101)
+        mock_post.return_value = _sparql_response('person')
+        wikidata.get_wikidata_properties('Q937')
+        entity = WikidataEntity.objects.get(qid='Q937')
+        self.assertEqual(entity.etag, '101')
+        self.assertEqual(entity.properties[0]['value']['text'], 'person')
+
+    @patch('api.http_client.post')
+    def test_expired_entry_is_refetched_inline_and_kept_on_failure(self, mock_post):
+        WikidataEntity.objects.create(qid='Q937', properties=['old'])
+        self._age(60 * wikidata.ENTITY_CACHE_TIME)
+
+        mock_post.side_effect = wikidata.requests.exceptions.ConnectionError('down')
+        self.assertEqual(wikidata.get_wikidata_properties('Q937'), ['old'])
+
+        mock_post.side_effect = None
+        mock_post.return_value = _sparql_response()
+        self.assertEqual(wikidata.get_wikidata_properties('Q937')[0]['property'], 'P31')
+
+    @override_settings(WIKIDATA_REFRESH_IN_BACKGROUND=True)
+    def test_background_refresh_does_not_block_the_request(self):
+        WikidataEntity.objects.create(qid='Q937', properties=['old'])
+        self._age(2 * wikidata.ENTITY_CACHE_TIME)
+        release = threading.Event()
+        started = threading.Event()
+
+        def slow_refresh(entity_id):
+            started.set()
+            release.wait(5)
+
+        with patch('api.wikidata.refresh_entity', side_effect=slow_refresh) as mock_refresh:
+            self.assertEqual(wikidata.get_wikidata_properties('Q937'), ['old'])
+            self.assertTrue(started.wait(5))
+            # A second stale read while the refresh is running doesn't start another one
+            wikidata.get_wikidata_properties('Q937')
+            release.set()
+        mock_refresh.assert_called_once_with('Q937')
+
+    def test_entity_properties_endpoint_reports_hit(self):
+        WikidataEntity.objects.create(qid='Q937', properties=[{'property': 'P31'}])
+        resp = self.client.get('/api/spaces/wikidata-entity-properties/Q937/')
+        self.assertEqual(resp.status_code, status.HTTP_200_OK)
+        self.assertEqual(resp['X-Cache'], 'HIT')
+        self.assertEqual(resp.data, [{'property': 'P31'}])
+
+
+class WikidataLabelTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        patcher = patch('api.http_client.get', side_effect=self._wbgetentities)
+        self.mock_get = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _wbgetentities(self, url, params, **kwargs):
+        ids = params['ids'].split('|')
+        self.assertLessEqual(len(ids), wikidata.LABEL_CHUNK_SIZE)
+        response = MagicMock()
+        response.json.return_value = {
+            'entities': {
+                entity_id: ({'labels': {}} if entity_id == 'P999' else {'labels': {'en': {'value': f'label {entity_id}'}}})
+                for entity_id in ids
+            }
+        }
+        return response
+
+    def test_labels_are_cached_per_id(self):
+        self.assertEqual(wikidata.get_property_labels(['P31', 'P17']), {'P31': 'label P31', 'P17': 'label P17'})
+        self.assertEqual(self.mock_get.call_count, 1)
+
+        labels = wikidata.get_property_labels(['P17', 'P31', 'P31'])
+        self.assertEqual(labels, {'P17': 'label P17', 'P31': 'label P31'})
+        self.assertEqual(self.mock_get.call_count, 1)
+
+    def test_misses_are_fetched_in_chunks(self):
+        wikidata.get_property_labels(['P1', 'P2'])
+        ids = [f'P{i}' for i in range(1, 121)] + ['P999']
+
+        labels = wikidata.get_property_labels(ids)
+
+        self.assertEqual(len(labels), 121)
+        self.assertEqual(labels['P120'], 'label P120')
+        self.assertEqual(labels['P999'], 'Property 999')
+        # 1 earlier call + 119 misses in chunks of 50
+        self.assertEqual(self.mock_get.call_count, 1 + 3)
+
+    def test_failed_chunks_fall_back_without_caching(self):
+        self.mock_get.side_effect = wikidata.requests.exceptions.Timeout('slow')
+        self.assertEqual(wikidata.get_property_labels(['P31']), {'P31': 'Property 31'})
+
+        self.mock_get.side_effect = self._wbgetentities
+        self.assertEqual(wikidata.get_property_labels(['P31']), {'P31': 'label P31'})
+
+
+def _search_item(entity_id, label, aliases=()):
+    return {
+        'id': entity_id,
+        'label': label,
+        'description': f'about {label}',
+        'url': f'https://www.wikidata.org/wiki/{entity_id}',
+        'aliases': list(aliases),
+        'match': {'type': 'label', 'language': 'en', 'text': label},
+    }
+
+
+class WikidataSearchCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.REGISTRY.reset()
+        self.user = User.objects.create_user(username='tester', password='pw')
+        self.client.login(username='tester', password='pw')
+        self.items = [
+            _search_item('Q64', 'Berlin'),
+            _search_item('Q152087', 'Berlingo'),
+            _search_item('Q3933', 'Berliner Mauer', aliases=['Berlin Wall']),
+            _search_item('Q1', 'Berlusconi'),
+        ]
+        patcher = patch('api.http_client.get', side_effect=self._wbsearchentities)
+        self.mock_get = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _wbsearchentities(self, url, params, **kwargs):
+        query = params['search'].casefold()
+        items = [item for item in self.items if item['label'].casefold().startswith(query)]
+        response = MagicMock()
+        response.json.return_value = {'search': items[:params['limit']]}
+        return response
+
+    def test_repeated_search_is_cached_and_normalized(self):
+        resp = self.client.get('/api/spaces/wikidata-search/', {'q': 'Berlin'})
+        self.assertEqual(resp['X-Cache'], 'MISS')
+        self.assertEqual(self.mock_get.call_args.kwargs['params']['limit'], 20)
+
+        resp = self.client.get('/api/spaces/wikidata-search/', {'q': '  berlin '})
+        self.assertEqual(resp['X-Cache'], 'HIT')
+        self.assertEqual([item['id'] for item in resp.data], ['Q64', 'Q152087', 'Q3933'])
+        self.assertEqual(self.mock_get.call_count, 1)
+
+        # Property searches are cached separately
+        self.client.get('/api/spaces/wikidata-property-search/', {'q': 'Berlin'})
+        self.assertEqual(self.mock_get.call_count, 2)
+
+    def test_complete_prefix_answers_longer_queries(self):
+        self.client.get('/api/spaces/wikidata-search/', {'q': 'berl'})
+
+        resp = self.client.get('/api/spaces/wikidata-search/', {'q': 'Berlin W'})
+        self.assertEqual(resp['X-Cache'], 'PREFIX')
+        # Matched through the alias
+        self.assertEqual([item['id'] for item in resp.data], ['Q3933'])
+        self.assertEqual(self.mock_get.call_count, 1)
+
+    @override_settings(WIKIDATA_SEARCH_LIMIT=2)
+    def test_truncated_prefix_is_not_reused(self):
+        self.client.get('/api/spaces/wikidata-search/', {'q': 'berl'})
+        resp = self.client.get('/api/spaces/wikidata-search/', {'q': 'berlu'})
+        self.assertEqual(resp['X-Cache'], 'MISS')
+        self.assertEqual([item['id'] for item in resp.data], ['Q1'])
+
+    def test_failures_are_not_cached(self):
+        self.mock_get.side_effect = wikidata.requests.exceptions.ConnectionError('down')
+        resp = self.client.get('/api/spaces/wikidata-search/', {'q': 'berlin'})
+        self.assertEqual(resp.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        self.mock_get.side_effect = self._wbsearchentities
+        resp = self.client.get('/api/spaces/wikidata-search/', {'q': 'berlin'})
+        self.assertEqual(resp['X-Cache'], 'MISS')
+
+    def test_identical_concurrent_searches_are_coalesced(self):
+        release = threading.Event()
+
+        def slow_search(*args, **kwargs):
+            release.wait(5)
+            return self._wbsearchentities(*args, **kwargs)
+
+        self.mock_get.side_effect = slow_search
+        statuses = []
+
+        def search():
+            try:
+                statuses.append(wikidata.search_entities('berlin')[1])
+            finally:
+                connection.close()
+
+        leader = threading.Thread(target=search)
+        leader.start()
+        key = wikidata._search_cache_key('berlin', 'item', 'en')
+        while not wikidata._search_flight.in_flight(key):
+            threading.Event().wait(0.01)
+
+        # Must not be answered from the cache, which is only filled once the leader is done
+        with patch.object(wikidata.cache, 'get_many', return_value={}):
+            follower = threading.Thread(target=search)
+            follower.start()
+            threading.Event().wait(0.1)
+            release.set()
+            follower.join(5)
+        leader.join(5)
+
+        self.assertEqual(sorted(statuses), ['COALESCED', 'MISS'])
+        self.assertEqual(self.mock_get.call_count, 1)
+
+    def test_hit_rate_is_reported(self):
+        for query in ('berl', 'berl', 'berlin', 'zzz'):
+            wikidata.search_entities(query)
+        stats = wikidata.search_cache_stats()
+        self.assertEqual((stats['hit'], stats['prefix'], stats['miss']), (1, 1, 2))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+        out = StringIO()
+        call_command('wikidata_search_stats', stdout=out)
+        self.assertIn('Hit rate 50.0% over 4 searches', out.getvalue())
+
+        # Other workers' counts come from their metrics snapshots
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            with open(os.path.join(directory, '1.json'), 'w') as f:
+                json.dump({'cache_requests_total': [[['wikidata_search', 'miss'], 4]]}, f)
+            call_command('wikidata_search_stats', stdout=out)
+        self.assertIn('Hit rate 25.0% over 8 searches', out.getvalue())
+
+
+def _batch_sparql_response(query_data):
+    """P31 bindings for every entity in the query's VALUES clause, except Q3."""
+    query = query_data['query']
+    entity_ids = query.split('VALUES ?entity {')[1].split('}')[0].replace('wd:', '').split()
+    bindings = [
+        {
+            'entity': {'type': 'uri', 'value': f'http://www.wikidata.org/entity/{entity_id}'},
+            'statement': {'type': 'uri', 'value': f'http://www.wikidata.org/entity/statement/{entity_id}-p31'},
+            'property': {'type': 'uri', 'value': 'http://www.wikidata.org/entity/P31'},
+            'propertyLabel': {'type': 'literal', 'value': 'instance of'},
+            'value': {'type': 'uri', 'value': 'http://www.wikidata.org/entity/Q5'},
+            'valueLabel': {'type': 'literal', 'value': 'human'},
+        }
+        for entity_id in entity_ids if entity_id != 'Q3'
+    ]
+    response = MagicMock()
+    response.json.return_value = {'results': {'bindings': bindings}}
+    return response
+
+
+class WikidataBatchFetchTests(APITestCase):
+    def setUp(self):
+        wikidata.clear_entity_lru()
+        self.addCleanup(wikidata.clear_entity_lru)
+        self.user = User.objects.create_user(username='tester', password='pw')
+        patcher = patch('api.http_client.post', side_effect=lambda url, data, **kwargs: _batch_sparql_response(data))
+        self.mock_post = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_entities_are_fetched_in_chunks(self):
+        with patch.object(wikidata, 'SPARQL_BATCH_SIZE', 2):
+            results = wikidata.get_wikidata_properties_many(['Q1', 'Q2', 'Q3', 'Q1'], property_filter=['P31'])
+
+        self.assertEqual(self.mock_post.call_count, 2)
+        self.assertIn('VALUES ?property { wd:P31 }', self.mock_post.call_args.kwargs['data']['query'])
+        self.assertEqual(results['Q1'][0]['value'], {'type': 'entity', 'id': 'Q5', 'text': 'human'})
+        self.assertEqual(results['Q3'], [])
+        # Filtered results are partial, so they are not cached
+        self.assertFalse(WikidataEntity.objects.exists())
+
+    def test_cached_entities_are_not_refetched(self):
+        WikidataEntity.objects.create(qid='Q1', properties=[{'property': 'P17'}, {'property': 'P31'}], fetched_at=timezone.now())
+
+        results = wikidata.get_wikidata_properties_many(['Q1', 'Q2'], property_filter=['P31'])
+
+        self.assertEqual(results['Q1'], [{'property': 'P31'}])
+        self.assertIn('{ wd:Q2 }', self.mock_post.call_args.kwargs['data']['query'])
+        self.assertEqual(self.mock_post.call_count, 1)
+
+    def test_cached_entities_are_loaded_in_one_query(self):
+        for qid in ('Q1', 'Q2', 'Q3'):
+            WikidataEntity.objects.create(qid=qid, properties=[{'property': 'P31'}], fetched_at=timezone.now())
+
+        with self.assertNumQueries(1):
+            results = wikidata.get_wikidata_properties_many(['Q1', 'Q2', 'Q3'])
+
+        self.assertEqual(sorted(results), ['Q1', 'Q2', 'Q3'])
+        self.mock_post.assert_not_called()
+
+    def test_failed_chunks_are_left_out(self):
+        self.mock_post.side_effect = wikidata.http_client.UpstreamUnavailable('down')
+        self.assertEqual(wikidata.get_wikidata_properties_many(['Q1']), {})
+
+    def test_fetch_missing_p31_command(self):
+        space = Space.objects.create(title='S', description='D', creator=self.user)
+        missing = Node.objects.create(label='A', wikidata_id='Q1', created_by=self.user, space=space)
+        broken = Node.objects.create(label='B', wikidata_id='Q2', created_by=self.user, space=space)
+        Property.objects.create(node=broken, property_id='P31', statement_id='Q2-p31', value_id='')
+        no_type = Node.objects.create(label='C', wikidata_id='Q3', created_by=self.user, space=space)
+        done = Node.objects.create(label='D', wikidata_id='Q4', created_by=self.user, space=space)
+        Property.objects.create(node=done, property_id='P31', statement_id='Q4-p31', value_id='Q5')
+        Node.objects.create(label='E', created_by=self.user, space=space)
+
+        out = StringIO()
+        call_command('fetch_missing_p31', '--dry-run', stdout=out)
+        self.assertIn('Found 2 nodes without P31 properties', out.getvalue())
+        self.assertIn('Found 1 nodes with P31 properties but missing value data', out.getvalue())
+        self.mock_post.assert_not_called()
+
+        out = StringIO()
+        call_command('fetch_missing_p31', stdout=out)
+        self.assertEqual(self.mock_post.call_count, 1)
+        self.assertIn('P31 properties added: 1', out.getvalue())
+        self.assertIn('Broken P31 properties fixed: 1', out.getvalue())
+        self.assertIn('Nodes without P31: 1', out.getvalue())
+        self.assertEqual(missing.node_properties.get().value_id, 'Q5')
+        self.assertEqual(broken.node_properties.get().value_text, 'human')
+        self.assertFalse(no_type.node_properties.exists())
+
+
+def _summary_response():
+    response = MagicMock()
+    response.json.return_value = {'results': {'bindings': [
+        {
+            'property': {'type': 'uri', 'value': f'http://www.wikidata.org/entity/{prop_id}'},
+            'propertyLabel': {'type': 'literal', 'value': label},
+            'count': {'type': 'literal', 'value': count},
+        }
+        for prop_id, label, count in (('P1082', 'population', '40'), ('P31', 'instance of', '3'))
+    ]}}
+    return response
+
+
+class WikidataPropertyPickerTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        wikidata.clear_entity_lru()
+        self.addCleanup(wikidata.clear_entity_lru)
+        self.user = User.objects.create_user(username='tester', password='pw')
+        self.client.force_authenticate(user=self.user)
+
+    @patch('api.http_client.post')
+    def test_summary_is_cached(self, mock_post):
+        mock_post.return_value = _summary_response()
+        url = '/api/spaces/wikidata-entity-property-summary/Q183/'
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data, [
+            {'property': 'P31', 'property_label': 'instance of', 'count': 3},
+            {'property': 'P1082', 'property_label': 'population', 'count': 40},
+        ])
+        self.assertIn('COUNT(?statement)', mock_post.call_args.kwargs['data']['query'])
+
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        self.assertEqual(mock_post.call_count, 1)
+
+    @patch('api.http_client.post')
+    def test_values_are_paged_and_cached_per_page(self, mock_post):
+        mock_post.return_value = _sparql_response()
+        url = '/api/spaces/wikidata-entity-property-values/Q937/P31/'
+
+        response = self.client.get(url, {'page': 3, 'page_size': 10})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['page'], 3)
+        self.assertFalse(response.data['has_more'])
+        self.assertEqual(response.data['results'][0]['value']['id'], 'Q5')
+        query = mock_post.call_args.kwargs['data']['query']
+        self.assertIn('BIND(wd:P31 AS ?property)', query)
+        self.assertIn('LIMIT 11 OFFSET 20', query)
+
+        self.assertEqual(self.client.get(url, {'page': 3, 'page_size': 10})['X-Cache'], 'HIT')
+        self.client.get(url, {'page': 4, 'page_size': 10})
+        self.assertEqual(mock_post.call_count, 2)
+
+    @patch('api.http_client.post')
+    def test_cached_entities_are_answered_locally(self, mock_post):
+        properties = [
+            {'statement_id': f'Q937-{i}', 'property': 'P31', 'property_label': 'instance of', 'value': str(i)}
+            for i in range(3)
+        ]
+        WikidataEntity.objects.create(qid='Q937', properties=properties, fetched_at=timezone.now())
+
+        summary = self.client.get('/api/spaces/wikidata-entity-property-summary/Q937/').data
+        self.assertEqual(summary, [{'property': 'P31', 'property_label': 'instance of', 'count': 3}])
+        page = self.client.get('/api/spaces/wikidata-entity-property-values/Q937/P31/', {'page_size': 2}).data
+        self.assertTrue(page['has_more'])
+        self.assertEqual([value['value'] for value in page['results']], ['0', '1'])
+        mock_post.assert_not_called()
+
+    @patch('api.http_client.post')
+    def test_invalid_ids_and_upstream_failures(self, mock_post):
+        self.assertEqual(self.client.get('/api/spaces/wikidata-entity-property-summary/Q1;DROP/').status_code, 400)
+        self.assertEqual(self.client.get('/api/spaces/wikidata-entity-property-values/Q1/X1/').status_code, 400)
+        self.assertEqual(
+            self.client.get('/api/spaces/wikidata-entity-property-values/Q1/P31/', {'page': 0}).status_code, 400
+        )
+        mock_post.assert_not_called()
+
+        mock_post.side_effect = wikidata.http_client.UpstreamUnavailable('down')
+        self.assertEqual(self.client.get('/api/spaces/wikidata-entity-property-summary/Q1/').status_code, 503)
+        self.assertIsNone(cache.get(wikidata.PROPERTY_SUMMARY_KEY.format(entity_id='Q1')))
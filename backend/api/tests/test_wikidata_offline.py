@@ -0,0 +1,119 @@
+import gzip
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest.mock import patch, MagicMock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from api import wikidata
+
+SAMPLE_DUMP = os.path.join(os.path.dirname(__file__), 'data', 'wikidata_sample.json')
+
+
+class OfflineIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        wikidata.clear_entity_lru()
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.index_path = os.path.join(self.tmpdir, 'wikidata.sqlite3')
+
+        override = override_settings(WIKIDATA_OFFLINE_INDEX=self.index_path)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def build(self, *args, dump=SAMPLE_DUMP):
+        out = StringIO()
+        call_command('build_wikidata_index', dump, *args, stdout=out)
+        return out.getvalue()
+
+    def test_build_from_dump(self):
+        output = self.build()
+        # Items and properties only; deprecated statements and unindexed properties are skipped
+        self.assertIn('Indexed 11 entities and 4 statements', output)
+        self.assertEqual(wikidata.offline_index().entity('Q42')['description'], 'English writer and humorist')
+
+    def test_build_from_compressed_dump(self):
+        compressed = os.path.join(self.tmpdir, 'dump.json.gz')
+        with open(SAMPLE_DUMP, 'rb') as src, gzip.open(compressed, 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        self.assertIn('Indexed 11 entities', self.build(dump=compressed))
+
+    def test_indexed_properties_are_served_without_network(self):
+        self.build()
+        with patch('api.http_client.post') as mock_post, patch('api.http_client.get') as mock_get:
+            properties = wikidata.get_wikidata_properties_many(['Q64'], property_filter=['P31', 'P625'])['Q64']
+        mock_post.assert_not_called()
+        mock_get.assert_not_called()
+
+        self.assertEqual([p['property'] for p in properties], ['P31', 'P625'])
+        self.assertEqual(properties[0]['statement_id'], 'Q64-00000001-0000-0000-0000-000000000000')
+        self.assertEqual(properties[0]['value'], {'type': 'entity', 'id': 'Q515', 'text': 'city'})
+        self.assertEqual(properties[0]['display'], 'instance of: city')
+        # Same literal as the SPARQL results, so extract_location_from_properties can parse it
+        self.assertEqual(properties[1]['value'], 'Point(13.383333333333 52.516666666667)')
+
+    @patch('api.http_client.post')
+    def test_unindexed_entities_fall_back_to_wikidata(self, mock_post):
+        self.build()
+        mock_post.return_value.json.return_value = {'results': {'bindings': []}}
+        self.assertEqual(wikidata.get_wikidata_properties('Q1'), [])
+        mock_post.assert_called_once()
+
+    @patch('api.http_client.get')
+    def test_labels_prefer_the_index(self, mock_get):
+        self.build()
+        response = MagicMock()
+        response.json.return_value = {'entities': {'Q7': {'labels': {'en': {'value': 'seven'}}}}}
+        mock_get.return_value = response
+
+        labels = wikidata.get_property_labels(['P31', 'Q5', 'Q7'])
+
+        self.assertEqual(labels, {'P31': 'instance of', 'Q5': 'human', 'Q7': 'seven'})
+        # Only the id without an English label in the index was fetched
+        self.assertEqual(mock_get.call_args.kwargs['params']['ids'], 'Q7')
+
+    @patch('api.http_client.post')
+    def test_other_properties_still_come_from_wikidata(self, mock_post):
+        self.build()
+        mock_post.return_value.json.return_value = {'results': {'bindings': [{
+            'entity': {'type': 'uri', 'value': 'http://www.wikidata.org/entity/Q64'},
+            'statement': {'type': 'uri', 'value': 'http://www.wikidata.org/entity/statement/Q64-p17'},
+            'property': {'type': 'uri', 'value': 'http://www.wikidata.org/entity/P17'},
+            'propertyLabel': {'type': 'literal', 'value': 'country'},
+            'value': {'type': 'uri', 'value': 'http://www.wikidata.org/entity/Q183'},
+            'valueLabel': {'type': 'literal', 'value': 'Germany'},
+        }]}}
+
+        # Q64 is indexed, but only for P31/P279/P625
+        many = wikidata.get_wikidata_properties_many(['Q64'], property_filter=['P31', 'P17'])
+        self.assertEqual([p['property'] for p in many['Q64']], ['P17'])
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual([p['property'] for p in wikidata.get_wikidata_properties('Q64')], ['P17'])
+        self.assertEqual(mock_post.call_count, 2)
+
+        # Values of an indexed property are paged from the index
+        page, cache_status = wikidata.get_property_values('Q64', 'P31')
+        self.assertEqual((cache_status, [p['property'] for p in page['results']]), ('HIT', ['P31']))
+        self.assertEqual(mock_post.call_count, 2)
+
+    def test_rebuild_is_picked_up(self):
+        self.build()
+        self.assertFalse(wikidata.offline_index().covers(['P17']))
+
+        self.build('--properties', 'P31,P17')
+        self.assertTrue(wikidata.offline_index().covers(['P17']))
+        properties = wikidata.get_wikidata_properties_many(['Q64'], property_filter=['P17', 'P31'])['Q64']
+        self.assertEqual([p['property'] for p in properties], ['P17', 'P31'])
+        self.assertEqual(properties[0]['display'], 'country: Germany')
+
+    @override_settings(WIKIDATA_OFFLINE_INDEX='')
+    def test_build_requires_an_output(self):
+        with self.assertRaises(CommandError):
+            self.build()
+        self.assertIsNone(wikidata.offline_index())
@@ -15,9 +15,12 @@ from .views import (
     list_users_by_type,
     dashboard_stats,
     ActivityStreamView,
+    SpaceActivityView,
     archive_item,
     list_archived_items,
     restore_archived_item,
+    list_request_profiles,
+    get_request_profile,
 )
 
 router = DefaultRouter()
@@ -27,6 +30,7 @@ router.register(r'profiles', ProfileViewSet, basename='profile')
 router.register(r'reports', ReportViewSet, basename='report')
 
 urlpatterns = [
+    path('spaces/<int:space_id>/activity/', SpaceActivityView.as_view(), name='space_activity_stream'),
     path('', include(router.urls)),
     path('register/', register, name='register'),
     path('login/', login, name='login'),
@@ -49,4 +53,8 @@ urlpatterns = [
     path('archive/', list_archived_items, name='list_archived_items'),
     path('archive/create/', archive_item, name='archive_item'),
     path('archive/<int:archive_id>/restore/', restore_archived_item, name='restore_archived_item'),
+
+    # Request profiler (admins)
+    path('request-profiles/', list_request_profiles, name='list_request_profiles'),
+    path('request-profiles/<str:request_id>/', get_request_profile, name='get_request_profile'),
 ]
@@ -1,6 +1,7 @@
 from datetime import timedelta
+from itertools import islice
 import logging
-import requests
+from django.conf import settings
 from django.contrib.auth import authenticate
 
 logger = logging.getLogger(__name__)
@@ -16,21 +17,31 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.exceptions import ValidationError
-from rest_framework_simplejwt.tokens import RefreshToken
-from .models import Space, Tag, Property, EdgeProperty, Profile, Node, Edge, GraphSnapshot, Discussion, DiscussionReaction, SpaceModerator, Report, Activity, Archive, record_activity
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from .models import Space, Tag, Property, EdgeProperty, Profile, Node, Edge, GraphSnapshot, Discussion, DiscussionReaction, SpaceModerator, Report, Activity, Archive, DashboardCounters, RequestProfile, SpaceSummary, bump_content_version, record_activity, set_archived
 from .graph import SpaceGraph
 from .neo4j_db import Neo4jConnection 
 from .serializers import (RegisterSerializer, SpaceSerializer, TagSerializer, 
                           UserSerializer, ProfileSerializer, DiscussionSerializer, 
                           ReportSerializer, ActivityStreamSerializer, ArchiveSerializer,
-                          NodeSerializer)
-from .wikidata import get_wikidata_properties, extract_location_from_properties
+                          NodeSerializer, RequestProfileSerializer, RequestProfileSummarySerializer)
+from . import http_client
+from .wikidata import (
+    get_wikidata_properties, entity_cache_status, search_entities, extract_location_from_properties,
+    get_property_summary, get_property_values, VALID_ENTITY_ID, VALID_PROPERTY_ID, PROPERTY_VALUES_PAGE_SIZE,
+)
+from .geocoding import schedule_node_reverse_geocode
+from .geo import MAP_MAX_PAGE_SIZE, MAP_PAGE_SIZE, clusters_in_bbox, parse_bbox, parse_zoom, points_in_bbox, points_min_zoom
+from .enrichment import schedule_node_enrichment
+from .summaries import latest_summary, request_summary, summary_events
+from .authentication import issue_access_token
+from .authorization import get_authz
 from .permissions import IsCollaboratorOrReadOnly, IsProfileOwner, IsAdmin, IsAdminOrModerator, IsSpaceModerator, CanChangeUserType, IsNotArchivedUser
 from .reporting import REASON_CODES, REASONS_VERSION
-from django.core.cache import cache
-from django.http import JsonResponse
+from .activity_archive import ARCHIVE_FILTER_FIELDS, iter_archived_activities
+from .profiling import DEFAULT_SLOW_MS
+from django.http import JsonResponse, StreamingHttpResponse
 from django.db.models import Count
-import google.generativeai as genai
 
 def _recompute_entity_reports(content_type, content_id):
     """Recalculate report_count and is_reported based on OPEN reports only."""
@@ -100,10 +111,9 @@ def login(request):
     password = request.data.get('password')
     user = authenticate(username=username, password=password)
     if user:
-        refresh = RefreshToken.for_user(user)
         return Response({
             "message": "Login successful",
-            "token": str(refresh.access_token)
+            "token": str(issue_access_token(user))
         })
     return Response({"message": "Invalid credentials"}, status=400)
 
@@ -173,32 +183,11 @@ class TagViewSet(viewsets.ModelViewSet):
         if not query:
             return Response({"error": "Query parameter is required"}, status=400)
         
-        url = 'https://www.wikidata.org/w/api.php'
-        params = {
-            'action': 'wbsearchentities',
-            'format': 'json',
-            'search': query,
-            'language': 'en',
-            'limit': 50
-        }
-        
         try:
-            headers = {
-                'User-Agent': 'ConnectTheDots/1.0 (https://github.com/repo/connectthedots)'
-            }
-            response = requests.get(url, params=params, headers=headers)
-            data = response.json()
-            
-            results = []
-            for item in data.get('search', []):
-                results.append({
-                    'id': item.get('id'),
-                    'label': item.get('label'),
-                    'description': item.get('description', ''),
-                    'url': item.get('url', '')
-                })
-                
-            return Response(results)
+            results, cache_status = search_entities(query)
+            return Response(results, headers={'X-Cache': cache_status})
+        except http_client.UpstreamUnavailable:
+            return Response({"error": "Wikidata is temporarily unavailable"}, status=503)
         except Exception as e:
             return Response({"error": str(e)}, status=500)
     
@@ -230,6 +219,16 @@ class TagViewSet(viewsets.ModelViewSet):
             headers = self.get_success_headers(serializer.data)
             return Response(serializer.data, status=201, headers=headers)
 
+class EventStreamRenderer(BaseRenderer):
+    """Lets clients ask for text/event-stream; successful responses are streamed by the view itself."""
+    media_type = 'text/event-stream'
+    format = 'sse'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Errors are plain Responses; send them as JSON
+        return JSONRenderer().render(data)
+
+
 class SpaceViewSet(viewsets.ModelViewSet):
     queryset = Space.objects.all()
     serializer_class = SpaceSerializer
@@ -260,7 +259,9 @@ class SpaceViewSet(viewsets.ModelViewSet):
         if self.action in ['discussions', 'wikidata_search']:
             permission_classes = [permissions.AllowAny]
         elif self.action in ['list', 'retrieve', 'trending', 'new', 'top_scored', 'collaborators', 'top_collaborators', 
-                             'nodes', 'edges', 'snapshots', 'wikidata_entity_properties', 'node_properties', 'graph_search', 'summarize_space']:
+                             'nodes', 'edges', 'snapshots', 'wikidata_entity_properties', 'wikidata_entity_property_summary',
+                             'wikidata_entity_property_values', 'node_properties', 'graph_search', 'summarize_space',
+                             'summary_status', 'summary_stream', 'spaces_map', 'nodes_map']:
             permission_classes = [permissions.IsAuthenticated]
         elif self.action in ['join_space', 'leave_space', 'check_collaborator', 'add_discussion', 'delete_discussion',
                              'react_discussion', 'add_node', 'delete_node', 'update_node_properties', 'delete_node_property',
@@ -282,8 +283,10 @@ class SpaceViewSet(viewsets.ModelViewSet):
         property_values_query = request.query_params.get('property_values_q', '').strip()
         depth = request.query_params.get('depth', '1')
         
-        print(f"🔍 GRAPH SEARCH VIEW CALLED: node_q={node_query}, edge_q={edge_query}, property_q={property_query}, property_values_q={property_values_query}, depth={depth}")
-        logger.info(f"graph_search VIEW: node_q={node_query}, edge_q={edge_query}, property_q={property_query}, property_values_q={property_values_query}, depth={depth}")
+        logger.debug(
+            "graph_search: node_q=%s, edge_q=%s, property_q=%s, property_values_q=%s, depth=%s",
+            node_query, edge_query, property_query, property_values_query, depth,
+        )
         
         # Parse depth parameter
         try:
@@ -302,12 +305,9 @@ class SpaceViewSet(viewsets.ModelViewSet):
             edge_query = general_query
             
         if not node_query and not edge_query and not property_query and not property_values_query:
-            print(f"⚠️ EARLY RETURN: All queries empty")
             return Response({'nodes': [], 'edges': []})
         
-        print(f"✅ Calling search_graph with space_id={int(pk)}")
         results = Neo4jConnection.search_graph(int(pk), node_queries=node_query, edge_queries=edge_query, property_queries=property_query, property_values=property_values_query, depth=depth)
-        print(f"✅ search_graph returned {len(results.get('nodes', []))} nodes and {len(results.get('edges', []))} edges")
         return Response(results)
         
     def perform_create(self, serializer):
@@ -350,7 +350,7 @@ class SpaceViewSet(viewsets.ModelViewSet):
         if space.is_archived:
             return Response({'message': 'Cannot join an archived space'}, status=403)
         
-        if user in space.collaborators.all():
+        if get_authz(request).is_collaborator(space):
             return Response({'message': 'You are already a collaborator of this space'}, status=400)
             
         space.collaborators.add(user)
@@ -377,7 +377,7 @@ class SpaceViewSet(viewsets.ModelViewSet):
         if user == space.creator:
             return Response({'message': 'Creator cannot leave the space'}, status=400)
             
-        if user not in space.collaborators.all():
+        if not get_authz(request).is_collaborator(space):
             return Response({'message': 'You are not a collaborator of this space'}, status=400)
             
         space.collaborators.remove(user)
@@ -396,15 +396,13 @@ class SpaceViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'], url_path='check-collaborator')
     def check_collaborator(self, request, pk=None):
         space = self.get_object()
-        user = request.user
-        is_collaborator = user in space.collaborators.all()
+        is_collaborator = get_authz(request).is_collaborator(space)
         return Response({'is_collaborator': is_collaborator})
 
     @action(detail=True, methods=['get'], url_path='discussions')
     def discussions(self, request, pk=None):
         """Get all discussions for a space"""
         space = self.get_object()
-        user = request.user
         
         # Anyone can view discussions, no collaborator check needed
         discussions = Discussion.objects.filter(space=space)
@@ -421,7 +419,7 @@ class SpaceViewSet(viewsets.ModelViewSet):
             return Response({'message': 'Cannot add discussions to an archived space'}, status=403)
         
         # Check if user is a collaborator
-        if user not in space.collaborators.all():
+        if not get_authz(request).is_collaborator(space):
             return Response({'message': 'Only collaborators can add discussions'}, status=403)
             
         text = request.data.get('text')
@@ -470,7 +468,7 @@ class SpaceViewSet(viewsets.ModelViewSet):
                     object=f'Reaction:{discussion.id}',
                     target=f'Discussion:{discussion.id}',
                     summary=f"{request.user.username} removed reaction",
-                    payload={'discussion_id': discussion.id}
+                    payload={'discussion_id': discussion.id, 'space_id': space.id}
                 )
             except Exception:
                 pass
@@ -501,7 +499,7 @@ class SpaceViewSet(viewsets.ModelViewSet):
                         object=f'Reaction:{discussion.id}',
                         target=f'Discussion:{discussion.id}',
                         summary=f"{request.user.username} removed reaction",
-                        payload={'discussion_id': discussion.id}
+                        payload={'discussion_id': discussion.id, 'space_id': space.id}
                     )
                 except Exception:
                     pass
@@ -515,7 +513,7 @@ class SpaceViewSet(viewsets.ModelViewSet):
                         type=('Like' if value == DiscussionReaction.UPVOTE else 'Dislike'),
                         object=f'Discussion:{discussion.id}',
                         summary=f"{request.user.username} reacted",
-                        payload={'discussion_id': discussion.id, 'value': int(value)}
+                        payload={'discussion_id': discussion.id, 'space_id': space.id, 'value': int(value)}
                     )
                 except Exception:
                     pass
@@ -527,7 +525,7 @@ class SpaceViewSet(viewsets.ModelViewSet):
                     type=('Like' if value == DiscussionReaction.UPVOTE else 'Dislike'),
                     object=f'Discussion:{discussion.id}',
                     summary=f"{request.user.username} reacted",
-                    payload={'discussion_id': discussion.id, 'value': int(value)}
+                    payload={'discussion_id': discussion.id, 'space_id': space.id, 'value': int(value)}
                 )
             except Exception:
                 pass
@@ -584,7 +582,7 @@ class SpaceViewSet(viewsets.ModelViewSet):
         if space.is_archived:
             return Response({'message': 'Cannot add nodes to an archived space'}, status=403)
         
-        if request.user not in space.collaborators.all():
+        if not get_authz(request).is_collaborator(space):
             return Response({'message': 'Only collaborators can add nodes'}, status=403)
             
         data = request.data
@@ -595,12 +593,15 @@ class SpaceViewSet(viewsets.ModelViewSet):
         wikidata_property_id = data.get('wikidata_property_id', None)
         is_new_node_source = data.get('is_new_node_source', False)
 
+        # Location fields come straight from the picked properties, so the node is a single insert
+        location_data = extract_location_from_properties(selected_properties) if selected_properties else {}
         new_node = Node.objects.create(
             label=wikidata_entity['label'],
             wikidata_id=wikidata_entity['id'],
             description=wikidata_entity.get('description', ''),
             created_by=request.user,
-            space = space
+            space = space,
+            **{field: value for field, value in location_data.items() if value is not None}
         )
 
         # --- NEO4J INTEGRATION START ---
@@ -642,9 +643,10 @@ class SpaceViewSet(viewsets.ModelViewSet):
         except Exception:
             pass
         
+        properties = []
         for prop in selected_properties:
             value_text, value_id = _normalize_property_value_for_storage(prop.get('value'))
-            Property.objects.create(
+            properties.append(Property(
                 node=new_node, 
                 property_id=prop.get('property'),
                 statement_id=prop.get('statement_id'),
@@ -652,48 +654,14 @@ class SpaceViewSet(viewsets.ModelViewSet):
                 value=prop.get('value'),
                 value_text=value_text,
                 value_id=value_id
-            )
+            ))
+        if properties:
+            Property.objects.bulk_create(properties)
+            bump_content_version(space_ids=[space.id])
         
-        # Auto-fetch and store ALL P31 values if none were selected
+        # P31 values (when none were selected) and location names are filled in by a background job
         has_p31 = any(prop.get('property') == 'P31' for prop in selected_properties)
-        
-        if not has_p31 and wikidata_entity and wikidata_entity.get('id'):
-            try:
-                from .wikidata import get_wikidata_properties
-                all_properties = get_wikidata_properties(wikidata_entity.get('id'))
-                
-                # Find ALL P31 properties (note: key is 'property', not 'property_id')
-                p31_props = [p for p in all_properties if p.get('property') == 'P31']
-                
-                # Store ALL P31 values
-                for p31 in p31_props:
-                    value_text, value_id = _normalize_property_value_for_storage(p31.get('value'))
-                    Property.objects.create(
-                        node=new_node,
-                        property_id='P31',
-                        statement_id=p31.get('statement_id'),
-                        property_label=p31.get('property_label', 'instance of'),
-                        value=p31.get('value'),
-                        value_text=value_text,
-                        value_id=value_id
-                    )
-                    
-                if p31_props:
-                    print(f"Auto-fetched {len(p31_props)} P31 properties for node {new_node.id}")
-                    
-            except Exception as e:
-                # Don't fail node creation if P31 fetch fails
-                print(f"Failed to auto-fetch P31 for {wikidata_entity.get('id')}: {e}")
-        
-        # Extract location information from selected properties if they exist
-        if selected_properties:
-            location_data = extract_location_from_properties(selected_properties)
-            # Update node with location information if any was found
-            if any(location_data.values()):
-                for field, value in location_data.items():
-                    if value is not None:
-                        setattr(new_node, field, value)
-                new_node.save()
+        enrichment = schedule_node_enrichment(new_node, has_p31)
 
         if related_node_id:
             related_node = Node.objects.get(id=related_node_id)
@@ -764,7 +732,7 @@ class SpaceViewSet(viewsets.ModelViewSet):
                 except Exception:
                     pass
 
-        return Response({'node_id': new_node.id}, status=201)
+        return Response({'node_id': new_node.id, 'enrichment_pending': enrichment is not None}, status=201)
 
     @action(detail=True, methods=['get'], url_path='nodes')
     def nodes(self, request, pk=None):
@@ -772,6 +740,60 @@ class SpaceViewSet(viewsets.ModelViewSet):
         serializer = NodeSerializer(nodes, many=True)
         return Response(serializer.data)
     
+    def _map_response(self, request, queryset, scope, fields):
+        """
+        The queryset's rows inside ?bbox= (west,south,east,north): clusters
+        when ?zoom= is below MAP_POINTS_MIN_ZOOM, otherwise a page of points
+        (?page=, ?page_size=)
+        """
+        try:
+            bbox = parse_bbox(request.query_params.get('bbox'))
+            zoom = parse_zoom(request.query_params.get('zoom'))
+            if zoom is not None and zoom < points_min_zoom():
+                return Response({
+                    'bbox': list(bbox),
+                    'zoom': zoom,
+                    'clustered': True,
+                    'clusters': clusters_in_bbox(queryset, scope, bbox, zoom),
+                })
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        try:
+            page = int(request.query_params.get('page', 1))
+            page_size = int(request.query_params.get('page_size', MAP_PAGE_SIZE))
+        except ValueError:
+            return Response({"error": "page and page_size must be integers"}, status=400)
+        if page < 1 or not 1 <= page_size <= MAP_MAX_PAGE_SIZE:
+            return Response({"error": f"page must be positive and page_size between 1 and {MAP_MAX_PAGE_SIZE}"}, status=400)
+
+        results, has_more = points_in_bbox(queryset, bbox, fields, page, page_size)
+        return Response({
+            'bbox': list(bbox),
+            'zoom': zoom,
+            'clustered': False,
+            'page': page,
+            'page_size': page_size,
+            'has_more': has_more,
+            'results': results,
+        })
+
+    @action(detail=False, methods=['get'], url_path='map')
+    def spaces_map(self, request):
+        """Spaces with coordinates inside the map viewport"""
+        return self._map_response(
+            request, Space.objects.filter(is_archived=False), 'spaces',
+            ['id', 'title', 'latitude', 'longitude', 'city', 'country'],
+        )
+
+    @action(detail=True, methods=['get'], url_path='nodes/map')
+    def nodes_map(self, request, pk=None):
+        """Nodes of the space with coordinates inside the map viewport"""
+        space = self.get_object()
+        return self._map_response(
+            request, Node.objects.filter(space=space, is_archived=False), f'nodes:{space.pk}',
+            ['id', 'label', 'wikidata_id', 'latitude', 'longitude', 'location_name'],
+        )
+
     @action(detail=True, methods=['get'], url_path='edges')
     def edges(self, request, pk=None):
         """Get all edges for a specific space"""
@@ -1152,7 +1174,7 @@ class SpaceViewSet(viewsets.ModelViewSet):
         if space.is_archived:
             return Response({'message': 'Cannot create snapshots for an archived space'}, status=403)
         
-        if request.user not in space.collaborators.all():
+        if not get_authz(request).is_collaborator(space):
             return Response({'message': 'Only collaborators can create snapshots'}, status=403)
             
         graph = SpaceGraph(pk)
@@ -1167,7 +1189,7 @@ class SpaceViewSet(viewsets.ModelViewSet):
         if space.is_archived:
             return Response({'message': 'Cannot revert snapshots for an archived space'}, status=403)
         
-        if request.user not in space.collaborators.all():
+        if not get_authz(request).is_collaborator(space):
             return Response({'message': 'Only collaborators can revert snapshots'}, status=403)
             
         snapshot_id = request.data.get('snapshot_id')
@@ -1196,31 +1218,11 @@ class SpaceViewSet(viewsets.ModelViewSet):
         if not query:
             return Response({"error": "Query parameter is required"}, status=400)
 
-        url = 'https://www.wikidata.org/w/api.php'
-        params = {
-            'action': 'wbsearchentities',
-            'format': 'json',
-            'search': query,
-            'language': 'en',
-            'limit': 100
-        }
-
         try:
-            headers = {
-                'User-Agent': 'ConnectTheDots/1.0 (https://github.com/repo/connectthedots)'
-            }
-            response = requests.get(url, params=params, headers=headers)
-            data = response.json()
-
-            results = [{
-                'id': item.get('id'),
-                'label': item.get('label'),
-                'description': item.get('description', ''),
-                'url': item.get('url', '')
-            } for item in data.get('search', [])]
-
-            return Response(results)
-
+            results, cache_status = search_entities(query)
+            return Response(results, headers={'X-Cache': cache_status})
+        except http_client.UpstreamUnavailable:
+            return Response({"error": "Wikidata is temporarily unavailable"}, status=503)
         except Exception as e:
             return Response({"error": str(e)}, status=500)
 
@@ -1231,63 +1233,68 @@ class SpaceViewSet(viewsets.ModelViewSet):
         if not query:
             return Response({"error": "Query parameter is required"}, status=400)
 
-        url = 'https://www.wikidata.org/w/api.php'
-        params = {
-            'action': 'wbsearchentities',
-            'format': 'json',
-            'search': query,
-            'type': 'property',
-            'language': 'en',
-            'limit': 100
-        }
-
         try:
-            headers = {
-                'User-Agent': 'ConnectTheDots/1.0 (https://github.com/repo/connectthedots)'
-            }
-            response = requests.get(url, params=params, headers=headers)
-            data = response.json()
-
-            results = [{
-                'id': item.get('id'),
-                'label': item.get('label'),
-                'description': item.get('description', ''),
-                'url': item.get('url', '')
-            } for item in data.get('search', [])]
-
-            return Response(results)
+            results, cache_status = search_entities(query, entity_type='property')
+            return Response(results, headers={'X-Cache': cache_status})
+        except http_client.UpstreamUnavailable:
+            return Response({"error": "Wikidata is temporarily unavailable"}, status=503)
         except Exception as e:
             return Response({"error": str(e)}, status=500)
 
     @action(detail=False, methods=['get'], url_path='wikidata-entity-properties/(?P<entity_id>[^/.]+)')
     def wikidata_entity_properties(self, request, entity_id=None):
         """Fetch entity properties from Wikidata with enhanced labels and formatting"""
-        if not entity_id:
-            return Response({"error": "Missing entity_id"}, status=400)
-        
-        cache_key = f"wikidata_props_{entity_id}"
-        is_cached = cache.get(cache_key) is not None
+        if not VALID_ENTITY_ID.match(entity_id or ''):
+            return Response({"error": "Invalid entity_id"}, status=400)
         
         try:
+            # HIT, STALE (served while refreshed in the background) or MISS
+            headers = {'X-Cache': entity_cache_status(entity_id)}
             properties = get_wikidata_properties(entity_id)
             
-            headers = {}
-            if is_cached:
-                headers['X-Cache'] = 'HIT'
-            else:
-                headers['X-Cache'] = 'MISS'
-            
             return Response(
                 properties, 
                 headers=headers
             )
         except Exception as e:
-            print(f"Error in wikidata_entity_properties for {entity_id}: {str(e)}")
+            logger.warning("Error in wikidata_entity_properties for %s: %s", entity_id, e)
             return Response(
                 {"error": f"Failed to fetch properties for {entity_id}"},
                 status=500
             )
 
+    @action(detail=False, methods=['get'], url_path='wikidata-entity-property-summary/(?P<entity_id>[^/.]+)')
+    def wikidata_entity_property_summary(self, request, entity_id=None):
+        """Property ids, labels and statement counts of an entity, without the values"""
+        if not VALID_ENTITY_ID.match(entity_id or ''):
+            return Response({"error": "Invalid entity_id"}, status=400)
+
+        summary, cache_status = get_property_summary(entity_id)
+        if summary is None:
+            return Response({"error": "Wikidata is temporarily unavailable"}, status=503)
+        return Response(summary, headers={'X-Cache': cache_status})
+
+    @action(
+        detail=False, methods=['get'],
+        url_path='wikidata-entity-property-values/(?P<entity_id>[^/.]+)/(?P<property_id>[^/.]+)'
+    )
+    def wikidata_entity_property_values(self, request, entity_id=None, property_id=None):
+        """One page of an entity's values for a single property (?page=, ?page_size=)"""
+        if not VALID_ENTITY_ID.match(entity_id or '') or not VALID_PROPERTY_ID.match(property_id or ''):
+            return Response({"error": "Invalid entity_id or property_id"}, status=400)
+        try:
+            page = int(request.query_params.get('page', 1))
+            page_size = int(request.query_params.get('page_size', PROPERTY_VALUES_PAGE_SIZE))
+        except ValueError:
+            return Response({"error": "page and page_size must be integers"}, status=400)
+        if page < 1 or page_size < 1:
+            return Response({"error": "page and page_size must be positive"}, status=400)
+
+        values, cache_status = get_property_values(entity_id, property_id, page, page_size)
+        if values is None:
+            return Response({"error": "Wikidata is temporarily unavailable"}, status=503)
+        return Response(values, headers={'X-Cache': cache_status})
+
     @action(detail=True, methods=['get'], url_path='all-properties')
     def all_properties(self, request, pk=None):
         """Get all unique properties across all nodes in a space"""
@@ -1339,7 +1346,7 @@ class SpaceViewSet(viewsets.ModelViewSet):
             
             return Response(props_list)
         except Exception as e:
-            print(f"Error fetching all properties: {str(e)}")
+            logger.warning("Error fetching all properties: %s", e)
             return Response(
                 {"error": str(e)},
                 status=500
@@ -1361,7 +1368,7 @@ class SpaceViewSet(viewsets.ModelViewSet):
                     wikidata_props_list = get_wikidata_properties(node.wikidata_id)
                     wikidata_props = {prop["statement_id"]: prop for prop in wikidata_props_list}
                 except Exception as e:
-                    print(f"Error fetching Wikidata properties: {str(e)}")
+                    logger.warning("Error fetching Wikidata properties: %s", e)
             
             result = []
             for prop in properties:
@@ -1380,7 +1387,7 @@ class SpaceViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({'error': str(e)}, status=500)
     
-    @action(detail=True, methods=['delete'], url_path='nodes/(?P<node_id>[^/.]+)')
+    @action(detail=True, methods=['delete'], url_path='nodes/(?P<node_id>[0-9]+)')
     def delete_node(self, request, pk=None, node_id=None):
         """Delete a node and its associated edges and properties"""
         space = self.get_object()
@@ -1388,7 +1395,7 @@ class SpaceViewSet(viewsets.ModelViewSet):
         if space.is_archived:
             return Response({'message': 'Cannot delete nodes in an archived space'}, status=403)
         
-        if request.user not in space.collaborators.all():
+        if not get_authz(request).is_collaborator(space):
             return Response({'message': 'Only collaborators can delete nodes'}, status=403)
             
         try:
@@ -1493,7 +1500,7 @@ class SpaceViewSet(viewsets.ModelViewSet):
         if space.is_archived:
             return Response({'message': 'Cannot update nodes in an archived space'}, status=403)
         
-        if request.user not in space.collaborators.all():
+        if not get_authz(request).is_collaborator(space):
             return Response({'message': 'Only collaborators can update nodes'}, status=403)
             
         try:
@@ -1540,11 +1547,11 @@ class SpaceViewSet(viewsets.ModelViewSet):
                         )
                         
                     if p31_props:
-                        print(f"Auto-fetched {len(p31_props)} P31 properties for node {node.id}")
+                        logger.debug("Auto-fetched %s P31 properties for node %s", len(p31_props), node.id)
                         
                 except Exception as e:
                     # Don't fail node update if P31 fetch fails
-                    print(f"Failed to auto-fetch P31 for {node.wikidata_id}: {e}")
+                    logger.warning("Failed to auto-fetch P31 for %s: %s", node.wikidata_id, e)
             
             if selected_properties:
                 location_data = extract_location_from_properties(selected_properties)
@@ -1554,6 +1561,7 @@ class SpaceViewSet(viewsets.ModelViewSet):
                         if value is not None:
                             setattr(node, field, value)
                     node.save()
+                schedule_node_reverse_geocode(node)
                 
                 # --- NEO4J INTEGRATION START ---
                 # Update Neo4j properties
@@ -1601,7 +1609,7 @@ class SpaceViewSet(viewsets.ModelViewSet):
         if space.is_archived:
             return Response({'message': 'Cannot delete node properties in an archived space'}, status=403)
         
-        if request.user not in space.collaborators.all():
+        if not get_authz(request).is_collaborator(space):
             return Response({'message': 'Only collaborators can update nodes'}, status=403)
         
         try:
@@ -1624,7 +1632,7 @@ class SpaceViewSet(viewsets.ModelViewSet):
                     object=f'Property:{statement_id}',
                     target=f'Node:{node.id}',
                     summary=f"{request.user.username} removed a node property",
-                    payload={'node_id': node.id, 'statement_id': statement_id}
+                    payload={'node_id': node.id, 'space_id': space.id, 'statement_id': statement_id}
                 )
             except Exception:
                 pass
@@ -1644,7 +1652,7 @@ class SpaceViewSet(viewsets.ModelViewSet):
         if space.is_archived:
             return Response({'message': 'Cannot update nodes in an archived space'}, status=403)
         
-        if request.user != space.creator and request.user not in space.collaborators.all():
+        if request.user != space.creator and not get_authz(request).is_collaborator(space):
             return Response({'message': 'Only space members can update node location'}, status=403)
             
         try:
@@ -1652,7 +1660,6 @@ class SpaceViewSet(viewsets.ModelViewSet):
             
             
             location_data = request.data.get('location', request.data)
-            print(f"Received location data: {location_data}")
             
             
             node.country = location_data.get('country', '') or None
@@ -1663,7 +1670,10 @@ class SpaceViewSet(viewsets.ModelViewSet):
             node.longitude = location_data.get('longitude') if location_data.get('longitude') is not None else None
             node.location_name = location_data.get('location_name', '') or None
             
-            print(f"Updated node location - Country: {node.country}, City: {node.city}, Lat: {node.latitude}, Lng: {node.longitude}")
+            logger.debug(
+                "Updating location of node %s: country=%s, city=%s, lat=%s, lng=%s",
+                node.id, node.country, node.city, node.latitude, node.longitude,
+            )
             
             node.save()
 
@@ -1720,7 +1730,7 @@ class SpaceViewSet(viewsets.ModelViewSet):
         if space.is_archived:
             return Response({'message': 'Cannot update edges in an archived space'}, status=403)
         
-        if request.user not in space.collaborators.all():
+        if not get_authz(request).is_collaborator(space):
             return Response({'message': 'Only collaborators can update edges'}, status=403)
         try:
             edge = Edge.objects.get(id=edge_id, source__space=space)
@@ -1810,7 +1820,7 @@ class SpaceViewSet(viewsets.ModelViewSet):
         if space.is_archived:
             return Response({'message': 'Cannot delete edges in an archived space'}, status=403)
         
-        if request.user not in space.collaborators.all():
+        if not get_authz(request).is_collaborator(space):
             return Response({'message': 'Only collaborators can delete edges'}, status=403)
         try:
             edge = Edge.objects.get(id=edge_id, source__space=space)
@@ -1848,7 +1858,7 @@ class SpaceViewSet(viewsets.ModelViewSet):
         if space.is_archived:
             return Response({'message': 'Cannot add edges to an archived space'}, status=403)
         
-        if request.user not in space.collaborators.all():
+        if not get_authz(request).is_collaborator(space):
             return Response({'message': 'Only collaborators can add edges'}, status=403)
         source_id = request.data.get('source_id')
         target_id = request.data.get('target_id')
@@ -1959,221 +1969,60 @@ class SpaceViewSet(viewsets.ModelViewSet):
     
         return response
 
+    def _summary_response(self, summary):
+        data = {
+            'summary_id': summary.id,
+            'status': summary.status,
+            'content_version': summary.content_version,
+        }
+        if summary.status == SpaceSummary.STATUS_DONE:
+            data.update(summary=summary.summary, model_used=summary.model_used, metadata=summary.metadata)
+            return Response(data)
+        if summary.status == SpaceSummary.STATUS_FAILED:
+            data['error'] = f'Failed to generate summary: {summary.error}'
+        return Response(data, status=202)
+
     @action(detail=True, methods=['post'], url_path='summarize')
     def summarize_space(self, request, pk=None):
-        import os
-        
-        try:
-            space = self.get_object()
-            
-            nodes = Node.objects.filter(space=space, is_archived=False)
-            edges = Edge.objects.filter(source__space=space, source__is_archived=False, target__is_archived=False)
-            discussions = Discussion.objects.filter(space=space).order_by('-created_at')[:10]  # Latest 10 discussions
-            
-            nodes_with_connections = nodes.annotate(
-                outgoing_count=Count('source_edges', distinct=True),
-                incoming_count=Count('target_edges', distinct=True)
-            )
-            
-            total_nodes = nodes_with_connections.count()
-            
-            if total_nodes > 0:
-                nodes_sorted_by_connections = sorted(
-                    nodes_with_connections,
-                    key=lambda n: n.outgoing_count + n.incoming_count,
-                    reverse=True
-                )
-            else:
-                nodes_sorted_by_connections = []
-            
-            space_data = {
-                'title': space.title,
-                'description': space.description or 'No description',
-                'creator': space.creator.username,
-                'collaborators': [user.username for user in space.collaborators.all()],
-                'tags': [tag.name for tag in space.tags.all()],
-                'location': {
-                    'country': space.country or 'Not specified',
-                    'city': space.city or 'Not specified',
-                }
-            }
-            
-            # nodes with connection counts
-            nodes_data = []
-            for node in nodes_with_connections[:30]:
-                try:
-                    node_info = {
-                        'label': node.label or 'Unlabeled',
-                        'wikidata_id': node.wikidata_id or 'N/A',
-                        'connections': node.outgoing_count + node.incoming_count,
-                        'properties': []
-                    }
-                    for prop in node.node_properties.all()[:5]:
-                        node_info['properties'].append({
-                            'property': prop.property_label or prop.property_id or 'Unknown',
-                            'value': prop.value_text or prop.value_id or 'N/A'
-                        })
-                    nodes_data.append(node_info)
-                except Exception as node_error:
-                    continue
-            
-            # edges
-            edges_data = []
-            
-            top_node_ids = {node.id for node in nodes_sorted_by_connections[:30]}
-            filtered_edges = [
-                e for e in edges 
-                if e.source_id in top_node_ids and e.target_id in top_node_ids
-            ]
-            
-            if len(filtered_edges) < 30:
-                remaining_edges = [e for e in edges if e not in filtered_edges]
-                filtered_edges.extend(remaining_edges[:30 - len(filtered_edges)])
-            
-            for edge in filtered_edges[:30]:
-                try:
-                    edge_info = {
-                        'source': edge.source.label if (edge.source and edge.source.label) else 'Unknown',
-                        'target': edge.target.label if (edge.target and edge.target.label) else 'Unknown',
-                        'relation': edge.relation_property or 'connected to'
-                    }
-                    edges_data.append(edge_info)
-                except Exception as edge_error:
-                    continue
-            
-            # COMMENTS
-            discussions_data = []
-            for discussion in discussions:
-                try:
-                    discussions_data.append({
-                        'user': discussion.user.username,
-                        'text': (discussion.text[:200] if discussion.text else 'No text'),
-                        'created_at': discussion.created_at.strftime('%Y-%m-%d')
-                    })
-                except Exception as disc_error:
-                    continue
-            
-            # NODE with connection counts
-            nodes_text = []
-            for n in nodes_data:  # Use all 30 sorted nodes
-                try:
-                    connection_info = f"[{n['connections']} connections]"
-                    if n['properties']:
-                        props_text = ', '.join([f"{p['property']}: {p['value']}" for p in n['properties']])
-                        nodes_text.append(f"- {n['label']} ({n['wikidata_id']}) {connection_info}: {props_text}")
-                    else:
-                        nodes_text.append(f"- {n['label']} ({n['wikidata_id']}) {connection_info}: No properties")
-                except Exception as e:
-                    continue
-            nodes_section = '\n'.join(nodes_text) if nodes_text else 'No nodes yet'
-            
-            # EDGE
-            edges_text = []
-            for e in edges_data[:20]:
-                try:
-                    edges_text.append(f"- {e['source']} → [{e['relation']}] → {e['target']}")
-                except Exception as e_error:
-                    continue
-            edges_section = '\n'.join(edges_text) if edges_text else 'No edges yet'
-            
-            discussions_text = []
-            for d in discussions_data[:5]:
-                try:
-                    discussions_text.append(f"- {d['user']} ({d['created_at']}): {d['text']}")
-                except Exception as d_error:
-                    continue
-            discussions_section = '\n'.join(discussions_text) if discussions_text else 'No discussions yet'
-            
-            ##### PROMPT #######
-            prompt = f"""Analyze and summarize the following knowledge graph space:
-
-**Space Information:**
-- Title: {space_data['title']}
-- Description: {space_data['description']}
-- Creator: {space_data['creator']}
-- Collaborators: {', '.join(space_data['collaborators']) if space_data['collaborators'] else 'None'}
-- Tags: {', '.join(space_data['tags']) if space_data['tags'] else 'None'}
-- Location: {space_data['location']['city']}, {space_data['location']['country']}
-
-**Graph Structure:**
-- Total Nodes: {nodes.count()}
-- Total Edges: {edges.count()}
-
-**Sample Nodes (top 30 by connections):**
-{nodes_section}
-
-**Sample Connections:**
-{edges_section}
-
-**Recent Discussions:**
-{discussions_section}
-
-Please provide a comprehensive summary using markdown formatting:
-- Use **bold** for important concepts, entities, and key insights
-- Use ### for section headings
-- Use bullet points (-) for lists
-- Keep it organized and easy to scan
-- Make it engaging and informative
-
-Include these sections:
-### Overview
-Briefly describe the main theme and purpose of this knowledge graph (2-3 sentences with key terms in **bold**)
-
-### Key Entities & Relationships
-List the most important entities and their connections using **bold** for entity names
-
-### Insights & Patterns
-Highlight interesting patterns or notable findings with **bold** emphasis on key points
-
-### Activity & Collaboration
-Describe the collaboration level and discussion activity with important metrics in **bold**
+        """
+        AI summary of the space. Returns it right away when the space's content
+        hasn't changed since it was generated; otherwise queues generation and
+        returns 202 with a summary_id to poll through GET summary/.
+        """
+        space = self.get_object()
+        return self._summary_response(request_summary(space))
 
-Keep the summary concise (2-3 paragraphs total) but well-formatted for easy reading."""
+    @action(detail=True, methods=['get'], url_path='summary')
+    def summary_status(self, request, pk=None):
+        """Status of a summary (?summary_id=), or of the latest one for the space"""
+        space = self.get_object()
+        summary_id = request.query_params.get('summary_id')
+        if summary_id:
+            summary = SpaceSummary.objects.filter(space=space, pk=summary_id).first() if summary_id.isdigit() else None
+        else:
+            summary = latest_summary(space)
+        if summary is None:
+            return Response({'error': 'No summary has been requested for this space'}, status=404)
+        return self._summary_response(summary)
 
-            api_key = os.getenv('GEMINI_API_KEY')
-            if not api_key:
-                return Response({
-                    'error': 'Gemini API key not configured. Please set GEMINI_API_KEY environment variable.'
-                }, status=500)
-            
-            genai.configure(api_key=api_key)
-            
-            model_name = 'gemini-2.5-flash'
-            model_used = model_name
-            
-            try:
-                model = genai.GenerativeModel(model_name)
-                response = model.generate_content(prompt)
-                summary = response.text
-            except Exception as flash_error:
-                error_str = str(flash_error).lower()
-                if 'quota' in error_str or 'resource' in error_str or '429' in error_str:
-                    model_name = 'gemini-2.5-flash-lite'
-                    model_used = model_name
-                    try:
-                        model = genai.GenerativeModel(model_name)
-                        response = model.generate_content(prompt)
-                        summary = response.text
-                    except Exception as lite_error:
-                        raise Exception(f"Both models failed. Flash error: {flash_error}, Lite error: {lite_error}")
-                else:
-                    raise flash_error
-            
-            return Response({
-                'summary': summary,
-                'model_used': model_used,
-                'metadata': {
-                    'node_count': nodes.count(),
-                    'edge_count': edges.count(),
-                    'discussion_count': discussions.count(),
-                    'collaborator_count': space.collaborators.count()
-                }
-            })
-            
-        except Exception as e:
-            return Response({
-                'error': f'Failed to generate summary: {str(e)}'
-            }, status=500)
+    @action(detail=True, methods=['get'], url_path='summary/stream', renderer_classes=[JSONRenderer, EventStreamRenderer])
+    def summary_stream(self, request, pk=None):
+        """
+        Server-sent events with the text of a summary (?summary_id=) as it is
+        generated, from character ?offset= on; see summaries.summary_events
+        """
+        space = self.get_object()
+        summary_id = request.query_params.get('summary_id', '')
+        offset = request.query_params.get('offset', '0')
+        if not (summary_id.isdigit() and SpaceSummary.objects.filter(space=space, pk=summary_id).exists()):
+            return Response({'error': 'Summary not found'}, status=404)
+        if not offset.isdigit():
+            return Response({'error': 'offset must be a non-negative integer'}, status=400)
+        response = StreamingHttpResponse(summary_events(int(summary_id), int(offset)), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Keep nginx from buffering the events
+        response['X-Accel-Buffering'] = 'no'
+        return response
 
     @action(detail=False, methods=['get'], url_path='top-scored', permission_classes=[IsAuthenticated])
     def top_scored(self, request):
@@ -2664,7 +2513,7 @@ def change_user_type(request):
             
             try:
                 space = Space.objects.get(id=space_id)
-                if not requesting_profile.can_moderate_space(space):
+                if not get_authz(request).can_moderate(space):
                     return Response({'error': 'You are not a moderator of this space'}, status=status.HTTP_403_FORBIDDEN)
                 
                 # Can only change regular users to moderators
@@ -2786,7 +2635,7 @@ def list_users_by_type(request):
             
             try:
                 space = Space.objects.get(id=space_id)
-                if not requesting_profile.can_moderate_space(space):
+                if not get_authz(request).can_moderate(space):
                     return Response({'error': 'You are not a moderator of this space'}, status=status.HTTP_403_FORBIDDEN)
                 
                 # Get users who are collaborators of the space
@@ -2826,49 +2675,76 @@ def dashboard_stats(request):
         if not (profile.is_admin() or profile.is_moderator()):
             return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
         
-        # Get total counts (excluding archived items)
-        total_users = User.objects.filter(profile__is_archived=False).count()
-        total_spaces = Space.objects.filter(is_archived=False).count()
-        total_graph_nodes = Node.objects.filter(is_archived=False).count()
-        
-        # Simplified active discussions count - just count all discussions for now
-        total_discussions = Discussion.objects.count()
-        
-        # For now, use total discussions as active discussions
-        active_discussions = total_discussions
-        
-        # Get additional useful stats (excluding archived items)
-        total_edges = Edge.objects.filter(
-            source__is_archived=False,
-            target__is_archived=False
-        ).count()
-        
+        # Totals (excluding archived items) are maintained incrementally
+        counters = DashboardCounters.load()
+
         return Response({
-            'totalUsers': total_users,
-            'totalSpaces': total_spaces,
-            'totalGraphNodes': total_graph_nodes,
-            'activeDiscussions': active_discussions,
-            'totalEdges': total_edges,
-            'totalDiscussions': total_discussions
+            'totalUsers': counters.users,
+            'totalSpaces': counters.spaces,
+            'totalGraphNodes': counters.nodes,
+            'activeDiscussions': counters.discussions,
+            'totalEdges': counters.edges,
+            'totalDiscussions': counters.discussions
         })
         
     except Profile.DoesNotExist:
         return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
-        print(f"Dashboard stats error: {str(e)}")  # Add logging
+        logger.exception("Dashboard stats error")
         return Response({'error': f'Internal server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+
+REQUEST_PROFILES_LIMIT = 50
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdmin])
+def list_request_profiles(request):
+    """
+    Recent profiled requests (see api/profiling.py) that took at least
+    ?min_ms= (default PROFILER_SLOW_MS), newest first; ?route= narrows to one route.
+    """
+    min_ms = request.query_params.get('min_ms', getattr(settings, 'PROFILER_SLOW_MS', DEFAULT_SLOW_MS))
+    try:
+        min_ms = float(min_ms)
+        limit = min(int(request.query_params.get('limit', REQUEST_PROFILES_LIMIT)), 200)
+    except ValueError:
+        return Response({'error': 'min_ms and limit must be numbers'}, status=status.HTTP_400_BAD_REQUEST)
+    profiles = RequestProfile.objects.filter(duration_ms__gte=min_ms).select_related('user')
+    route = request.query_params.get('route')
+    if route:
+        profiles = profiles.filter(route=route)
+    serializer = RequestProfileSummarySerializer(profiles.defer('stacks', 'sql', 'cypher')[:max(limit, 1)], many=True)
+    return Response({'min_ms': min_ms, 'results': serializer.data})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdmin])
+def get_request_profile(request, request_id):
+    """A stored request profile with its stack samples, SQL statements and Cypher queries"""
+    profile = RequestProfile.objects.select_related('user').filter(request_id=request_id).first()
+    if profile is None:
+        return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(RequestProfileSerializer(profile).data)
+
+
 class ActivityStreamView(APIView):
     """
     Serve a unified ActivityStreams OrderedCollectionPage built from stored Activity rows.
     """
     permission_classes = [AllowAny]
     serializer_class = ActivityStreamSerializer
+    url_name = 'activity_stream'
     DEFAULT_LIMIT = 25
     MAX_LIMIT = 100
 
-    def get(self, request):
+    SOURCES = ('hot', 'archive')
+
+    def get(self, request, **kwargs):
+        if self._get_source(request) == 'archive':
+            return self._get_archived(request)
+
         queryset = Activity.objects.all().order_by('-published')
         queryset = self._apply_filters(request, queryset)
 
@@ -2880,6 +2756,29 @@ class ActivityStreamView(APIView):
         end = start + limit
         activities = queryset[start:end]
 
+        return self._build_response(request, page, activities, has_next=end < total_items, total_items=total_items)
+
+    def _get_archived(self, request):
+        """
+        Page through activities that were moved out of the hot table.
+        Archive files are decoded lazily, only up to the end of the requested page.
+        """
+        params = request.query_params
+        since = self._parse_datetime(params['since'], 'since') if params.get('since') else None
+        until = self._parse_datetime(params['until'], 'until') if params.get('until') else None
+        filters = {field: params.get(field) for field in ARCHIVE_FILTER_FIELDS}
+        filters['space_id'] = self._get_space_id(request)
+
+        limit = self._get_limit(request)
+        page = self._get_page(request)
+        start = (page - 1) * limit
+
+        stream = iter_archived_activities(filters, since=since, until=until)
+        window = list(islice(stream, start, start + limit + 1))
+
+        return self._build_response(request, page, window[:limit], has_next=len(window) > limit)
+
+    def _build_response(self, request, page, activities, has_next, total_items=None):
         serializer = self.serializer_class(activities, many=True, context={'request': request})
 
         collection_url = self._build_collection_url(request)
@@ -2890,21 +2789,30 @@ class ActivityStreamView(APIView):
             'id': page_url,
             'type': 'OrderedCollectionPage',
             'partOf': collection_url,
-            'totalItems': total_items,
-            'orderedItems': serializer.data,
         }
+        if total_items is not None:
+            data['totalItems'] = total_items
+        data['orderedItems'] = serializer.data
 
-        if start > 0:
+        if page > 1:
             data['prev'] = self._build_page_url(request, page - 1)
-        if end < total_items:
+        if has_next:
             data['next'] = self._build_page_url(request, page + 1)
 
         return Response(data)
 
+    def _get_source(self, request):
+        source = request.query_params.get('source', 'hot')
+        if source not in self.SOURCES:
+            raise ValidationError({'source': f"source must be one of: {', '.join(self.SOURCES)}"})
+        return source
+
     def _apply_filters(self, request, queryset):
         activity_type = request.query_params.get('type')
         actor = request.query_params.get('actor')
         obj = request.query_params.get('object')
+        target = request.query_params.get('target')
+        space_id = self._get_space_id(request)
         since = request.query_params.get('since')
         until = request.query_params.get('until')
 
@@ -2914,6 +2822,10 @@ class ActivityStreamView(APIView):
             queryset = queryset.filter(actor__iexact=actor)
         if obj:
             queryset = queryset.filter(object__iexact=obj)
+        if target:
+            queryset = queryset.filter(target__iexact=target)
+        if space_id is not None:
+            queryset = queryset.filter(space_id=space_id)
         if since:
             queryset = queryset.filter(published__gte=self._parse_datetime(since, 'since'))
         if until:
@@ -2921,6 +2833,15 @@ class ActivityStreamView(APIView):
 
         return queryset
 
+    def _get_space_id(self, request):
+        raw_space = request.query_params.get('space')
+        if raw_space in (None, ''):
+            return None
+        try:
+            return int(raw_space)
+        except (TypeError, ValueError):
+            raise ValidationError({'space': 'space must be an integer'})
+
     def _parse_datetime(self, value, field_name):
         parsed = parse_datetime(value)
         if not parsed:
@@ -2949,8 +2870,11 @@ class ActivityStreamView(APIView):
             raise ValidationError({'page': 'page must be at least 1'})
         return page
 
+    def _build_base_url(self, request):
+        return request.build_absolute_uri(reverse(self.url_name, kwargs=self.kwargs))
+
     def _build_collection_url(self, request):
-        base_url = request.build_absolute_uri(reverse('activity_stream'))
+        base_url = self._build_base_url(request)
         params = request.query_params.copy()
         params.pop('page', None)
         if params:
@@ -2958,12 +2882,29 @@ class ActivityStreamView(APIView):
         return base_url
 
     def _build_page_url(self, request, page_number):
-        base_url = request.build_absolute_uri(reverse('activity_stream'))
+        base_url = self._build_base_url(request)
         params = request.query_params.copy()
         params['page'] = page_number
         encoded = params.urlencode()
         return f"{base_url}?{encoded}" if encoded else base_url
 
+
+class SpaceActivityView(ActivityStreamView):
+    """
+    Activity timeline of a single space, read through the (space_id, published) index.
+    Accepts the same filters and paging parameters as the global activity stream,
+    and like it is public: the same activities are listed there with ?space=.
+    """
+    url_name = 'space_activity_stream'
+
+    def get(self, request, space_id):
+        if not Space.objects.filter(pk=space_id).exists():
+            return Response({'error': 'Space not found'}, status=status.HTTP_404_NOT_FOUND)
+        return super().get(request, space_id=space_id)
+
+    def _get_space_id(self, request):
+        return self.kwargs['space_id']
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated, IsAdminOrModerator])
 def archive_item(request):
@@ -3018,8 +2959,7 @@ def archive_item(request):
                 space = Space.objects.get(id=content_id)
                 if space.is_archived:
                     return Response({'error': 'Space is already archived'}, status=status.HTTP_400_BAD_REQUEST)
-                space.is_archived = True
-                space.save(update_fields=['is_archived'])
+                set_archived(space, True)
             except Space.DoesNotExist:
                 return Response({'error': 'Space not found'}, status=status.HTTP_404_NOT_FOUND)
                 
@@ -3028,8 +2968,7 @@ def archive_item(request):
                 node = Node.objects.get(id=content_id)
                 if node.is_archived:
                     return Response({'error': 'Node is already archived'}, status=status.HTTP_400_BAD_REQUEST)
-                node.is_archived = True
-                node.save(update_fields=['is_archived'])
+                set_archived(node, True)
             except Node.DoesNotExist:
                 return Response({'error': 'Node not found'}, status=status.HTTP_404_NOT_FOUND)
                 
@@ -3038,8 +2977,7 @@ def archive_item(request):
                 profile = Profile.objects.get(user__id=content_id)
                 if profile.is_archived:
                     return Response({'error': 'Profile is already archived'}, status=status.HTTP_400_BAD_REQUEST)
-                profile.is_archived = True
-                profile.save(update_fields=['is_archived'])
+                set_archived(profile, True)
             except Profile.DoesNotExist:
                 return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
         
@@ -3054,7 +2992,7 @@ def archive_item(request):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
         
     except Exception as e:
-        print(f"Archive error: {str(e)}")
+        logger.exception("Archive error")
         return Response({'error': f'Internal server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
@@ -3090,7 +3028,7 @@ def list_archived_items(request):
         return Response(serializer.data)
         
     except Exception as e:
-        print(f"List archives error: {str(e)}")
+        logger.exception("List archives error")
         return Response({'error': f'Internal server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['POST'])
@@ -3129,24 +3067,21 @@ def restore_archived_item(request, archive_id):
         if archive.content_type == Archive.CONTENT_SPACE:
             try:
                 space = Space.objects.get(id=archive.content_id)
-                space.is_archived = False
-                space.save(update_fields=['is_archived'])
+                set_archived(space, False)
             except Space.DoesNotExist:
                 return Response({'error': 'Space not found'}, status=status.HTTP_404_NOT_FOUND)
                 
         elif archive.content_type == Archive.CONTENT_NODE:
             try:
                 node = Node.objects.get(id=archive.content_id)
-                node.is_archived = False
-                node.save(update_fields=['is_archived'])
+                set_archived(node, False)
             except Node.DoesNotExist:
                 return Response({'error': 'Node not found'}, status=status.HTTP_404_NOT_FOUND)
                 
         elif archive.content_type == Archive.CONTENT_PROFILE:
             try:
                 profile = Profile.objects.get(user__id=archive.content_id)
-                profile.is_archived = False
-                profile.save(update_fields=['is_archived'])
+                set_archived(profile, False)
             except Profile.DoesNotExist:
                 return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
         
@@ -3157,6 +3092,6 @@ def restore_archived_item(request, archive_id):
     except Archive.DoesNotExist:
         return Response({'error': 'Archive not found'}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
-        print(f"Restore error: {str(e)}")
+        logger.exception("Restore error")
         return Response({'error': f'Internal server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
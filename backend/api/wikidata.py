@@ -1,8 +1,59 @@
+import hashlib
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
 import requests
+from django.conf import settings
 from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from . import http_client, metrics
+from .lru import LRUCache
+from .singleflight import MISS, SharedFlight
+from .wikidata_offline import offline_index
+from .models import WikidataEntity, WikidataSearchResult
+
+logger = logging.getLogger(__name__)
 
 ENTITY_CACHE_TIME = 86400
 LABEL_CACHE_TIME = 604800
+SEARCH_CACHE_TIME = 3600
+
+# wbgetentities accepts at most 50 ids per call
+LABEL_CHUNK_SIZE = 50
+LABEL_FETCH_WORKERS = 4
+# Entities per VALUES clause in fetch_wikidata_properties_many; keeps the
+# query well inside the endpoint's 60 s limit.
+SPARQL_BATCH_SIZE = 100
+VALID_ENTITY_ID = re.compile(r'^Q\d+$')
+VALID_PROPERTY_ID = re.compile(r'^P\d+$')
+
+# Property picker: a per-entity summary plus pages of values per property,
+# so large items (countries, big cities) never need the full statement dump.
+PROPERTY_SUMMARY_KEY = 'wikidata_property_summary:{entity_id}'
+PROPERTY_VALUES_KEY = 'wikidata_property_values:{entity_id}:{property_id}:{page}:{page_size}'
+PROPERTY_VALUES_PAGE_SIZE = 50
+PROPERTY_VALUES_MAX_PAGE_SIZE = 500
+
+# Entity properties are cached in two tiers: an in-process LRU in front of the
+# WikidataEntity table shared by every worker. Entries older than
+# WIKIDATA_ENTITY_FRESH_SECONDS are still served but refreshed in the
+# background; past WIKIDATA_ENTITY_MAX_STALE_SECONDS they are refetched inline.
+_entity_lru = LRUCache(getattr(settings, 'WIKIDATA_ENTITY_LRU_SIZE', 512))
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+# Concurrent misses for the same entity, in this or another worker, share one SPARQL query.
+_entity_flight = SharedFlight('wikidata_entity')
+
+# Autocomplete searches: identical in-flight searches, in this or another
+# worker, share one upstream call; the leader's answer reaches the other
+# workers through the WikidataSearchResult table.
+_search_flight = SharedFlight('wikidata_search')
+SEARCH_OUTCOMES = ('hit', 'prefix', 'miss', 'coalesced')
 
 SPARQL_ENDPOINT = "https://query.wikidata.org/sparql"
 WIKIDATA_API_URL = "https://www.wikidata.org/w/api.php"
@@ -24,44 +75,213 @@ def get_wikidata_headers(include_accept=False):
         headers['Accept'] = 'application/sparql-json'
     return headers
 
-def get_property_labels(property_ids):
-    """Fetch labels for multiple properties in a single API call"""
-    if not property_ids:
-        return {}
-        
-    ids_param = "|".join(property_ids)
-    
-    cache_key = f"wikidata_props_batch_{'_'.join(sorted(property_ids))}"
-    cached_labels = cache.get(cache_key)
-    if cached_labels:
-        return cached_labels
-    
+def _label_cache_key(entity_id):
+    return f"wikidata_label_en_{entity_id}"
+
+
+def _fallback_label(entity_id):
+    return entity_id.replace('P', 'Property ')
+
+
+def _fetch_label_chunk(ids):
+    """English labels for at most LABEL_CHUNK_SIZE ids; {} if the call failed."""
+    params = {
+        "action": "wbgetentities",
+        "ids": "|".join(ids),
+        "props": "labels",
+        "languages": "en",
+        "format": "json"
+    }
     try:
-        params = {
-            "action": "wbgetentities",
-            "ids": ids_param,
-            "props": "labels",
-            "languages": "en",
-            "format": "json"
-        }
-        
-        response = requests.get(WIKIDATA_API_URL, params=params, headers=get_wikidata_headers(), timeout=5)
+        response = http_client.get(WIKIDATA_API_URL, params=params)
         data = response.json()
-        
-        result = {}
-        if 'entities' in data:
-            for prop_id, entity_data in data['entities'].items():
-                if 'labels' in entity_data and 'en' in entity_data['labels']:
-                    result[prop_id] = entity_data['labels']['en']['value']
-                else:
-                    result[prop_id] = prop_id.replace('P', 'Property ')
-        
-        cache.set(cache_key, result, LABEL_CACHE_TIME)
-        return result
-    
     except Exception as e:
-        print(f"Error fetching property labels: {str(e)}")
-        return {prop_id: prop_id.replace('P', 'Property ') for prop_id in property_ids}
+        logger.warning("Error fetching labels for %s ids: %s", len(ids), e)
+        return {}
+
+    labels = {}
+    for entity_id, entity_data in data.get('entities', {}).items():
+        if 'missing' in entity_data:
+            continue
+        label = entity_data.get('labels', {}).get('en', {}).get('value')
+        labels[entity_id] = label or _fallback_label(entity_id)
+    return labels
+
+
+def get_property_labels(property_ids):
+    """
+    English labels for Wikidata ids (properties or items), read from the
+    offline index when there is one and otherwise cached per id. Misses are
+    fetched in LABEL_CHUNK_SIZE-id wbgetentities calls run concurrently; ids
+    that could not be resolved get a placeholder label.
+    """
+    ids = list(dict.fromkeys(property_ids))
+    if not ids:
+        return {}
+
+    index = offline_index()
+    result = index.labels(ids) if index is not None else {}
+
+    keys = {entity_id: _label_cache_key(entity_id) for entity_id in ids if entity_id not in result}
+    cached = cache.get_many(list(keys.values())) if keys else {}
+    metrics.record_cache('wikidata_labels', hits=len(cached), misses=len(keys) - len(cached))
+    result.update({entity_id: cached[key] for entity_id, key in keys.items() if key in cached})
+
+    missing = [entity_id for entity_id in ids if entity_id not in result]
+    if missing:
+        chunks = [missing[i:i + LABEL_CHUNK_SIZE] for i in range(0, len(missing), LABEL_CHUNK_SIZE)]
+        if len(chunks) == 1:
+            fetched = [_fetch_label_chunk(chunks[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=min(LABEL_FETCH_WORKERS, len(chunks))) as pool:
+                fetched = list(pool.map(_fetch_label_chunk, chunks))
+
+        to_cache = {}
+        for labels in fetched:
+            for entity_id, label in labels.items():
+                result[entity_id] = label
+                to_cache[keys.get(entity_id, _label_cache_key(entity_id))] = label
+        if to_cache:
+            cache.set_many(to_cache, LABEL_CACHE_TIME)
+
+    return {entity_id: result.get(entity_id) or _fallback_label(entity_id) for entity_id in ids}
+
+def normalize_search_query(query):
+    return ' '.join(query.split()).casefold()
+
+
+def _search_cache_key(query, entity_type, language):
+    digest = hashlib.md5(query.encode()).hexdigest()
+    return f"wikidata_search:{entity_type}:{language}:{digest}"
+
+
+def _record_search(outcome):
+    metrics.CACHE_REQUESTS.inc(cache='wikidata_search', result=outcome)
+
+
+def search_cache_stats():
+    """
+    Searches per outcome, over every worker when METRICS_DIR is set, and the
+    share answered without an upstream call.
+    """
+    values = metrics.REGISTRY.collect()[metrics.CACHE_REQUESTS.name]
+    stats = {outcome: values.get(('wikidata_search', outcome), 0) for outcome in SEARCH_OUTCOMES}
+    total = sum(stats.values())
+    served = stats['hit'] + stats['prefix'] + stats['coalesced']
+    stats['total'] = total
+    stats['hit_rate'] = served / total if total else 0.0
+    return stats
+
+
+def _store_search(key, entry):
+    """Share a fetched entry with other workers, and drop the entries that have expired."""
+    now = timezone.now()
+    WikidataSearchResult.objects.update_or_create(key=key, defaults={'entry': entry, 'fetched_at': now})
+    WikidataSearchResult.objects.filter(fetched_at__lt=now - timedelta(seconds=SEARCH_CACHE_TIME)).delete()
+
+
+def _stored_search(key):
+    """The entry stored (possibly by another worker) within SEARCH_CACHE_TIME, or MISS."""
+    entry = WikidataSearchResult.objects.filter(
+        key=key, fetched_at__gte=timezone.now() - timedelta(seconds=SEARCH_CACHE_TIME)
+    ).values_list('entry', flat=True).first()
+    if entry is None:
+        return MISS
+    cache.set(key, entry, SEARCH_CACHE_TIME)
+    return entry
+
+
+def _search_terms(item):
+    """Normalized strings a result matched on: label, aliases, the matched term and the id."""
+    terms = [item.get('label') or '', item.get('match', {}).get('text') or '', item.get('id') or '']
+    terms.extend(item.get('aliases') or [])
+    return sorted({normalize_search_query(term) for term in terms if term})
+
+
+def _fetch_search(query, entity_type, language, limit):
+    params = {
+        'action': 'wbsearchentities',
+        'format': 'json',
+        'search': query,
+        'type': entity_type,
+        'language': language,
+        'uselang': language,
+        'limit': limit
+    }
+    response = http_client.get(WIKIDATA_API_URL, params=params, headers=get_wikidata_headers())
+    response.raise_for_status()
+    data = response.json()
+    if 'error' in data:
+        raise requests.exceptions.RequestException(data['error'].get('info', 'wbsearchentities failed'))
+
+    items = data.get('search', [])
+    return {
+        'results': [{
+            'id': item.get('id'),
+            'label': item.get('label'),
+            'description': item.get('description', ''),
+            'url': item.get('url', '')
+        } for item in items],
+        'terms': [_search_terms(item) for item in items],
+        # Fewer results than asked for: every entity matching this prefix is here.
+        'complete': len(items) < limit and 'search-continue' not in data,
+    }
+
+
+def _narrow_search(entry, query):
+    """Results of a complete entry for a shorter prefix that also match ``query``."""
+    kept = [
+        (result, terms) for result, terms in zip(entry['results'], entry['terms'])
+        if any(term.startswith(query) for term in terms)
+    ]
+    return {
+        'results': [result for result, _ in kept],
+        'terms': [terms for _, terms in kept],
+        'complete': True,
+    }
+
+
+def search_entities(query, entity_type='item', language='en'):
+    """
+    wbsearchentities results for an autocomplete query as ``(results, status)``.
+
+    Results are cached per normalized (query, type, language). A query whose
+    shorter prefix has a complete cached result set ("berl" returned fewer
+    than the limit) is answered by filtering that set locally. Status is
+    'HIT', 'PREFIX', 'COALESCED' or 'MISS'. Upstream failures raise
+    ``requests.RequestException`` and are not cached.
+    """
+    normalized = normalize_search_query(query)
+    key = _search_cache_key(normalized, entity_type, language)
+    prefix_keys = [
+        _search_cache_key(normalized[:end], entity_type, language)
+        for end in range(len(normalized) - 1, 0, -1)
+    ]
+    cached = cache.get_many([key] + prefix_keys)
+
+    if key in cached:
+        _record_search('hit')
+        return cached[key]['results'], 'HIT'
+
+    for prefix_key in prefix_keys:
+        entry = cached.get(prefix_key)
+        if entry and entry['complete']:
+            entry = _narrow_search(entry, normalized)
+            cache.set(key, entry, SEARCH_CACHE_TIME)
+            _record_search('prefix')
+            return entry['results'], 'PREFIX'
+
+    limit = getattr(settings, 'WIKIDATA_SEARCH_LIMIT', 20)
+
+    def fetch():
+        entry = _fetch_search(query.strip(), entity_type, language, limit)
+        cache.set(key, entry, SEARCH_CACHE_TIME)
+        _store_search(key, entry)
+        return entry
+
+    entry, shared = _search_flight.do(key, fetch, lookup=lambda: _stored_search(key))
+    _record_search('coalesced' if shared else 'miss')
+    return entry['results'], 'COALESCED' if shared else 'MISS'
 
 def format_property_value(value):
     """Format property value in a human-readable way and identify entity references"""
@@ -85,23 +305,53 @@ def execute_sparql_query(query):
     """Executes a SPARQL query against the Wikidata endpoint."""
     params = {'query': query, 'format': 'json'}
     try:
-        response = requests.post(SPARQL_ENDPOINT, headers=get_wikidata_headers(include_accept=True), data=params, timeout=30)
+        response = http_client.post(SPARQL_ENDPOINT, headers=get_wikidata_headers(include_accept=True), data=params, idempotent=True)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
-        print(f"SPARQL query failed: {e}")
+        logger.warning("SPARQL query failed: %s", e)
         return None
 
-def get_wikidata_properties(entity_id):
+def _parse_property_binding(item):
+    """One SPARQL result row as a property dict (see fetch_wikidata_properties)."""
+    prop_id = item.get('property', {}).get('value', '').split('/')[-1]
+    statement_uri = item.get('statement', {}).get('value', '')
+    statement_id = statement_uri.split('/')[-1] if statement_uri else None
+
+    prop_label = item.get('propertyLabel', {}).get('value', prop_id)
+    value_node = item.get('value', {})
+    value_type = value_node.get('type')
+    raw_value = value_node.get('value')
+    display_value = item.get('valueLabel', {}).get('value', raw_value)
+
+    value = display_value
+    if value_type == 'uri':
+        value = {'type': 'entity', 'id': raw_value.split('/')[-1], 'text': display_value}
+    elif value_type == 'literal' and 'datatype' in value_node and 'xmls#dateTime' in value_node['datatype']:
+        display_value = raw_value.split('T')[0]
+        value = display_value
+
+    return {
+        "statement_id": statement_id,
+        "property": prop_id,
+        "property_label": prop_label,
+        "value": value,
+        "display": f"{prop_label}: {display_value}"
+    }
+
+
+def _sparql_bindings(data):
+    if not data or 'results' not in data or 'bindings' not in data['results']:
+        return None
+    return data['results']['bindings']
+
+
+def fetch_wikidata_properties(entity_id):
     """
     Fetch properties for a Wikidata entity using a single SPARQL query.
-    Returns property data with human-readable labels for properties and their values.
+    Returns property data with human-readable labels for properties and their
+    values, or None when the query failed.
     """
-    cache_key = f"wikidata_props_sparql_v2_{entity_id}"
-    cached_props = cache.get(cache_key)
-    if cached_props is not None:
-        return cached_props
-
     query = f"""
     PREFIX wd: <http://www.wikidata.org/entity/>
     PREFIX wikibase: <http://wikiba.se/ontology#>
@@ -122,41 +372,418 @@ def get_wikidata_properties(entity_id):
     }}
     """
 
-    data = execute_sparql_query(query)
-    
-    if not data or 'results' not in data or 'bindings' not in data['results']:
-        return []
+    bindings = _sparql_bindings(execute_sparql_query(query))
+    if bindings is None:
+        return None
+    return [_parse_property_binding(item) for item in bindings]
 
-    properties = []
-    for item in data['results']['bindings']:
-        prop_id = item.get('property', {}).get('value', '').split('/')[-1]
-        statement_uri = item.get('statement', {}).get('value', '')
-        statement_id = statement_uri.split('/')[-1] if statement_uri else None
 
-        prop_label = item.get('propertyLabel', {}).get('value', prop_id)
-        value_node = item.get('value', {})
-        value_type = value_node.get('type')
-        raw_value = value_node.get('value')
-        display_value = item.get('valueLabel', {}).get('value', raw_value)
+def fetch_wikidata_properties_many(entity_ids, property_filter=None):
+    """
+    Properties of several entities with one SPARQL query per
+    SPARQL_BATCH_SIZE ids, restricted to ``property_filter`` (e.g. ['P31'])
+    when given. Returns {entity_id: [properties]}; ids of a chunk whose query
+    failed are left out so callers can retry them.
+    """
+    property_values = ''
+    if property_filter:
+        property_values = 'VALUES ?property { %s }' % ' '.join(f'wd:{pid}' for pid in sorted(property_filter))
+    ids = [entity_id for entity_id in dict.fromkeys(entity_ids) if VALID_ENTITY_ID.match(entity_id)]
+
+    results = {}
+    for start in range(0, len(ids), SPARQL_BATCH_SIZE):
+        chunk = ids[start:start + SPARQL_BATCH_SIZE]
+        query = f"""
+        PREFIX wd: <http://www.wikidata.org/entity/>
+        PREFIX wikibase: <http://wikiba.se/ontology#>
+        PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+        PREFIX bd: <http://www.bigdata.com/rdf#>
+        SELECT ?entity ?statement ?property ?propertyLabel ?value ?valueLabel WHERE {{
+          VALUES ?entity {{ {' '.join(f'wd:{entity_id}' for entity_id in chunk)} }}
+          {property_values}
+          ?entity ?p ?statement .
+          ?property wikibase:claim ?p .
+          ?statement ?ps ?value .
+          ?property wikibase:statementProperty ?ps .
+          FILTER(!isBLANK(?value))
+          SERVICE wikibase:label {{
+            bd:serviceParam wikibase:language "en" .
+            ?property rdfs:label ?propertyLabel .
+            ?value rdfs:label ?valueLabel .
+          }}
+        }}
+        """
+        bindings = _sparql_bindings(execute_sparql_query(query))
+        if bindings is None:
+            continue
+        chunk_results = {entity_id: [] for entity_id in chunk}
+        for item in bindings:
+            entity_id = item.get('entity', {}).get('value', '').split('/')[-1]
+            if entity_id in chunk_results:
+                chunk_results[entity_id].append(_parse_property_binding(item))
+        results.update(chunk_results)
+    return results
+
+
+def _entity_settings():
+    fresh = getattr(settings, 'WIKIDATA_ENTITY_FRESH_SECONDS', ENTITY_CACHE_TIME)
+    max_stale = getattr(settings, 'WIKIDATA_ENTITY_MAX_STALE_SECONDS', 30 * ENTITY_CACHE_TIME)
+    return fresh, max_stale
+
+
+def _entity_age(fetched_at):
+    return (timezone.now() - fetched_at).total_seconds()
+
+
+def _load_entity(entity_id):
+    """(properties, fetched_at, etag) from the LRU or the entity table, or None."""
+    entry = _entity_lru.get(entity_id)
+    if entry is None:
+        entry = WikidataEntity.objects.filter(qid=entity_id).values_list('properties', 'fetched_at', 'etag').first()
+        if entry is not None:
+            _entity_lru.set(entity_id, entry)
+    return entry
+
+
+def _load_entities(entity_ids):
+    """{entity_id: (properties, fetched_at, etag)} for the cached ones, in one query for LRU misses."""
+    entries = {}
+    unloaded = []
+    for entity_id in entity_ids:
+        entry = _entity_lru.get(entity_id)
+        if entry is None:
+            unloaded.append(entity_id)
+        else:
+            entries[entity_id] = entry
+    if unloaded:
+        rows = WikidataEntity.objects.filter(qid__in=unloaded).values_list('qid', 'properties', 'fetched_at', 'etag')
+        for qid, *entry in rows:
+            entries[qid] = entry = tuple(entry)
+            _entity_lru.set(qid, entry)
+    return entries
+
+
+def _store_entity(entity_id, properties, etag=''):
+    fetched_at = timezone.now()
+    WikidataEntity.objects.update_or_create(
+        qid=entity_id,
+        defaults={'properties': properties, 'etag': etag, 'fetched_at': fetched_at},
+    )
+    _entity_lru.set(entity_id, (properties, fetched_at, etag))
+
+
+def _stored_fresh_entity(entity_id):
+    """Properties stored (possibly by another worker) within the freshness window, or MISS."""
+    fresh, _max_stale = _entity_settings()
+    properties = WikidataEntity.objects.filter(
+        qid=entity_id, fetched_at__gte=timezone.now() - timedelta(seconds=fresh)
+    ).values_list('properties', flat=True).first()
+    return MISS if properties is None else properties
+
+
+def clear_entity_lru():
+    """Drop the in-process tier (tests, or after editing WikidataEntity rows by hand)."""
+    _entity_lru.clear()
+
+
+def entity_cache_status(entity_id):
+    """'HIT', 'STALE' or 'MISS' for the cached properties of an entity."""
+    entry = _load_entity(entity_id)
+    if entry is None:
+        return 'MISS'
+    fresh, _max_stale = _entity_settings()
+    return 'HIT' if _entity_age(entry[1]) <= fresh else 'STALE'
+
+
+def get_entity_revision(entity_id):
+    """Current lastrevid of an entity as a string, or '' if it could not be fetched."""
+    params = {
+        "action": "wbgetentities",
+        "ids": entity_id,
+        "props": "info",
+        "format": "json"
+    }
+    try:
+        response = http_client.get(WIKIDATA_API_URL, params=params, headers=get_wikidata_headers())
+        entity = response.json().get('entities', {}).get(entity_id, {})
+        revision = entity.get('lastrevid')
+        return str(revision) if revision else ''
+    except Exception as e:
+        logger.warning("Failed to fetch revision for %s: %s", entity_id, e)
+        return ''
 
-        value = display_value
-        if value_type == 'uri':
-            value = {'type': 'entity', 'id': raw_value.split('/')[-1], 'text': display_value}
-        elif value_type == 'literal' and 'datatype' in value_node and 'xmls#dateTime' in value_node['datatype']:
-            display_value = raw_value.split('T')[0]
-            value = display_value
-        
-        properties.append({
-            "statement_id": statement_id,
-            "property": prop_id,
-            "property_label": prop_label,
-            "value": value,
-            "display": f"{prop_label}: {display_value}"
-        })
 
-    cache.set(cache_key, properties, ENTITY_CACHE_TIME)
+def refresh_entity(entity_id):
+    """
+    Revalidate a cached entity. When its revision is unchanged only fetched_at
+    moves forward; otherwise the SPARQL query is re-run. Returns True if the
+    properties were refetched.
+    """
+    entry = _load_entity(entity_id)
+    etag = get_entity_revision(entity_id)
+    if entry is not None and etag and entry[2] == etag:
+        fetched_at = timezone.now()
+        WikidataEntity.objects.filter(qid=entity_id).update(fetched_at=fetched_at)
+        _entity_lru.set(entity_id, (entry[0], fetched_at, etag))
+        return False
+
+    properties = fetch_wikidata_properties(entity_id)
+    if properties is not None:
+        _store_entity(entity_id, properties, etag)
+    return True
+
+
+def _refresh_in_background(entity_id):
+    try:
+        refresh_entity(entity_id)
+    except Exception:
+        logger.exception("Background refresh of %s failed", entity_id)
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(entity_id)
+        connection.close()
+
+
+def _schedule_refresh(entity_id):
+    if not getattr(settings, 'WIKIDATA_REFRESH_IN_BACKGROUND', True):
+        refresh_entity(entity_id)
+        return
+    with _refreshing_lock:
+        if entity_id in _refreshing:
+            return
+        _refreshing.add(entity_id)
+    threading.Thread(
+        target=_refresh_in_background, args=(entity_id,), name=f'wikidata-refresh-{entity_id}', daemon=True
+    ).start()
+
+
+def get_wikidata_properties(entity_id):
+    """
+    Properties for a Wikidata entity (see fetch_wikidata_properties), served
+    from the two-tier entity cache. Stale entries are returned immediately and
+    revalidated in the background. Concurrent misses, across workers too,
+    share one query. The returned list is shared; don't mutate it.
+    """
+    entry = _load_entity(entity_id)
+    if entry is not None:
+        fresh, max_stale = _entity_settings()
+        age = _entity_age(entry[1])
+        if age <= fresh:
+            return entry[0]
+        if age <= max_stale:
+            _schedule_refresh(entity_id)
+            return (_entity_lru.get(entity_id) or entry)[0]
+
+    def fetch():
+        properties = fetch_wikidata_properties(entity_id)
+        if properties is not None:
+            _store_entity(entity_id, properties)
+        return properties
+
+    properties, _shared = _entity_flight.do(
+        f'wikidata_entity:{entity_id}', fetch, lookup=lambda: _stored_fresh_entity(entity_id)
+    )
+    if properties is None:
+        # Upstream failed: an old copy beats nothing
+        return entry[0] if entry is not None else []
     return properties
 
+
+def _filter_properties(properties, property_filter):
+    if not property_filter:
+        return properties
+    return [prop for prop in properties if prop.get('property') in property_filter]
+
+
+def get_wikidata_properties_many(entity_ids, property_filter=None):
+    """
+    {entity_id: properties} for several entities, optionally only the
+    properties in ``property_filter``. Freshly cached entities, and
+    offline-indexed ones when the filter only asks for indexed properties,
+    are answered locally; the rest are fetched with batched
+    SPARQL queries (see fetch_wikidata_properties_many). Complete
+    fetches are written to the entity cache, filtered ones are not. Ids
+    whose query failed are missing from the result.
+    """
+    property_filter = set(property_filter) if property_filter else None
+    results = {}
+    missing = []
+    index = offline_index()
+    if index is not None and not index.covers(property_filter):
+        index = None
+    fresh, _max_stale = _entity_settings()
+    unindexed = []
+    for entity_id in dict.fromkeys(entity_ids):
+        properties = index.properties(entity_id) if index is not None else None
+        if properties is None:
+            unindexed.append(entity_id)
+        else:
+            results[entity_id] = _filter_properties(properties, property_filter)
+
+    entries = _load_entities(unindexed)
+    for entity_id in unindexed:
+        entry = entries.get(entity_id)
+        if entry is not None and _entity_age(entry[1]) <= fresh:
+            results[entity_id] = _filter_properties(entry[0], property_filter)
+        else:
+            missing.append(entity_id)
+
+    fetched = fetch_wikidata_properties_many(missing, property_filter=property_filter)
+    for entity_id, properties in fetched.items():
+        if property_filter is None:
+            _store_entity(entity_id, properties)
+        results[entity_id] = properties
+    return results
+
+def _summarize(properties):
+    summary = {}
+    for prop in properties:
+        entry = summary.setdefault(prop['property'], {
+            'property': prop['property'],
+            'property_label': prop.get('property_label') or prop['property'],
+            'count': 0,
+        })
+        entry['count'] += 1
+    return list(summary.values())
+
+
+def _local_properties(entity_id, property_ids=None):
+    """
+    Properties from a fresh entity cache entry, or from the offline index
+    when all of ``property_ids`` are indexed; None when neither has them.
+    """
+    index = offline_index()
+    if index is not None and index.covers(property_ids):
+        properties = index.properties(entity_id)
+        if properties is not None:
+            return properties
+    entry = _load_entity(entity_id)
+    if entry is not None and _entity_age(entry[1]) <= _entity_settings()[0]:
+        return entry[0]
+    return None
+
+
+def fetch_property_summary(entity_id):
+    """[{'property', 'property_label', 'count'}] for an entity, or None when the query failed."""
+    query = f"""
+    PREFIX wd: <http://www.wikidata.org/entity/>
+    PREFIX wikibase: <http://wikiba.se/ontology#>
+    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+    PREFIX bd: <http://www.bigdata.com/rdf#>
+    SELECT ?property ?propertyLabel ?count WHERE {{
+      {{
+        SELECT ?p (COUNT(?statement) AS ?count) WHERE {{
+          wd:{entity_id} ?p ?statement .
+        }} GROUP BY ?p
+      }}
+      ?property wikibase:claim ?p .
+      SERVICE wikibase:label {{
+        bd:serviceParam wikibase:language "en" .
+        ?property rdfs:label ?propertyLabel .
+      }}
+    }}
+    """
+    bindings = _sparql_bindings(execute_sparql_query(query))
+    if bindings is None:
+        return None
+    summary = []
+    for item in bindings:
+        prop_id = item.get('property', {}).get('value', '').split('/')[-1]
+        summary.append({
+            'property': prop_id,
+            'property_label': item.get('propertyLabel', {}).get('value', prop_id),
+            'count': int(item.get('count', {}).get('value', 0)),
+        })
+    return sorted(summary, key=lambda entry: int(entry['property'][1:]))
+
+
+def fetch_property_values(entity_id, property_id, offset, limit):
+    """Statements of one property (see fetch_wikidata_properties), or None when the query failed."""
+    query = f"""
+    PREFIX wd: <http://www.wikidata.org/entity/>
+    PREFIX wikibase: <http://wikiba.se/ontology#>
+    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+    PREFIX bd: <http://www.bigdata.com/rdf#>
+    SELECT ?statement ?property ?propertyLabel ?value ?valueLabel WHERE {{
+      BIND(wd:{property_id} AS ?property)
+      ?property wikibase:claim ?p ;
+                wikibase:statementProperty ?ps .
+      wd:{entity_id} ?p ?statement .
+      ?statement ?ps ?value .
+      FILTER(!isBLANK(?value))
+      SERVICE wikibase:label {{
+        bd:serviceParam wikibase:language "en" .
+        ?property rdfs:label ?propertyLabel .
+        ?value rdfs:label ?valueLabel .
+      }}
+    }}
+    ORDER BY ?statement
+    LIMIT {limit} OFFSET {offset}
+    """
+    bindings = _sparql_bindings(execute_sparql_query(query))
+    if bindings is None:
+        return None
+    return [_parse_property_binding(item) for item in bindings]
+
+
+def get_property_summary(entity_id):
+    """
+    The entity's properties with labels and statement counts, without their
+    values. Served from the entity cache when it has the entity, otherwise
+    from one aggregate query cached for ENTITY_CACHE_TIME.
+    Returns (summary, cache_status), or (None, 'MISS') if Wikidata failed.
+    """
+    key = PROPERTY_SUMMARY_KEY.format(entity_id=entity_id)
+    summary = cache.get(key)
+    metrics.record_cache('wikidata_property_summary', hits=summary is not None, misses=summary is None)
+    if summary is not None:
+        return summary, 'HIT'
+    properties = _local_properties(entity_id)
+    if properties is not None:
+        return _summarize(properties), 'HIT'
+    summary = fetch_property_summary(entity_id)
+    if summary is not None:
+        cache.set(key, summary, ENTITY_CACHE_TIME)
+    return summary, 'MISS'
+
+
+def get_property_values(entity_id, property_id, page=1, page_size=PROPERTY_VALUES_PAGE_SIZE):
+    """
+    One page of an entity's statements for ``property_id``:
+    {'property', 'page', 'page_size', 'has_more', 'results'}. Each page is
+    cached separately. Returns (page, cache_status), or (None, 'MISS') if
+    Wikidata failed.
+    """
+    page_size = min(page_size, PROPERTY_VALUES_MAX_PAGE_SIZE)
+    offset = (page - 1) * page_size
+    key = PROPERTY_VALUES_KEY.format(entity_id=entity_id, property_id=property_id, page=page, page_size=page_size)
+    cached = cache.get(key)
+    metrics.record_cache('wikidata_property_values', hits=cached is not None, misses=cached is None)
+    if cached is not None:
+        return cached, 'HIT'
+
+    properties = _local_properties(entity_id, [property_id])
+    if properties is not None:
+        values = [prop for prop in properties if prop.get('property') == property_id][offset:offset + page_size + 1]
+        cache_status = 'HIT'
+    else:
+        # One extra row tells whether there is a next page
+        values = fetch_property_values(entity_id, property_id, offset, page_size + 1)
+        if values is None:
+            return None, 'MISS'
+        cache_status = 'MISS'
+
+    result = {
+        'property': property_id,
+        'page': page,
+        'page_size': page_size,
+        'has_more': len(values) > page_size,
+        'results': values[:page_size],
+    }
+    if cache_status == 'MISS':
+        cache.set(key, result, ENTITY_CACHE_TIME)
+    return result, cache_status
+
 def extract_location_from_properties(properties):
     """
     Extract location information from Wikidata properties.
@@ -234,167 +861,5 @@ def extract_location_from_properties(properties):
                     if not location_data['district'] and len(parts) > 2:
                         location_data['district'] = parts[1]
     
-    # If we have coordinates but missing location info, try reverse geocoding
-    if (location_data['latitude'] and location_data['longitude'] and 
-        not any([location_data['country'], location_data['city'], location_data['location_name']])):
-        reverse_geocoded = reverse_geocode_coordinates(location_data['latitude'], location_data['longitude'])
-        if reverse_geocoded:
-            for key, value in reverse_geocoded.items():
-                if value and not location_data[key]:
-                    location_data[key] = value
-    
+    # Names for bare coordinates are filled in later by geocoding.schedule_node_reverse_geocode
     return location_data
-
-def reverse_geocode_coordinates(latitude, longitude):
-    """
-    Convert coordinates to address information using Nominatim reverse geocoding API.
-    Returns a dictionary with location fields: country, city, district, street, location_name
-    """
-    import requests
-    import time
-    
-    try:
-        # Use Nominatim API for reverse geocoding
-        url = "https://nominatim.openstreetmap.org/reverse"
-        params = {
-            'lat': latitude,
-            'lon': longitude,
-            'format': 'json',
-            'addressdetails': 1,
-            'zoom': 18,  # High detail level
-            'accept-language': 'en'
-        }
-        headers = {
-            'User-Agent': 'ConnectTheDots/1.0'
-        }
-        
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        time.sleep(1)  # Be respectful to the API
-        
-        if response.status_code == 200:
-            data = response.json()
-            if 'address' in data:
-                address = data['address']
-                
-                location_info = {
-                    'country': None,
-                    'city': None,
-                    'district': None,
-                    'street': None,
-                    'location_name': None
-                }
-                
-                # Extract country
-                location_info['country'] = (
-                    address.get('country') or
-                    address.get('country_code', '').upper()
-                )
-                
-                # Extract city (try multiple possible fields)
-                location_info['city'] = (
-                    address.get('city') or
-                    address.get('town') or
-                    address.get('municipality') or
-                    address.get('village') or
-                    address.get('hamlet')
-                )
-                
-                # Extract district/area
-                location_info['district'] = (
-                    address.get('suburb') or
-                    address.get('district') or
-                    address.get('neighbourhood') or
-                    address.get('quarter') or
-                    address.get('city_district') or
-                    address.get('state_district')
-                )
-                
-                # Extract street
-                location_info['street'] = (
-                    address.get('road') or
-                    address.get('pedestrian') or
-                    address.get('path')
-                )
-                
-                # Create a readable location name from display_name
-                if 'display_name' in data:
-                    # Take first few parts of display_name for a concise location
-                    parts = data['display_name'].split(',')[:3]
-                    location_info['location_name'] = ', '.join(part.strip() for part in parts)
-                
-                return location_info
-                
-    except Exception as e:
-        print(f"Reverse geocoding error for coordinates ({latitude}, {longitude}): {e}")
-    
-    return None
-
-def forward_geocode_address(country=None, city=None, district=None, street=None):
-    """
-    Convert address information to coordinates using Nominatim geocoding API.
-    Returns a dictionary with latitude, longitude, and formatted location_name
-    """
-    import requests
-    import time
-    
-    # Build address string from available components
-    address_parts = []
-    if street:
-        address_parts.append(street)
-    if district:
-        address_parts.append(district)
-    if city:
-        address_parts.append(city)
-    if country:
-        address_parts.append(country)
-    
-    if not address_parts:
-        return None
-    
-    address_string = ", ".join(address_parts)
-    
-    try:
-        # Use Nominatim API for forward geocoding
-        url = "https://nominatim.openstreetmap.org/search"
-        params = {
-            'q': address_string,
-            'format': 'json',
-            'addressdetails': 1,
-            'limit': 1,
-            'accept-language': 'en'
-        }
-        headers = {
-            'User-Agent': 'ConnectTheDots/1.0'
-        }
-        
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        time.sleep(1)  # Be respectful to the API
-        
-        if response.status_code == 200:
-            data = response.json()
-            if data and len(data) > 0:
-                result = data[0]
-                
-                geocoded_info = {
-                    'latitude': None,
-                    'longitude': None,
-                    'location_name': None
-                }
-                
-                # Extract coordinates
-                if 'lat' in result and 'lon' in result:
-                    geocoded_info['latitude'] = float(result['lat'])
-                    geocoded_info['longitude'] = float(result['lon'])
-                
-                # Extract formatted location name
-                if 'display_name' in result:
-                    # Take first few parts of display_name for a concise location
-                    parts = result['display_name'].split(',')[:4]
-                    geocoded_info['location_name'] = ', '.join(part.strip() for part in parts)
-                
-                return geocoded_info
-                
-    except Exception as e:
-        print(f"Forward geocoding error for address '{address_string}': {e}")
-    
-    return None
@@ -0,0 +1,227 @@
+"""
+Local Wikidata index built from a JSON dump.
+
+``manage.py build_wikidata_index`` streams a Wikidata JSON dump (the full
+``latest-all.json.gz`` or a filtered subset in the same one-entity-per-line
+format) into a compact SQLite file with, per entity:
+
+- the label and description in one language;
+- P31 (instance of), P279 (subclass of) and P625 (coordinate location)
+  statements, or whichever properties were passed with ``--properties``.
+
+When ``WIKIDATA_OFFLINE_INDEX`` points at such a file, ``get_property_labels``
+reads it first, and lookups asking only for indexed properties (such as the
+P31 filter used by node enrichment and fetch_missing_p31) are answered from
+it. Everything else, including the full property list of an entity, still
+comes from the entity cache or Wikidata, as the index holds only some
+statements. Only entities the index does not contain go to Wikidata. The file is opened read-only, one connection per thread,
+and reopened when a rebuild replaces it.
+"""
+import bz2
+import gzip
+import json
+import os
+import sqlite3
+import threading
+
+from django.conf import settings
+
+DEFAULT_PROPERTIES = ('P31', 'P279', 'P625')
+BATCH_SIZE = 5000
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT) WITHOUT ROWID;
+CREATE TABLE entities (
+    qid TEXT PRIMARY KEY,
+    label TEXT,
+    description TEXT
+) WITHOUT ROWID;
+CREATE TABLE claims (
+    qid TEXT NOT NULL,
+    statement_id TEXT NOT NULL,
+    property TEXT NOT NULL,
+    value_id TEXT,
+    value_text TEXT,
+    PRIMARY KEY (qid, statement_id)
+) WITHOUT ROWID;
+"""
+
+_local = threading.local()
+
+
+def _open_dump(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def iter_dump_entities(path):
+    """Entities of a dump that holds a JSON array with one entity per line."""
+    with _open_dump(path) as dump:
+        for line in dump:
+            line = line.strip().rstrip(',')
+            if not line or line in ('[', ']'):
+                continue
+            yield json.loads(line)
+
+
+def _statement_id(statement):
+    # SPARQL results (and so the live properties) use "Q42-..." rather than "Q42$..."
+    return statement.get('id', '').replace('$', '-', 1)
+
+
+def entity_rows(entity, properties, language):
+    """(entity row, claim rows) for one dump entity."""
+    qid = entity['id']
+    label = entity.get('labels', {}).get(language, {}).get('value')
+    description = entity.get('descriptions', {}).get(language, {}).get('value')
+
+    claims = []
+    for prop in properties:
+        for statement in entity.get('claims', {}).get(prop, []):
+            if statement.get('rank') == 'deprecated':
+                continue
+            datavalue = statement.get('mainsnak', {}).get('datavalue')
+            if not datavalue:
+                continue
+            value = datavalue.get('value')
+            if datavalue.get('type') == 'wikibase-entityid':
+                claims.append((qid, _statement_id(statement), prop, value.get('id'), None))
+            elif datavalue.get('type') == 'globecoordinate':
+                point = f"Point({value['longitude']} {value['latitude']})"
+                claims.append((qid, _statement_id(statement), prop, None, point))
+            elif isinstance(value, str):
+                claims.append((qid, _statement_id(statement), prop, None, value))
+    return (qid, label, description), claims
+
+
+def build_index(dump_path, output_path, properties=DEFAULT_PROPERTIES, language='en'):
+    """Build the index into ``output_path`` (replaced atomically). Returns (entities, claims) counts."""
+    tmp_path = f'{output_path}.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    connection = sqlite3.connect(tmp_path)
+    try:
+        connection.executescript('PRAGMA journal_mode=OFF; PRAGMA synchronous=OFF;' + SCHEMA)
+        entity_count = claim_count = 0
+        entities, claims = [], []
+
+        def flush():
+            connection.executemany('INSERT OR REPLACE INTO entities VALUES (?, ?, ?)', entities)
+            connection.executemany('INSERT OR REPLACE INTO claims VALUES (?, ?, ?, ?, ?)', claims)
+            entities.clear()
+            claims.clear()
+
+        for entity in iter_dump_entities(dump_path):
+            if entity.get('type') not in ('item', 'property'):
+                continue
+            row, entity_claims = entity_rows(entity, properties, language)
+            entities.append(row)
+            claims.extend(entity_claims)
+            entity_count += 1
+            claim_count += len(entity_claims)
+            if len(entities) >= BATCH_SIZE:
+                flush()
+        flush()
+
+        connection.executemany('INSERT INTO meta VALUES (?, ?)', [
+            ('language', language),
+            ('properties', ','.join(properties)),
+            ('source', os.path.basename(dump_path)),
+        ])
+        connection.commit()
+    finally:
+        connection.close()
+
+    os.replace(tmp_path, output_path)
+    return entity_count, claim_count
+
+
+class OfflineIndex:
+    """Read-only lookups against a built index file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'properties'").fetchone()
+        # The properties whose statements were kept
+        self.indexed_properties = frozenset(row[0].split(',')) if row and row[0] else frozenset()
+
+    def close(self):
+        self.connection.close()
+
+    def labels(self, ids):
+        """{id: label} for the ids that are in the index and have a label."""
+        labels = {}
+        ids = list(ids)
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            labels.update(self.connection.execute(
+                f'SELECT qid, label FROM entities WHERE label IS NOT NULL AND qid IN ({placeholders})', chunk
+            ).fetchall())
+        return labels
+
+    def entity(self, qid):
+        """{'label', 'description'} or None if the entity is not indexed."""
+        row = self.connection.execute('SELECT label, description FROM entities WHERE qid = ?', (qid,)).fetchone()
+        return {'label': row[0], 'description': row[1]} if row else None
+
+    def covers(self, property_ids):
+        """Whether every statement of these properties is in the index."""
+        return bool(property_ids) and set(property_ids) <= self.indexed_properties
+
+    def properties(self, qid):
+        """
+        Indexed statements in the get_wikidata_properties format, or None if
+        the entity is not indexed. Only the indexed properties are included;
+        check ``covers`` before treating this as the entity's statements.
+        """
+        if self.entity(qid) is None:
+            return None
+        claims = self.connection.execute(
+            'SELECT statement_id, property, value_id, value_text FROM claims WHERE qid = ? ORDER BY property, statement_id',
+            (qid,)
+        ).fetchall()
+        labels = self.labels({claim[1] for claim in claims} | {claim[2] for claim in claims if claim[2]})
+
+        properties = []
+        for statement_id, prop, value_id, value_text in claims:
+            prop_label = labels.get(prop, prop)
+            if value_id:
+                display_value = labels.get(value_id, value_id)
+                value = {'type': 'entity', 'id': value_id, 'text': display_value}
+            else:
+                display_value = value = value_text
+            properties.append({
+                "statement_id": statement_id,
+                "property": prop,
+                "property_label": prop_label,
+                "value": value,
+                "display": f"{prop_label}: {display_value}"
+            })
+        return properties
+
+
+def offline_index():
+    """The configured OfflineIndex for this thread, or None when there is none."""
+    path = getattr(settings, 'WIKIDATA_OFFLINE_INDEX', '')
+    if not path:
+        return None
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+    current = getattr(_local, 'index', None)
+    if current is not None and current[0] == (path, mtime):
+        return current[1]
+    if current is not None:
+        current[1].close()
+    index = OfflineIndex(path)
+    _local.index = ((path, mtime), index)
+    return index
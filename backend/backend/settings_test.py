@@ -46,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.ServerTimingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -54,6 +56,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -152,14 +155,99 @@ CORS_ALLOWED_ORIGINS = [
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.ClaimsJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
-    ]
+    ],
+    # JSONRenderer that times itself for the Server-Timing header
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.metrics.TimedJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 from datetime import timedelta
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=1),
-}
\ No newline at end of file
+}
+# Activity retention: monthly partitions of api_activity older than the
+# retention window are exported here by `manage.py archive_activities`.
+ACTIVITY_RETENTION_MONTHS = int(os.getenv('ACTIVITY_RETENTION_MONTHS', '12'))
+ACTIVITY_PARTITION_PREMAKE_MONTHS = int(os.getenv('ACTIVITY_PARTITION_PREMAKE_MONTHS', '3'))
+ACTIVITY_ARCHIVE_DIR = os.getenv('ACTIVITY_ARCHIVE_DIR', os.path.join(BASE_DIR, 'activity_archive'))
+
+# Seconds authorization answers (collaborator/moderator/admin/archived) are
+# shared through the cache; 0 keeps them per-request only.
+AUTHZ_CACHE_TTL = int(os.getenv('AUTHZ_CACHE_TTL', '0'))
+
+# Wikidata entity cache: in-process LRU in front of the WikidataEntity table.
+# Entries older than FRESH are served while refreshed in the background;
+# past MAX_STALE they are refetched on the request path.
+WIKIDATA_ENTITY_LRU_SIZE = int(os.getenv('WIKIDATA_ENTITY_LRU_SIZE', '512'))
+WIKIDATA_ENTITY_FRESH_SECONDS = int(os.getenv('WIKIDATA_ENTITY_FRESH_SECONDS', '86400'))
+WIKIDATA_ENTITY_MAX_STALE_SECONDS = int(os.getenv('WIKIDATA_ENTITY_MAX_STALE_SECONDS', '2592000'))
+WIKIDATA_REFRESH_IN_BACKGROUND = False
+
+# Results requested from wbsearchentities per autocomplete search; matches
+# what the search dropdowns show.
+WIKIDATA_SEARCH_LIMIT = int(os.getenv('WIKIDATA_SEARCH_LIMIT', '20'))
+
+# SQLite index built by `manage.py build_wikidata_index`; when set, labels and
+# lookups of indexed properties (P31 by default) are read from it before calling
+# Wikidata.
+WIKIDATA_OFFLINE_INDEX = ''
+
+# Nominatim requests per second made by each `manage.py run_jobs` process.
+GEOCODING_RATE_LIMIT = float(os.getenv('GEOCODING_RATE_LIMIT', '1'))
+
+# GeoNames cities15000.txt / countryInfo.txt for offline reverse geocoding of
+# node coordinates; cities further than GAZETTEER_MAX_DISTANCE_KM are ignored.
+# Neither file ships with the repository: see the backfill_node_locations command
+# for where to download them.
+GAZETTEER_CITIES_FILE = ''
+GAZETTEER_COUNTRIES_FILE = ''
+GAZETTEER_MAX_DISTANCE_KM = 50
+
+# Seconds a request waits for another worker's identical upstream call
+# (Wikidata entity, search, geocode) before making its own.
+SINGLEFLIGHT_LOCK_TIMEOUT = 10
+
+# Provider that writes space summaries: 'gemini', 'stub' or the dotted path of
+# a provider class (see api/llm.py), and the prompt size it is given in tokens.
+SPACE_SUMMARY_PROVIDER = 'stub'
+SPACE_SUMMARY_PROMPT_TOKENS = 4000
+
+# Below this zoom level the map endpoints return clusters instead of points;
+# cluster tiles are cached for MAP_TILE_CACHE_SECONDS, and a change made in
+# another process retires them within MAP_TILE_VERSION_CACHE_SECONDS (see api/geo.py).
+MAP_POINTS_MIN_ZOOM = 14
+MAP_TILE_CACHE_SECONDS = 3600
+MAP_TILE_VERSION_CACHE_SECONDS = 10
+
+# Seconds between runs of the update_analytics_rollups job once it has been
+# started with `manage.py update_analytics_rollups --schedule` (see api/analytics.py).
+ANALYTICS_ROLLUP_INTERVAL = 300
+
+# Prometheus metrics at /metrics (see api/metrics.py). Under gunicorn, point
+# METRICS_DIR at a directory shared by the workers, emptied on every start;
+# scrapes need "Authorization: Bearer <METRICS_TOKEN>", and without a token
+# /metrics is only served with DEBUG on.
+METRICS_DIR = None
+METRICS_FLUSH_SECONDS = 5
+METRICS_TOKEN = ''
+
+# Request profiler for admins (X-Profile: 1, see api/profiling.py): stack
+# sampling interval, the default threshold of /api/request-profiles/, and how
+# many profiles are kept.
+PROFILER_INTERVAL_MS = 5
+PROFILER_SLOW_MS = 500
+PROFILER_KEEP = 500
+
+# Requests slower than this are logged to the api.slow_requests logger with
+# their phase breakdown and slowest SQL statements (see api/middleware.py).
+SLOW_REQUEST_MS = 1000
+
+# Per-host overrides for the outbound HTTP client (timeouts, retries, circuit
+# breaker, bulkhead); see api/http_client.py for the keys and defaults.
+OUTBOUND_HTTP_UPSTREAMS = {}
@@ -225,14 +225,13 @@ const ActivityStream = ({ title, spaceId, maxItems = 100, dense = false, classNa
       return [
         {
           label: "global",
+          url: "/activity-stream/",
           params: baseParams,
         },
       ];
     }
-    const spaceRef = `Space:${spaceId}`;
     return [
-      { label: "object", params: { ...baseParams, object: spaceRef } },
-      { label: "target", params: { ...baseParams, target: spaceRef } },
+      { label: "space", url: `/spaces/${spaceId}/activity/`, params: baseParams },
     ];
   }, [spaceId, maxItems, oneDayAgo]);
 
@@ -281,7 +280,7 @@ const ActivityStream = ({ title, spaceId, maxItems = 100, dense = false, classNa
 
     try {
       const requests = requestParams.map((entry) =>
-        api.get("/activity-stream/", { params: entry.params })
+        api.get(entry.url, { params: entry.params })
       );
       const responses = await Promise.all(requests);
 
@@ -1,9 +1,10 @@
-import { useState, useEffect, useMemo, useRef } from "react";
+import { useState, useEffect, useMemo } from "react";
 import PropTypes from "prop-types";
 import { useTranslation } from "../contexts/TranslationContext";
 import api from "../axiosConfig";
-import useWikidataSearch from "../hooks/useWikidataSearch";
+import usePropertyPicker from "../hooks/usePropertyPicker";
 import PropertySearch from "./PropertySearch";
+import PropertySelectionList from "./PropertySelectionList";
 import useClickOutside from "../hooks/useClickOutside";
 import ReportModal from "./ReportModal";
 import "./NodeDetailModal.css";
@@ -91,194 +92,6 @@ const getPropertyLabelWithId = (prop) => {
   return propId ? `${label} (${propId})` : label;
 };
 
-const PropertySelectionList = ({
-  properties,
-  selectedProperties,
-  onChange,
-}) => {
-  const scrollContainerRef = useRef(null);
-
-  const groupedProperties = useMemo(() => {
-    const groups = {};
-    properties.forEach((prop) => {
-      if (!prop || !prop.statement_id) return;
-      const propId = prop.property || prop.property_id;
-      const key = propId || getPropertyLabelWithId(prop) || "unknown";
-
-      if (!groups[key]) {
-        groups[key] = {
-          key,
-          label: getPropertyLabelWithId(prop).split(':')[0].trim(),
-          values: [],
-        };
-      }
-      groups[key].values.push(prop);
-    });
-    return Object.values(groups);
-  }, [properties]);
-
-  const handleItemClick = (statementId) => {
-    let scrollPos = 0;
-    if (scrollContainerRef.current) {
-      scrollPos = scrollContainerRef.current.scrollTop;
-    }
-
-    const newSelection = selectedProperties.includes(statementId)
-      ? selectedProperties.filter((id) => id !== statementId)
-      : [...selectedProperties, statementId];
-
-    onChange(newSelection);
-
-    if (scrollContainerRef.current) {
-      setTimeout(() => {
-        scrollContainerRef.current.scrollTop = scrollPos;
-      }, 0);
-    }
-  };
-
-  const handleGlobalSelectAll = () => {
-    const allStatementIds = properties.map((p) => p.statement_id);
-    const areAllSelected = allStatementIds.length > 0 && allStatementIds.every((id) => selectedProperties.includes(id));
-    
-    if (areAllSelected) {
-      onChange([]);
-    } else {
-      onChange(allStatementIds);
-    }
-  };
-
-  const handleGroupSelectAll = (group) => {
-    const groupStatementIds = group.values.map((p) => p.statement_id);
-    const areAllGroupSelected = groupStatementIds.every((id) => selectedProperties.includes(id));
-
-    let newSelection = [...selectedProperties];
-
-    if (areAllGroupSelected) {
-      newSelection = newSelection.filter((id) => !groupStatementIds.includes(id));
-    } else {
-      const missingIds = groupStatementIds.filter((id) => !selectedProperties.includes(id));
-      newSelection = [...newSelection, ...missingIds];
-    }
-    onChange(newSelection);
-  };
-
-  const renderSelectionPropertyValue = (prop) => {
-    if (
-      prop && // Ensure prop exists
-      prop.value &&
-      typeof prop.value === "object" &&
-      prop.value.type === "entity"
-    ) {
-      return (
-        <a
-          href={`https://www.wikidata.org/wiki/${prop.value.id}`}
-          target="_blank"
-          rel="noopener noreferrer"
-          className="entity-link"
-          onClick={(e) => {
-            e.stopPropagation();
-            e.preventDefault();
-            window.open(
-              `https://www.wikidata.org/wiki/${prop.value.id}`,
-              "_blank"
-            );
-          }}
-        >
-          {prop.value.text}
-        </a>
-      );
-    }
-
-    return prop?.value ? String(prop.value) : "No value available";
-  };
-
-  const allStatementIds = properties.map((p) => p.statement_id);
-  const areAllSelected = allStatementIds.length > 0 && allStatementIds.every((id) => selectedProperties.includes(id));
-
-  return (
-    <div className="property-selection-container">
-      <div 
-        className="property-selection-header" 
-        style={{ 
-          padding: '8px 12px', 
-          borderBottom: '1px solid var(--color-gray-300)', 
-          backgroundColor: 'var(--color-bg-secondary)', 
-          display: 'flex', 
-          alignItems: 'center',
-          cursor: 'pointer'
-        }}
-        onClick={handleGlobalSelectAll}
-      >
-        <input
-          type="checkbox"
-          checked={areAllSelected}
-          onChange={handleGlobalSelectAll}
-          className="property-checkbox"
-          onClick={(e) => e.stopPropagation()}
-        />
-        <span style={{ fontWeight: '600', fontSize: '0.9rem', color: 'var(--color-text)' }}>Select All Properties</span>
-      </div>
-      <div className="property-selection-list" ref={scrollContainerRef}>
-        {groupedProperties.map((group) => {
-          const groupStatementIds = group.values.map(p => p.statement_id);
-          const isGroupSelected = groupStatementIds.every(id => selectedProperties.includes(id));
-          
-          return (
-            <div key={group.key} className="property-group-item selection-group">
-              <div 
-                className="property-group-header selection-header"
-                style={{ display: 'flex', alignItems: 'center', cursor: 'pointer' }}
-                onClick={() => handleGroupSelectAll(group)}
-              >
-                <input
-                  type="checkbox"
-                  checked={isGroupSelected}
-                  onChange={(e) => {
-                    e.stopPropagation();
-                    handleGroupSelectAll(group);
-                  }}
-                  className="property-checkbox"
-                  onClick={(e) => e.stopPropagation()}
-                />
-                <span className="property-group-label">{group.label}</span>
-              </div>
-              <ul className="property-values-list">
-                {group.values.map((prop) => (
-                  <div
-                    key={prop.statement_id}
-                    className={`property-selection-item ${
-                      selectedProperties.includes(prop.statement_id)
-                        ? "selected"
-                        : ""
-                    }`}
-                    onClick={() => handleItemClick(prop.statement_id)}
-                  >
-                    <input
-                      type="checkbox"
-                      id={`prop-${prop.statement_id}`}
-                      checked={selectedProperties.includes(prop.statement_id)}
-                      onChange={() => handleItemClick(prop.statement_id)}
-                      className="property-checkbox"
-                      onClick={(e) => e.stopPropagation()}
-                    />
-                    <label
-                      htmlFor={`prop-${prop.statement_id}`}
-                      className="property-selection-label"
-                      onClick={(e) => e.stopPropagation()}
-                    >
-                      {renderSelectionPropertyValue(prop)}
-                    </label>
-                  </div>
-                ))}
-              </ul>
-            </div>
-          );
-        })}
-      </div>
-    </div>
-  );
-};
-
 const NodeDetailModal = ({
   node,
   onClose,
@@ -292,7 +105,6 @@ const NodeDetailModal = ({
   const [nodeProperties, setNodeProperties] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
-  const [availableProperties, setAvailableProperties] = useState([]);
   const [selectedProperties, setSelectedProperties] = useState([]);
   const [confirmDelete, setConfirmDelete] = useState(false);
   const [allNodes, setAllNodes] = useState([]);
@@ -344,7 +156,13 @@ const NodeDetailModal = ({
     location_name: ''
   });
 
-  const { fetchProperties } = useWikidataSearch();
+  const {
+    summary: propertySummary,
+    valuePages,
+    load: loadPropertySummary,
+    loadValues,
+    findStatement,
+  } = usePropertyPicker();
 
   // Extract location information from node properties
   const extractLocationFromNodeProperties = (properties) => {
@@ -414,18 +232,18 @@ const NodeDetailModal = ({
   };
 
   const filteredAndSortedProperties = useMemo(() => {
-    if (!availableProperties) return [];
-    return availableProperties
-      .filter((prop) => prop && prop.display && prop.property)
+    const query = propertySearch.toLowerCase();
+    return propertySummary
       .filter((prop) =>
-        prop.display.toLowerCase().includes(propertySearch.toLowerCase())
+        prop.property.toLowerCase().includes(query) ||
+        (prop.property_label || "").toLowerCase().includes(query)
       )
       .sort((a, b) => {
         const numA = parseInt(a.property.substring(1), 10);
         const numB = parseInt(b.property.substring(1), 10);
         return numA - numB;
       });
-  }, [availableProperties, propertySearch]);
+  }, [propertySummary, propertySearch]);
 
   const groupedProperties = useMemo(() => {
     const groups = {};
@@ -471,8 +289,7 @@ const NodeDetailModal = ({
 
         const wikidataId = node.data?.wikidata_id || node.wikidata_id;
         if (wikidataId) {
-          const properties = await fetchProperties(wikidataId);
-          setAvailableProperties(properties);
+          await loadPropertySummary(wikidataId);
 
           const selectedPropertyIds = response.data.map(
             (prop) => prop.statement_id
@@ -487,7 +304,7 @@ const NodeDetailModal = ({
     };
 
     fetchNodeProperties();
-  }, [node.id, spaceId, fetchProperties]);
+  }, [node.id, spaceId, loadPropertySummary]);
 
   useEffect(() => {
     const fetchNodeImage = async () => {
@@ -986,9 +803,18 @@ const NodeDetailModal = ({
 
   const handleSaveChanges = async () => {
     try {
-      const fullSelectedProperties = selectedProperties.map((statementId) =>
-        availableProperties.find((p) => p.statement_id === statementId)
-      );
+      // Values of properties that were never expanded are the node's saved ones
+      const fullSelectedProperties = selectedProperties.map((statementId) => {
+        const statement = findStatement(statementId);
+        if (statement) return statement;
+        const saved = nodeProperties.find((p) => p.statement_id === statementId);
+        return saved && {
+          statement_id: saved.statement_id,
+          property: saved.property_id,
+          property_label: saved.property_label,
+          value: saved.property_value,
+        };
+      });
       await api.put(
         `/spaces/${spaceId}/nodes/${node.id}/update-properties/`,
         {
@@ -1773,7 +1599,7 @@ const NodeDetailModal = ({
             </div>
 
             {/* Property selection UI for editing node properties */}
-            {availableProperties.length > 0 && (
+            {propertySummary.length > 0 && (
               <div className="edit-properties-section">
                 <div 
                   className="collapsible-header" 
@@ -1804,8 +1630,10 @@ const NodeDetailModal = ({
                     />
                     <PropertySelectionList
                       properties={filteredAndSortedProperties}
+                      valuePages={valuePages}
                       selectedProperties={selectedProperties}
                       onChange={handlePropertySelection}
+                      onLoadValues={loadValues}
                     />
                     <button
                       className="save-button"
@@ -0,0 +1,235 @@
+import { useState, useRef } from "react";
+import PropTypes from "prop-types";
+import { useTranslation } from "../contexts/TranslationContext";
+
+const getPropertyLabelWithId = (property) => {
+  const label = property.property_label;
+  if (!label || label === property.property) {
+    return property.property;
+  }
+  return `${label} (${property.property})`;
+};
+
+// Properties of an entity from its property summary; a property's values are
+// loaded, a page at a time, when it is expanded (see usePropertyPicker).
+const PropertySelectionList = ({
+  properties,
+  valuePages,
+  selectedProperties,
+  onChange,
+  onLoadValues,
+}) => {
+  const { t } = useTranslation();
+  const scrollContainerRef = useRef(null);
+  const [expanded, setExpanded] = useState([]);
+
+  const loadedValues = (propertyId) => valuePages[propertyId]?.results || [];
+
+  const toggleExpanded = (propertyId) => {
+    if (expanded.includes(propertyId)) {
+      setExpanded(expanded.filter((id) => id !== propertyId));
+      return;
+    }
+    setExpanded([...expanded, propertyId]);
+    if (!valuePages[propertyId]) {
+      onLoadValues(propertyId);
+    }
+  };
+
+  const handleItemClick = (statementId) => {
+    let scrollPos = 0;
+    if (scrollContainerRef.current) {
+      scrollPos = scrollContainerRef.current.scrollTop;
+    }
+
+    const newSelection = selectedProperties.includes(statementId)
+      ? selectedProperties.filter((id) => id !== statementId)
+      : [...selectedProperties, statementId];
+
+    onChange(newSelection);
+
+    if (scrollContainerRef.current) {
+      setTimeout(() => {
+        scrollContainerRef.current.scrollTop = scrollPos;
+      }, 0);
+    }
+  };
+
+  // Only values that have been loaded can be selected
+  const allStatementIds = properties.flatMap((property) =>
+    loadedValues(property.property).map((p) => p.statement_id)
+  );
+  const areAllSelected = allStatementIds.length > 0 && allStatementIds.every((id) => selectedProperties.includes(id));
+
+  const handleGlobalSelectAll = () => {
+    if (areAllSelected) {
+      onChange(selectedProperties.filter((id) => !allStatementIds.includes(id)));
+    } else {
+      onChange([...selectedProperties, ...allStatementIds.filter((id) => !selectedProperties.includes(id))]);
+    }
+  };
+
+  const handleGroupSelectAll = (propertyId) => {
+    const groupStatementIds = loadedValues(propertyId).map((p) => p.statement_id);
+    if (groupStatementIds.length === 0) {
+      toggleExpanded(propertyId);
+      return;
+    }
+    const areAllGroupSelected = groupStatementIds.every((id) => selectedProperties.includes(id));
+
+    let newSelection = [...selectedProperties];
+
+    if (areAllGroupSelected) {
+      newSelection = newSelection.filter((id) => !groupStatementIds.includes(id));
+    } else {
+      const missingIds = groupStatementIds.filter((id) => !selectedProperties.includes(id));
+      newSelection = [...newSelection, ...missingIds];
+    }
+    onChange(newSelection);
+  };
+
+  const renderPropertyValue = (prop) => {
+    if (
+      prop &&
+      prop.value &&
+      typeof prop.value === "object" &&
+      prop.value.type === "entity"
+    ) {
+      return (
+        <a
+          href={`https://www.wikidata.org/wiki/${prop.value.id}`}
+          target="_blank"
+          rel="noopener noreferrer"
+          className="entity-link"
+          onClick={(e) => {
+            e.stopPropagation();
+            e.preventDefault();
+            window.open(
+              `https://www.wikidata.org/wiki/${prop.value.id}`,
+              "_blank"
+            );
+          }}
+        >
+          {prop.value.text}
+        </a>
+      );
+    }
+
+    return prop?.value ? String(prop.value) : "No value available";
+  };
+
+  return (
+    <div className="property-selection-container">
+      <div
+        className="property-selection-header"
+        style={{
+          padding: '8px 12px',
+          borderBottom: '1px solid var(--color-gray-300)',
+          backgroundColor: 'var(--color-bg-secondary)',
+          display: 'flex',
+          alignItems: 'center',
+          cursor: 'pointer'
+        }}
+        onClick={handleGlobalSelectAll}
+      >
+        <input
+          type="checkbox"
+          checked={areAllSelected}
+          onChange={handleGlobalSelectAll}
+          className="property-checkbox"
+          onClick={(e) => e.stopPropagation()}
+        />
+        <span style={{ fontWeight: '600', fontSize: '0.9rem', color: 'var(--color-text)' }}>Select All Properties</span>
+      </div>
+      <div className="property-selection-list" ref={scrollContainerRef}>
+        {properties.map((property) => {
+          const propertyId = property.property;
+          const pages = valuePages[propertyId];
+          const values = loadedValues(propertyId);
+          const isExpanded = expanded.includes(propertyId);
+          const isGroupSelected = values.length > 0 && values.every((p) => selectedProperties.includes(p.statement_id));
+
+          return (
+            <div key={propertyId} className="property-group-item selection-group">
+              <div
+                className="property-group-header selection-header"
+                style={{ display: 'flex', alignItems: 'center', cursor: 'pointer' }}
+                onClick={() => toggleExpanded(propertyId)}
+              >
+                <input
+                  type="checkbox"
+                  checked={isGroupSelected}
+                  onChange={(e) => {
+                    e.stopPropagation();
+                    handleGroupSelectAll(propertyId);
+                  }}
+                  className="property-checkbox"
+                  onClick={(e) => e.stopPropagation()}
+                />
+                <span className="property-group-label">
+                  {getPropertyLabelWithId(property)} ({property.count})
+                </span>
+                <span className={`expand-icon ${isExpanded ? 'expanded' : ''}`} style={{ marginLeft: 'auto' }}>
+                  ▼
+                </span>
+              </div>
+              {isExpanded && (
+                <ul className="property-values-list">
+                  {values.map((prop) => (
+                    <div
+                      key={prop.statement_id}
+                      className={`property-selection-item ${
+                        selectedProperties.includes(prop.statement_id)
+                          ? "selected"
+                          : ""
+                      }`}
+                      onClick={() => handleItemClick(prop.statement_id)}
+                    >
+                      <input
+                        type="checkbox"
+                        id={`prop-${prop.statement_id}`}
+                        checked={selectedProperties.includes(prop.statement_id)}
+                        onChange={() => handleItemClick(prop.statement_id)}
+                        className="property-checkbox"
+                        onClick={(e) => e.stopPropagation()}
+                      />
+                      <label
+                        htmlFor={`prop-${prop.statement_id}`}
+                        className="property-selection-label"
+                        onClick={(e) => e.stopPropagation()}
+                      >
+                        {renderPropertyValue(prop)}
+                      </label>
+                    </div>
+                  ))}
+                  {pages?.loading && <div className="property-selection-item">{t("common.loading")}</div>}
+                  {pages?.hasMore && !pages.loading && (
+                    <div className="property-selection-item" onClick={() => onLoadValues(propertyId)}>
+                      <span className="entity-link">{t("common.loadMore")}</span>
+                    </div>
+                  )}
+                </ul>
+              )}
+            </div>
+          );
+        })}
+      </div>
+    </div>
+  );
+};
+
+PropertySelectionList.propTypes = {
+  properties: PropTypes.arrayOf(
+    PropTypes.shape({
+      property: PropTypes.string.isRequired,
+      property_label: PropTypes.string,
+      count: PropTypes.number,
+    })
+  ).isRequired,
+  valuePages: PropTypes.object.isRequired,
+  selectedProperties: PropTypes.arrayOf(PropTypes.string).isRequired,
+  onChange: PropTypes.func.isRequired,
+  onLoadValues: PropTypes.func.isRequired,
+};
+
+export default PropertySelectionList;
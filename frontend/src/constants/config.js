@@ -21,6 +21,10 @@ export const API_ENDPOINTS = {
   WIKIDATA_PROPERTY_SEARCH: "/spaces/wikidata-property-search/",
   WIKIDATA_PROPERTIES: (entityId) =>
     `/spaces/wikidata-entity-properties/${entityId}/`,
+  WIKIDATA_PROPERTY_SUMMARY: (entityId) =>
+    `/spaces/wikidata-entity-property-summary/${entityId}/`,
+  WIKIDATA_PROPERTY_VALUES: (entityId, propertyId) =>
+    `/spaces/wikidata-entity-property-values/${entityId}/${propertyId}/`,
   PROFILE_ME: "/profiles/me/",
   UPDATE_PROFILE: "/profiles/update_profile/",
   PROFILE: (username) => `/profiles/${username}/user_profile/`,
@@ -0,0 +1,78 @@
+import { useState, useCallback, useMemo, useRef } from "react";
+import useWikidataSearch from "./useWikidataSearch";
+
+// Property picker for a Wikidata entity: the property summary up front, the
+// values of a property one page at a time once it is expanded.
+const usePropertyPicker = () => {
+  const { fetchPropertySummary, fetchPropertyValues } = useWikidataSearch();
+  const [summary, setSummary] = useState([]);
+  // propertyId -> { results, page, hasMore, loading }
+  const [valuePages, setValuePages] = useState({});
+  const entityRef = useRef(null);
+  const pagesRef = useRef({});
+
+  const updatePages = useCallback((propertyId, update) => {
+    pagesRef.current = {
+      ...pagesRef.current,
+      [propertyId]: { ...pagesRef.current[propertyId], ...update },
+    };
+    setValuePages(pagesRef.current);
+  }, []);
+
+  const reset = useCallback(() => {
+    entityRef.current = null;
+    pagesRef.current = {};
+    setSummary([]);
+    setValuePages({});
+  }, []);
+
+  const load = useCallback(async (entityId) => {
+    reset();
+    entityRef.current = entityId;
+    const result = await fetchPropertySummary(entityId);
+    if (entityRef.current === entityId) {
+      setSummary(result);
+    }
+  }, [fetchPropertySummary, reset]);
+
+  // Fetches the next page of a property's values
+  const loadValues = useCallback(async (propertyId) => {
+    const entityId = entityRef.current;
+    const current = pagesRef.current[propertyId];
+    if (!entityId || current?.loading || (current && !current.hasMore)) return;
+
+    updatePages(propertyId, { loading: true });
+    try {
+      const page = await fetchPropertyValues(entityId, propertyId, (current?.page || 0) + 1);
+      if (entityRef.current !== entityId) return;
+      updatePages(propertyId, {
+        results: [...(current?.results || []), ...page.results],
+        page: page.page,
+        hasMore: page.has_more,
+        loading: false,
+      });
+    } catch (err) {
+      if (entityRef.current === entityId) {
+        updatePages(propertyId, { loading: false });
+      }
+    }
+  }, [fetchPropertyValues, updatePages]);
+
+  const loadedStatements = useMemo(
+    () => Object.fromEntries(
+      Object.values(valuePages)
+        .flatMap((pages) => pages.results || [])
+        .map((statement) => [statement.statement_id, statement])
+    ),
+    [valuePages]
+  );
+
+  const findStatement = useCallback(
+    (statementId) => loadedStatements[statementId],
+    [loadedStatements]
+  );
+
+  return { summary, valuePages, load, loadValues, reset, findStatement };
+};
+
+export default usePropertyPicker;
@@ -1,5 +1,6 @@
 import { useState, useCallback } from 'react';
 import api from '../axiosConfig';
+import { API_ENDPOINTS } from '../constants/config';
 
 const useWikidataSearch = () => {
   const [searchResults, setSearchResults] = useState([]);
@@ -17,8 +18,9 @@ const useWikidataSearch = () => {
       setError(null);
 
       const response = await api.get(
-        `/spaces/wikidata-search/?q=${encodeURIComponent(query)}`,
+        API_ENDPOINTS.WIKIDATA_SEARCH,
         {
+          params: { q: query },
           headers: {
             "Content-Type": "application/json",
             Authorization: `Bearer ${localStorage.getItem("token")}`,
@@ -35,13 +37,14 @@ const useWikidataSearch = () => {
     }
   }, []);
 
-  const fetchProperties = useCallback(async (entityId) => {
+  // Property ids, labels and counts only; cheap even for very large items
+  const fetchPropertySummary = useCallback(async (entityId) => {
     try {
       setLoading(true);
       setError(null);
 
       const response = await api.get(
-        `/spaces/wikidata-entity-properties/${encodeURIComponent(entityId)}/`,
+        API_ENDPOINTS.WIKIDATA_PROPERTY_SUMMARY(encodeURIComponent(entityId)),
         {
           headers: {
             "Content-Type": "application/json",
@@ -53,19 +56,44 @@ const useWikidataSearch = () => {
       return response.data;
     } catch (err) {
       setError(err.message || 'Failed to fetch entity properties');
-      console.error("Error fetching entity properties:", err);
+      console.error("Error fetching entity property summary:", err);
       throw err;
     } finally {
       setLoading(false);
     }
   }, []);
 
+  // One page of values for a single property: { results, has_more, page, page_size }
+  const fetchPropertyValues = useCallback(async (entityId, propertyId, page = 1) => {
+    try {
+      setError(null);
+
+      const response = await api.get(
+        API_ENDPOINTS.WIKIDATA_PROPERTY_VALUES(encodeURIComponent(entityId), encodeURIComponent(propertyId)),
+        {
+          params: { page },
+          headers: {
+            "Content-Type": "application/json",
+            Authorization: `Bearer ${localStorage.getItem("token")}`,
+          },
+        }
+      );
+
+      return response.data;
+    } catch (err) {
+      setError(err.message || 'Failed to fetch property values');
+      console.error("Error fetching property values:", err);
+      throw err;
+    }
+  }, []);
+
   return {
     searchResults,
     loading,
     error,
     search,
-    fetchProperties,
+    fetchPropertySummary,
+    fetchPropertyValues,
   };
 };
 
@@ -4,9 +4,11 @@ import { useTranslation } from "../contexts/TranslationContext";
 import api from "../axiosConfig";
 import SpaceGraph from "../components/SpaceGraph";
 import NodeDetailModal from "../components/NodeDetailModal";
+import PropertySelectionList from "../components/PropertySelectionList";
 import "../components/NodeDetailModal.css";
 import useGraphData from "../hooks/useGraphData";
 import useWikidataSearch from "../hooks/useWikidataSearch";
+import usePropertyPicker from "../hooks/usePropertyPicker";
 import { API_ENDPOINTS } from "../constants/config";
 import EdgeDetailModal from "../components/EdgeDetailModal";
 import SpaceDiscussions from "../components/SpaceDiscussions";
@@ -19,6 +21,46 @@ import InstanceTypeLegend from "../components/InstanceTypeLegend";
 import { getGroupById } from "../config/instanceTypes";
 import { marked } from "marked";
 
+const SUMMARY_POLL_INTERVAL_MS = 2000;
+
+// Reads the server-sent events of a summary being generated, calling onDelta
+// with each piece of text. Resolves with the final event ({ event, data }):
+// done, error, or pending when the server ended the stream before the summary.
+// fetch rather than EventSource, which can't send the Authorization header.
+const streamSummary = async (url, headers, onDelta) => {
+  const response = await fetch(url, { headers: { ...headers, Accept: 'text/event-stream' } });
+  if (!response.ok || !response.body) {
+    throw new Error(`Summary stream failed with status ${response.status}`);
+  }
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffered = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) {
+      throw new Error('Summary stream ended early');
+    }
+    buffered += decoder.decode(value, { stream: true });
+    let boundary;
+    while ((boundary = buffered.indexOf('\n\n')) !== -1) {
+      const block = buffered.slice(0, boundary);
+      buffered = buffered.slice(boundary + 2);
+      const fields = {};
+      block.split('\n').forEach((line) => {
+        const separator = line.indexOf(': ');
+        if (separator !== -1) fields[line.slice(0, separator)] = line.slice(separator + 2);
+      });
+      const data = JSON.parse(fields.data || '{}');
+      if (fields.event === 'delta') {
+        onDelta(data.text);
+      } else {
+        reader.cancel();
+        return { event: fields.event, data };
+      }
+    }
+  }
+};
+
 const infoModalStyles = `
 .info-icon-btn {
   background: none;
@@ -563,210 +605,6 @@ const fullscreenGraphStyles = `
 }
 `;
 
-const getPropertyLabelWithId = (prop) => {
-  const label =
-    prop.property_label ||
-    (prop.display && prop.display.includes(":")
-      ? prop.display.split(":")[0].trim()
-      : prop.property_label);
-  const propId = prop.property || prop.property_id;
-  if (!label) {
-    return propId || "Unknown Property";
-  }
-  if (propId && label.includes(propId)) {
-    return label;
-  }
-  return propId ? `${label} (${propId})` : label;
-};
-
-const PropertySelectionList = ({
-  properties,
-  selectedProperties,
-  onChange,
-}) => {
-  const scrollContainerRef = useRef(null);
-
-  const groupedProperties = useMemo(() => {
-    const groups = {};
-    properties.forEach((prop) => {
-      if (!prop || !prop.statement_id) return;
-      const propId = prop.property || prop.property_id;
-      const key = propId || getPropertyLabelWithId(prop) || "unknown";
-
-      if (!groups[key]) {
-        groups[key] = {
-          key,
-          label: getPropertyLabelWithId(prop).split(':')[0].trim(),
-          values: [],
-        };
-      }
-      groups[key].values.push(prop);
-    });
-    return Object.values(groups);
-  }, [properties]);
-
-  const handleItemClick = (statementId) => {
-    let scrollPos = 0;
-    if (scrollContainerRef.current) {
-      scrollPos = scrollContainerRef.current.scrollTop;
-    }
-
-    const newSelection = selectedProperties.includes(statementId)
-      ? selectedProperties.filter((id) => id !== statementId)
-      : [...selectedProperties, statementId];
-
-    onChange(newSelection);
-
-    if (scrollContainerRef.current) {
-      setTimeout(() => {
-        scrollContainerRef.current.scrollTop = scrollPos;
-      }, 0);
-    }
-  };
-
-  const handleGlobalSelectAll = () => {
-    const allStatementIds = properties.map((p) => p.statement_id);
-    const areAllSelected = allStatementIds.length > 0 && allStatementIds.every((id) => selectedProperties.includes(id));
-    
-    if (areAllSelected) {
-      onChange([]);
-    } else {
-      onChange(allStatementIds);
-    }
-  };
-
-  const handleGroupSelectAll = (group) => {
-    const groupStatementIds = group.values.map((p) => p.statement_id);
-    const areAllGroupSelected = groupStatementIds.every((id) => selectedProperties.includes(id));
-
-    let newSelection = [...selectedProperties];
-
-    if (areAllGroupSelected) {
-      newSelection = newSelection.filter((id) => !groupStatementIds.includes(id));
-    } else {
-      const missingIds = groupStatementIds.filter((id) => !selectedProperties.includes(id));
-      newSelection = [...newSelection, ...missingIds];
-    }
-    onChange(newSelection);
-  };
-
-  const renderPropertyValue = (prop) => {
-    if (
-      prop &&
-      prop.value &&
-      typeof prop.value === "object" &&
-      prop.value.type === "entity"
-    ) {
-      return (
-        <a
-          href={`https://www.wikidata.org/wiki/${prop.value.id}`}
-          target="_blank"
-          rel="noopener noreferrer"
-          className="entity-link"
-          onClick={(e) => {
-            e.stopPropagation();
-            e.preventDefault();
-            window.open(
-              `https://www.wikidata.org/wiki/${prop.value.id}`,
-              "_blank"
-            );
-          }}
-        >
-          {prop.value.text}
-        </a>
-      );
-    }
-
-    return prop?.value ? String(prop.value) : "No value available";
-  };
-
-  const allStatementIds = properties.map((p) => p.statement_id);
-  const areAllSelected = allStatementIds.length > 0 && allStatementIds.every((id) => selectedProperties.includes(id));
-
-  return (
-    <div className="property-selection-container">
-      <div 
-        className="property-selection-header" 
-        style={{ 
-          padding: '8px 12px', 
-          borderBottom: '1px solid var(--color-gray-300)', 
-          backgroundColor: 'var(--color-bg-secondary)', 
-          display: 'flex', 
-          alignItems: 'center',
-          cursor: 'pointer'
-        }}
-        onClick={handleGlobalSelectAll}
-      >
-        <input
-          type="checkbox"
-          checked={areAllSelected}
-          onChange={handleGlobalSelectAll}
-          className="property-checkbox"
-          onClick={(e) => e.stopPropagation()}
-        />
-        <span style={{ fontWeight: '600', fontSize: '0.9rem', color: 'var(--color-text)' }}>Select All Properties</span>
-      </div>
-      <div className="property-selection-list" ref={scrollContainerRef}>
-        {groupedProperties.map((group) => {
-          const groupStatementIds = group.values.map(p => p.statement_id);
-          const isGroupSelected = groupStatementIds.every(id => selectedProperties.includes(id));
-          
-          return (
-            <div key={group.key} className="property-group-item selection-group">
-              <div 
-                className="property-group-header selection-header"
-                style={{ display: 'flex', alignItems: 'center', cursor: 'pointer' }}
-                onClick={() => handleGroupSelectAll(group)}
-              >
-                <input
-                  type="checkbox"
-                  checked={isGroupSelected}
-                  onChange={(e) => {
-                    e.stopPropagation();
-                    handleGroupSelectAll(group);
-                  }}
-                  className="property-checkbox"
-                  onClick={(e) => e.stopPropagation()}
-                />
-                <span className="property-group-label">{group.label}</span>
-              </div>
-              <ul className="property-values-list">
-                {group.values.map((prop) => (
-                  <div
-                    key={prop.statement_id}
-                    className={`property-selection-item ${
-                      selectedProperties.includes(prop.statement_id)
-                        ? "selected"
-                        : ""
-                    }`}
-                    onClick={() => handleItemClick(prop.statement_id)}
-                  >
-                    <input
-                      type="checkbox"
-                      id={`prop-${prop.statement_id}`}
-                      checked={selectedProperties.includes(prop.statement_id)}
-                      onChange={() => handleItemClick(prop.statement_id)}
-                      className="property-checkbox"
-                      onClick={(e) => e.stopPropagation()}
-                    />
-                    <label
-                      htmlFor={`prop-${prop.statement_id}`}
-                      className="property-selection-label"
-                      onClick={(e) => e.stopPropagation()}
-                    >
-                      {renderPropertyValue(prop)}
-                    </label>
-                  </div>
-                ))}
-              </ul>
-            </div>
-          );
-        })}
-      </div>
-    </div>
-  );
-};
-
 const SpaceDetails = () => {
   const { t } = useTranslation();
   const location = useLocation();
@@ -897,8 +735,15 @@ const SpaceDetails = () => {
     loading: searchLoading,
     error: searchError,
     search,
-    fetchProperties,
   } = useWikidataSearch();
+  const {
+    summary: propertySummary,
+    valuePages,
+    load: loadPropertySummary,
+    loadValues,
+    reset: resetPropertyPicker,
+    findStatement,
+  } = usePropertyPicker();
 
   const nodeDegrees = useMemo(() => {
     const degrees = {};
@@ -964,18 +809,18 @@ const SpaceDetails = () => {
   }, [existingNodes, nodeSortOption, nodeDegrees]);
 
   const filteredAndSortedProperties = useMemo(() => {
-    if (!entityProperties) return [];
-    return entityProperties
-      .filter((prop) => prop && prop.display && prop.property)
+    const query = propertySearch.toLowerCase();
+    return propertySummary
       .filter((prop) =>
-        prop.display.toLowerCase().includes(propertySearch.toLowerCase())
+        prop.property.toLowerCase().includes(query) ||
+        (prop.property_label || "").toLowerCase().includes(query)
       )
       .sort((a, b) => {
         const numA = parseInt(a.property.substring(1), 10);
         const numB = parseInt(b.property.substring(1), 10);
         return numA - numB;
       });
-  }, [entityProperties, propertySearch]);
+  }, [propertySummary, propertySearch]);
 
   useEffect(() => {
     window.scrollTo(0, 0);
@@ -1391,7 +1236,7 @@ const SpaceDetails = () => {
     const entityId = e.target.value;
     if (!entityId) {
       setSelectedEntity(null);
-      setEntityProperties([]);
+      resetPropertyPicker();
       // Reset location when no entity is selected
       setNewNodeLocation({
         country: '',
@@ -1420,9 +1265,8 @@ const SpaceDetails = () => {
     });
     
     try {
-      const properties = await fetchProperties(entityId);
-      setEntityProperties(properties);
       setSelectedProperties([]);
+      await loadPropertySummary(entityId);
     } catch (err) {
       console.error(err);
     }
@@ -1596,20 +1440,59 @@ const SpaceDetails = () => {
   const handleAiSummarize = async () => {
     setLoadingAiSummary(true);
     setAiSummaryError(null);
+    setAiSummary(null);
     setShowAiSummary(true);
     
+    const headers = {
+      Authorization: `Bearer ${localStorage.getItem("token")}`,
+    };
+
     try {
-      const response = await api.post(
-        `/spaces/${id}/summarize/`,
-        {},
-        {
-          headers: {
-            Authorization: `Bearer ${localStorage.getItem("token")}`,
-          },
+      let response = await api.post(`/spaces/${id}/summarize/`, {}, { headers });
+
+      // Generation runs in the background; show its text as it is written
+      if (response.data.status === 'pending' || response.data.status === 'running') {
+        const summaryId = response.data.summary_id;
+        setAiSummary({ summary: '', metadata: {} });
+        try {
+          // Each stream lasts a few seconds; 'pending' says where to pick up
+          let result = null;
+          while (!result || result.event === 'pending') {
+            if (result) {
+              await new Promise((resolve) => setTimeout(resolve, SUMMARY_POLL_INTERVAL_MS));
+            }
+            const offset = result ? result.data.offset : 0;
+            result = await streamSummary(
+              `${api.defaults.baseURL}/spaces/${id}/summary/stream/?summary_id=${summaryId}&offset=${offset}`,
+              headers,
+              (text) => setAiSummary((current) => ({ ...current, summary: (current?.summary || '') + text })),
+            );
+          }
+          if (result.event === 'error') {
+            response = { data: { status: 'failed', error: result.data.error } };
+          }
+        } catch (streamError) {
+          console.error("Summary stream unavailable, polling instead:", streamError);
         }
-      );
-      
-      setAiSummary(response.data);
+        if (response.data.status !== 'failed') {
+          response = await api.get(`/spaces/${id}/summary/`, { headers, params: { summary_id: summaryId } });
+        }
+      }
+
+      // Poll until it is done or failed if the stream couldn't follow it
+      while (response.data.status === 'pending' || response.data.status === 'running') {
+        await new Promise((resolve) => setTimeout(resolve, SUMMARY_POLL_INTERVAL_MS));
+        response = await api.get(`/spaces/${id}/summary/`, {
+          headers,
+          params: { summary_id: response.data.summary_id },
+        });
+      }
+
+      if (response.data.status === 'failed') {
+        setAiSummaryError(response.data.error || "Failed to generate AI summary");
+      } else {
+        setAiSummary(response.data);
+      }
     } catch (error) {
       console.error("Error generating AI summary:", error);
       setAiSummaryError(error.response?.data?.error || "Failed to generate AI summary");
@@ -4401,7 +4284,7 @@ const SpaceDetails = () => {
               </div>
             )}
 
-            {selectedEntity && entityProperties.length > 0 && (
+            {selectedEntity && propertySummary.length > 0 && (
               <div>
                 <h4>{t("space.selectedEntity")}: {selectedEntity.label}</h4>
                 <div>
@@ -4423,8 +4306,10 @@ const SpaceDetails = () => {
                   />
                   <PropertySelectionList
                     properties={filteredAndSortedProperties}
+                    valuePages={valuePages}
                     selectedProperties={selectedProperties}
                     onChange={handlePropertySelection}
+                    onLoadValues={loadValues}
                   />
                 </div>
                 <div style={{ marginTop: "10px" }}>
@@ -4704,12 +4589,7 @@ const SpaceDetails = () => {
                   style={{ marginTop: "20px" }}
                   disabled={!selectedEntity}
                   onClick={() => {
-                    const fullSelectedProperties = selectedProperties.map(
-                      (statementId) =>
-                        entityProperties.find(
-                          (p) => p.statement_id === statementId
-                        )
-                    );
+                    const fullSelectedProperties = selectedProperties.map(findStatement);
                     api
                       .post(
                         `/spaces/${id}/add-node/`,
@@ -5105,7 +4985,7 @@ const SpaceDetails = () => {
               </button>
             </div>
 
-            {loadingAiSummary && (
+            {loadingAiSummary && !aiSummary?.summary && (
               <div style={{
                 textAlign: 'center',
                 padding: '40px 20px',
@@ -5147,7 +5027,7 @@ const SpaceDetails = () => {
               </div>
             )}
 
-            {aiSummary && !loadingAiSummary && !aiSummaryError && (
+            {aiSummary && (!loadingAiSummary || aiSummary.summary) && !aiSummaryError && (
               <div>
                 <div style={{
                   backgroundColor: '#f8f9fa',
@@ -55,7 +55,8 @@ vi.mock("../hooks/useWikidataSearch", () => ({
     loading: false,
     error: null,
     search: vi.fn(),
-    fetchProperties: vi.fn(),
+    fetchPropertySummary: vi.fn(),
+    fetchPropertyValues: vi.fn(),
   }),
 }));
 
@@ -101,62 +101,66 @@ def create_postgresql_datasource(session):
         print(f"Response: {response.text}")
         return None
 
-def create_user_cards_dashboard(session,datasource_uid):
-    """Create dashboard with user metric cards - daily, weekly, monthly"""
-    
-    # Combined daily user query
-    daily_users_query = """
+# Card periods: (change column, new-rows column suffix, current period,
+# previous period, new rows). Changes compare complete periods: yesterday with
+# the day before, the last 7 full days with the 7 before them, and this month
+# so far with last month.
+CARD_PERIODS = {
+    'daily': (
+        'daily_change', 'today',
+        "period = 'day' AND period_start >= date_trunc('day', CURRENT_TIMESTAMP) - INTERVAL '1 day' AND period_start < date_trunc('day', CURRENT_TIMESTAMP)",
+        "period = 'day' AND period_start >= date_trunc('day', CURRENT_TIMESTAMP) - INTERVAL '2 days' AND period_start < date_trunc('day', CURRENT_TIMESTAMP) - INTERVAL '1 day'",
+        "period = 'day' AND period_start >= date_trunc('day', CURRENT_TIMESTAMP)",
+    ),
+    'weekly': (
+        'weekly_change', 'this_week',
+        "period = 'day' AND period_start >= date_trunc('day', CURRENT_TIMESTAMP) - INTERVAL '7 days' AND period_start < date_trunc('day', CURRENT_TIMESTAMP)",
+        "period = 'day' AND period_start >= date_trunc('day', CURRENT_TIMESTAMP) - INTERVAL '14 days' AND period_start < date_trunc('day', CURRENT_TIMESTAMP) - INTERVAL '7 days'",
+        "period = 'week' AND period_start >= date_trunc('week', CURRENT_TIMESTAMP)",
+    ),
+    'monthly': (
+        'monthly_change', 'this_month',
+        "period = 'month' AND period_start >= date_trunc('month', CURRENT_DATE)",
+        "period = 'month' AND period_start = date_trunc('month', CURRENT_DATE - INTERVAL '1 month')",
+        "period = 'month' AND period_start >= date_trunc('month', CURRENT_DATE)",
+    ),
+}
+
+def rollup_card_query(metric, period):
+    """
+    Card query (total, % change, new this period) for a metric, read from the
+    api_analyticsrollup table kept up to date by `manage.py update_analytics_rollups`
+    instead of counting the base tables on every refresh.
+    """
+    change_column, new_suffix, current, previous, new = CARD_PERIODS[period]
+    return f"""
     SELECT
-        COUNT(*) AS total_users,
+        COALESCE(SUM(count) FILTER (WHERE period = 'month'), 0) AS total_{metric},
         COALESCE(
             ROUND(
                 (
-                    (
-                        (SELECT COUNT(*) FROM auth_user WHERE date_joined >= NOW() - INTERVAL '1 day')::numeric /
-                        NULLIF((SELECT COUNT(*) FROM auth_user WHERE date_joined >= NOW() - INTERVAL '2 days' AND date_joined < NOW() - INTERVAL '1 day'), 0)
-                    ) - 1
+                    COALESCE(SUM(count) FILTER (WHERE {current}), 0)::numeric /
+                    NULLIF(SUM(count) FILTER (WHERE {previous}), 0)
+                    - 1
                 ) * 100, 2
             ),
-        0) AS daily_change,
-        (SELECT COUNT(*) FROM auth_user WHERE date_joined >= date_trunc('day', CURRENT_TIMESTAMP)) AS new_users_today
-    FROM auth_user;
+        0) AS {change_column},
+        COALESCE(SUM(count) FILTER (WHERE {new}), 0) AS new_{metric}_{new_suffix}
+    FROM api_analyticsrollup
+    WHERE metric = '{metric}';
     """
 
+def create_user_cards_dashboard(session,datasource_uid):
+    """Create dashboard with user metric cards - daily, weekly, monthly"""
+    
+    # Combined daily user query
+    daily_users_query = rollup_card_query('users', 'daily')
+
     # Combined weekly user query
-    weekly_users_query = """
-    SELECT
-        COUNT(*) AS total_users,
-        COALESCE(
-            ROUND(
-                (
-                    (
-                        (SELECT COUNT(*) FROM auth_user WHERE date_joined >= NOW() - INTERVAL '7 days')::numeric /
-                        NULLIF((SELECT COUNT(*) FROM auth_user WHERE date_joined >= NOW() - INTERVAL '14 days' AND date_joined < NOW() - INTERVAL '7 days'), 0)
-                    ) - 1
-                ) * 100, 2
-            ),
-        0) AS weekly_change,
-        (SELECT COUNT(*) FROM auth_user WHERE date_joined >= date_trunc('week', CURRENT_TIMESTAMP)) AS new_users_this_week
-    FROM auth_user;
-    """
+    weekly_users_query = rollup_card_query('users', 'weekly')
 
     # Combined monthly user query
-    monthly_users_query = """
-    SELECT
-        COUNT(*) AS total_users,
-        COALESCE(
-            ROUND(
-                (
-                    (
-                        (SELECT COUNT(*) FROM auth_user WHERE date_joined >= date_trunc('month', CURRENT_DATE))::numeric /
-                        NULLIF((SELECT COUNT(*) FROM auth_user WHERE date_joined >= date_trunc('month', CURRENT_DATE - INTERVAL '1 month') AND date_joined < date_trunc('month', CURRENT_DATE)), 0)
-                    ) - 1
-                ) * 100, 2
-            ),
-        0) AS monthly_change,
-        (SELECT COUNT(*) FROM auth_user WHERE date_joined >= date_trunc('month', CURRENT_DATE)) AS new_users_this_month
-    FROM auth_user;
-    """
+    monthly_users_query = rollup_card_query('users', 'monthly')
 
     dashboard_config = {
         "dashboard": {
@@ -400,220 +404,40 @@ def create_combined_analytics_dashboard(session, datasource_uid):
     """Create combined dashboard with both user and space metrics"""
     
     # Combined daily user query
-    daily_users_query = """
-    SELECT
-        COUNT(*) AS total_users,
-        COALESCE(
-            ROUND(
-                (
-                    (
-                        (SELECT COUNT(*) FROM auth_user WHERE date_joined >= NOW() - INTERVAL '1 day')::numeric /
-                        NULLIF((SELECT COUNT(*) FROM auth_user WHERE date_joined >= NOW() - INTERVAL '2 days' AND date_joined < NOW() - INTERVAL '1 day'), 0)
-                    ) - 1
-                ) * 100, 2
-            ),
-        0) AS daily_change,
-        (SELECT COUNT(*) FROM auth_user WHERE date_joined >= date_trunc('day', CURRENT_TIMESTAMP)) AS new_users_today
-    FROM auth_user;
-    """
+    daily_users_query = rollup_card_query('users', 'daily')
 
     # Combined weekly user query
-    weekly_users_query = """
-    SELECT
-        COUNT(*) AS total_users,
-        COALESCE(
-            ROUND(
-                (
-                    (
-                        (SELECT COUNT(*) FROM auth_user WHERE date_joined >= NOW() - INTERVAL '7 days')::numeric /
-                        NULLIF((SELECT COUNT(*) FROM auth_user WHERE date_joined >= NOW() - INTERVAL '14 days' AND date_joined < NOW() - INTERVAL '7 days'), 0)
-                    ) - 1
-                ) * 100, 2
-            ),
-        0) AS weekly_change,
-        (SELECT COUNT(*) FROM auth_user WHERE date_joined >= date_trunc('week', CURRENT_TIMESTAMP)) AS new_users_this_week
-    FROM auth_user;
-    """
+    weekly_users_query = rollup_card_query('users', 'weekly')
 
     # Combined monthly user query
-    monthly_users_query = """
-    SELECT
-        COUNT(*) AS total_users,
-        COALESCE(
-            ROUND(
-                (
-                    (
-                        (SELECT COUNT(*) FROM auth_user WHERE date_joined >= date_trunc('month', CURRENT_DATE))::numeric /
-                        NULLIF((SELECT COUNT(*) FROM auth_user WHERE date_joined >= date_trunc('month', CURRENT_DATE - INTERVAL '1 month') AND date_joined < date_trunc('month', CURRENT_DATE)), 0)
-                    ) - 1
-                ) * 100, 2
-            ),
-        0) AS monthly_change,
-        (SELECT COUNT(*) FROM auth_user WHERE date_joined >= date_trunc('month', CURRENT_DATE)) AS new_users_this_month
-    FROM auth_user;
-    """
+    monthly_users_query = rollup_card_query('users', 'monthly')
 
     # Combined daily space query
-    daily_spaces_query = """
-    SELECT
-        COUNT(*) AS total_spaces,
-        COALESCE(
-            ROUND(
-                (
-                    (
-                        (SELECT COUNT(*) FROM api_space WHERE created_at >= NOW() - INTERVAL '1 day')::numeric /
-                        NULLIF((SELECT COUNT(*) FROM api_space WHERE created_at >= NOW() - INTERVAL '2 days' AND created_at < NOW() - INTERVAL '1 day'), 0)
-                    ) - 1
-                ) * 100, 2
-            ),
-        0) AS daily_change,
-        (SELECT COUNT(*) FROM api_space WHERE created_at >= date_trunc('day', CURRENT_TIMESTAMP)) AS new_spaces_today
-    FROM api_space;
-    """
+    daily_spaces_query = rollup_card_query('spaces', 'daily')
 
     # Combined weekly space query
-    weekly_spaces_query = """
-    SELECT
-        COUNT(*) AS total_spaces,
-        COALESCE(
-            ROUND(
-                (
-                    (
-                        (SELECT COUNT(*) FROM api_space WHERE created_at >= NOW() - INTERVAL '7 days')::numeric /
-                        NULLIF((SELECT COUNT(*) FROM api_space WHERE created_at >= NOW() - INTERVAL '14 days' AND created_at < NOW() - INTERVAL '7 days'), 0)
-                    ) - 1
-                ) * 100, 2
-            ),
-        0) AS weekly_change,
-        (SELECT COUNT(*) FROM api_space WHERE created_at >= date_trunc('week', CURRENT_TIMESTAMP)) AS new_spaces_this_week
-    FROM api_space;
-    """
+    weekly_spaces_query = rollup_card_query('spaces', 'weekly')
 
     # Combined monthly space query
-    monthly_spaces_query = """
-    SELECT
-        COUNT(*) AS total_spaces,
-        COALESCE(
-            ROUND(
-                (
-                    (
-                        (SELECT COUNT(*) FROM api_space WHERE created_at >= date_trunc('month', CURRENT_DATE))::numeric /
-                        NULLIF((SELECT COUNT(*) FROM api_space WHERE created_at >= date_trunc('month', CURRENT_DATE - INTERVAL '1 month') AND created_at < date_trunc('month', CURRENT_DATE)), 0)
-                    ) - 1
-                ) * 100, 2
-            ),
-        0) AS monthly_change,
-        (SELECT COUNT(*) FROM api_space WHERE created_at >= date_trunc('month', CURRENT_DATE)) AS new_spaces_this_month
-    FROM api_space;
-    """
+    monthly_spaces_query = rollup_card_query('spaces', 'monthly')
 
     # Combined daily node query
-    daily_nodes_query = """
-    SELECT
-        COUNT(*) AS total_nodes,
-        COALESCE(
-            ROUND(
-                (
-                    (
-                        (SELECT COUNT(*) FROM api_node WHERE created_at >= NOW() - INTERVAL '1 day')::numeric /
-                        NULLIF((SELECT COUNT(*) FROM api_node WHERE created_at >= NOW() - INTERVAL '2 days' AND created_at < NOW() - INTERVAL '1 day'), 0)
-                    ) - 1
-                ) * 100, 2
-            ),
-        0) AS daily_change,
-        (SELECT COUNT(*) FROM api_node WHERE created_at >= date_trunc('day', CURRENT_TIMESTAMP)) AS new_nodes_today
-    FROM api_node;
-    """
+    daily_nodes_query = rollup_card_query('nodes', 'daily')
 
     # Combined weekly node query
-    weekly_nodes_query = """
-    SELECT
-        COUNT(*) AS total_nodes,
-        COALESCE(
-            ROUND(
-                (
-                    (
-                        (SELECT COUNT(*) FROM api_node WHERE created_at >= NOW() - INTERVAL '7 days')::numeric /
-                        NULLIF((SELECT COUNT(*) FROM api_node WHERE created_at >= NOW() - INTERVAL '14 days' AND created_at < NOW() - INTERVAL '7 days'), 0)
-                    ) - 1
-                ) * 100, 2
-            ),
-        0) AS weekly_change,
-        (SELECT COUNT(*) FROM api_node WHERE created_at >= date_trunc('week', CURRENT_TIMESTAMP)) AS new_nodes_this_week
-    FROM api_node;
-    """
+    weekly_nodes_query = rollup_card_query('nodes', 'weekly')
 
     # Combined monthly node query
-    monthly_nodes_query = """
-    SELECT
-        COUNT(*) AS total_nodes,
-        COALESCE(
-            ROUND(
-                (
-                    (
-                        (SELECT COUNT(*) FROM api_node WHERE created_at >= date_trunc('month', CURRENT_DATE))::numeric /
-                        NULLIF((SELECT COUNT(*) FROM api_node WHERE created_at >= date_trunc('month', CURRENT_DATE - INTERVAL '1 month') AND created_at < date_trunc('month', CURRENT_DATE)), 0)
-                    ) - 1
-                ) * 100, 2
-            ),
-        0) AS monthly_change,
-        (SELECT COUNT(*) FROM api_node WHERE created_at >= date_trunc('month', CURRENT_DATE)) AS new_nodes_this_month
-    FROM api_node;
-    """
+    monthly_nodes_query = rollup_card_query('nodes', 'monthly')
 
     # Combined daily edge query
-    daily_edges_query = """
-    SELECT
-        COUNT(*) AS total_edges,
-        COALESCE(
-            ROUND(
-                (
-                    (
-                        (SELECT COUNT(*) FROM api_edge WHERE created_at >= NOW() - INTERVAL '1 day')::numeric /
-                        NULLIF((SELECT COUNT(*) FROM api_edge WHERE created_at >= NOW() - INTERVAL '2 days' AND created_at < NOW() - INTERVAL '1 day'), 0)
-                    ) - 1
-                ) * 100, 2
-            ),
-        0) AS daily_change,
-        (SELECT COUNT(*) FROM api_edge WHERE created_at >= date_trunc('day', CURRENT_TIMESTAMP)) AS new_edges_today
-    FROM api_edge;
-    """
+    daily_edges_query = rollup_card_query('edges', 'daily')
 
     # Combined weekly edge query
-    weekly_edges_query = """
-    SELECT
-        COUNT(*) AS total_edges,
-        COALESCE(
-            ROUND(
-                (
-                    (
-                        (SELECT COUNT(*) FROM api_edge WHERE created_at >= NOW() - INTERVAL '7 days')::numeric /
-                        NULLIF((SELECT COUNT(*) FROM api_edge WHERE created_at >= NOW() - INTERVAL '14 days' AND created_at < NOW() - INTERVAL '7 days'), 0)
-                    ) - 1
-                ) * 100, 2
-            ),
-        0) AS weekly_change,
-        (SELECT COUNT(*) FROM api_edge WHERE created_at >= date_trunc('week', CURRENT_TIMESTAMP)) AS new_edges_this_week
-    FROM api_edge;
-    """
+    weekly_edges_query = rollup_card_query('edges', 'weekly')
 
     # Combined monthly edge query
-    monthly_edges_query = """
-    SELECT
-        COUNT(*) AS total_edges,
-        COALESCE(
-            ROUND(
-                (
-                    (
-                        (SELECT COUNT(*) FROM api_edge WHERE created_at >= date_trunc('month', CURRENT_DATE))::numeric /
-                        NULLIF((SELECT COUNT(*) FROM api_edge WHERE created_at >= date_trunc('month', CURRENT_DATE - INTERVAL '1 month') AND created_at < date_trunc('month', CURRENT_DATE)), 0)
-                    ) - 1
-                ) * 100, 2
-            ),
-        0) AS monthly_change,
-        (SELECT COUNT(*) FROM api_edge WHERE created_at >= date_trunc('month', CURRENT_DATE)) AS new_edges_this_month
-    FROM api_edge;
-    """
+    monthly_edges_query = rollup_card_query('edges', 'monthly')
 
     dashboard_config = {
         "dashboard": {
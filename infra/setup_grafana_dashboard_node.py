@@ -104,57 +104,59 @@ def create_postgresql_datasource(session):
 def create_node_growth_dashboard(session, datasource_uid):
     """Create dashboard showing node creation analytics over time"""
     
+    # Rolled up by `manage.py update_analytics_rollups`; totals count every node
+    # created before the first point, not just those inside the time range
     # SQL query for daily total nodes (cumulative)
     daily_growth_query = """
-    WITH daily_creations AS (
+    WITH cumulative AS (
         SELECT 
-            date_trunc('day', created_at) as day,
-            count(*) as new_nodes_this_day
-        FROM api_node 
-        WHERE created_at IS NOT NULL
-            AND $__timeFilter(created_at)
-        GROUP BY date_trunc('day', created_at)
+            period_start as day,
+            SUM(count) OVER (ORDER BY period_start ROWS UNBOUNDED PRECEDING) as total_nodes
+        FROM api_analyticsrollup 
+        WHERE metric = 'nodes'
+            AND period = 'day'
     )
     SELECT 
         day as time,
-        SUM(new_nodes_this_day) OVER (ORDER BY day ROWS UNBOUNDED PRECEDING) as total_nodes
-    FROM daily_creations
+        total_nodes
+    FROM cumulative
+    WHERE $__timeFilter(day)
     ORDER BY time
     """
     
     # SQL query for weekly total nodes (cumulative)
     weekly_growth_query = """
-    WITH weekly_creations AS (
+    WITH cumulative AS (
         SELECT 
-            date_trunc('week', created_at) as week,
-            count(*) as new_nodes_this_week
-        FROM api_node 
-        WHERE created_at IS NOT NULL
-            AND $__timeFilter(created_at)
-        GROUP BY date_trunc('week', created_at)
+            period_start as week,
+            SUM(count) OVER (ORDER BY period_start ROWS UNBOUNDED PRECEDING) as total_nodes
+        FROM api_analyticsrollup 
+        WHERE metric = 'nodes'
+            AND period = 'week'
     )
     SELECT 
         week as time,
-        SUM(new_nodes_this_week) OVER (ORDER BY week ROWS UNBOUNDED PRECEDING) as total_nodes
-    FROM weekly_creations
+        total_nodes
+    FROM cumulative
+    WHERE $__timeFilter(week)
     ORDER BY time
     """
     
     # SQL query for monthly total nodes (cumulative) - one point per month
     monthly_growth_query = """
-    WITH monthly_creations AS (
+    WITH cumulative AS (
         SELECT 
-            date_trunc('month', created_at) as month,
-            count(*) as new_nodes_this_month
-        FROM api_node 
-        WHERE created_at IS NOT NULL
-            AND $__timeFilter(created_at)
-        GROUP BY date_trunc('month', created_at)
+            period_start as month,
+            SUM(count) OVER (ORDER BY period_start ROWS UNBOUNDED PRECEDING) as total_nodes
+        FROM api_analyticsrollup 
+        WHERE metric = 'nodes'
+            AND period = 'month'
     )
     SELECT 
         month as time,
-        SUM(new_nodes_this_month) OVER (ORDER BY month ROWS UNBOUNDED PRECEDING) as total_nodes
-    FROM monthly_creations
+        total_nodes
+    FROM cumulative
+    WHERE $__timeFilter(month)
     ORDER BY time
     """
     
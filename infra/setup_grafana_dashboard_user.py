@@ -104,57 +104,59 @@ def create_postgresql_datasource(session):
 def create_user_growth_dashboard(session, datasource_uid):
     """Create dashboard showing user growth changes over time"""
     
+    # Rolled up by `manage.py update_analytics_rollups`; totals count every user
+    # created before the first point, not just those inside the time range
     # SQL query for daily total users (cumulative)
     daily_growth_query = """
-    WITH daily_registrations AS (
+    WITH cumulative AS (
         SELECT 
-            date_trunc('day', date_joined) as day,
-            count(*) as new_users_this_day
-        FROM auth_user 
-        WHERE date_joined IS NOT NULL
-            AND $__timeFilter(date_joined)
-        GROUP BY date_trunc('day', date_joined)
+            period_start as day,
+            SUM(count) OVER (ORDER BY period_start ROWS UNBOUNDED PRECEDING) as total_users
+        FROM api_analyticsrollup 
+        WHERE metric = 'users'
+            AND period = 'day'
     )
     SELECT 
         day as time,
-        SUM(new_users_this_day) OVER (ORDER BY day ROWS UNBOUNDED PRECEDING) as total_users
-    FROM daily_registrations
+        total_users
+    FROM cumulative
+    WHERE $__timeFilter(day)
     ORDER BY time
     """
     
     # SQL query for weekly total users (cumulative)
     weekly_growth_query = """
-    WITH weekly_registrations AS (
+    WITH cumulative AS (
         SELECT 
-            date_trunc('week', date_joined) as week,
-            count(*) as new_users_this_week
-        FROM auth_user 
-        WHERE date_joined IS NOT NULL
-            AND $__timeFilter(date_joined)
-        GROUP BY date_trunc('week', date_joined)
+            period_start as week,
+            SUM(count) OVER (ORDER BY period_start ROWS UNBOUNDED PRECEDING) as total_users
+        FROM api_analyticsrollup 
+        WHERE metric = 'users'
+            AND period = 'week'
     )
     SELECT 
         week as time,
-        SUM(new_users_this_week) OVER (ORDER BY week ROWS UNBOUNDED PRECEDING) as total_users
-    FROM weekly_registrations
+        total_users
+    FROM cumulative
+    WHERE $__timeFilter(week)
     ORDER BY time
     """
     
     # SQL query for monthly total users (cumulative) - one point per month
     monthly_growth_query = """
-    WITH monthly_data AS (
+    WITH cumulative AS (
         SELECT 
-            DATE_TRUNC('month', date_joined) + INTERVAL '1 month' - INTERVAL '1 day' as month_end,
-            COUNT(*) as users_in_month
-        FROM auth_user 
-        WHERE date_joined IS NOT NULL
-            AND $__timeFilter(date_joined)
-        GROUP BY DATE_TRUNC('month', date_joined)
+            period_start + INTERVAL '1 month' - INTERVAL '1 day' as month_end,
+            SUM(count) OVER (ORDER BY period_start ROWS UNBOUNDED PRECEDING) as total_users
+        FROM api_analyticsrollup 
+        WHERE metric = 'users'
+            AND period = 'month'
     )
     SELECT 
         month_end as time,
-        SUM(users_in_month) OVER (ORDER BY month_end ROWS UNBOUNDED PRECEDING) as total_users
-    FROM monthly_data
+        total_users
+    FROM cumulative
+    WHERE $__timeFilter(month_end)
     ORDER BY time
     """
     